@@ -0,0 +1,43 @@
+"""Fixtures of the benchmarks: synthetic grid trees of configurable size and depth.
+
+The sizes and the depth can be changed via the GSY_BENCHMARK_AREA_COUNTS (comma separated)
+and GSY_BENCHMARK_GRID_DEPTH environment variables.
+"""
+import os
+from functools import lru_cache
+from typing import Dict
+
+import pytest
+
+from gsy_e_sdk.emulator import create_nested_grid
+from gsy_e_sdk.utils import flatten_info_dict
+
+AREA_COUNTS = [int(count) for count in
+               os.environ.get("GSY_BENCHMARK_AREA_COUNTS", "100,1000,10000,100000").split(",")]
+GRID_DEPTH = int(os.environ.get("GSY_BENCHMARK_GRID_DEPTH", 4))
+
+
+@lru_cache(maxsize=None)
+def _get_grid_tree(area_count: int) -> Dict:
+    return create_nested_grid(area_count, depth=GRID_DEPTH)
+
+
+@pytest.fixture(name="area_count", params=AREA_COUNTS, ids=lambda count: f"{count}-areas")
+def fixture_area_count(request):
+    return request.param
+
+
+@pytest.fixture(name="grid_tree")
+def fixture_grid_tree(area_count):
+    """The trees are shared between the benchmarks, they must not be modified."""
+    return _get_grid_tree(area_count)
+
+
+@pytest.fixture(name="grid_tree_flat")
+def fixture_grid_tree_flat(grid_tree):
+    return flatten_info_dict(grid_tree)
+
+
+@pytest.fixture(name="asset_uuids")
+def fixture_asset_uuids(grid_tree_flat):
+    return [area_uuid for area_uuid, area in grid_tree_flat.items() if "asset_info" in area]
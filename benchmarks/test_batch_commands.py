@@ -0,0 +1,54 @@
+# pylint: disable=missing-function-docstring
+import json
+
+import pytest
+
+from gsy_e_sdk.commands import ClientCommandBuffer
+
+COMMAND_COUNTS = (100, 1000, 10000)
+
+
+def _fill_command_buffer(command_buffer, asset_uuids, command_count):
+    for index in range(command_count):
+        asset_uuid = asset_uuids[index % len(asset_uuids)]
+        if index % 2:
+            command_buffer.bid_energy(asset_uuid, 0.5, 15)
+        else:
+            command_buffer.offer_energy_rate(asset_uuid, 0.5, 25)
+    return command_buffer
+
+
+@pytest.fixture(name="command_count", params=COMMAND_COUNTS,
+                ids=lambda count: f"{count}-commands")
+def fixture_command_count(request):
+    return request.param
+
+
+@pytest.fixture(name="batch_payload")
+def fixture_batch_payload(asset_uuids):
+    batch_commands = {
+        asset_uuid: [{"type": "bid", "energy": 0.5, "price": 15, "replace_existing": True,
+                      "time_slot": None}]
+        for asset_uuid in asset_uuids}
+    return {"type": "BATCHED", "transaction_id": "transaction", "aggregator_uuid": "aggregator",
+            "batch_commands": batch_commands}
+
+
+@pytest.mark.parametrize("area_count", [1000], ids=["1000-areas"])
+def test_command_buffer_insert_and_execute_batch(benchmark, asset_uuids, command_count):
+
+    def insert_and_execute_batch():
+        return _fill_command_buffer(
+            ClientCommandBuffer(), asset_uuids, command_count).execute_batch()
+
+    batch_commands = benchmark(insert_and_execute_batch)
+    assert sum(len(commands) for commands in batch_commands.values()) == command_count
+
+
+def test_encode_batch_payload(benchmark, batch_payload):
+    benchmark(json.dumps, batch_payload)
+
+
+def test_decode_batch_payload(benchmark, batch_payload):
+    payload = json.dumps(batch_payload)
+    assert benchmark(json.loads, payload) == batch_payload
@@ -0,0 +1,27 @@
+# pylint: disable=missing-function-docstring, protected-access
+import json
+
+import pytest
+
+from gsy_e_sdk.emulator import ExchangeEmulator, InProcessRedis
+from gsy_e_sdk.redis_aggregator import RedisAggregator
+
+
+@pytest.fixture(name="aggregator")
+def fixture_aggregator():
+    redis_db = InProcessRedis()
+    emulator = ExchangeEmulator(redis_db=redis_db, asset_count=0)
+    aggregator = RedisAggregator("benchmark", redis_db=redis_db)
+    yield aggregator
+    emulator.stop()
+    aggregator.executor.shutdown(wait=True)
+
+
+@pytest.mark.parametrize("event", ["market", "tick", "trade"])
+def test_events_callback_dict(benchmark, aggregator, grid_tree, event):
+    payload = {"event": event, "slot_completion": "50%", "market_slot": "2022-01-01T00:00",
+               "grid_tree": grid_tree}
+    if event == "trade":
+        payload["trade_list"] = []
+    message = {"data": json.dumps(payload).encode("utf-8")}
+    benchmark(aggregator._events_callback_dict, message)
@@ -0,0 +1,35 @@
+# pylint: disable=missing-function-docstring
+import random
+
+from gsy_e_sdk.grid_fee_calculation import GridFeeCalculation
+from gsy_e_sdk.utils import create_area_name_uuid_mapping_from_tree_info, flatten_info_dict
+
+GRID_FEE_QUERIES = 100
+
+
+def test_flatten_info_dict(benchmark, grid_tree, area_count):
+    grid_tree_flat = benchmark(flatten_info_dict, grid_tree)
+    assert len(grid_tree_flat) == area_count
+
+
+def test_create_area_name_uuid_mapping_from_tree_info(benchmark, grid_tree_flat, area_count):
+    area_name_uuid_mapping = benchmark(create_area_name_uuid_mapping_from_tree_info,
+                                       grid_tree_flat)
+    assert len(area_name_uuid_mapping) == area_count
+
+
+def test_handle_grid_stats(benchmark, grid_tree):
+    benchmark(GridFeeCalculation().handle_grid_stats, grid_tree)
+
+
+def test_calculate_grid_fee(benchmark, grid_tree, asset_uuids):
+    grid_fee_calculation = GridFeeCalculation()
+    grid_fee_calculation.handle_grid_stats(grid_tree)
+    rng = random.Random(0)
+    asset_pairs = [tuple(rng.sample(asset_uuids, 2)) for _ in range(GRID_FEE_QUERIES)]
+
+    def calculate_grid_fees():
+        return [grid_fee_calculation.calculate_grid_fee(start_uuid, target_uuid)
+                for start_uuid, target_uuid in asset_pairs]
+
+    assert all(grid_fee > 0 for grid_fee in benchmark(calculate_grid_fees))
@@ -0,0 +1,22 @@
+# pylint: disable=missing-function-docstring
+import subprocess
+import sys
+
+import pytest
+
+# Every round imports the module in a fresh interpreter, like a short-lived cron job does
+IMPORT_ROUNDS = 5
+
+
+@pytest.mark.parametrize("module", [
+    "gsy_e_sdk", "gsy_e_sdk.cli", "gsy_e_sdk.types", "gsy_e_sdk.aggregator",
+    "gsy_e_sdk.redis_aggregator"])
+def test_cold_import(benchmark, module):
+    benchmark.pedantic(subprocess.run, args=([sys.executable, "-c", f"import {module}"],),
+                       kwargs={"check": True}, rounds=IMPORT_ROUNDS)
+
+
+def test_cli_help(benchmark):
+    benchmark.pedantic(subprocess.run, args=(
+        [sys.executable, "-c", "from gsy_e_sdk.cli import main; main(['run', '--help'])"],),
+        kwargs={"check": True, "capture_output": True}, rounds=IMPORT_ROUNDS)
@@ -2,22 +2,25 @@ import logging
 from concurrent.futures.thread import ThreadPoolExecutor
 from typing import Dict
 
-from gsy_framework.client_connections.utils import (
-    blocking_post_request, blocking_get_request, get_slot_completion_percentage_int_from_message)
-from gsy_framework.client_connections.websocket_connection import WebsocketThread
+from gsy_framework.client_connections.utils import get_slot_completion_percentage_int_from_message
 
 from gsy_e_sdk.commands import ClientCommandBuffer
-from gsy_e_sdk.constants import MAX_WORKER_THREADS
+from gsy_e_sdk.constants import MAX_WORKER_THREADS, PERSISTENT_CACHE_MAX_AGE_SECS
 from gsy_e_sdk.constants import MIN_SLOT_COMPLETION_TICK_TRIGGER_PERCENTAGE
 from gsy_e_sdk.grid_fee_calculation import GridFeeCalculation
 from gsy_e_sdk.clients.rest_asset_client import RestAssetClient
+from gsy_e_sdk.http_session import blocking_post_request, blocking_get_request
+from gsy_e_sdk.metrics import BATCH_COMMANDS_SENT, BATCHES_SENT
+from gsy_e_sdk.persistent_cache import get_persistent_cache
+from gsy_e_sdk.tracing import get_batch_commands_trace_attributes
 from gsy_e_sdk.utils import (
     get_uuid_from_area_name_in_tree_dict, buffer_grid_tree_info,
     create_area_name_uuid_mapping_from_tree_info,
     log_bid_offer_confirmation, log_deleted_bid_offer_confirmation,
-    get_name_from_area_name_uuid_mapping)
+    get_name_from_area_name_uuid_mapping, get_aggregators_list)
 from gsy_e_sdk.utils import logging_decorator
 from gsy_e_sdk.websocket_device import DeviceWebsocketMessageReceiver
+from gsy_e_sdk.websocket_manager import WebsocketThread
 
 
 class AggregatorWebsocketMessageReceiver(DeviceWebsocketMessageReceiver):
@@ -44,20 +47,30 @@ class AggregatorWebsocketMessageReceiver(DeviceWebsocketMessageReceiver):
 class Aggregator(RestAssetClient):
 
     def __init__(self, aggregator_name, simulation_id=None, domain_name=None,
-                 websockets_domain_name=None, accept_all_devices=True):
+                 websockets_domain_name=None, accept_all_devices=True, http_session=None,
+                 cache_dir=None, websocket_manager=None, recorder=None, latency_tracker=None,
+                 metrics=None, tracer=None):
         super().__init__(
             simulation_id=simulation_id,
             domain_name=domain_name,
             websockets_domain_name=websockets_domain_name,
             asset_uuid="",
             autoregister=False,
-            start_websocket=False)
+            start_websocket=False,
+            http_session=http_session,
+            websocket_manager=websocket_manager,
+            recorder=recorder,
+            latency_tracker=latency_tracker,
+            metrics=metrics,
+            tracer=tracer)
 
         self.grid_fee_calculation = GridFeeCalculation()
         self.aggregator_name = aggregator_name
+        self._log_summary.name = aggregator_name
         self.accept_all_devices = accept_all_devices
         self.device_uuid_list = []
         self.aggregator_uuid = None
+        self._persistent_cache = get_persistent_cache(cache_dir)
         self._client_command_buffer = ClientCommandBuffer()
         self._connect_to_simulation()
         self.latest_grid_tree = {}
@@ -72,21 +85,67 @@ class Aggregator(RestAssetClient):
         if self.aggregator_uuid is None:
             aggr = self._create_aggregator()
             self.aggregator_uuid = aggr["uuid"]
+        self._load_cached_device_uuid_list()
         self.start_websocket_connection()
 
+    @property
+    def _device_list_cache_key(self):
+        return f"{self.domain_name}/{self.simulation_id}/{self.aggregator_uuid}"
+
+    def _load_cached_device_uuid_list(self):
+        """Restore the devices that had selected the aggregator before the last restart.
+
+        The devices that the server lists for the aggregator take precedence, so that devices
+        that (un)selected it in the meantime are not missed. The persisted list is only used if
+        the server can not be reached, and for PERSISTENT_CACHE_MAX_AGE_SECS.
+        """
+        if self._persistent_cache is None:
+            return
+        cached_device_uuid_list = self._persistent_cache.get(
+            "aggregator_devices", self._device_list_cache_key,
+            max_age=PERSISTENT_CACHE_MAX_AGE_SECS)
+        device_uuid_list = self._fetch_device_uuid_list()
+        if device_uuid_list is None:
+            device_uuid_list = cached_device_uuid_list or []
+        if device_uuid_list:
+            logging.info("Restored %s selected devices.", len(device_uuid_list))
+            self.device_uuid_list = device_uuid_list
+        if sorted(device_uuid_list) != sorted(cached_device_uuid_list or []):
+            self._persist_device_uuid_list()
+
+    def _fetch_device_uuid_list(self):
+        """Return the devices that selected the aggregator according to the server."""
+        for aggregator in get_aggregators_list(self.domain_name, session=self.http_session):
+            if (aggregator.get("name") == self.aggregator_name and
+                    aggregator.get("configUuid") == self.simulation_id):
+                return [device["deviceUuid"] for device in aggregator.get("devicesList") or []]
+        return None
+
+    def _persist_device_uuid_list(self):
+        if self._persistent_cache is None:
+            return
+        self._persistent_cache.set(
+            "aggregator_devices", self._device_list_cache_key, self.device_uuid_list)
+
     def start_websocket_connection(self):
         self.dispatcher = AggregatorWebsocketMessageReceiver(self)
         websocket_uri = f"{self.websockets_domain_name}/{self.simulation_id}/aggregator/" \
                         f"{self.aggregator_uuid}/"
-        self.websocket_thread = WebsocketThread(websocket_uri, self.domain_name,
-                                                self.dispatcher)
-        self.websocket_thread.start()
-        self.callback_thread = ThreadPoolExecutor(max_workers=MAX_WORKER_THREADS)
+        if self.websocket_manager is not None:
+            self.websocket_connection = self.websocket_manager.add_connection(
+                websocket_uri, self.domain_name, self.dispatcher)
+            self.callback_thread = self.websocket_manager.callback_executor
+        else:
+            self.websocket_thread = WebsocketThread(websocket_uri, self.domain_name,
+                                                    self.dispatcher)
+            self.websocket_thread.start()
+            self.callback_thread = ThreadPoolExecutor(max_workers=MAX_WORKER_THREADS)
+        self.metrics.track_executor(self.callback_thread)
 
     @logging_decorator("list-aggregators")
     def list_aggregators(self):
         list_of_aggregators = blocking_get_request(f'{self.aggregator_prefix}list-aggregators/',
-                                                   {}, self.jwt_token)
+                                                   {}, self.jwt_token, session=self.http_session)
         if list_of_aggregators is None:
             logging.error(f"No aggregators found on {self.aggregator_prefix}")
             list_of_aggregators = []
@@ -99,7 +158,7 @@ class Aggregator(RestAssetClient):
         For each asset, the status of the aggregator's registration will be shown.
         """
         config_registry = blocking_get_request(
-            f"{self.configuration_prefix}registry", {}, self.jwt_token)
+            f"{self.configuration_prefix}registry", {}, self.jwt_token, session=self.http_session)
 
         return config_registry
 
@@ -110,21 +169,25 @@ class Aggregator(RestAssetClient):
     @logging_decorator("create-aggregator")
     def _create_aggregator(self):
         return blocking_post_request(f'{self.aggregator_prefix}create-aggregator/',
-                                     {"name": self.aggregator_name}, self.jwt_token)
+                                     {"name": self.aggregator_name}, self.jwt_token,
+                                     session=self.http_session)
 
     @logging_decorator("delete-aggregator")
     def delete_aggregator(self):
         return blocking_post_request(f'{self.aggregator_prefix}delete-aggregator/',
-                                     {"aggregator_uuid": self.aggregator_uuid}, self.jwt_token)
+                                     {"aggregator_uuid": self.aggregator_uuid}, self.jwt_token,
+                                     session=self.http_session)
 
     def _selected_by_device(self, message):
-        if self.accept_all_devices:
+        if self.accept_all_devices and message["device_uuid"] not in self.device_uuid_list:
             self.device_uuid_list.append(message["device_uuid"])
+            self._persist_device_uuid_list()
 
     def _unselected_by_device(self, message):
         device_uuid = message["device_uuid"]
         if device_uuid in self.device_uuid_list:
             self.device_uuid_list.remove(device_uuid)
+            self._persist_device_uuid_list()
 
     def _all_uuids_in_selected_device_uuid_list(self, uuid_list):
         for device_uuid in uuid_list:
@@ -152,21 +215,42 @@ class Aggregator(RestAssetClient):
         if not self.commands_buffer_length:
             return
         batch_command_dict = self._client_command_buffer.execute_batch()
-        self._all_uuids_in_selected_device_uuid_list(batch_command_dict.keys())
-        transaction_id, posted = self._post_request(
-            f"{self.aggregator_prefix}batch-commands", {"aggregator_uuid": self.aggregator_uuid,
-                                                       "batch_commands": batch_command_dict})
+        transaction_id, posted = self._post_batch_commands(batch_command_dict)
         if posted:
             self._client_command_buffer.clear()
-            response = self.dispatcher.wait_for_command_response('batch_commands', transaction_id)
-            for asset_uuid, responses in response["responses"].items():
-                for command_response in responses:
-                    log_bid_offer_confirmation(command_response)
-                    log_deleted_bid_offer_confirmation(
-                        command_response,
-                        asset_name=get_name_from_area_name_uuid_mapping(self.area_name_uuid_mapping,
-                                                                        asset_uuid))
-            return response
+            return self._wait_for_batch_commands_response(transaction_id)
+
+    def send_batch_commands(self, batch_command_dict: Dict):
+        """Send the batch commands ({asset_uuid: [command, ...]}) bypassing the commands buffer.
+
+        Can be called concurrently from multiple threads.
+        """
+        transaction_id, posted = self._post_batch_commands(batch_command_dict)
+        if posted:
+            return self._wait_for_batch_commands_response(transaction_id)
+        return None
+
+    def _post_batch_commands(self, batch_command_dict: Dict):
+        self._all_uuids_in_selected_device_uuid_list(batch_command_dict.keys())
+        self.metrics.inc(BATCHES_SENT)
+        self.metrics.inc(BATCH_COMMANDS_SENT,
+                         sum(len(commands) for commands in batch_command_dict.values()))
+        return self._post_request(
+            f"{self.aggregator_prefix}batch-commands", {"aggregator_uuid": self.aggregator_uuid,
+                                                       "batch_commands": batch_command_dict},
+            **get_batch_commands_trace_attributes(self.aggregator_uuid, batch_command_dict))
+
+    def _wait_for_batch_commands_response(self, transaction_id):
+        response = self.dispatcher.wait_for_command_response('batch_commands', transaction_id)
+        for asset_uuid, responses in response["responses"].items():
+            self._log_summary.add_command_responses(responses)
+            for command_response in responses:
+                log_bid_offer_confirmation(command_response)
+                log_deleted_bid_offer_confirmation(
+                    command_response,
+                    asset_name=get_name_from_area_name_uuid_mapping(self.area_name_uuid_mapping,
+                                                                    asset_uuid))
+        return response
 
     def get_uuid_from_area_name(self, name):
         if self.area_name_uuid_mapping:
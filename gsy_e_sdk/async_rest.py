@@ -0,0 +1,135 @@
+"""Asynchronous REST transport that is shared by all REST clients of the process."""
+import asyncio
+import json
+import uuid
+from concurrent.futures.thread import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from typing import Any, Coroutine, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+from urllib.parse import urlsplit
+
+import requests
+
+from gsy_e_sdk.constants import (
+    REST_CONNECTION_POOL_SIZE, REST_MAX_CONCURRENT_REQUESTS_PER_HOST)
+from gsy_e_sdk.http_session import check_response, get_http_session, send_request
+
+if TYPE_CHECKING:
+    from gsy_e_sdk.clients.rest_asset_client import RestAssetClient
+
+
+class AsyncRestTransport:
+    """Send REST requests concurrently over a pooled keep-alive HTTP session.
+
+    The requests are executed by a thread pool, which allows them to be awaited and fanned out
+    via asyncio.gather. The number of in-flight requests to the same host is capped in order
+    to not overload the exchange. By default the process-wide HTTP session is used.
+    """
+
+    def __init__(self, pool_size: int = REST_CONNECTION_POOL_SIZE,
+                 max_requests_per_host: int = REST_MAX_CONCURRENT_REQUESTS_PER_HOST,
+                 session: Optional[requests.Session] = None):
+        self.max_requests_per_host = max_requests_per_host
+        self.session = session or get_http_session()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+        self._host_semaphores: Dict[str, BoundedSemaphore] = {}
+        self._lock = Lock()
+
+    def _get_host_semaphore(self, endpoint: str) -> BoundedSemaphore:
+        host = urlsplit(endpoint).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = BoundedSemaphore(self.max_requests_per_host)
+            return self._host_semaphores[host]
+
+    def request(self, method: str, endpoint: str, data: Dict,
+                jwt_token: str) -> Optional[requests.Response]:
+        """Send a request (blocking) and return the response, None if the connection failed."""
+        with self._get_host_semaphore(endpoint):
+            return send_request(method, endpoint, data, jwt_token, self.session)
+
+    async def async_request(self, method: str, endpoint: str, data: Dict,
+                            jwt_token: str) -> Optional[requests.Response]:
+        """Send a request without blocking the running event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self.request, method, endpoint, data, jwt_token)
+
+    async def post(self, endpoint: str, data: Dict, jwt_token: str) -> Tuple[str, bool]:
+        """Post a command to the exchange, return its transaction_id and whether it was sent."""
+        data["transaction_id"] = str(uuid.uuid4())
+        response = await self.async_request("POST", f"{endpoint}/", data, jwt_token)
+        return data["transaction_id"], check_response(response)
+
+    async def blocking_post(self, endpoint: str, data: Dict, jwt_token: str) -> Optional[Dict]:
+        """Post a request to the exchange and return the body of its response."""
+        data["transaction_id"] = str(uuid.uuid4())
+        response = await self.async_request("POST", endpoint, data, jwt_token)
+        return json.loads(response.text) if check_response(response) else None
+
+    def close(self) -> None:
+        """Stop the worker threads of the transport."""
+        self._executor.shutdown(wait=False)
+
+
+_transports: Dict[Optional[requests.Session], AsyncRestTransport] = {}
+_transport_lock = Lock()
+
+
+def get_async_rest_transport(session: Optional[requests.Session] = None
+                             ) -> AsyncRestTransport:
+    """Return the transport that is shared by all the REST clients of the process.
+
+    Clients that share an HTTP session also share the transport that sends over it, and with
+    it its worker threads and its cap of requests per host.
+    """
+    with _transport_lock:
+        if session not in _transports:
+            _transports[session] = AsyncRestTransport(session=session)
+        return _transports[session]
+
+
+async def gather_concurrently(coroutines: Iterable[Coroutine]) -> List[Any]:
+    """Await the coroutines concurrently and return their results in the same order.
+
+    Exceptions are returned in place of the result of the coroutine that raised them, so that
+    a single failing request does not discard the responses of the rest.
+    """
+    return await asyncio.gather(*coroutines, return_exceptions=True)
+
+
+def run_concurrently(coroutines: Iterable[Coroutine]) -> List[Any]:
+    """Run the coroutines concurrently and return their results, see gather_concurrently.
+
+    If the calling thread already runs an event loop (e.g. in a notebook or an async strategy),
+    the coroutines run on the event loop of a helper thread. Async code can await
+    gather_concurrently instead, which does not block its event loop.
+    """
+    coroutines = list(coroutines)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(gather_concurrently(coroutines))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, gather_concurrently(coroutines)).result()
+
+
+def set_energy_forecasts(forecasts: Dict["RestAssetClient", Dict],
+                         do_not_wait: bool = False) -> List[Any]:
+    """Send the energy forecasts of multiple assets concurrently."""
+    return run_concurrently(
+        client.async_set_energy_forecast(forecast, do_not_wait=do_not_wait)
+        for client, forecast in forecasts.items())
+
+
+def set_energy_measurements(measurements: Dict["RestAssetClient", Dict],
+                            do_not_wait: bool = False) -> List[Any]:
+    """Send the energy measurements of multiple assets concurrently."""
+    return run_concurrently(
+        client.async_set_energy_measurement(measurement, do_not_wait=do_not_wait)
+        for client, measurement in measurements.items())
+
+
+def select_aggregator(clients: Iterable["RestAssetClient"], aggregator_uuid: str) -> List[Any]:
+    """Connect multiple assets with the aggregator (identified by the provided ID) concurrently."""
+    return run_concurrently(
+        client.async_select_aggregator(aggregator_uuid) for client in clients)
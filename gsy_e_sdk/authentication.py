@@ -0,0 +1,188 @@
+"""JWT authentication that is shared by all REST clients and GraphQL helpers of the process."""
+import base64
+import json
+import logging
+import os
+import time
+from threading import Lock, RLock, Timer
+from typing import Dict, NamedTuple, Optional
+
+import requests
+
+from gsy_e_sdk import __version__
+from gsy_e_sdk.constants import (
+    JWT_TOKEN_DEFAULT_LIFETIME_SECS, JWT_TOKEN_REFRESH_MARGIN_SECS, JWT_TOKEN_RETRY_INTERVAL_SECS)
+from gsy_e_sdk.http_session import get_http_session
+
+
+def validate_client_up_to_date(response):
+    """Check whether the client is connected to the supporting version of the server."""
+    remote_version = response.headers.get("API-VERSION")
+    if not remote_version:
+        return
+
+    if __version__ < remote_version:
+        logging.warning(
+            "Your version of the client %s is outdated, kindly upgrade to "
+            "version %s to make use of our latest features", __version__, remote_version)
+
+
+def retrieve_jwt_key_from_server(domain_name: str,
+                                 session: Optional[requests.Session] = None) -> Optional[str]:
+    """
+    Get the jwt token from the server based on credentials set in the
+    environment variables.
+    """
+    resp = (session or get_http_session()).post(
+        f"{domain_name}/api-token-auth/",
+        data=json.dumps({"username": os.environ["API_CLIENT_USERNAME"],
+                         "password": os.environ["API_CLIENT_PASSWORD"]}),
+        headers={"Content-Type": "application/json"})
+    if resp.status_code != 200:
+        logging.error("Request for token authentication failed with status "
+                      "code %s. Response body: %s", resp.status_code, resp.text)
+        return None
+
+    validate_client_up_to_date(resp)
+    return json.loads(resp.text)["access"]
+
+
+def get_jwt_token_expiry(jwt_token: str) -> Optional[float]:
+    """Return the expiry timestamp (exp claim) of the token, None if it can not be read."""
+    try:
+        payload = jwt_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class _CachedToken(NamedTuple):
+    token: str
+    refresh_at: float
+
+
+class JWTTokenManager:
+    """Thread-safe cache of JWT tokens keyed by domain name.
+
+    Each domain is authenticated once, no matter how many clients or GraphQL requests use it.
+    A single timer refreshes every token shortly before it expires. The authentication requests
+    are sent under a lock of their domain only, so a slow server does not block the clients of
+    the other domains.
+    """
+
+    def __init__(self, refresh_margin: float = JWT_TOKEN_REFRESH_MARGIN_SECS):
+        self.refresh_margin = refresh_margin
+        self._tokens: Dict[str, _CachedToken] = {}
+        self._sessions: Dict[str, Optional[requests.Session]] = {}
+        self._domain_locks: Dict[str, Lock] = {}
+        self._lock = RLock()
+        self._refresh_timer: Optional[Timer] = None
+
+    def get_token(self, domain_name: str,
+                  session: Optional[requests.Session] = None) -> Optional[str]:
+        """Return the token of the domain, authenticate if there is no token yet."""
+        with self._lock:
+            if domain_name in self._tokens:
+                return self._tokens[domain_name].token
+            self._sessions[domain_name] = session
+            domain_lock = self._domain_locks.setdefault(domain_name, Lock())
+        with domain_lock:
+            with self._lock:
+                # Another thread may have authenticated while this one waited for the lock
+                if domain_name in self._tokens:
+                    return self._tokens[domain_name].token
+            token = self._fetch_token(domain_name)
+        with self._lock:
+            self._schedule_refresh()
+        return token
+
+    def invalidate(self, domain_name: str) -> None:
+        """Drop the token of the domain, so that the next request authenticates again."""
+        with self._lock:
+            self._tokens.pop(domain_name, None)
+
+    def clear(self) -> None:
+        """Drop all tokens and stop the refresh timer."""
+        with self._lock:
+            self._tokens.clear()
+            self._sessions.clear()
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+    def _fetch_token(self, domain_name: str) -> Optional[str]:
+        """Authenticate with the server, must be called without holding self._lock."""
+        try:
+            token = retrieve_jwt_key_from_server(
+                domain_name, session=self._sessions.get(domain_name))
+        except (requests.exceptions.RequestException, KeyError, ValueError) as ex:
+            logging.error("Request for token authentication of %s failed: %s", domain_name, ex)
+            token = None
+
+        with self._lock:
+            if token is None:
+                cached = self._tokens.get(domain_name)
+                if cached is not None:
+                    # Keep using the current token until the authentication succeeds again
+                    self._tokens[domain_name] = cached._replace(
+                        refresh_at=time.time() + JWT_TOKEN_RETRY_INTERVAL_SECS)
+                    return cached.token
+                return None
+
+            now = time.time()
+            expiry = get_jwt_token_expiry(token) or now + JWT_TOKEN_DEFAULT_LIFETIME_SECS
+            # Tokens that live shorter than the margin are refreshed halfway through their
+            # lifetime (expired ones after the retry interval), not in a tight loop
+            min_refresh_delay = (min(JWT_TOKEN_RETRY_INTERVAL_SECS, (expiry - now) / 2)
+                                 if expiry > now else JWT_TOKEN_RETRY_INTERVAL_SECS)
+            self._tokens[domain_name] = _CachedToken(
+                token, max(expiry - self.refresh_margin, now + min_refresh_delay))
+            return token
+
+    def _refresh_expiring_tokens(self) -> None:
+        try:
+            with self._lock:
+                now = time.time()
+                expiring_domains = [
+                    (domain_name, self._domain_locks.setdefault(domain_name, Lock()))
+                    for domain_name, cached in self._tokens.items() if cached.refresh_at <= now]
+            for domain_name, domain_lock in expiring_domains:
+                logging.debug("Refreshing JWT token of %s.", domain_name)
+                with domain_lock:
+                    self._fetch_token(domain_name)
+        finally:
+            with self._lock:
+                self._schedule_refresh()
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+        if not self._tokens:
+            return
+        next_refresh = min(cached.refresh_at for cached in self._tokens.values())
+        self._refresh_timer = Timer(max(next_refresh - time.time(), 0),
+                                    self._refresh_expiring_tokens)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+
+_token_manager = JWTTokenManager()
+
+
+def get_jwt_token_manager() -> JWTTokenManager:
+    """Return the token manager that is shared by all REST clients and utilities."""
+    return _token_manager
+
+
+class JWTAuthenticationMixin:
+    """Authenticate the requests of a REST client with the process-wide token of its domain."""
+
+    jwt_domain_name: str
+    http_session: requests.Session
+
+    @property
+    def jwt_token(self) -> Optional[str]:
+        """Return the current JWT token of the client's domain."""
+        return get_jwt_token_manager().get_token(self.jwt_domain_name, session=self.http_session)
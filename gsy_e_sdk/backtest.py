@@ -0,0 +1,470 @@
+"""Backtest aggregator strategies on historic profiles, deterministically and offline.
+
+The BacktestEngine drives a RedisAggregator subclass through the market slots of the profiles,
+without redis, gsy-e, threads or sleeps: the market, tick, trade and finish events are
+dispatched in the calling thread, and the batch commands of the strategy are executed on an
+order book before the send_batch_commands call returns. Like in live runs, the exceptions of
+the callbacks are logged and do not stop the run.
+
+The profiles hold the energy of every asset per market slot ({asset: {time_slot: kWh}}, the
+assets by uuid or name), positive for consumption and negative for generation, read from files
+with read_profiles or created with create_synthetic_profiles. They set the
+energy_requirement_kWh / available_energy_kWh of the assets in the grid tree, which decrease as
+the assets trade. The order book is cleared on every tick by the clearing model, the buyers pay
+the grid fees along the path to the seller. At the end of every slot the remaining consumption
+is bought from the market maker and the remaining generation is sold at the feed-in tariff.
+The dso_market_stats of a market report the trades and the area throughput of the last slot.
+Order and trade ids are drawn from a seeded random generator, so that runs with the same inputs
+have the same results.
+"""
+import copy
+import json
+import math
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+from gsy_framework.constants_limits import DATE_TIME_FORMAT
+from gsy_framework.redis_channels import AggregatorChannels
+from pendulum import parse
+from tabulate import tabulate
+
+from gsy_e_sdk.constants import (
+    EMULATOR_FEED_IN_TARIFF_RATE, EMULATOR_MARKET_MAKER_RATE, EMULATOR_TICKS_PER_SLOT,
+    INGESTION_SLOT_LENGTH_MINUTES)
+from gsy_e_sdk.emulator import MARKET_MAKER_NAME, PayAsBidOrderBook
+from gsy_e_sdk.grid_fee_calculation import GridFeeCalculation
+from gsy_e_sdk.ingestion import (
+    TimeSeries, iter_csv_rows, iter_parquet_rows, iter_time_series_batches)
+from gsy_e_sdk.redis_aggregator import RedisAggregator
+from gsy_e_sdk.replay import CallbackTiming, SynchronousRedis, TimingExecutor
+from gsy_e_sdk.utils import flatten_info_dict
+
+# Energy below this is considered to be traded completely
+ENERGY_TOLERANCE_KWH = 1e-9
+# Grid fees are rounded, so that the order of summing up the fees along a path does not matter
+GRID_FEE_DECIMALS = 10
+
+
+class PayAsClearOrderBook(PayAsBidOrderBook):
+    """Bids and offers matched like in the PayAsBidOrderBook, but all trades of a clearing are
+    made at one rate, the highest rate of the matched offers."""
+
+    def match(self, time_slot: str) -> List[Dict]:
+        offer_rates = {offer_id: offer["energy_rate"] for offer_id, offer in self.offers.items()}
+        trades = super().match(time_slot)
+        if trades:
+            clearing_rate = max(offer_rates[trade["offer_id"]] for trade in trades)
+            for trade in trades:
+                trade["trade_price"] = trade["traded_energy"] * clearing_rate
+        return trades
+
+
+CLEARING_MODELS: Dict[str, Callable[..., PayAsBidOrderBook]] = {
+    "pay_as_bid": PayAsBidOrderBook,
+    "pay_as_clear": PayAsClearOrderBook,
+}
+
+
+class AssetResult(NamedTuple):
+    """Energy and money (in cents) that one asset traded during the backtest."""
+    bought_kWh: float
+    sold_kWh: float
+    market_maker_kWh: float  # bought from the market maker at the end of the slots
+    feed_in_kWh: float  # sold at the feed-in tariff at the end of the slots
+    cost: float  # including the grid fees
+    revenue: float
+
+    @property
+    def net_cost(self) -> float:
+        """Return the cost minus the revenue."""
+        return self.cost - self.revenue
+
+
+class BacktestResult(NamedTuple):
+    """Summary of a backtest run."""
+    slots: int
+    trades: int
+    traded_energy_kWh: float
+    grid_fee_revenue: float
+    rejected_commands: int
+    elapsed_secs: float
+    asset_results: Dict[str, AssetResult]
+    callback_timings: Dict[str, CallbackTiming]
+
+    @property
+    def net_cost(self) -> float:
+        """Return the net cost of all assets."""
+        return sum(result.net_cost for result in self.asset_results.values())
+
+    @property
+    def market_maker_kWh(self) -> float:
+        """Return the energy that was bought from the market maker."""
+        return sum(result.market_maker_kWh for result in self.asset_results.values())
+
+    @property
+    def feed_in_kWh(self) -> float:
+        """Return the energy that was sold at the feed-in tariff."""
+        return sum(result.feed_in_kWh for result in self.asset_results.values())
+
+
+def format_backtest_report(result: BacktestResult) -> str:
+    """Return the result as human readable tables."""
+    summary = tabulate([
+        ["Market slots", result.slots],
+        ["Trades", result.trades],
+        ["Traded energy (kWh)", round(result.traded_energy_kWh, 3)],
+        ["Bought from the market maker (kWh)", round(result.market_maker_kWh, 3)],
+        ["Sold at the feed-in tariff (kWh)", round(result.feed_in_kWh, 3)],
+        ["Net cost of the assets (cents)", round(result.net_cost, 3)],
+        ["Grid fee revenue (cents)", round(result.grid_fee_revenue, 3)],
+        ["Rejected commands", result.rejected_commands],
+        ["Duration (s)", round(result.elapsed_secs, 3)]], tablefmt="github")
+    assets = tabulate(
+        [[name, *(round(value, 3) for value in asset_result), round(asset_result.net_cost, 3)]
+         for name, asset_result in sorted(result.asset_results.items())],
+        headers=["Asset", "Bought (kWh)", "Sold (kWh)", "Market maker (kWh)", "Feed-in (kWh)",
+                 "Cost", "Revenue", "Net cost"], tablefmt="github")
+    return f"{summary}\n\n{assets}"
+
+
+def read_profiles(file_path: str, time_column: str, asset_columns: Dict[str, str],
+                  slot_length_minutes: int = INGESTION_SLOT_LENGTH_MINUTES,
+                  delimiter: str = ",", decimal_separator: str = ".") -> TimeSeries:
+    """Read the profiles of the assets from a CSV or Parquet (.parquet) file.
+
+    asset_columns maps the column names of the file to the uuids or names of the assets, the
+    values are summed up per market slot like in gsy_e_sdk.ingestion.
+    """
+    rows = (iter_parquet_rows(file_path) if file_path.endswith(".parquet")
+            else iter_csv_rows(file_path, delimiter=delimiter))
+    profiles: TimeSeries = {}
+    for batch in iter_time_series_batches(rows, time_column, asset_columns, slot_length_minutes,
+                                          decimal_separator=decimal_separator):
+        for asset, series in batch.items():
+            profile = profiles.setdefault(asset, {})
+            for time_slot, energy in series.items():
+                profile[time_slot] = profile.get(time_slot, 0.0) + energy
+    return profiles
+
+
+# pylint: disable-next=too-many-arguments
+def create_synthetic_profiles(grid_tree: Dict, slot_count: int,
+                              start_time: str = "2022-01-01T00:00",
+                              slot_length_minutes: int = INGESTION_SLOT_LENGTH_MINUTES,
+                              peak_energy_kWh: float = 1.0, seed: int = 0) -> TimeSeries:
+    """Return random profiles of the loads and PVs (by the asset names) of the grid tree.
+
+    The loads consume up to peak_energy_kWh per slot, the PVs generate up to peak_energy_kWh
+    between 6:00 and 18:00, following the sun.
+    """
+    rng = random.Random(seed)
+    first_slot = parse(start_time)
+    time_slots = [first_slot.add(minutes=slot_length_minutes * index)
+                  for index in range(slot_count)]
+    profiles: TimeSeries = {}
+    for area_uuid, area in flatten_info_dict(grid_tree).items():
+        asset_type = area.get("area_name", "").split(" ")[0]
+        if "asset_info" not in area or asset_type not in ("Load", "PV"):
+            continue
+        profile = profiles[area_uuid] = {}
+        for time_slot in time_slots:
+            if asset_type == "Load":
+                energy = rng.uniform(0.1, 1.0) * peak_energy_kWh
+            else:
+                hour = time_slot.hour + time_slot.minute / 60
+                energy = -max(0.0, math.sin(math.pi * (hour - 6) / 12)) * rng.uniform(
+                    0.5, 1.0) * peak_energy_kWh
+            profile[time_slot.format(DATE_TIME_FORMAT)] = energy
+    return profiles
+
+
+def _create_market_stats() -> Dict:
+    return {"import": 0.0, "export": 0.0, "traded_energy": 0.0, "trade_price": 0.0, "rates": []}
+
+
+class BacktestEngine:
+    """Run a RedisAggregator subclass on historic profiles, see the module docstring.
+
+    The market slots are the time slots of the profiles unless time_slots are given. The
+    market_maker_rate is either constant or a {time_slot: rate} dict.
+    """
+
+    # pylint: disable = too-many-instance-attributes, too-many-arguments
+    def __init__(self, aggregator_class, grid_tree: Dict, profiles: TimeSeries,
+                 time_slots: Optional[List[str]] = None, clearing_model: str = "pay_as_bid",
+                 ticks_per_slot: int = EMULATOR_TICKS_PER_SLOT,
+                 market_maker_rate: Union[float, Dict[str, float]] = EMULATOR_MARKET_MAKER_RATE,
+                 feed_in_tariff_rate: float = EMULATOR_FEED_IN_TARIFF_RATE, seed: int = 0,
+                 aggregator_name: str = "backtest-aggregator",
+                 aggregator_kwargs: Optional[Dict] = None):
+        if clearing_model not in CLEARING_MODELS:
+            raise ValueError(
+                f"Clearing model {clearing_model} is not one of {tuple(CLEARING_MODELS)}.")
+        if not issubclass(aggregator_class, RedisAggregator):
+            raise ValueError(f"{aggregator_class.__name__} is not a RedisAggregator subclass.")
+        self.aggregator_class = aggregator_class
+        # The asset infos and grid fees of the grid tree are changed during the run
+        self.grid_tree = copy.deepcopy(grid_tree)
+        self.grid_tree_flat = flatten_info_dict(self.grid_tree)
+        self.assets = {area_uuid: area for area_uuid, area in self.grid_tree_flat.items()
+                       if "asset_info" in area}
+        self.asset_profiles = {
+            asset_uuid: profiles.get(asset_uuid, profiles.get(asset["area_name"], {}))
+            for asset_uuid, asset in self.assets.items()}
+        self.time_slots = time_slots or sorted(
+            {time_slot for profile in profiles.values() for time_slot in profile})
+        self.ticks_per_slot = ticks_per_slot
+        self.market_maker_rate = market_maker_rate
+        self.feed_in_tariff_rate = feed_in_tariff_rate
+        self.aggregator_name = aggregator_name
+        self.aggregator_kwargs = aggregator_kwargs or {}
+        self._rng = random.Random(seed)
+        self.order_book = CLEARING_MODELS[clearing_model](create_id=self._create_id)
+        self.executor = TimingExecutor()
+        self.aggregator: Optional[RedisAggregator] = None
+        self._redis_db = SynchronousRedis(self._on_publish)
+        self._grid_fee_calculation = GridFeeCalculation()
+        self._grid_fee_rates: Dict[tuple, float] = {}
+        self._pending_grid_fees: Dict[str, float] = {}
+        self._remaining_energy: Dict[str, float] = {}
+        self.market_maker_uuid = next(
+            (area_uuid for area_uuid, area in self.grid_tree_flat.items()
+             if area.get("area_name") == MARKET_MAKER_NAME), None)
+        self._slot_market_stats = defaultdict(_create_market_stats)
+        self._last_market_stats: Dict[str, Dict] = {}
+        self._asset_totals = defaultdict(lambda: dict.fromkeys(AssetResult._fields, 0.0))
+        self._counters = {"trades": 0, "traded_energy_kWh": 0.0, "grid_fee_revenue": 0.0,
+                          "rejected_commands": 0}
+
+    def _create_id(self) -> str:
+        return str(uuid.UUID(int=self._rng.getrandbits(128), version=4))
+
+    def _get_market_maker_rate(self, time_slot: str) -> float:
+        if isinstance(self.market_maker_rate, dict):
+            return self.market_maker_rate.get(time_slot, EMULATOR_MARKET_MAKER_RATE)
+        return self.market_maker_rate
+
+    def _create_aggregator(self) -> RedisAggregator:
+        aggregator = self.aggregator_class(
+            self.aggregator_name, redis_db=self._redis_db, **self.aggregator_kwargs)
+        aggregator.executor = self.executor
+        # All assets and markets of the grid have selected the aggregator
+        for area_uuid in self.grid_tree_flat:
+            if area_uuid not in aggregator.device_uuid_list:
+                aggregator.device_uuid_list.append(area_uuid)
+        return aggregator
+
+    def _on_publish(self, channel: str, data: Dict) -> None:
+        pubsub = self._redis_db.pubsub()
+        if data.get("type") == "BATCHED":
+            pubsub.deliver(self.aggregator.channel_names.batch_commands_response, {
+                "aggregator_uuid": data["aggregator_uuid"],
+                "transaction_id": data["transaction_id"], "status": "ready",
+                "responses": {area_uuid: [self._execute_command(area_uuid, command)
+                                          for command in commands]
+                              for area_uuid, commands in data["batch_commands"].items()}})
+        elif channel == AggregatorChannels().commands:
+            pubsub.deliver(AggregatorChannels().response, {
+                "transaction_id": data["transaction_id"], "status": "ready"})
+
+    def _reject(self, response: Dict, error: str) -> Dict:
+        self._counters["rejected_commands"] += 1
+        return {**response, "status": "error", "error": error}
+
+    # pylint: disable-next=too-many-return-statements
+    def _execute_command(self, area_uuid: str, command: Dict) -> Dict:
+        command_type = command.get("type")
+        response = {"command": command_type, "status": "ready", "area_uuid": area_uuid}
+        if command_type in ("bid", "offer"):
+            if area_uuid not in self.assets:
+                return self._reject(response, "Bids and offers can only be placed by assets.")
+            remaining_energy = self._remaining_energy.get(area_uuid, 0.0)
+            if command_type == "offer":
+                remaining_energy = -remaining_energy
+            if not command.get("replace_existing", True):
+                # The open orders stay in the book, so they can not trade the same energy again
+                remaining_energy -= sum(order["energy"] for order in
+                                        self.order_book.list_orders(command_type, area_uuid))
+            if command["energy"] > remaining_energy + ENERGY_TOLERANCE_KWH:
+                return self._reject(
+                    response, f"The energy of the {command_type} exceeds the energy of the asset.")
+            order = self.order_book.add_order(
+                command_type, area_uuid, command["energy"], command["price"],
+                command.get("replace_existing", True))
+            response[command_type] = json.dumps(order)
+        elif command_type in ("delete_bid", "delete_offer"):
+            order_type = command_type.split("_")[1]
+            response.update({"command": f"{order_type}_delete", "deleted_ids":
+                             self.order_book.delete_orders(
+                                 order_type, area_uuid, command.get(order_type))})
+        elif command_type in ("list_bids", "list_offers"):
+            order_type = command_type.split("_")[1][:-1]
+            response[f"{order_type}_list"] = self.order_book.list_orders(order_type, area_uuid)
+        elif command_type == "device_info":
+            response["device_info"] = self.grid_tree_flat[area_uuid].get("asset_info")
+        elif command_type == "grid_fees":
+            if "current_market_fee" not in self.grid_tree_flat[area_uuid]:
+                return self._reject(response, "Grid fees can only be set on markets.")
+            if command["data"].get("fee_const") is None:
+                return self._reject(response, "Only constant grid fees are supported.")
+            # Like in the exchange, the fee applies from the next market slot on
+            self._pending_grid_fees[area_uuid] = command["data"]["fee_const"]
+        elif command_type == "dso_market_stats":
+            if "children" not in self.grid_tree_flat[area_uuid]:
+                return self._reject(response, "Market stats are only available for markets.")
+            response.update({
+                "name": self.grid_tree_flat[area_uuid]["area_name"],
+                "market_stats": self._last_market_stats.get(area_uuid) or
+                self._format_market_stats(_create_market_stats())})
+        elif command_type not in ("set_energy_forecast", "set_energy_measurement"):
+            # Forecasts and measurements are accepted, the profiles set the energy
+            return self._reject(response, f"Unknown command type {command_type}.")
+        return response
+
+    @staticmethod
+    def _format_market_stats(stats: Dict) -> Dict:
+        return {"area_throughput": {"import": stats["import"], "export": stats["export"]},
+                "total_traded_energy_kWh": stats["traded_energy"],
+                "min_trade_rate": min(stats["rates"], default=None),
+                "max_trade_rate": max(stats["rates"], default=None),
+                "avg_trade_rate": (stats["trade_price"] / stats["traded_energy"]
+                                   if stats["traded_energy"] else None)}
+
+    def _book_market_stats(self, buyer_uuid: Optional[str], seller_uuid: Optional[str],
+                           energy: float, trade_price: Optional[float] = None) -> None:
+        """Add the energy to the import / export of the markets between buyer and seller.
+
+        The markets of the buyer and the seller count the trade, settlements with the market
+        maker (trade_price None) only count towards the area throughput.
+        """
+        paths_to_root = self._grid_fee_calculation.paths_to_root_mapping
+        buyer_markets = set(paths_to_root.get(buyer_uuid, [])[:-1])
+        seller_markets = set(paths_to_root.get(seller_uuid, [])[:-1])
+        for market_uuid in buyer_markets - seller_markets:
+            self._slot_market_stats[market_uuid]["import"] += energy
+        for market_uuid in seller_markets - buyer_markets:
+            self._slot_market_stats[market_uuid]["export"] += energy
+        if trade_price is None:
+            return
+        for market_uuid in buyer_markets | seller_markets:
+            stats = self._slot_market_stats[market_uuid]
+            stats["traded_energy"] += energy
+            stats["trade_price"] += trade_price
+            stats["rates"].append(trade_price / energy)
+
+    def _set_asset_info(self, asset_uuid: str) -> None:
+        energy = self._remaining_energy[asset_uuid]
+        if energy > ENERGY_TOLERANCE_KWH:
+            self.assets[asset_uuid]["asset_info"] = {"energy_requirement_kWh": energy}
+        elif energy < -ENERGY_TOLERANCE_KWH:
+            self.assets[asset_uuid]["asset_info"] = {"available_energy_kWh": -energy}
+        else:
+            self.assets[asset_uuid]["asset_info"] = {}
+
+    def _start_market_slot(self, time_slot: str) -> None:
+        for market_uuid, fee in self._pending_grid_fees.items():
+            market = self.grid_tree_flat[market_uuid]
+            market["last_market_fee"] = market.get("current_market_fee")
+            market["current_market_fee"] = fee
+        self._pending_grid_fees.clear()
+        self._grid_fee_calculation.handle_grid_stats(self.grid_tree)
+        self._grid_fee_rates.clear()
+        self.order_book.clear()
+        self._slot_market_stats.clear()
+        for asset_uuid, profile in self.asset_profiles.items():
+            self._remaining_energy[asset_uuid] = profile.get(time_slot, 0.0)
+            self._set_asset_info(asset_uuid)
+
+    def _get_grid_fee_rate(self, buyer_uuid: str, seller_uuid: str) -> float:
+        key = (buyer_uuid, seller_uuid)
+        if key not in self._grid_fee_rates:
+            self._grid_fee_rates[key] = round(self._grid_fee_calculation.calculate_grid_fee(
+                buyer_uuid, seller_uuid) or 0.0, GRID_FEE_DECIMALS)
+        return self._grid_fee_rates[key]
+
+    def _settle_trades(self, trades: List[Dict]) -> List[Dict]:
+        """Book the trades and return them as listed in the trade event."""
+        trade_list = []
+        for trade in trades:
+            buyer_uuid, seller_uuid = trade["buyer"], trade["seller"]
+            energy = trade["traded_energy"]
+            fee_price = self._get_grid_fee_rate(buyer_uuid, seller_uuid) * energy
+            self._asset_totals[buyer_uuid]["bought_kWh"] += energy
+            self._asset_totals[buyer_uuid]["cost"] += trade["trade_price"] + fee_price
+            self._asset_totals[seller_uuid]["sold_kWh"] += energy
+            self._asset_totals[seller_uuid]["revenue"] += trade["trade_price"]
+            self._remaining_energy[buyer_uuid] -= energy
+            self._remaining_energy[seller_uuid] += energy
+            self._counters["trades"] += 1
+            self._counters["traded_energy_kWh"] += energy
+            self._counters["grid_fee_revenue"] += fee_price
+            self._book_market_stats(buyer_uuid, seller_uuid, energy, trade["trade_price"])
+            trade_list.append({
+                **trade, "fee_price": fee_price,
+                "buyer": self.assets[buyer_uuid]["area_name"], "buyer_uuid": buyer_uuid,
+                "seller": self.assets[seller_uuid]["area_name"], "seller_uuid": seller_uuid})
+        for asset_uuid in {area_uuid for trade in trades
+                           for area_uuid in (trade["buyer"], trade["seller"])}:
+            self._set_asset_info(asset_uuid)
+        return trade_list
+
+    def _settle_remaining_energy(self, time_slot: str) -> None:
+        market_maker_rate = self._get_market_maker_rate(time_slot)
+        for asset_uuid, energy in self._remaining_energy.items():
+            if energy > ENERGY_TOLERANCE_KWH:
+                self._asset_totals[asset_uuid]["market_maker_kWh"] += energy
+                self._asset_totals[asset_uuid]["cost"] += energy * market_maker_rate
+                self._book_market_stats(asset_uuid, self.market_maker_uuid, energy)
+            elif energy < -ENERGY_TOLERANCE_KWH:
+                self._asset_totals[asset_uuid]["feed_in_kWh"] -= energy
+                self._asset_totals[asset_uuid]["revenue"] -= energy * self.feed_in_tariff_rate
+                self._book_market_stats(self.market_maker_uuid, asset_uuid, -energy)
+        self._last_market_stats = {
+            market_uuid: self._format_market_stats(stats)
+            for market_uuid, stats in self._slot_market_stats.items()}
+
+    def _send_event(self, time_slot: str, event: Dict) -> None:
+        # The events are passed decoded, encoding the grid tree would dominate the run time
+        # pylint: disable-next=protected-access
+        self.aggregator._handle_event(
+            {**event, "market_slot": time_slot, "grid_tree": self.grid_tree})
+
+    def run_market_slot(self, time_slot: str) -> None:
+        """Send the market event and the ticks of the slot, and clear the orders on every tick.
+
+        The orders of the last tick are cleared at the end of the slot.
+        """
+        self._start_market_slot(time_slot)
+        self._send_event(time_slot, {
+            "event": "market", "slot_completion": "0%",
+            "feed_in_tariff_rate": self.feed_in_tariff_rate,
+            "market_maker_rate": self._get_market_maker_rate(time_slot)})
+        for tick in range(1, self.ticks_per_slot + 1):
+            trade_list = self._settle_trades(self.order_book.match(time_slot))
+            if trade_list:
+                self._send_event(time_slot, {"event": "trade", "trade_list": trade_list})
+            if tick < self.ticks_per_slot:
+                self._send_event(time_slot, {
+                    "event": "tick",
+                    "slot_completion": f"{int(tick * 100 / self.ticks_per_slot)}%"})
+        self._settle_remaining_energy(time_slot)
+
+    def run(self) -> BacktestResult:
+        """Run all market slots, then send the finish event."""
+        start_time = time.perf_counter()
+        self.aggregator = self._create_aggregator()
+        for time_slot in self.time_slots:
+            self.run_market_slot(time_slot)
+        self._send_event(self.time_slots[-1] if self.time_slots else "", {"event": "finish"})
+        return BacktestResult(
+            slots=len(self.time_slots), trades=self._counters["trades"],
+            traded_energy_kWh=self._counters["traded_energy_kWh"],
+            grid_fee_revenue=self._counters["grid_fee_revenue"],
+            rejected_commands=self._counters["rejected_commands"],
+            elapsed_secs=time.perf_counter() - start_time,
+            asset_results={self.assets[asset_uuid]["area_name"]: AssetResult(**totals)
+                           for asset_uuid, totals in self._asset_totals.items()},
+            callback_timings=dict(self.executor.timings))
@@ -0,0 +1,194 @@
+"""Measure the capacity of a host for the SDK's hot paths, without a running exchange.
+
+Every scenario runs on the synthetic grid trees of gsy_e_sdk.emulator:
+- command_buffer: fill a ClientCommandBuffer with one command per asset and build the batch.
+- codec: encode and decode a tick event with the grid tree.
+- grid_fee: calculate the grid fees between random pairs of assets.
+- dispatch: publish a tick event on an InProcessRedis until the aggregator's on_tick runs.
+"""
+import json
+import os
+import platform
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple
+
+from gsy_framework.redis_channels import AggregatorChannels
+from tabulate import tabulate
+
+from gsy_e_sdk import __version__
+from gsy_e_sdk.commands import ClientCommandBuffer
+from gsy_e_sdk.constants import (
+    BENCH_GRID_DEPTH, BENCH_GRID_FEE_QUERIES, BENCH_ITERATIONS, BENCH_MAX_COMMANDS)
+from gsy_e_sdk.emulator import ExchangeEmulator, InProcessRedis, create_nested_grid
+from gsy_e_sdk.grid_fee_calculation import GridFeeCalculation
+from gsy_e_sdk.redis_aggregator import RedisAggregator
+from gsy_e_sdk.utils import flatten_info_dict
+
+# Waiting longer than that for a dispatched event means the aggregator is stuck
+DISPATCH_TIMEOUT_SECS = 60
+
+
+class BenchResult(NamedTuple):
+    """Timings of the iterations of a scenario on a grid of area_count areas."""
+    scenario: str
+    area_count: int
+    iterations: int
+    operations: int  # per iteration
+    mean_secs: float
+    p50_secs: float
+    p99_secs: float
+    max_secs: float
+
+    @property
+    def operations_per_sec(self) -> float:
+        """Return the throughput of the scenario."""
+        return self.operations / self.mean_secs if self.mean_secs else 0.0
+
+
+def _summarize(scenario: str, area_count: int, operations: int,
+               durations: List[float]) -> BenchResult:
+    durations = sorted(durations)
+    return BenchResult(
+        scenario, area_count, len(durations), operations, sum(durations) / len(durations),
+        durations[len(durations) // 2], durations[min(len(durations) - 1,
+                                                      int(len(durations) * 0.99))],
+        durations[-1])
+
+
+def _time_iterations(function: Callable[[], None], iterations: int) -> List[float]:
+    durations = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start_time)
+    return durations
+
+
+def _get_asset_uuids(grid_tree: Dict) -> List[str]:
+    return [area_uuid for area_uuid, area in flatten_info_dict(grid_tree).items()
+            if "asset_info" in area]
+
+
+def bench_command_buffer(grid_tree: Dict, iterations: int) -> BenchResult:
+    """Fill the command buffer with one command per asset and build the batch."""
+    asset_uuids = _get_asset_uuids(grid_tree)[:BENCH_MAX_COMMANDS]
+
+    def fill_and_execute_batch():
+        command_buffer = ClientCommandBuffer()
+        for index, asset_uuid in enumerate(asset_uuids):
+            if index % 2:
+                command_buffer.bid_energy(asset_uuid, 0.5, 15)
+            else:
+                command_buffer.offer_energy_rate(asset_uuid, 0.5, 25)
+        command_buffer.execute_batch()
+
+    return _summarize("command_buffer", len(flatten_info_dict(grid_tree)), len(asset_uuids),
+                      _time_iterations(fill_and_execute_batch, iterations))
+
+
+def bench_codec(grid_tree: Dict, iterations: int) -> BenchResult:
+    """Encode and decode a tick event that carries the grid tree."""
+    event = {"event": "tick", "slot_completion": "50%", "market_slot": "2022-01-01T00:00",
+             "grid_tree": grid_tree}
+    return _summarize("codec", len(flatten_info_dict(grid_tree)), 1,
+                      _time_iterations(lambda: json.loads(json.dumps(event)), iterations))
+
+
+def bench_grid_fee(grid_tree: Dict, iterations: int) -> BenchResult:
+    """Calculate the grid fees between random pairs of assets."""
+    grid_fee_calculation = GridFeeCalculation()
+    grid_fee_calculation.handle_grid_stats(grid_tree)
+    asset_uuids = _get_asset_uuids(grid_tree)
+    rng = random.Random(0)
+    asset_pairs = [tuple(rng.sample(asset_uuids, 2)) for _ in range(BENCH_GRID_FEE_QUERIES)]
+
+    def calculate_grid_fees():
+        for start_uuid, target_uuid in asset_pairs:
+            grid_fee_calculation.calculate_grid_fee(start_uuid, target_uuid)
+
+    return _summarize("grid_fee", len(flatten_info_dict(grid_tree)), len(asset_pairs),
+                      _time_iterations(calculate_grid_fees, iterations))
+
+
+class _DispatchProbeAggregator(RedisAggregator):
+    """Signal every tick that reached the on_tick callback."""
+
+    def __init__(self, *args, **kwargs):
+        self.tick_received = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def on_tick(self, tick_info):
+        self.tick_received.set()
+
+
+def bench_dispatch(grid_tree: Dict, iterations: int) -> BenchResult:
+    """Publish tick events to an aggregator, until its on_tick callback runs."""
+    redis_db = InProcessRedis()
+    emulator = ExchangeEmulator(redis_db=redis_db, grid_tree=grid_tree)
+    aggregator = _DispatchProbeAggregator("bench", redis_db=redis_db)
+    payload = json.dumps({"event": "tick", "slot_completion": "50%",
+                          "market_slot": "2022-01-01T00:00", "grid_tree": grid_tree})
+    events_channel = AggregatorChannels("", aggregator.aggregator_uuid).events
+
+    def dispatch_tick():
+        aggregator.tick_received.clear()
+        redis_db.publish(events_channel, payload)
+        if not aggregator.tick_received.wait(DISPATCH_TIMEOUT_SECS):
+            raise TimeoutError("The tick event was not dispatched to the aggregator.")
+
+    try:
+        return _summarize("dispatch", len(flatten_info_dict(grid_tree)), 1,
+                          _time_iterations(dispatch_tick, iterations))
+    finally:
+        aggregator.pubsub.close()
+        aggregator.executor.shutdown(wait=True)
+        emulator.stop()
+
+
+SCENARIOS: Dict[str, Callable[[Dict, int], BenchResult]] = {
+    "command_buffer": bench_command_buffer,
+    "codec": bench_codec,
+    "grid_fee": bench_grid_fee,
+    "dispatch": bench_dispatch,
+}
+
+
+def run_benchmarks(area_counts: Iterable[int], scenarios: Iterable[str],
+                   iterations: int = BENCH_ITERATIONS,
+                   depth: int = BENCH_GRID_DEPTH) -> List[BenchResult]:
+    """Run the scenarios on grids of every area count."""
+    results = []
+    for area_count in area_counts:
+        grid_tree = create_nested_grid(area_count, depth=depth)
+        for scenario in scenarios:
+            results.append(SCENARIOS[scenario](grid_tree, iterations))
+    return results
+
+
+def get_host_info() -> Dict:
+    """Return the properties of the host that the results depend on."""
+    return {"sdk_version": __version__, "python": platform.python_version(),
+            "implementation": platform.python_implementation(), "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count()}
+
+
+def format_bench_report(results: List[BenchResult]) -> str:
+    """Return the results as a human readable table."""
+    return tabulate(
+        [[result.scenario, result.area_count, result.operations, result.iterations,
+          round(result.mean_secs * 1000, 3), round(result.p50_secs * 1000, 3),
+          round(result.p99_secs * 1000, 3), round(result.operations_per_sec, 1)]
+         for result in results],
+        headers=["Scenario", "Areas", "Ops/iteration", "Iterations", "Mean (ms)", "p50 (ms)",
+                 "p99 (ms)", "Ops/s"], tablefmt="github")
+
+
+def write_bench_report(results: List[BenchResult], file_path: str) -> None:
+    """Write the host info and the results as JSON."""
+    with open(file_path, "w", encoding="utf-8") as report_file:
+        json.dump({"host": get_host_info(), "results": [
+            {**result._asdict(), "operations_per_sec": result.operations_per_sec}
+            for result in results]}, report_file, indent=2)
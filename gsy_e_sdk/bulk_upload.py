@@ -0,0 +1,193 @@
+"""Upload forecasts or measurements of many assets and time slots in few, concurrent requests."""
+import json
+import logging
+import math
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from gsy_e_sdk.async_rest import run_concurrently
+from gsy_e_sdk.constants import BULK_UPLOAD_MAX_CHUNK_BYTES, BULK_UPLOAD_MAX_CONCURRENCY
+from gsy_e_sdk.enums import Commands, command_enum_to_command_name
+
+TimeSeries = Dict[str, Dict[str, float]]
+
+# Keys of the time series in the commands and REST payloads, per command
+TIME_SERIES_KEYS = {Commands.FORECAST: "energy_forecast",
+                    Commands.MEASUREMENT: "energy_measurement"}
+
+
+class ChunkResult(NamedTuple):
+    """Outcome of the upload of one chunk of the time series."""
+    asset_uuids: List[str]
+    time_slot_count: int
+    payload_size: int
+    success: bool
+    response: Any = None
+    error: Optional[BaseException] = None
+
+
+def _format_time_slot(time_slot: Any) -> str:
+    if isinstance(time_slot, str):
+        return time_slot
+    if hasattr(time_slot, "strftime"):
+        # Same representation as gsy_framework's DATE_TIME_FORMAT
+        return time_slot.strftime("%Y-%m-%dT%H:%M")
+    return str(time_slot)
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def time_series_to_dict(data: Any, asset_uuids: Optional[Sequence[str]] = None,
+                        time_slots: Optional[Sequence[Any]] = None) -> TimeSeries:
+    """Convert the supported inputs to a {asset_uuid: {time_slot: energy_kWh}} dict.
+
+    Supported inputs are:
+    - a {asset_uuid: {time_slot: energy_kWh}} dict,
+    - a DataFrame-like object with one column per asset and one row per time slot (anything
+      with a pandas compatible to_dict()),
+    - a 2D (assets x time slots) array or nested sequence, together with asset_uuids and
+      time_slots.
+    Missing values (None or NaN) are skipped, time slots are formatted as strings.
+    """
+    if hasattr(data, "to_dict") and not isinstance(data, dict):
+        data = data.to_dict()
+    elif not isinstance(data, dict):
+        if asset_uuids is None or time_slots is None:
+            raise ValueError("asset_uuids and time_slots are required for array inputs.")
+        data = {asset_uuid: dict(zip(time_slots, row))
+                for asset_uuid, row in zip(asset_uuids, data)}
+
+    return {str(asset_uuid): {_format_time_slot(time_slot): float(value)
+                              for time_slot, value in series.items() if not _is_missing(value)}
+            for asset_uuid, series in data.items()}
+
+
+def _entry_size(time_slot: str, value: float) -> int:
+    # Size of '"time_slot": value, ' in the JSON payload
+    return len(time_slot) + len(repr(value)) + 6
+
+
+def chunk_time_series(time_series: TimeSeries,
+                      max_chunk_bytes: int = BULK_UPLOAD_MAX_CHUNK_BYTES) -> List[TimeSeries]:
+    """Split the time series into chunks whose JSON payload stays below max_chunk_bytes.
+
+    Assets are packed together into the same chunk while they fit, the series of assets
+    that do not fit into one chunk are split over multiple chunks.
+    """
+    chunks = []
+    chunk: TimeSeries = {}
+    chunk_size = 0
+    for asset_uuid, series in time_series.items():
+        asset_overhead = len(asset_uuid) + 64
+        for time_slot, value in series.items():
+            entry_size = _entry_size(time_slot, value)
+            added_size = entry_size + (0 if asset_uuid in chunk else asset_overhead)
+            if chunk and chunk_size + added_size > max_chunk_bytes:
+                chunks.append(chunk)
+                chunk, chunk_size = {}, 0
+                added_size = entry_size + asset_overhead
+            chunk.setdefault(asset_uuid, {})[time_slot] = value
+            chunk_size += added_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class BulkTimeSeriesUploader:
+    """Send the energy forecasts or measurements of many assets in chunks, concurrently.
+
+    The chunks are sent either as batch commands of an aggregator (REST or redis), or as
+    REST requests of the asset clients ({asset_uuid: RestAssetClient}).
+    """
+
+    def __init__(self, aggregator=None, clients: Optional[Dict[str, Any]] = None,
+                 max_chunk_bytes: int = BULK_UPLOAD_MAX_CHUNK_BYTES,
+                 max_concurrency: int = BULK_UPLOAD_MAX_CONCURRENCY):
+        if (aggregator is None) == (clients is None):
+            raise ValueError("Exactly one of aggregator and clients has to be provided.")
+        self.aggregator = aggregator
+        self.clients = clients
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_concurrency = max_concurrency
+
+    def upload_energy_forecasts(self, data: Any, **kwargs) -> List[ChunkResult]:
+        """Upload the energy forecasts, see time_series_to_dict for the supported inputs."""
+        return self.upload(Commands.FORECAST, time_series_to_dict(data, **kwargs))
+
+    def upload_energy_measurements(self, data: Any, **kwargs) -> List[ChunkResult]:
+        """Upload the energy measurements, see time_series_to_dict for the supported inputs."""
+        return self.upload(Commands.MEASUREMENT, time_series_to_dict(data, **kwargs))
+
+    def upload(self, command: Commands, time_series: TimeSeries) -> List[ChunkResult]:
+        """Upload the time series and return the results of the chunks in order."""
+        chunks = chunk_time_series(time_series, self.max_chunk_bytes)
+        logging.debug("Uploading %s time series of %s assets in %s chunks.",
+                      command_enum_to_command_name(command), len(time_series), len(chunks))
+        if self.aggregator is not None:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                return list(executor.map(
+                    lambda chunk: self._send_batch_chunk(command, chunk), chunks))
+        return self._send_rest_chunks(command, chunks)
+
+    def _send_batch_chunk(self, command: Commands, chunk: TimeSeries) -> ChunkResult:
+        command_name = command_enum_to_command_name(command)
+        batch_command_dict = {
+            asset_uuid: [{"type": command_name, TIME_SERIES_KEYS[command]: series}]
+            for asset_uuid, series in chunk.items()}
+        payload_size = len(json.dumps(batch_command_dict))
+        try:
+            response = self.aggregator.send_batch_commands(batch_command_dict)
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.error("Uploading chunk of assets %s failed: %s", list(chunk), ex)
+            return _create_chunk_result(chunk, payload_size, False, error=ex)
+        return _create_chunk_result(chunk, payload_size, response is not None, response)
+
+    def _send_rest_chunks(self, command: Commands, chunks: List[TimeSeries]
+                          ) -> List[ChunkResult]:
+        asset_series = [(asset_uuid, series) for chunk in chunks
+                        for asset_uuid, series in chunk.items()]
+        responses = []
+        for start in range(0, len(asset_series), self.max_concurrency):
+            responses.extend(run_concurrently(
+                self._send_rest_request(command, asset_uuid, series)
+                for asset_uuid, series in asset_series[start:start + self.max_concurrency]))
+
+        results = []
+        responses = iter(responses)
+        for chunk in chunks:
+            chunk_responses = [next(responses) for _ in chunk]
+            errors = [response for response in chunk_responses
+                      if isinstance(response, BaseException)]
+            results.append(_create_chunk_result(
+                chunk, len(json.dumps(chunk)), not errors and None not in chunk_responses,
+                chunk_responses, errors[0] if errors else None))
+        return results
+
+    async def _send_rest_request(self, command: Commands, asset_uuid: str, series: Dict):
+        client = self.clients[asset_uuid]
+        if command == Commands.FORECAST:
+            return await client.async_set_energy_forecast(series)
+        return await client.async_set_energy_measurement(series)
+
+
+def _create_chunk_result(chunk: TimeSeries, payload_size: int, success: bool,
+                         response: Any = None, error: Optional[BaseException] = None
+                         ) -> ChunkResult:
+    return ChunkResult(asset_uuids=list(chunk),
+                       time_slot_count=sum(len(series) for series in chunk.values()),
+                       payload_size=payload_size, success=success, response=response,
+                       error=error)
+
+
+def upload_energy_forecasts(data: Any, aggregator=None, clients: Optional[Dict] = None,
+                            **kwargs) -> List[ChunkResult]:
+    """Upload the energy forecasts of many assets, see BulkTimeSeriesUploader."""
+    return BulkTimeSeriesUploader(aggregator, clients).upload_energy_forecasts(data, **kwargs)
+
+
+def upload_energy_measurements(data: Any, aggregator=None, clients: Optional[Dict] = None,
+                               **kwargs) -> List[ChunkResult]:
+    """Upload the energy measurements of many assets, see BulkTimeSeriesUploader."""
+    return BulkTimeSeriesUploader(aggregator, clients).upload_energy_measurements(data, **kwargs)
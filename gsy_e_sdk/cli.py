@@ -18,23 +18,28 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # pylint: disable=too-many-arguments
 import importlib
 import inspect
+import json
 import logging
 import os
 import sys
+import threading
+from functools import lru_cache
 from logging import getLogger
 
 import click
 from click.types import Choice
 from click_default_group import DefaultGroup
 from colorlog import ColoredFormatter
-from gsy_framework.exceptions import GSyException
-from gsy_framework.utils import iterate_over_all_modules
 
 import gsy_e_sdk
 from gsy_e_sdk import setups
-from gsy_e_sdk.constants import SETUP_FILE_PATH
-from gsy_e_sdk.utils import domain_name_from_env, websocket_domain_name_from_env, \
-    simulation_id_from_env, read_simulation_config_file
+from gsy_e_sdk.constants import (
+    BENCH_AREA_COUNTS, BENCH_GRID_DEPTH, BENCH_ITERATIONS, BENCH_SCENARIOS,
+    PROFILER_DEFAULT_SLOTS, PROFILER_SAMPLE_INTERVAL_SECS, SETUP_FILE_PATH)
+from gsy_e_sdk.log_policy import configure_async_logging
+
+# The clients, their transports and gsy_framework are only imported by the commands that need
+# them, so that the CLI (and its --help) starts fast.
 
 log = getLogger(__name__)
 gsy_e_sdk_path = os.path.dirname(inspect.getsourcefile(gsy_e_sdk))
@@ -46,7 +51,9 @@ gsy_e_sdk_path = os.path.dirname(inspect.getsourcefile(gsy_e_sdk))
               show_default=True, help="Log level")
 @click.option("-f", "--log-file", type=str, default="",
               show_default=True, help="Log file")
-def main(log_level, log_file):
+@click.option("--async-logging", is_flag=True, default=False,
+              help="Write the log records in a background thread")
+def main(log_level, log_file, async_logging):
 
     if log_file:
         handler = logging.FileHandler(log_file)
@@ -64,32 +71,62 @@ def main(log_level, log_file):
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
     root_logger.addHandler(handler)
+    if async_logging:
+        configure_async_logging()
 
 
 modules_path = setups.__path__ if SETUP_FILE_PATH is None else [SETUP_FILE_PATH, ]
-_setup_modules = iterate_over_all_modules(modules_path)
 
 
-@main.command()
-@click.option("-b", "--base-setup-path", default=None, type=str,
-              help="Accept absolute or relative path for client script")
-@click.option("--setup", "setup_module_name", required=True,
-              help="Setup module of client script. Available modules: ["
-                   f"{', '.join(_setup_modules)}]")
-@click.option("-u", "--username", default=None, type=str, help="D3A username")
-@click.option("-p", "--password", default=None, type=str, help="D3A password")
-@click.option("-d", "--domain-name", default=None,
-              type=str, help="D3A domain URL")
-@click.option("-w", "--web-socket", default=None,
-              type=str, help="D3A websocket URL")
-@click.option("-i", "--simulation-config-path", type=str, default=None,
-              help="Path to simulation config file.")
-@click.option("-s", "--simulation-id", type=str, default=None,
-              help="Simulation id")
-@click.option("--run-on-redis", is_flag=True, default=False,
-              help="Start the client using the Redis API")
-def run(base_setup_path, setup_module_name, username, password, domain_name, web_socket,
-        simulation_config_path, simulation_id, run_on_redis):
+@lru_cache(maxsize=1)
+def get_setup_modules():
+    """Return the names of the available setup modules (discovered on first use)."""
+    # pylint: disable-next=import-outside-toplevel
+    from gsy_framework.utils import iterate_over_all_modules
+    return iterate_over_all_modules(modules_path)
+
+
+class SetupModuleOption(click.Option):
+    """Option whose help lists the available setup modules, only discovered when it is shown."""
+
+    def get_help_record(self, ctx):
+        self.help = f"Setup module of client script. Available modules: [" \
+                    f"{', '.join(get_setup_modules())}]"
+        return super().get_help_record(ctx)
+
+
+def run_options(function):
+    """Add the options of the run command, which connect to an exchange, to the command."""
+    options = [
+        click.option("-b", "--base-setup-path", default=None, type=str,
+                     help="Accept absolute or relative path for client script"),
+        click.option("--setup", "setup_module_name", required=True, cls=SetupModuleOption),
+        click.option("-u", "--username", default=None, type=str, help="D3A username"),
+        click.option("-p", "--password", default=None, type=str, help="D3A password"),
+        click.option("-d", "--domain-name", default=None,
+                     type=str, help="D3A domain URL"),
+        click.option("-w", "--web-socket", default=None,
+                     type=str, help="D3A websocket URL"),
+        click.option("-i", "--simulation-config-path", type=str, default=None,
+                     help="Path to simulation config file."),
+        click.option("-s", "--simulation-id", type=str, default=None,
+                     help="Simulation id"),
+        click.option("--run-on-redis", is_flag=True, default=False,
+                     help="Start the client using the Redis API"),
+    ]
+    for option in reversed(options):
+        function = option(function)
+    return function
+
+
+def set_run_environment(username, password, domain_name, web_socket, simulation_config_path,
+                        simulation_id, run_on_redis):
+    """Set the environment variables that the clients of the setup scripts are configured by."""
+    # pylint: disable-next=import-outside-toplevel
+    from gsy_e_sdk.utils import (
+        domain_name_from_env, read_simulation_config_file, simulation_id_from_env,
+        websocket_domain_name_from_env)
+
     if username is not None:
         os.environ["API_CLIENT_USERNAME"] = username
     if password is not None:
@@ -112,9 +149,116 @@ def run(base_setup_path, setup_module_name, username, password, domain_name, web
 
         validate_general_settings_are_set()
 
+
+@main.command()
+@run_options
+def run(base_setup_path, setup_module_name, username, password, domain_name, web_socket,
+        simulation_config_path, simulation_id, run_on_redis):
+    set_run_environment(username, password, domain_name, web_socket, simulation_config_path,
+                        simulation_id, run_on_redis)
     load_client_script(base_setup_path, setup_module_name)
 
 
+@main.command()
+@run_options
+@click.option("--slots", type=int, default=PROFILER_DEFAULT_SLOTS, show_default=True,
+              help="Market slots to profile, the script is stopped afterwards")
+@click.option("--interval", type=float, default=PROFILER_SAMPLE_INTERVAL_SECS,
+              show_default=True, help="Sampling interval in seconds")
+@click.option("--all-threads", is_flag=True, default=False,
+              help="Also sample the threads that do not run callbacks or dispatch messages")
+@click.option("-o", "--output", type=str, default="profile.folded", show_default=True,
+              help="Folded stacks file, e.g. for flamegraph.pl or speedscope")
+def profile(  # pylint: disable=too-many-locals
+        base_setup_path, setup_module_name, username, password, domain_name, web_socket,
+        simulation_config_path, simulation_id, run_on_redis, slots, interval, all_threads,
+        output):
+    """Run a setup script under a sampling profiler, attributing the time to its callbacks."""
+    # pylint: disable-next=import-outside-toplevel
+    from gsy_e_sdk.profiler import SamplingProfiler, format_profile_report, wait_for_market_slots
+
+    set_run_environment(username, password, domain_name, web_socket, simulation_config_path,
+                        simulation_id, run_on_redis)
+    profiler = SamplingProfiler(interval, all_threads)
+    # The setup scripts run until their simulation finishes, so they run in a daemon thread
+    # that is abandoned once the requested slots were profiled
+    script_thread = threading.Thread(
+        target=load_client_script, args=(base_setup_path, setup_module_name),
+        name="setup-script", daemon=True)
+    profiler.start()
+    script_thread.start()
+    profiled_slots = wait_for_market_slots(script_thread, slots)
+    profiler.stop()
+    profiler.write_folded_stacks(output)
+    click.echo(f"Profiled {profiled_slots} market slots ({profiler.sample_count} samples), "
+               f"the folded stacks were written to {output}.\n")
+    click.echo(format_profile_report(profiler))
+
+
+@main.command()
+@click.argument("recording_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("-a", "--aggregator", "aggregator_path", required=True, type=str,
+              help="Aggregator class that is driven by the recording, as <module>:<class>")
+@click.option("-b", "--base-setup-path", default=None, type=str,
+              help="Accept absolute or relative path of the aggregator's module")
+@click.option("--speedup", type=float, default=None,
+              help="Replay this many times faster than recorded  [default: as fast as possible]")
+@click.option("--report-file", type=str, default=None,
+              help="Write the replay report as JSON to this file")
+def replay(recording_file, aggregator_path, base_setup_path, speedup, report_file):
+    """Replay a recording into an aggregator strategy, without a running exchange."""
+    # pylint: disable-next=import-outside-toplevel
+    from gsy_e_sdk.replay import ReplayEngine, format_replay_report
+
+    aggregator_class = load_class(base_setup_path, aggregator_path)
+    report = ReplayEngine(recording_file, aggregator_class).run(speedup=speedup)
+    click.echo(format_replay_report(report))
+    if report_file:
+        with open(report_file, "w", encoding="utf-8") as report_json:
+            json.dump({**report._asdict(), "callback_timings": {
+                name: timing._asdict() for name, timing in report.callback_timings.items()}},
+                report_json, indent=2)
+
+
+@main.command()
+@click.option("-n", "--area-counts", default=",".join(map(str, BENCH_AREA_COUNTS)),
+              show_default=True, help="Comma separated sizes of the synthetic grids")
+@click.option("--depth", type=int, default=BENCH_GRID_DEPTH, show_default=True,
+              help="Levels of the synthetic grids")
+@click.option("-i", "--iterations", type=int, default=BENCH_ITERATIONS, show_default=True,
+              help="Iterations of every scenario")
+@click.option("-s", "--scenario", "scenarios", type=Choice(BENCH_SCENARIOS), multiple=True,
+              help="Scenario to run, can be repeated  [default: all]")
+@click.option("--report-file", type=str, default=None,
+              help="Write the host info and the results as JSON to this file")
+def bench(area_counts, depth, iterations, scenarios, report_file):
+    """Benchmark the SDK's hot paths on synthetic grids, without a running exchange."""
+    # pylint: disable-next=import-outside-toplevel
+    from gsy_e_sdk.bench import format_bench_report, run_benchmarks, write_bench_report
+
+    try:
+        area_counts = [int(area_count) for area_count in area_counts.split(",")]
+    except ValueError as ex:
+        raise click.BadParameter(f"{area_counts} is not a list of integers.") from ex
+    results = run_benchmarks(area_counts, scenarios or BENCH_SCENARIOS, iterations, depth)
+    click.echo(format_bench_report(results))
+    if report_file:
+        write_bench_report(results, report_file)
+
+
+def load_class(base_setup_path, class_path):
+    """Load the class of a <module>:<class> path."""
+    module_name, _, class_name = class_path.partition(":")
+    if not class_name:
+        raise click.BadParameter(f"{class_path} is not of the form <module>:<class>.")
+    if base_setup_path is not None:
+        sys.path.append(base_setup_path)
+    try:
+        return getattr(importlib.import_module(module_name), class_name)
+    except (ImportError, AttributeError) as ex:
+        raise click.BadParameter(f"Could not load {class_path}: {ex}") from ex
+
+
 def validate_general_settings_are_set():
     """Validate if general settings are set."""
     settings_list = ["API_CLIENT_DOMAIN_NAME", "API_CLIENT_WEBSOCKET_DOMAIN_NAME",
@@ -126,6 +270,9 @@ def validate_general_settings_are_set():
 
 def load_client_script(base_setup_path, setup_module_name):
     """Load client script."""
+    # pylint: disable-next=import-outside-toplevel
+    from gsy_framework.exceptions import GSyException
+
     try:
         if base_setup_path is None:
             importlib.import_module(f"d3a_api_client.setups.{setup_module_name}")
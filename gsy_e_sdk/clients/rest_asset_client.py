@@ -2,44 +2,59 @@ import logging
 from concurrent.futures.thread import ThreadPoolExecutor
 from typing import Dict
 
-from gsy_framework.client_connections.utils import (
-    RestCommunicationMixin, blocking_post_request, log_market_progression,
-    retrieve_jwt_key_from_server)
-from gsy_framework.client_connections.websocket_connection import WebsocketThread
-from gsy_framework.utils import execute_function_util
+from gsy_framework.client_connections.utils import log_market_progression
 
 from gsy_e_sdk import APIClientInterface
+from gsy_e_sdk.async_rest import AsyncRestTransport, get_async_rest_transport
+from gsy_e_sdk.authentication import JWTAuthenticationMixin, get_jwt_token_manager
 from gsy_e_sdk.constants import MAX_WORKER_THREADS
+from gsy_e_sdk.http_session import HTTPSessionMixin, blocking_post_request, get_http_session
+from gsy_e_sdk.latency import LatencyTracker, get_latency_tracker
+from gsy_e_sdk.log_policy import MessageLogView, SlotLogSummary, is_log_level_enabled
+from gsy_e_sdk.metrics import MetricsRegistry, get_metrics_registry
+from gsy_e_sdk.recorder import MessageRecorder, get_message_recorder
+from gsy_e_sdk.tracing import Tracer, get_tracer
 from gsy_e_sdk.utils import (
-    domain_name_from_env, get_aggregator_prefix, get_configuration_prefix, log_trade_info,
+    domain_name_from_env, get_aggregator_prefix, get_configuration_prefix,
     logging_decorator, simulation_id_from_env, websocket_domain_name_from_env)
 from gsy_e_sdk.websocket_device import DeviceWebsocketMessageReceiver
+from gsy_e_sdk.websocket_manager import WebsocketConnectionManager, WebsocketThread
 
 
 REGISTER_COMMAND_TIMEOUT = 15 * 60
 
 
 # pylint: disable-next=too-many-instance-attributes
-class RestAssetClient(APIClientInterface, RestCommunicationMixin):
+class RestAssetClient(APIClientInterface, JWTAuthenticationMixin, HTTPSessionMixin):
     """Client class for assets to be used while working with REST."""
 
     # pylint: disable-next=super-init-not-called
     # pylint: disable-next=too-many-arguments
     def __init__(
             self, asset_uuid, simulation_id=None, domain_name=None, websockets_domain_name=None,
-            autoregister=False, start_websocket=True, sim_api_domain_name=None):
+            autoregister=False, start_websocket=True, sim_api_domain_name=None,
+            rest_transport: AsyncRestTransport = None, http_session=None,
+            websocket_manager: WebsocketConnectionManager = None,
+            recorder: MessageRecorder = None, latency_tracker: LatencyTracker = None,
+            metrics: MetricsRegistry = None, tracer: Tracer = None):
         self.is_finished = False
         self.simulation_id = simulation_id if simulation_id else simulation_id_from_env()
         self.domain_name = domain_name if domain_name else domain_name_from_env()
         self.websockets_domain_name = websockets_domain_name or websocket_domain_name_from_env()
         self.asset_uuid = asset_uuid
-        if sim_api_domain_name is None:
-            sim_api_domain_name = self.domain_name
-        self.jwt_token = retrieve_jwt_key_from_server(sim_api_domain_name)
-        self._create_jwt_refresh_timer(sim_api_domain_name)
+        self.websocket_manager = websocket_manager
+        self.recorder = recorder or get_message_recorder()
+        self.latency_tracker = latency_tracker or get_latency_tracker()
+        self.metrics = metrics or get_metrics_registry()
+        self.tracer = tracer or get_tracer()
+        self._log_summary = SlotLogSummary(asset_uuid)
+        self.http_session = http_session or get_http_session()
+        self.jwt_domain_name = sim_api_domain_name or self.domain_name
+        get_jwt_token_manager().get_token(self.jwt_domain_name, session=self.http_session)
         self.aggregator_prefix = get_aggregator_prefix(self.domain_name, self.simulation_id)
         self.configuration_prefix = get_configuration_prefix(self.domain_name, self.simulation_id)
         self.active_aggregator = None
+        self.rest_transport = rest_transport or get_async_rest_transport(http_session)
 
         if start_websocket or autoregister:
             self.start_websocket_connection()
@@ -62,9 +77,16 @@ class RestAssetClient(APIClientInterface, RestCommunicationMixin):
         """Initiate the websocket connection to the exchange."""
         self.dispatcher = DeviceWebsocketMessageReceiver(self)
         websocket_uri = f"{self.websockets_domain_name}/{self.simulation_id}/{self.asset_uuid}/"
-        self.websocket_thread = WebsocketThread(websocket_uri, self.domain_name, self.dispatcher)
-        self.websocket_thread.start()
-        self.callback_thread = ThreadPoolExecutor(max_workers=MAX_WORKER_THREADS)
+        if self.websocket_manager is not None:
+            self.websocket_connection = self.websocket_manager.add_connection(
+                websocket_uri, self.domain_name, self.dispatcher)
+            self.callback_thread = self.websocket_manager.callback_executor
+        else:
+            self.websocket_thread = WebsocketThread(
+                websocket_uri, self.domain_name, self.dispatcher)
+            self.websocket_thread.start()
+            self.callback_thread = ThreadPoolExecutor(max_workers=MAX_WORKER_THREADS)
+        self.metrics.track_executor(self.callback_thread)
 
     @logging_decorator("register")
     def register(self, is_blocking=True):
@@ -96,7 +118,7 @@ class RestAssetClient(APIClientInterface, RestCommunicationMixin):
         response = blocking_post_request(
             f"{self.aggregator_prefix}select-aggregator/",
             {"aggregator_uuid": aggregator_uuid, "device_uuid": self.asset_uuid},
-            self.jwt_token)
+            self.jwt_token, session=self.http_session)
 
         self.active_aggregator = response["aggregator_uuid"] if response else None
 
@@ -106,10 +128,19 @@ class RestAssetClient(APIClientInterface, RestCommunicationMixin):
         blocking_post_request(
             f"{self.aggregator_prefix}unselect-aggregator/",
             {"aggregator_uuid": aggregator_uuid, "device_uuid": self.asset_uuid},
-            self.jwt_token)
+            self.jwt_token, session=self.http_session)
 
         self.active_aggregator = None
 
+    async def async_select_aggregator(self, aggregator_uuid):
+        """Connect the asset with its aggregator without blocking the running event loop."""
+        response = await self.rest_transport.blocking_post(
+            f"{self.aggregator_prefix}select-aggregator/",
+            {"aggregator_uuid": aggregator_uuid, "device_uuid": self.asset_uuid},
+            self.jwt_token)
+
+        self.active_aggregator = response["aggregator_uuid"] if response else None
+
     # pylint: disable=invalid-name
     @logging_decorator("set-energy-forecast")
     def set_energy_forecast(self, energy_forecast_kWh: Dict, do_not_wait=False):
@@ -121,6 +152,18 @@ class RestAssetClient(APIClientInterface, RestCommunicationMixin):
 
         return None
 
+    # pylint: disable=invalid-name
+    async def async_set_energy_forecast(self, energy_forecast_kWh: Dict, do_not_wait=False):
+        """Communicate the energy forecast of the asset without blocking the event loop."""
+        transaction_id, posted = await self.rest_transport.post(
+            f"{self.endpoint_prefix}/set-energy-forecast",
+            {"energy_forecast": energy_forecast_kWh}, self.jwt_token)
+        if posted and do_not_wait is False:
+            return await self.dispatcher.async_wait_for_command_response(
+                "set_energy_forecast", transaction_id)
+
+        return None
+
     @logging_decorator("set-live-generation")
     def set_live_generation(self, live_data: Dict, do_not_wait=False):
         """Send live generation data to gsy-web."""
@@ -143,6 +186,17 @@ class RestAssetClient(APIClientInterface, RestCommunicationMixin):
                                                              transaction_id)
         return None
 
+    # pylint: disable=invalid-name
+    async def async_set_energy_measurement(self, energy_measurement_kWh: Dict, do_not_wait=False):
+        """Communicate the energy measurement of the asset without blocking the event loop."""
+        transaction_id, posted = await self.rest_transport.post(
+            f"{self.endpoint_prefix}/set-energy-measurement",
+            {"energy_measurement": energy_measurement_kWh}, self.jwt_token)
+        if posted and do_not_wait is False:
+            return await self.dispatcher.async_wait_for_command_response(
+                "set_energy_measurement", transaction_id)
+        return None
+
     # pylint: disable=invalid-name
     @logging_decorator("set-scm-timeseries-and-member-data")
     def set_scm_timeseries_and_member_data(self, scm_timeseries_members: Dict):
@@ -159,35 +213,32 @@ class RestAssetClient(APIClientInterface, RestCommunicationMixin):
             f"{self.simulation_endpoint_prefix}/set-scm-global-data", scm_global_data)
         return posted
 
+    def _submit_callback(self, function, function_name):
+        self.latency_tracker.submit(self.callback_thread, function, function_name)
+
     def _on_event_or_response(self, message):
-        logging.debug("A new message was received. Message information: %s", message)
-        log_market_progression(message)
-        self.callback_thread.submit(execute_function_util,
-                                    function=lambda: self.on_event_or_response(message),
-                                    function_name="on_event_or_response")
+        logging.debug("A new message was received. Message information: %s",
+                      MessageLogView(message))
+        if is_log_level_enabled(logging.INFO):
+            log_market_progression(message)
+        self._submit_callback(lambda: self.on_event_or_response(message), "on_event_or_response")
 
     def _on_market_cycle(self, message):
-        self.callback_thread.submit(execute_function_util,
-                                    function=lambda: self.on_market_slot(message),
-                                    function_name="on_market_slot")
+        self._log_summary.flush()
+        self._submit_callback(lambda: self.on_market_slot(message), "on_market_slot")
 
     def _on_tick(self, message):
-        self.callback_thread.submit(execute_function_util,
-                                    function=lambda: self.on_tick(message),
-                                    function_name="on_tick")
+        self._submit_callback(lambda: self.on_tick(message), "on_tick")
 
     def _on_trade(self, message):
         for individual_trade in message["trade_list"]:
-            log_trade_info(individual_trade)
+            self._log_summary.add_trade(individual_trade)
 
-        self.callback_thread.submit(execute_function_util,
-                                    function=lambda: self.on_trade(message),
-                                    function_name="on_trade")
+        self._submit_callback(lambda: self.on_trade(message), "on_trade")
 
     def _on_finish(self, message):
-        self.callback_thread.submit(execute_function_util,
-                                    function=lambda: self.on_finish(message),
-                                    function_name="on_finish")
+        self._log_summary.flush()
+        self._submit_callback(lambda: self.on_finish(message), "on_finish")
         self.is_finished = True
 
     def on_market_cycle(self, market_info):  # pylint: disable=unused-argument
@@ -136,8 +136,7 @@ class ClientCommandBuffer:
             self._commands_buffer.append(
                 {area_uuid: {"type": command_enum_to_command_name(action)
                              if isinstance(action, Commands) else action, **args, **args}})
-            logging.debug("Added Command to buffer, updated buffer: ")
-            self._log_all_commands()
+            logging.debug("Added command %s of %s to buffer.", action, area_uuid)
         return self
 
     def clear(self):
@@ -146,6 +145,8 @@ class ClientCommandBuffer:
 
     def _log_all_commands(self):
         """Log all commands that were previously added to the buffer."""
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
         table_headers = ["Area UUID", "Command Type", "Arguments"]
         table_data = []
         for command_dict in self._commands_buffer:
@@ -158,6 +159,7 @@ class ClientCommandBuffer:
 
     def execute_batch(self):
         """Send to the exchange all the commands that were previously added to the buffer."""
+        self._log_all_commands()
         batch_command_dict = {}
         for command_dict in self._commands_buffer:
             area_uuid = list(command_dict.keys())[0]
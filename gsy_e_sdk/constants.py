@@ -8,3 +8,104 @@ API_CLIENT_SIMULATION_ID = ""
 CUSTOMER_WEBSOCKET_DOMAIN_NAME = "ws://localhost:4000"
 LOCAL_REDIS_URL = "redis://localhost:6379"
 MIN_SLOT_COMPLETION_TICK_TRIGGER_PERCENTAGE = 10
+
+REST_CONNECTION_POOL_SIZE = 100
+REST_MAX_CONCURRENT_REQUESTS_PER_HOST = 20
+REST_MAX_RETRIES = 3
+REST_RETRY_BACKOFF_FACTOR = 0.3
+# Request bodies larger than this (in bytes) are gzip-compressed, None disables compression
+REST_GZIP_MIN_BODY_SIZE = None
+
+# Tokens are refreshed this many seconds before they expire
+JWT_TOKEN_REFRESH_MARGIN_SECS = 60
+# Lifetime that is assumed for tokens that do not define their expiry
+JWT_TOKEN_DEFAULT_LIFETIME_SECS = 30 * 60
+JWT_TOKEN_RETRY_INTERVAL_SECS = 30
+
+# Seconds for which the parsed scenario of a simulation is reused for area lookups
+SCENARIO_INDEX_TTL_SECS = 5 * 60
+
+# Name of the sqlite database that is created in the API_CLIENT_CACHE_DIR directory
+PERSISTENT_CACHE_FILE_NAME = "gsy_e_sdk_cache.sqlite3"
+
+# Persisted entries that can not be validated with the server expire after this many seconds
+PERSISTENT_CACHE_MAX_AGE_SECS = 60 * 60
+
+# Command responses that nobody waits for are dropped after this many seconds
+COMMAND_RESPONSE_BUFFER_TTL_SECS = 10 * 60
+COMMAND_RESPONSE_BUFFER_MAX_SIZE = 10000
+
+WEBSOCKET_MAX_CONNECTION_RETRIES = 5
+WEBSOCKET_WAIT_BEFORE_RETRY_SECS = 5
+# Size of the executor that runs the callbacks of all clients of a WebsocketConnectionManager
+WEBSOCKET_MANAGER_CALLBACK_WORKERS = 32
+
+# Key of the sequence number of websocket messages, used to detect lost and repeated messages
+WEBSOCKET_SEQUENCE_NUMBER_KEY = "sequence_number"
+WEBSOCKET_REPLAY_BUFFER_SIZE = 1000
+
+# Upper bound of the JSON payload of one chunk of a bulk forecast/measurement upload
+BULK_UPLOAD_MAX_CHUNK_BYTES = 256 * 1024
+BULK_UPLOAD_MAX_CONCURRENCY = 8
+
+INGESTION_SLOT_LENGTH_MINUTES = 15
+# Number of market slots that are sent to the exchange at once when ingesting files
+INGESTION_BATCH_SLOTS = 96
+INGESTION_MAX_PENDING_BATCHES = 2
+# Interval in which a blocked ingestion reader checks whether the consumer stopped
+INGESTION_READER_POLL_INTERVAL_SECS = 0.1
+
+# Live data readings are sent once this many are buffered, or after LIVE_DATA_MAX_LATENCY_SECS
+LIVE_DATA_MAX_BATCH_SIZE = 500
+LIVE_DATA_MAX_LATENCY_SECS = 10
+
+# Upper bound of the JSON payload of one chunk of an SCM member data upload
+SCM_UPLOAD_MAX_CHUNK_BYTES = 512 * 1024
+SCM_UPLOAD_MAX_CONCURRENCY = 4
+SCM_UPLOAD_MAX_RETRIES = 3
+SCM_UPLOAD_RETRY_BACKOFF_SECS = 1
+SCM_UPLOAD_GZIP_MIN_SIZE = 1024
+
+# Messages that are waiting to be written by the recorder, newer ones are dropped beyond that
+RECORDER_MAX_QUEUE_SIZE = 100000
+RECORDER_COMPRESSION_LEVEL = 1
+RECORDER_COMPRESSION_MIN_SIZE = 128
+
+# Synthetic grid and market slots of the local exchange emulator
+EMULATOR_ASSETS_PER_HOUSE = 3
+EMULATOR_HOUSES_PER_STREET = 20
+EMULATOR_GRID_FEE = 1
+EMULATOR_TICKS_PER_SLOT = 10
+EMULATOR_SLOT_LENGTH_MINUTES = 15
+EMULATOR_FEED_IN_TARIFF_RATE = 11
+EMULATOR_MARKET_MAKER_RATE = 30
+
+# Sent transactions whose round trip time is measured, older ones are forgotten beyond that
+LATENCY_MAX_PENDING_TRANSACTIONS = 10000
+
+# The metrics endpoint only accepts local connections by default
+METRICS_DEFAULT_HOST = "127.0.0.1"
+
+# Traced transactions that wait for their response, older ones are forgotten beyond that
+TRACING_MAX_ACTIVE_TRANSACTIONS = 10000
+# Traces that are waiting to be written by the span exporter, newer ones are dropped beyond that
+TRACING_MAX_QUEUE_SIZE = 10000
+
+# Individual trades that are logged at DEBUG per market slot, the rest is only summarized
+LOG_MAX_ITEM_LINES_PER_SLOT = 20
+# Log records that are waiting to be written by the async logging thread, newer ones are dropped
+LOG_QUEUE_SIZE = 10000
+
+# Scenarios and defaults of the gsy-e-sdk bench command
+BENCH_SCENARIOS = ("command_buffer", "codec", "grid_fee", "dispatch")
+BENCH_AREA_COUNTS = (100, 1000, 10000)
+BENCH_GRID_DEPTH = 4
+BENCH_ITERATIONS = 50
+BENCH_GRID_FEE_QUERIES = 100
+# Commands per batch of the command_buffer scenario, one per asset up to this limit
+BENCH_MAX_COMMANDS = 10000
+
+# Sampling of the gsy-e-sdk profile command
+PROFILER_SAMPLE_INTERVAL_SECS = 0.005
+PROFILER_MAX_STACK_DEPTH = 100
+PROFILER_DEFAULT_SLOTS = 3
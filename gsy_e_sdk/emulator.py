@@ -0,0 +1,541 @@
+"""Emulate the GSy Exchange locally, for integration and load tests of the redis clients.
+
+The ExchangeEmulator speaks the AggregatorChannels / ExternalStrategyChannels protocol over a
+local redis server or an InProcessRedis. It registers the assets of a synthetic grid, handles
+the aggregator commands and the batch commands of the aggregators, matches bids and offers
+pay-as-bid on every tick and sends the market, tick, trade and finish events.
+"""
+import fnmatch
+import itertools
+import json
+import logging
+import math
+import queue
+import random
+import threading
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from gsy_framework.constants_limits import DATE_TIME_FORMAT
+from gsy_framework.redis_channels import AggregatorChannels, ExternalStrategyChannels
+from pendulum import DateTime, parse
+from redis import Redis
+
+from gsy_e_sdk.constants import (
+    EMULATOR_ASSETS_PER_HOUSE, EMULATOR_FEED_IN_TARIFF_RATE, EMULATOR_GRID_FEE,
+    EMULATOR_HOUSES_PER_STREET, EMULATOR_MARKET_MAKER_RATE, EMULATOR_SLOT_LENGTH_MINUTES,
+    EMULATOR_TICKS_PER_SLOT, LOCAL_REDIS_URL)
+
+MARKET_MAKER_NAME = "Market Maker"
+
+
+class _InProcessWorkerThread(threading.Thread):
+
+    def __init__(self, pubsub: "InProcessPubSub", daemon: bool):
+        super().__init__(name="in-process-pubsub", daemon=daemon)
+        self.pubsub = pubsub
+
+    def run(self) -> None:
+        while True:
+            message = self.pubsub.messages.get()
+            if message is None:
+                return
+            self.pubsub.handle_message(message)
+
+    def stop(self) -> None:
+        """Stop the thread after the pending messages were handled."""
+        self.pubsub.messages.put(None)
+
+
+class InProcessPubSub:
+    """Pattern subscriptions of one client, the messages are handled in one thread."""
+
+    def __init__(self, redis_db: "InProcessRedis"):
+        self.redis_db = redis_db
+        self.patterns: Dict[bytes, Optional[Callable]] = {}
+        self.messages = queue.Queue()
+        self._thread: Optional[_InProcessWorkerThread] = None
+
+    def psubscribe(self, *patterns, **patterns_with_handlers) -> None:
+        """Subscribe to the (glob-style) patterns."""
+        for pattern, handler in [*((pattern, None) for pattern in patterns),
+                                 *patterns_with_handlers.items()]:
+            self.patterns[pattern.encode("utf-8")] = handler
+            self.redis_db.add_subscription(pattern, self)
+
+    def punsubscribe(self, *patterns) -> None:
+        """Unsubscribe from the patterns."""
+        for pattern in patterns:
+            self.patterns.pop(pattern.encode("utf-8"), None)
+            self.redis_db.remove_subscription(pattern, self)
+
+    def handle_message(self, message: Dict) -> None:
+        """Call the handler of the message's pattern."""
+        handler = self.patterns.get(message["pattern"])
+        if handler is None:
+            return
+        try:
+            handler(message)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Handler of %s failed.", message["channel"])
+
+    def run_in_thread(self, daemon: bool = False, **_kwargs) -> _InProcessWorkerThread:
+        """Handle the messages in a background thread."""
+        if self._thread is None:
+            self._thread = _InProcessWorkerThread(self, daemon)
+            self._thread.start()
+        return self._thread
+
+    def close(self) -> None:
+        """Unsubscribe from all patterns and stop the thread."""
+        self.punsubscribe(*(pattern.decode("utf-8") for pattern in list(self.patterns)))
+        if self._thread is not None:
+            self._thread.stop()
+
+
+class InProcessRedis:
+    """Stand-in for the publish/psubscribe subset of redis that the clients use.
+
+    Patterns without wildcards are looked up directly, so that thousands of clients can
+    subscribe to their own channels without slowing down every publish.
+    """
+
+    def __init__(self):
+        self._exact_subscriptions: Dict[str, List[InProcessPubSub]] = defaultdict(list)
+        self._glob_subscriptions: Dict[str, List[InProcessPubSub]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_glob(pattern: str) -> bool:
+        return any(character in pattern for character in "*?[")
+
+    def _get_subscriptions(self, pattern: str) -> Dict[str, List[InProcessPubSub]]:
+        return self._glob_subscriptions if self._is_glob(pattern) else self._exact_subscriptions
+
+    def pubsub(self) -> InProcessPubSub:
+        """Return a new pubsub object."""
+        return InProcessPubSub(self)
+
+    def add_subscription(self, pattern: str, pubsub: InProcessPubSub) -> None:
+        """Deliver the messages of the channels that match the pattern to the pubsub."""
+        with self._lock:
+            subscribers = self._get_subscriptions(pattern)[pattern]
+            if pubsub not in subscribers:
+                subscribers.append(pubsub)
+
+    def remove_subscription(self, pattern: str, pubsub: InProcessPubSub) -> None:
+        """Stop delivering the messages of the pattern to the pubsub."""
+        with self._lock:
+            subscribers = self._get_subscriptions(pattern).get(pattern, [])
+            if pubsub in subscribers:
+                subscribers.remove(pubsub)
+
+    def publish(self, channel: str, payload) -> int:
+        """Queue the message for all matching subscriptions, return their number."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self._lock:
+            matches = [(channel, pubsub)
+                       for pubsub in self._exact_subscriptions.get(channel, [])]
+            matches.extend((pattern, pubsub)
+                           for pattern, subscribers in self._glob_subscriptions.items()
+                           if fnmatch.fnmatchcase(channel, pattern)
+                           for pubsub in subscribers)
+        for pattern, pubsub in matches:
+            pubsub.messages.put({"type": "pmessage", "pattern": pattern.encode("utf-8"),
+                                 "channel": channel.encode("utf-8"), "data": payload})
+        return len(matches)
+
+
+def _create_uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def create_synthetic_grid(asset_count: int, assets_per_house: int = EMULATOR_ASSETS_PER_HOUSE,
+                          houses_per_street: int = EMULATOR_HOUSES_PER_STREET,
+                          grid_fee: float = EMULATOR_GRID_FEE, seed: int = 0) -> Dict:
+    """Return a grid tree ({area_uuid: area_dict}) with asset_count loads, PVs and storages.
+
+    The assets are grouped in houses, the houses in streets, which are connected to the
+    grid market together with the market maker. Asset names are unique.
+    """
+    rng = random.Random(seed)
+
+    def _market(name: str) -> Dict:
+        return {"area_name": name, "area_uuid": _create_uuid(rng), "children": {},
+                "current_market_fee": grid_fee, "last_market_fee": grid_fee}
+
+    grid = _market("Grid")
+    market_maker_uuid = _create_uuid(rng)
+    grid["children"][market_maker_uuid] = {
+        "area_name": MARKET_MAKER_NAME, "area_uuid": market_maker_uuid, "asset_info": None}
+    street = house = None
+    for asset_index in range(asset_count):
+        if asset_index % (assets_per_house * houses_per_street) == 0:
+            street = _market(f"Street {len(grid['children'])}")
+            grid["children"][street["area_uuid"]] = street
+        if asset_index % assets_per_house == 0:
+            house = _market(f"House {asset_index // assets_per_house + 1}")
+            street["children"][house["area_uuid"]] = house
+        asset_type = ("Load", "PV", "Storage")[asset_index % 3]
+        asset_uuid = _create_uuid(rng)
+        house["children"][asset_uuid] = {
+            "area_name": f"{asset_type} {asset_index + 1}", "area_uuid": asset_uuid,
+            "asset_info": {}}
+    return {grid["area_uuid"]: grid}
+
+
+def create_nested_grid(area_count: int, depth: int = 4, grid_fee: float = EMULATOR_GRID_FEE,
+                       seed: int = 0) -> Dict:
+    """Return a grid tree ({area_uuid: area_dict}) with area_count areas in depth levels.
+
+    The levels below the grid market are filled breadth-first with the same number of
+    children per market, the areas of the deepest level are assets. Used by the benchmarks
+    to vary the size and the depth of the grid independently.
+    """
+    rng = random.Random(seed)
+    children_per_market = max(2, math.ceil(area_count ** (1 / max(depth, 1))))
+    grid = {"area_name": "Grid", "area_uuid": _create_uuid(rng), "children": {},
+            "current_market_fee": grid_fee, "last_market_fee": grid_fee}
+    created_areas = 1
+    parents = [grid]
+    for level in range(1, depth + 1):
+        children = []
+        for parent, _ in itertools.product(parents, range(children_per_market)):
+            if created_areas >= area_count:
+                break
+            created_areas += 1
+            area_uuid = _create_uuid(rng)
+            if level == depth:
+                asset_type = ("Load", "PV", "Storage")[created_areas % 3]
+                area = {"area_name": f"{asset_type} {created_areas}", "area_uuid": area_uuid,
+                        "asset_info": {}}
+            else:
+                area = {"area_name": f"Market {level}-{len(children) + 1}",
+                        "area_uuid": area_uuid, "children": {},
+                        "current_market_fee": grid_fee, "last_market_fee": grid_fee}
+            parent["children"][area_uuid] = area
+            children.append(area)
+        parents = children
+    return {grid["area_uuid"]: grid}
+
+
+def _iter_assets(grid_tree: Dict):
+    for area_uuid, area in grid_tree.items():
+        if area.get("asset_info") is not None:
+            yield area_uuid, area
+        yield from _iter_assets(area.get("children", {}))
+
+
+class EmulatorStats(NamedTuple):
+    """Counters of an ExchangeEmulator."""
+    registered_assets: int
+    aggregators: int
+    batch_commands: int
+    commands: int
+    trades: int
+    events: int
+
+
+class PayAsBidOrderBook:
+    """Bids and offers of the current market slot, matched at the bid price.
+
+    The ids of the orders and trades are created with create_id, random uuids by default.
+    """
+
+    def __init__(self, create_id: Optional[Callable[[], str]] = None):
+        self.create_id = create_id or (lambda: str(uuid.uuid4()))
+        self.bids: Dict[str, Dict] = {}
+        self.offers: Dict[str, Dict] = {}
+
+    def add_order(self, order_type: str, asset_name: str, energy: float, price: float,
+                  replace_existing: bool = True) -> Dict:
+        """Add a bid or offer and return it."""
+        orders = self.bids if order_type == "bid" else self.offers
+        if replace_existing:
+            self.delete_orders(order_type, asset_name)
+        order = {"id": self.create_id(), "type": order_type, "energy": energy, "price": price,
+                 "energy_rate": price / energy if energy else 0.0,
+                 ("buyer" if order_type == "bid" else "seller"): asset_name}
+        orders[order["id"]] = order
+        return order
+
+    def delete_orders(self, order_type: str, asset_name: str,
+                      order_id: Optional[str] = None) -> List[str]:
+        """Delete the order with order_id, or all orders of the asset, return their ids."""
+        orders = self.bids if order_type == "bid" else self.offers
+        trader_key = "buyer" if order_type == "bid" else "seller"
+        deleted_ids = [existing_id for existing_id, order in orders.items()
+                       if order[trader_key] == asset_name and order_id in (None, existing_id)]
+        for deleted_id in deleted_ids:
+            orders.pop(deleted_id)
+        return deleted_ids
+
+    def list_orders(self, order_type: str, asset_name: str) -> List[Dict]:
+        """Return the open orders of the asset."""
+        orders = self.bids if order_type == "bid" else self.offers
+        trader_key = "buyer" if order_type == "bid" else "seller"
+        return [order for order in orders.values() if order[trader_key] == asset_name]
+
+    def match(self, time_slot: str) -> List[Dict]:
+        """Match the highest bids with the cheapest offers, the buyers pay their bid rate."""
+        trades = []
+        bids = sorted(self.bids.values(), key=lambda order: -order["energy_rate"])
+        offers = sorted(self.offers.values(), key=lambda order: order["energy_rate"])
+        while bids and offers and bids[0]["energy_rate"] >= offers[0]["energy_rate"]:
+            bid, offer = bids[0], offers[0]
+            energy = min(bid["energy"], offer["energy"])
+            trades.append({"trade_id": self.create_id(), "time_slot": time_slot,
+                           "buyer": bid["buyer"], "seller": offer["seller"],
+                           "bid_id": bid["id"], "offer_id": offer["id"],
+                           "traded_energy": energy,
+                           "trade_price": energy * bid["energy_rate"]})
+            for order, orders, sorted_orders in ((bid, self.bids, bids),
+                                                 (offer, self.offers, offers)):
+                order["energy"] -= energy
+                order["price"] = order["energy"] * order["energy_rate"]
+                if order["energy"] <= 1e-9:
+                    orders.pop(order["id"])
+                    sorted_orders.pop(0)
+        return trades
+
+    def clear(self) -> None:
+        """Drop all orders, at the end of the market slot."""
+        self.bids.clear()
+        self.offers.clear()
+
+
+class ExchangeEmulator:
+    """Local stand-in for the exchange, see the module docstring."""
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, redis_db=None, redis_url: str = LOCAL_REDIS_URL,
+                 grid_tree: Optional[Dict] = None, asset_count: int = 100,
+                 ticks_per_slot: int = EMULATOR_TICKS_PER_SLOT,
+                 slot_length_minutes: int = EMULATOR_SLOT_LENGTH_MINUTES,
+                 start_time: str = "2022-01-01T00:00", seed: int = 0):
+        self.redis_db = redis_db or Redis.from_url(redis_url)
+        self.grid_tree = grid_tree or create_synthetic_grid(asset_count, seed=seed)
+        self.assets = dict(_iter_assets(self.grid_tree))
+        self.asset_uuids_by_name = {asset["area_name"]: asset_uuid
+                                    for asset_uuid, asset in self.assets.items()}
+        self.ticks_per_slot = ticks_per_slot
+        self.slot_length_minutes = slot_length_minutes
+        self.current_slot: DateTime = parse(start_time)
+        self.order_book = PayAsBidOrderBook()
+        self.registered_assets: Dict[str, str] = {}
+        self.aggregators: Dict[str, str] = {}
+        self.selected_aggregators: Dict[str, str] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._counters = dict.fromkeys(EmulatorStats._fields, 0)
+        self._stop_event = threading.Event()
+
+        self.pubsub = self.redis_db.pubsub()
+        asset_channels = ExternalStrategyChannels(False, "", asset_name="*")
+        self.pubsub.psubscribe(**{
+            AggregatorChannels().commands: self._on_aggregator_command,
+            asset_channels.register: self._on_register,
+            asset_channels.unregister: self._on_unregister})
+        self._pubsub_thread = self.pubsub.run_in_thread(daemon=True)
+
+    @property
+    def stats(self) -> EmulatorStats:
+        """Return the counters of the emulator."""
+        with self._lock:
+            return EmulatorStats(**{**self._counters,
+                                    "registered_assets": len(self.registered_assets),
+                                    "aggregators": len(self.aggregators)})
+
+    def _publish(self, channel: str, data: Dict) -> None:
+        self.redis_db.publish(channel, json.dumps(data))
+        self._counters["events"] += 1
+
+    @staticmethod
+    def _get_request_data(message: Dict, command: str) -> Optional[Dict]:
+        # The glob of the request channels matches the response channels as well
+        data = json.loads(message["data"])
+        channels = ExternalStrategyChannels(False, "", asset_name=data.get("name"))
+        if message["channel"].decode("utf-8") != getattr(channels, command):
+            return None
+        return data
+
+    def _on_register(self, message: Dict) -> None:
+        data = self._get_request_data(message, "register")
+        if data is None:
+            return
+        name = data["name"]
+        response = {"command": "register", "name": name,
+                    "transaction_id": data.get("transaction_id")}
+        asset_uuid = self.asset_uuids_by_name.get(name)
+        if asset_uuid is None:
+            response.update({"response": "error", "error": f"Unknown asset {name}."})
+        else:
+            with self._lock:
+                self.registered_assets[name] = asset_uuid
+            response.update({"response": "success", "device_uuid": asset_uuid})
+        self._publish(
+            ExternalStrategyChannels(False, "", asset_name=name).register_response, response)
+
+    def _on_unregister(self, message: Dict) -> None:
+        data = self._get_request_data(message, "unregister")
+        if data is None:
+            return
+        name = data["name"]
+        with self._lock:
+            was_registered = self.registered_assets.pop(name, None) is not None
+        self._publish(ExternalStrategyChannels(False, "", asset_name=name).unregister_response,
+                      {"command": "unregister", "name": name,
+                       "transaction_id": data.get("transaction_id"),
+                       "response": "success" if was_registered else "error"})
+
+    def _on_aggregator_command(self, message: Dict) -> None:
+        data = json.loads(message["data"])
+        command_type = data.get("type")
+        response = {"transaction_id": data.get("transaction_id"), "status": "ready"}
+        with self._lock:
+            self._counters["commands"] += 1
+            if command_type == "CREATE":
+                # The transaction id of the CREATE command becomes the aggregator's uuid
+                aggregator_uuid = data["transaction_id"]
+                self.aggregators[aggregator_uuid] = data["name"]
+                self.pubsub.psubscribe(**{AggregatorChannels("", aggregator_uuid).batch_commands:
+                                          self._on_batch_commands})
+                response["aggregator_uuid"] = aggregator_uuid
+            elif command_type == "DELETE":
+                self.aggregators.pop(data["aggregator_uuid"], None)
+                self.pubsub.punsubscribe(
+                    AggregatorChannels("", data["aggregator_uuid"]).batch_commands)
+            elif command_type in ("SELECT", "UNSELECT"):
+                if command_type == "SELECT":
+                    self.selected_aggregators[data["device_uuid"]] = data["aggregator_uuid"]
+                else:
+                    self.selected_aggregators.pop(data["device_uuid"], None)
+                response.update({"status": f"{command_type}ED",
+                                 "aggregator_uuid": data["aggregator_uuid"],
+                                 "device_uuid": data["device_uuid"]})
+            else:
+                response.update({"status": "error",
+                                 "error": f"Unknown command type {command_type}."})
+        self._publish(AggregatorChannels().response, response)
+
+    def _on_batch_commands(self, message: Dict) -> None:
+        data = json.loads(message["data"])
+        aggregator_uuid = data["aggregator_uuid"]
+        responses = {}
+        with self._lock:
+            self._counters["batch_commands"] += 1
+            for asset_uuid, commands in data["batch_commands"].items():
+                responses[asset_uuid] = [
+                    self._execute_command(aggregator_uuid, asset_uuid, command)
+                    for command in commands]
+        self._publish(AggregatorChannels("", aggregator_uuid).batch_commands_response, {
+            "aggregator_uuid": aggregator_uuid, "transaction_id": data["transaction_id"],
+            "status": "ready", "responses": responses})
+
+    def _execute_command(self, aggregator_uuid: str, asset_uuid: str, command: Dict) -> Dict:
+        command_type = command.get("type")
+        self._counters["commands"] += 1
+        response = {"command": command_type, "status": "ready", "area_uuid": asset_uuid}
+        if self.selected_aggregators.get(asset_uuid) != aggregator_uuid:
+            return {**response, "status": "error",
+                    "error": "The asset did not select the aggregator."}
+        asset_name = self.assets[asset_uuid]["area_name"]
+        if command_type in ("bid", "offer"):
+            order = self.order_book.add_order(
+                command_type, asset_name, command["energy"], command["price"],
+                command.get("replace_existing", True))
+            response[command_type] = json.dumps(order)
+        elif command_type in ("delete_bid", "delete_offer"):
+            order_type = command_type.split("_")[1]
+            response.update({"command": f"{order_type}_delete", "deleted_ids":
+                             self.order_book.delete_orders(
+                                 order_type, asset_name, command.get(order_type))})
+        elif command_type in ("list_bids", "list_offers"):
+            order_type = command_type.split("_")[1][:-1]
+            response[f"{order_type}_list"] = self.order_book.list_orders(order_type, asset_name)
+        elif command_type == "device_info":
+            response["device_info"] = self.assets[asset_uuid]["asset_info"]
+        return response
+
+    def _update_asset_info(self) -> None:
+        for asset in self.assets.values():
+            energy = round(self._rng.uniform(0.1, 1.0), 3)
+            asset_type = asset["area_name"].split(" ")[0]
+            if asset_type == "Load":
+                asset["asset_info"] = {"energy_requirement_kWh": energy}
+            elif asset_type == "PV":
+                asset["asset_info"] = {"available_energy_kWh": energy}
+            else:
+                asset["asset_info"] = {"used_storage": round(self._rng.uniform(0, 10), 3),
+                                       "energy_to_buy": energy, "energy_to_sell": energy}
+
+    def _send_event(self, event: Dict) -> None:
+        event = {**event, "market_slot": self.current_slot.format(DATE_TIME_FORMAT)}
+        for aggregator_uuid in list(self.aggregators):
+            self._publish(AggregatorChannels("", aggregator_uuid).events,
+                          {**event, "grid_tree": self.grid_tree})
+        for name, asset_uuid in list(self.registered_assets.items()):
+            if asset_uuid not in self.selected_aggregators:
+                self._publish(f"{name}/events/{event['event']}",
+                              {**event, "asset_info": self.assets[asset_uuid]["asset_info"]})
+
+    def _send_trades(self, trades: List[Dict]) -> None:
+        market_slot = self.current_slot.format(DATE_TIME_FORMAT)
+        trades_by_receiver = defaultdict(list)
+        for trade in trades:
+            for asset_name in {trade["buyer"], trade["seller"]}:
+                asset_uuid = self.asset_uuids_by_name[asset_name]
+                receiver = (self.selected_aggregators.get(asset_uuid)
+                            or (asset_name if asset_name in self.registered_assets else None))
+                if receiver is not None and trade not in trades_by_receiver[receiver]:
+                    trades_by_receiver[receiver].append(trade)
+        for receiver, trade_list in trades_by_receiver.items():
+            event = {"event": "trade", "market_slot": market_slot, "trade_list": trade_list}
+            if receiver in self.aggregators:
+                self._publish(AggregatorChannels("", receiver).events,
+                              {**event, "grid_tree": self.grid_tree})
+            else:
+                self._publish(f"{receiver}/events/trade", event)
+
+    def run_market_slot(self, tick_interval: float = 0.0) -> List[Dict]:
+        """Emulate one market slot and return its trades.
+
+        tick_interval seconds are waited after each event, to give the clients time to react.
+        """
+        time_slot = self.current_slot.format(DATE_TIME_FORMAT)
+        slot_trades = []
+        with self._lock:
+            self.order_book.clear()
+            self._update_asset_info()
+            self._send_event({"event": "market", "slot_completion": "0%",
+                              "feed_in_tariff_rate": EMULATOR_FEED_IN_TARIFF_RATE,
+                              "market_maker_rate": EMULATOR_MARKET_MAKER_RATE})
+        for tick in range(1, self.ticks_per_slot):
+            if self._stop_event.wait(tick_interval):
+                break
+            with self._lock:
+                trades = self.order_book.match(time_slot)
+                self._counters["trades"] += len(trades)
+                slot_trades.extend(trades)
+                self._send_trades(trades)
+                self._send_event({"event": "tick", "slot_completion":
+                                  f"{int(tick * 100 / self.ticks_per_slot)}%"})
+        self.current_slot = self.current_slot.add(minutes=self.slot_length_minutes)
+        return slot_trades
+
+    def run(self, slot_count: int, tick_interval: float = 0.0) -> EmulatorStats:
+        """Emulate slot_count market slots, then send the finish event."""
+        for _ in range(slot_count):
+            if self._stop_event.is_set():
+                break
+            self.run_market_slot(tick_interval)
+        with self._lock:
+            self._send_event({"event": "finish"})
+        return self.stats
+
+    def stop(self) -> None:
+        """Stop running market slots and handling commands."""
+        self._stop_event.set()
+        self._pubsub_thread.stop()
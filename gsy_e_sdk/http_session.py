@@ -0,0 +1,176 @@
+"""Process-wide HTTP session that is reused by all REST requests of the SDK."""
+import gzip
+import json
+import logging
+import uuid
+from contextlib import ExitStack
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from gsy_e_sdk.constants import (
+    REST_CONNECTION_POOL_SIZE, REST_MAX_RETRIES, REST_RETRY_BACKOFF_FACTOR,
+    REST_GZIP_MIN_BODY_SIZE)
+from gsy_e_sdk.latency import PUBLISH
+from gsy_e_sdk.recorder import OUTBOUND
+from gsy_e_sdk.tracing import POST_SPAN
+
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+def create_http_session(pool_size: int = REST_CONNECTION_POOL_SIZE,
+                        max_retries: int = REST_MAX_RETRIES,
+                        backoff_factor: float = REST_RETRY_BACKOFF_FACTOR) -> requests.Session:
+    """Create a session that keeps up to pool_size connections per host alive.
+
+    Failed connections are retried for all requests, whereas responses with a gateway error
+    are only retried for idempotent methods, so that commands are never executed twice.
+    """
+    retries = Retry(total=max_retries, backoff_factor=backoff_factor,
+                    status_forcelist=RETRY_STATUS_CODES, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retries)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Return the session that is shared by all REST clients and utilities of the process."""
+    global _http_session  # pylint: disable=global-statement
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = create_http_session()
+        return _http_session
+
+
+def set_http_session(session: Optional[requests.Session]) -> None:
+    """Replace the process-wide session (None recreates it with the defaults on next use)."""
+    global _http_session  # pylint: disable=global-statement
+    with _http_session_lock:
+        _http_session = session
+
+
+def get_request_headers(jwt_token: Optional[str]) -> Dict:
+    """Return the headers of an authenticated JSON request."""
+    return {"Content-Type": "application/json", "Authorization": f"JWT {jwt_token}"}
+
+
+def encode_json_body(data: Dict, headers: Dict,
+                     gzip_min_size: Optional[int] = REST_GZIP_MIN_BODY_SIZE) -> Tuple[bytes, Dict]:
+    """Serialize data to JSON and gzip it if it is larger than gzip_min_size bytes."""
+    body = json.dumps(data).encode("utf-8")
+    if gzip_min_size is not None and len(body) >= gzip_min_size:
+        return gzip.compress(body), {**headers, "Content-Encoding": "gzip"}
+    return body, headers
+
+
+def check_response(response: Optional[requests.Response]) -> bool:
+    """Return whether the request succeeded, log the error otherwise."""
+    if response is None:
+        return False
+    if 200 <= response.status_code <= 299:
+        return True
+    logging.error("Request to %s failed with status code %s. Response body: %s",
+                  response.url, response.status_code, response.text)
+    return False
+
+
+# pylint: disable=too-many-arguments
+def send_request(method: str, endpoint: str, data: Dict, jwt_token: Optional[str],
+                 session: Optional[requests.Session] = None,
+                 gzip_min_size: Optional[int] = REST_GZIP_MIN_BODY_SIZE
+                 ) -> Optional[requests.Response]:
+    """Send a JSON request and return the response, None if the connection failed."""
+    body, headers = encode_json_body(data, get_request_headers(jwt_token), gzip_min_size)
+    try:
+        return (session or get_http_session()).request(method, endpoint, data=body,
+                                                       headers=headers)
+    except requests.exceptions.RequestException:
+        logging.exception("%s request to %s failed.", method, endpoint)
+        return None
+
+
+def post_request(endpoint: str, data: Dict, jwt_token: Optional[str],
+                 session: Optional[requests.Session] = None,
+                 gzip_min_size: Optional[int] = REST_GZIP_MIN_BODY_SIZE) -> bool:
+    """Post data to the endpoint and return whether it was accepted."""
+    return check_response(
+        send_request("POST", endpoint, data, jwt_token, session, gzip_min_size))
+
+
+def get_request(endpoint: str, data: Dict, jwt_token: Optional[str],
+                session: Optional[requests.Session] = None) -> bool:
+    """Send a GET request to the endpoint and return whether it was accepted."""
+    return check_response(send_request("GET", endpoint, data, jwt_token, session))
+
+
+def blocking_post_request(endpoint: str, data: Dict, jwt_token: Optional[str],
+                          session: Optional[requests.Session] = None,
+                          gzip_min_size: Optional[int] = REST_GZIP_MIN_BODY_SIZE
+                          ) -> Optional[Dict]:
+    """Post data to the endpoint and return the body of the response."""
+    data["transaction_id"] = str(uuid.uuid4())
+    response = send_request("POST", endpoint, data, jwt_token, session, gzip_min_size)
+    return json.loads(response.text) if check_response(response) else None
+
+
+def blocking_get_request(endpoint: str, data: Dict, jwt_token: Optional[str],
+                         session: Optional[requests.Session] = None) -> Optional[Dict]:
+    """Send a GET request to the endpoint and return the body of the response."""
+    data["transaction_id"] = str(uuid.uuid4())
+    response = send_request("GET", endpoint, data, jwt_token, session)
+    return json.loads(response.text) if check_response(response) else None
+
+
+class HTTPSessionMixin:
+    """Send the commands of a REST client through its (injectable) HTTP session."""
+
+    http_session: requests.Session
+    jwt_token: Optional[str]
+
+    def _record_request(self, endpoint: str, data: Dict) -> None:
+        recorder = getattr(self, "recorder", None)
+        if recorder is not None:
+            recorder.record(OUTBOUND, endpoint, data)
+        latency_tracker = getattr(self, "latency_tracker", None)
+        if latency_tracker is not None:
+            latency_tracker.start_transaction(data["transaction_id"])
+
+    def _send_request(self, request_function: Callable, endpoint: str, data: Dict) -> bool:
+        latency_tracker = getattr(self, "latency_tracker", None)
+        tracer = getattr(self, "tracer", None)
+        with ExitStack() as stack:
+            # Includes the serialization of the body, which happens in send_request
+            if latency_tracker is not None:
+                stack.enter_context(latency_tracker.measure(PUBLISH))
+            if tracer is not None:
+                stack.enter_context(tracer.span(data["transaction_id"], POST_SPAN))
+            return request_function(
+                f"{endpoint}/", data, self.jwt_token, session=self.http_session)
+
+    def _post_request(self, endpoint: str, data: Dict,
+                      **trace_attributes) -> Tuple[str, bool]:
+        data["transaction_id"] = str(uuid.uuid4())
+        self._record_request(endpoint, data)
+        tracer = getattr(self, "tracer", None)
+        if tracer is not None:
+            tracer.start_transaction(data["transaction_id"], endpoint.rstrip("/").split("/")[-1],
+                                     endpoint=endpoint, **trace_attributes)
+        posted = self._send_request(post_request, endpoint, data)
+        if not posted and tracer is not None:
+            tracer.end_transaction(data["transaction_id"], error="request failed")
+        return data["transaction_id"], posted
+
+    def _get_request(self, endpoint: str, data: Dict) -> Tuple[str, bool]:
+        data["transaction_id"] = str(uuid.uuid4())
+        self._record_request(endpoint, data)
+        return data["transaction_id"], self._send_request(get_request, endpoint, data)
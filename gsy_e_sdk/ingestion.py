@@ -0,0 +1,215 @@
+"""Stream meter data and forecasts from large CSV/Parquet files to the exchange."""
+import csv
+import logging
+import mmap
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from gsy_framework.constants_limits import DATE_TIME_FORMAT
+from pendulum import DateTime, parse
+
+from gsy_e_sdk.constants import (
+    INGESTION_BATCH_SLOTS, INGESTION_MAX_PENDING_BATCHES, INGESTION_READER_POLL_INTERVAL_SECS,
+    INGESTION_SLOT_LENGTH_MINUTES)
+
+TimeSeries = Dict[str, Dict[str, float]]
+
+# Client methods that accept a {time_slot: energy_kWh} dict
+INGESTION_COMMANDS = ("set_energy_forecast", "set_energy_measurement", "set_live_generation")
+
+
+class IngestionStats(NamedTuple):
+    """Summary of an ingestion run."""
+    batches: int
+    values: int
+    failed_requests: int
+
+
+def iter_csv_rows(file_path: str, delimiter: str = ",",
+                  encoding: str = "utf-8") -> Iterator[Dict[str, str]]:
+    """Yield the rows of the CSV file as {column: value} dicts.
+
+    The file is memory-mapped and read line by line, so that only the current row is held in
+    memory. Quoted values must not contain line breaks.
+    """
+    with open(file_path, "rb") as csv_file:
+        if not csv_file.seek(0, 2):
+            return
+        with mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            headers = None
+            for line in iter(mapped_file.readline, b""):
+                line = line.decode(encoding).rstrip("\r\n")
+                if not line:
+                    continue
+                values = next(csv.reader([line], delimiter=delimiter))
+                if headers is None:
+                    headers = [header.strip().lstrip("\ufeff") for header in values]
+                    continue
+                yield dict(zip(headers, values))
+
+
+def iter_parquet_rows(file_path: str, batch_size: int = 10000) -> Iterator[Dict]:
+    """Yield the rows of the Parquet file as dicts, reading batch_size rows at a time.
+
+    Requires the optional pyarrow package.
+    """
+    try:
+        # pylint: disable-next=import-outside-toplevel
+        import pyarrow.parquet as pq
+    except ImportError as ex:
+        raise ImportError("Reading Parquet files requires pyarrow, "
+                          "install it with `pip install pyarrow`.") from ex
+    for record_batch in pq.ParquetFile(file_path).iter_batches(batch_size=batch_size):
+        yield from record_batch.to_pylist()
+
+
+def align_to_market_slot(timestamp, slot_length_minutes: int = INGESTION_SLOT_LENGTH_MINUTES
+                         ) -> str:
+    """Return the start of the market slot that contains the timestamp."""
+    if not isinstance(timestamp, DateTime):
+        timestamp = parse(str(timestamp))
+    slot_start = timestamp.set(minute=timestamp.minute - timestamp.minute % slot_length_minutes,
+                               second=0, microsecond=0)
+    return slot_start.format(DATE_TIME_FORMAT)
+
+
+def _parse_value(value, decimal_separator: str = ".") -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, str) and decimal_separator != ".":
+        value = value.replace(decimal_separator, ".")
+    return float(value)
+
+
+def iter_time_series_batches(
+        rows: Iterable[Dict], time_column: str, asset_columns: Dict[str, str],
+        slot_length_minutes: int = INGESTION_SLOT_LENGTH_MINUTES,
+        batch_slots: int = INGESTION_BATCH_SLOTS,
+        decimal_separator: str = ".") -> Iterator[TimeSeries]:
+    """Aggregate the rows into market slots and yield them in batches of batch_slots slots.
+
+    asset_columns maps the column names of the file to the uuids of the assets. The values of
+    all rows within the same market slot are summed up (e.g. 1-minute meter readings in kWh),
+    empty values are skipped and invalid values are logged and skipped. Numbers must not
+    contain thousands separators. Rows are expected in chronological order, so only the slots
+    of the current batch are kept in memory.
+    """
+    batch: TimeSeries = {}
+    batch_time_slots = set()
+    for row_number, row in enumerate(rows, start=1):
+        time_slot = align_to_market_slot(row[time_column], slot_length_minutes)
+        if time_slot not in batch_time_slots and len(batch_time_slots) >= batch_slots:
+            yield batch
+            batch, batch_time_slots = {}, set()
+        batch_time_slots.add(time_slot)
+        for column, asset_uuid in asset_columns.items():
+            try:
+                value = _parse_value(row.get(column), decimal_separator)
+            except (TypeError, ValueError):
+                logging.warning("Skipping invalid value %r of column %s in row %s.",
+                                row.get(column), column, row_number)
+                continue
+            if value is None:
+                continue
+            series = batch.setdefault(asset_uuid, {})
+            series[time_slot] = series.get(time_slot, 0.0) + value
+    if batch:
+        yield batch
+
+
+def iter_batches_in_background(batches: Iterable[TimeSeries],
+                               max_pending_batches: int = INGESTION_MAX_PENDING_BATCHES
+                               ) -> Iterator[TimeSeries]:
+    """Read the batches in a background thread, at most max_pending_batches ahead.
+
+    Reading the file overlaps with sending the previous batch, while the bounded queue blocks
+    the reader whenever the exchange can not keep up (backpressure). If the consumer stops
+    early (break, close() or an exception), the reader stops and closes the batches.
+    """
+    pending_batches = queue.Queue(maxsize=max_pending_batches)
+    end_of_stream = object()
+    stop_event = threading.Event()
+    errors = []
+
+    def _put(item) -> bool:
+        while not stop_event.is_set():
+            try:
+                pending_batches.put(item, timeout=INGESTION_READER_POLL_INTERVAL_SECS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read():
+        batch_iterator = iter(batches)
+        try:
+            for batch in batch_iterator:
+                if not _put(batch):
+                    break
+        except Exception as ex:  # pylint: disable=broad-except
+            errors.append(ex)
+        finally:
+            # Closes the file of a generator that was not exhausted
+            if hasattr(batch_iterator, "close"):
+                batch_iterator.close()
+            _put(end_of_stream)
+
+    threading.Thread(target=_read, name="ingestion-reader", daemon=True).start()
+    try:
+        while True:
+            batch = pending_batches.get()
+            if batch is end_of_stream:
+                break
+            yield batch
+    finally:
+        stop_event.set()
+    if errors:
+        raise errors[0]
+
+
+def send_time_series_batches(batches: Iterable[TimeSeries], clients: Dict[str, object],
+                             command: str = "set_energy_forecast",
+                             do_not_wait: bool = False,
+                             on_batch: Optional[Callable[[TimeSeries, List], None]] = None
+                             ) -> IngestionStats:
+    """Send every batch with the command of the asset clients ({asset_uuid: client}).
+
+    Each batch is sent completely before the next one is requested from the iterator.
+    """
+    if command not in INGESTION_COMMANDS:
+        raise ValueError(f"Command {command} is not one of {INGESTION_COMMANDS}.")
+    batch_count = value_count = failed_requests = 0
+    for batch in batches:
+        responses = []
+        for asset_uuid, series in batch.items():
+            try:
+                responses.append(getattr(clients[asset_uuid], command)(
+                    series, do_not_wait=do_not_wait))
+            except Exception as ex:  # pylint: disable=broad-except
+                logging.error("Sending %s of asset %s failed: %s", command, asset_uuid, ex)
+                failed_requests += 1
+                responses.append(ex)
+            value_count += len(series)
+        batch_count += 1
+        if on_batch is not None:
+            on_batch(batch, responses)
+    return IngestionStats(batch_count, value_count, failed_requests)
+
+
+# pylint: disable-next=too-many-arguments
+def ingest_file(file_path: str, clients: Dict[str, object], time_column: str,
+                asset_columns: Dict[str, str], command: str = "set_energy_forecast",
+                slot_length_minutes: int = INGESTION_SLOT_LENGTH_MINUTES,
+                batch_slots: int = INGESTION_BATCH_SLOTS,
+                max_pending_batches: int = INGESTION_MAX_PENDING_BATCHES,
+                delimiter: str = ",", decimal_separator: str = ".",
+                do_not_wait: bool = False) -> IngestionStats:
+    """Stream the CSV or Parquet (.parquet) file to the assets, see iter_time_series_batches."""
+    rows = (iter_parquet_rows(file_path) if file_path.endswith(".parquet")
+            else iter_csv_rows(file_path, delimiter=delimiter))
+    batches = iter_time_series_batches(
+        rows, time_column, asset_columns, slot_length_minutes, batch_slots, decimal_separator)
+    return send_time_series_batches(
+        iter_batches_in_background(batches, max_pending_batches), clients, command,
+        do_not_wait=do_not_wait)
@@ -0,0 +1,279 @@
+"""Measure where the time goes between receiving an event and the confirmation of the orders.
+
+The clients report the durations of the stages of their hot path (decoding of the received
+messages, waiting in the callback executor, running the callbacks, serializing and publishing
+the commands, waiting for the command responses) to a LatencyTracker. The durations are kept
+in fixed-memory histograms with logarithmic buckets (HDR-style), so the memory usage does not
+grow with the number of messages, and the percentiles are accurate to about 3%.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from time import monotonic
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from gsy_framework.utils import execute_function_util
+from tabulate import tabulate
+
+from gsy_e_sdk.constants import LATENCY_MAX_PENDING_TRANSACTIONS
+
+DECODE = "decode"
+QUEUE_WAIT = "queue_wait"
+CALLBACK_PREFIX = "callback."
+SERIALIZE = "serialize"
+PUBLISH = "publish"
+RESPONSE_RTT = "response_rtt"
+EVENT_TO_RESPONSE = "event_to_response"
+
+# Values below 2 ** _SUB_BUCKET_BITS microseconds get one bucket each, larger values get
+# 2 ** (_SUB_BUCKET_BITS - 1) buckets per power of two
+_SUB_BUCKET_BITS = 5
+_SUB_BUCKET_COUNT = 1 << _SUB_BUCKET_BITS
+_SUB_BUCKET_HALF_COUNT = _SUB_BUCKET_COUNT >> 1
+_MAX_SHIFT = 32
+_BUCKET_COUNT = _SUB_BUCKET_COUNT + _MAX_SHIFT * _SUB_BUCKET_HALF_COUNT
+
+
+def _get_bucket_index(micros: int) -> int:
+    if micros < _SUB_BUCKET_COUNT:
+        return max(micros, 0)
+    shift = min(micros.bit_length() - _SUB_BUCKET_BITS, _MAX_SHIFT)
+    sub_bucket = min(micros >> shift, _SUB_BUCKET_COUNT - 1)
+    return _SUB_BUCKET_COUNT + (shift - 1) * _SUB_BUCKET_HALF_COUNT + (
+        sub_bucket - _SUB_BUCKET_HALF_COUNT)
+
+
+def _get_bucket_value(index: int) -> int:
+    """Return the middle of the bucket in microseconds."""
+    if index < _SUB_BUCKET_COUNT:
+        return index
+    shift, sub_bucket = divmod(index - _SUB_BUCKET_COUNT, _SUB_BUCKET_HALF_COUNT)
+    shift += 1
+    return ((sub_bucket + _SUB_BUCKET_HALF_COUNT) << shift) + (1 << (shift - 1))
+
+
+class LatencySummary(NamedTuple):
+    """Statistics of the durations of one stage, in seconds."""
+    count: int
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+class LatencyHistogram:
+    """Durations of one stage, counted in a fixed number of logarithmic buckets."""
+
+    def __init__(self):
+        self._counts = [0] * _BUCKET_COUNT
+        self._count = 0
+        self._total_secs = 0.0
+        self._max_secs = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        """Return the number of recorded durations."""
+        return self._count
+
+    def record(self, duration_secs: float) -> None:
+        """Count the duration in its bucket."""
+        index = _get_bucket_index(int(duration_secs * 1e6))
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._total_secs += duration_secs
+            self._max_secs = max(self._max_secs, duration_secs)
+
+    def _get_percentiles(self, counts: List[int], count: int,
+                         percentiles: List[float]) -> List[float]:
+        values = []
+        cumulative_count = 0
+        index = 0
+        for percentile in percentiles:
+            threshold = max(1, percentile / 100 * count)
+            while cumulative_count + counts[index] < threshold:
+                cumulative_count += counts[index]
+                index += 1
+            values.append(min(_get_bucket_value(index) / 1e6, self._max_secs))
+        return values
+
+    def percentile(self, percentile: float) -> float:
+        """Return the duration below which percentile % of the durations are, in seconds."""
+        with self._lock:
+            counts, count = list(self._counts), self._count
+        if not count:
+            return 0.0
+        return self._get_percentiles(counts, count, [percentile])[0]
+
+    def summary(self) -> LatencySummary:
+        """Return the statistics of the recorded durations."""
+        with self._lock:
+            counts, count = list(self._counts), self._count
+            total_secs, max_secs = self._total_secs, self._max_secs
+        if not count:
+            return LatencySummary(0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        return LatencySummary(count, total_secs / count,
+                              *self._get_percentiles(counts, count, [50, 90, 99]), max_secs)
+
+    def reset(self) -> None:
+        """Forget all recorded durations."""
+        with self._lock:
+            self._counts = [0] * _BUCKET_COUNT
+            self._count = 0
+            self._total_secs = 0.0
+            self._max_secs = 0.0
+
+
+class LatencyTracker:
+    """Latency histograms per stage, shared by the clients of the process.
+
+    Besides the stage durations, the tracker measures the round trip time of the
+    transactions, from sending the command until its response arrives. Transactions whose
+    response never arrives are forgotten once max_pending_transactions are pending.
+    """
+
+    def __init__(self, max_pending_transactions: int = LATENCY_MAX_PENDING_TRANSACTIONS):
+        self.max_pending_transactions = max_pending_transactions
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._pending_transactions: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._summary_log_thread: Optional[threading.Thread] = None
+        self._stop_summary_log = threading.Event()
+
+    def get_histogram(self, stage: str) -> LatencyHistogram:
+        """Return the histogram of the stage, create it on first use."""
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    def record(self, stage: str, duration_secs: float) -> None:
+        """Record the duration of one pass through the stage."""
+        self.get_histogram(stage).record(duration_secs)
+
+    def record_since(self, stage: str, start_time: Optional[float]) -> None:
+        """Record the time that passed since start_time (time.monotonic()), if it is set."""
+        if start_time is not None:
+            self.record(stage, monotonic() - start_time)
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """Record the duration of the with block."""
+        start_time = monotonic()
+        try:
+            yield
+        finally:
+            self.record(stage, monotonic() - start_time)
+
+    def start_transaction(self, transaction_id: Optional[str]) -> None:
+        """Remember when the command with transaction_id was sent."""
+        if transaction_id is None:
+            return
+        with self._lock:
+            self._pending_transactions[transaction_id] = monotonic()
+            while len(self._pending_transactions) > self.max_pending_transactions:
+                self._pending_transactions.popitem(last=False)
+
+    def finish_transaction(self, transaction_id: Optional[str]) -> Optional[float]:
+        """Record and return the round trip time of the transaction whose response arrived.
+
+        Returns None for transactions that were not started, or that were finished already.
+        """
+        with self._lock:
+            start_time = self._pending_transactions.pop(transaction_id, None)
+        if start_time is None:
+            return None
+        round_trip_time = monotonic() - start_time
+        self.record(RESPONSE_RTT, round_trip_time)
+        return round_trip_time
+
+    @property
+    def pending_transactions(self) -> int:
+        """Return the number of transactions that wait for their response."""
+        return len(self._pending_transactions)
+
+    def _execute_callback(self, function: Callable, function_name: str,
+                          submitted_at: float) -> None:
+        start_time = monotonic()
+        self.record(QUEUE_WAIT, start_time - submitted_at)
+        try:
+            execute_function_util(function=function, function_name=function_name)
+        finally:
+            self.record(CALLBACK_PREFIX + function_name, monotonic() - start_time)
+
+    def submit(self, executor: Executor, function: Callable, function_name: str) -> Future:
+        """Run the callback on the executor, recording its queue wait and duration."""
+        return executor.submit(self._execute_callback, function=function,
+                               function_name=function_name, submitted_at=monotonic())
+
+    def snapshot(self) -> Dict[str, LatencySummary]:
+        """Return the statistics of all stages that were recorded."""
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {stage: histogram.summary() for stage, histogram in sorted(histograms.items())}
+
+    def format_summary(self) -> str:
+        """Return the statistics of all stages as a table, the durations in milliseconds."""
+        return tabulate(
+            [[stage, summary.count,
+              *(round(value * 1000, 3) for value in summary[1:])]
+             for stage, summary in self.snapshot().items()],
+            headers=["Stage", "Count", "Mean ms", "P50 ms", "P90 ms", "P99 ms", "Max ms"])
+
+    def reset(self) -> None:
+        """Forget all recorded durations and pending transactions."""
+        with self._lock:
+            histograms = list(self._histograms.values())
+            self._pending_transactions.clear()
+        for histogram in histograms:
+            histogram.reset()
+
+    def _log_summary_periodically(self, interval_secs: float) -> None:
+        while not self._stop_summary_log.wait(interval_secs):
+            if self._histograms:
+                logging.info("Latency of the last %s seconds:\n%s",
+                             interval_secs, self.format_summary())
+                self.reset()
+
+    def start_summary_log(self, interval_secs: float) -> None:
+        """Log the summary and start over every interval_secs seconds, in a daemon thread."""
+        if self._summary_log_thread is not None:
+            return
+        self._stop_summary_log.clear()
+        self._summary_log_thread = threading.Thread(
+            target=self._log_summary_periodically, args=(interval_secs,),
+            name="latency-summary-log", daemon=True)
+        self._summary_log_thread.start()
+
+    def stop_summary_log(self) -> None:
+        """Stop logging the summary periodically."""
+        self._stop_summary_log.set()
+        if self._summary_log_thread is not None:
+            self._summary_log_thread.join()
+            self._summary_log_thread = None
+
+
+_latency_tracker: Optional[LatencyTracker] = None
+_latency_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Return the tracker that is shared by all clients of the process.
+
+    If the API_CLIENT_LATENCY_LOG_INTERVAL environment variable is set, the summary is logged
+    every that many seconds.
+    """
+    global _latency_tracker  # pylint: disable=global-statement
+    with _latency_tracker_lock:
+        if _latency_tracker is None:
+            _latency_tracker = LatencyTracker()
+            log_interval = os.environ.get("API_CLIENT_LATENCY_LOG_INTERVAL")
+            if log_interval:
+                _latency_tracker.start_summary_log(float(log_interval))
+        return _latency_tracker
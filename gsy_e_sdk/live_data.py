@@ -0,0 +1,133 @@
+"""Coalesce frequent live data readings into few requests with bounded latency."""
+import logging
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from gsy_e_sdk.constants import LIVE_DATA_MAX_BATCH_SIZE, LIVE_DATA_MAX_LATENCY_SECS
+
+
+class CoalescerStats(NamedTuple):
+    """Counters of a LiveDataCoalescer."""
+    readings_received: int
+    readings_sent: int
+    readings_merged: int
+    requests_sent: int
+    failed_requests: int
+    size_flushes: int
+    deadline_flushes: int
+    max_flush_delay: float
+
+
+class LiveDataCoalescer:
+    """Buffer live data readings of one or many asset clients and send them in batches.
+
+    Readings of the same client and timestamp are merged (the latest one wins, or they are
+    summed up if sum_readings is set). The buffer is flushed as soon as it holds
+    max_batch_size readings, and at the latest max_latency seconds after its oldest reading
+    arrived, so that the readings still reach the exchange within the market slot.
+    """
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, max_batch_size: int = LIVE_DATA_MAX_BATCH_SIZE,
+                 max_latency: float = LIVE_DATA_MAX_LATENCY_SECS,
+                 command: str = "set_live_generation", do_not_wait: bool = True,
+                 sum_readings: bool = False):
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.command = command
+        self.do_not_wait = do_not_wait
+        self.sum_readings = sum_readings
+        self._buffer: Dict[object, Dict[str, float]] = {}
+        self._buffer_size = 0
+        self._oldest_reading_time: Optional[float] = None
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._is_closed = False
+        self._counters = dict.fromkeys(CoalescerStats._fields, 0)
+        self._flush_thread = threading.Thread(
+            target=self._flush_on_deadline, name="live-data-coalescer", daemon=True)
+        self._flush_thread.start()
+
+    @property
+    def stats(self) -> CoalescerStats:
+        """Return the counters of the coalescer."""
+        with self._condition:
+            return CoalescerStats(**self._counters)
+
+    def add(self, client, readings: Dict[str, float]) -> None:
+        """Buffer the {timestamp: value} readings of the client."""
+        with self._condition:
+            if self._is_closed:
+                raise RuntimeError("The live data coalescer is closed.")
+            client_buffer = self._buffer.setdefault(client, {})
+            for timestamp, value in readings.items():
+                if timestamp in client_buffer:
+                    self._counters["readings_merged"] += 1
+                    if self.sum_readings:
+                        value += client_buffer[timestamp]
+                else:
+                    self._buffer_size += 1
+                client_buffer[timestamp] = value
+            self._counters["readings_received"] += len(readings)
+            if self._oldest_reading_time is None:
+                self._oldest_reading_time = time.monotonic()
+                self._condition.notify_all()
+            is_full = self._buffer_size >= self.max_batch_size
+        if is_full:
+            self.flush(reason="size_flushes")
+
+    def flush(self, reason: Optional[str] = None) -> None:
+        """Send all buffered readings, one request per client."""
+        # Flushes are serialized, so that readings of a client reach the exchange in order
+        with self._send_lock:
+            with self._condition:
+                buffer, self._buffer, self._buffer_size = self._buffer, {}, 0
+                if self._oldest_reading_time is not None:
+                    self._counters["max_flush_delay"] = max(
+                        self._counters["max_flush_delay"],
+                        time.monotonic() - self._oldest_reading_time)
+                self._oldest_reading_time = None
+                if reason and buffer:
+                    self._counters[reason] += 1
+            for client, readings in buffer.items():
+                self._send(client, readings)
+
+    def _send(self, client, readings: Dict[str, float]) -> None:
+        try:
+            getattr(client, self.command)(readings, do_not_wait=self.do_not_wait)
+            failed = False
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.error("Sending %s readings of %s failed: %s", len(readings), client, ex)
+            failed = True
+        with self._condition:
+            self._counters["requests_sent"] += 1
+            self._counters["failed_requests"] += failed
+            self._counters["readings_sent"] += 0 if failed else len(readings)
+
+    def _flush_on_deadline(self) -> None:
+        while True:
+            with self._condition:
+                while not self._is_closed and self._oldest_reading_time is None:
+                    self._condition.wait()
+                if self._is_closed:
+                    return
+                remaining_time = self._oldest_reading_time + self.max_latency - time.monotonic()
+                if remaining_time > 0:
+                    self._condition.wait(remaining_time)
+                    continue
+            self.flush(reason="deadline_flushes")
+
+    def close(self) -> None:
+        """Send the remaining readings and stop the deadline thread."""
+        with self._condition:
+            self._is_closed = True
+            self._condition.notify_all()
+        self._flush_thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
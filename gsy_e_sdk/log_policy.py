@@ -0,0 +1,158 @@
+"""Keep the logging of the message hot path cheap.
+
+Messages are only formatted if their log level is enabled, trades and order confirmations are
+aggregated into one summary line per market slot (the individual lines are logged at DEBUG, up
+to a limit per slot), and the log records can be handed to a background thread that writes them,
+so that slow handlers (files, terminals) do not block the callbacks.
+"""
+import atexit
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterable, Optional
+
+from gsy_e_sdk.constants import LOG_MAX_ITEM_LINES_PER_SLOT, LOG_QUEUE_SIZE
+
+
+def is_log_level_enabled(level: int) -> bool:
+    """Return whether records of the level would be handled by the root logger."""
+    return logging.getLogger().isEnabledFor(level)
+
+
+class MessageLogView:
+    """Format a received message for logging, without its grid tree.
+
+    The message is neither copied nor formatted unless the log record is emitted.
+    """
+
+    __slots__ = ("message",)
+
+    def __init__(self, message: Dict):
+        self.message = message
+
+    def __str__(self) -> str:
+        return str({key: value for key, value in self.message.items() if key != "grid_tree"})
+
+
+class SlotLogSummary:
+    """Aggregate the trades and command confirmations of a market slot into one log line."""
+
+    def __init__(self, name: str = "", max_item_lines: int = LOG_MAX_ITEM_LINES_PER_SLOT):
+        self.name = name
+        self.max_item_lines = max_item_lines
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.trade_count = 0
+        self.traded_energy = 0.0
+        self.trade_price = 0.0
+        self.command_counts: Dict[str, int] = {}
+        self._item_lines = 0
+
+    def _should_log_item(self) -> bool:
+        if not is_log_level_enabled(logging.DEBUG):
+            return False
+        self._item_lines += 1
+        return self._item_lines <= self.max_item_lines
+
+    def add_trade(self, trade: Dict) -> None:
+        """Count the trade, log it at DEBUG until max_item_lines are logged in the slot."""
+        energy = trade.get("traded_energy") or 0
+        price = trade.get("trade_price") or 0
+        with self._lock:
+            self.trade_count += 1
+            self.traded_energy += energy
+            self.trade_price += price
+            should_log = self._should_log_item()
+        if should_log and energy:
+            action, trader = (("SOLD", trade.get("seller")) if trade.get("buyer") == "anonymous"
+                              else ("BOUGHT", trade.get("buyer")))
+            logging.debug("<-- %s %s %s kWh at %s cents/kWh -->",
+                          trader, action, round(energy, 3), round(price / energy, 2))
+
+    def add_command_responses(self, command_responses: Iterable[Dict]) -> None:
+        """Count the successful commands per type."""
+        with self._lock:
+            for command_response in command_responses:
+                if not isinstance(command_response, dict):
+                    continue
+                if command_response.get("status") == "ready":
+                    command = command_response.get("command")
+                    self.command_counts[command] = self.command_counts.get(command, 0) + 1
+
+    def format(self) -> Optional[str]:
+        """Return the summary of the slot, None if nothing happened."""
+        if not self.trade_count and not self.command_counts:
+            return None
+        parts = []
+        if self.trade_count:
+            average_rate = (round(self.trade_price / self.traded_energy, 2)
+                            if self.traded_energy else 0)
+            parts.append(f"{self.trade_count} trades, {round(self.traded_energy, 3)} kWh, "
+                         f"avg rate {average_rate} cents/kWh")
+        if self.command_counts:
+            parts.append(", ".join(f"{count} {command}" for command, count
+                                   in sorted(self.command_counts.items())) + " commands")
+        return "; ".join(parts)
+
+    def flush(self) -> None:
+        """Log the summary of the finished slot at INFO and start a new slot."""
+        with self._lock:
+            summary = self.format() if is_log_level_enabled(logging.INFO) else None
+            self._reset()
+        if summary:
+            logging.info("Market slot summary%s: %s",
+                         f" of {self.name}" if self.name else "", summary)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Drop the records instead of blocking the logging thread if the queue is full."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue_listener: Optional[QueueListener] = None
+
+
+def configure_async_logging(max_queue_size: int = LOG_QUEUE_SIZE) -> QueueListener:
+    """Move the handlers of the root logger to a background thread.
+
+    The root logger only enqueues the records, records are dropped when max_queue_size are
+    waiting. The listener is stopped (and the queue is flushed) at exit.
+    """
+    global _queue_listener  # pylint: disable=global-statement
+    if _queue_listener is not None:
+        return _queue_listener
+    root_logger = logging.getLogger()
+    handlers = list(root_logger.handlers)
+    log_queue = queue.Queue(maxsize=max_queue_size)
+    for handler in handlers:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(_DroppingQueueHandler(log_queue))
+    _queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+    atexit.register(stop_async_logging)
+    return _queue_listener
+
+
+def stop_async_logging() -> None:
+    """Write the pending log records, stop the background thread and restore the handlers."""
+    global _queue_listener  # pylint: disable=global-statement
+    if _queue_listener is None:
+        return
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        if isinstance(handler, _DroppingQueueHandler):
+            root_logger.removeHandler(handler)
+    _queue_listener.stop()
+    for handler in _queue_listener.handlers:
+        root_logger.addHandler(handler)
+    _queue_listener = None
@@ -0,0 +1,253 @@
+"""Export counters, gauges and latencies of the SDK clients in the Prometheus text format.
+
+Counters are incremented without locks: every thread increments its own shard, and the shards
+are only summed up when the metrics are scraped. Gauges (e.g. the depth of the callback
+queues) are not updated on the hot path at all, they are evaluated at scrape time. The
+latencies are the histograms of the LatencyTracker, exported as summaries.
+"""
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from gsy_e_sdk.constants import METRICS_DEFAULT_HOST
+from gsy_e_sdk.latency import LatencyTracker, get_latency_tracker
+
+METRICS_PREFIX = "gsy_e_sdk_"
+
+MESSAGES_RECEIVED = "messages_received_total"
+DECODED_BYTES = "decoded_bytes_total"
+BATCHES_SENT = "batches_sent_total"
+BATCH_COMMANDS_SENT = "batch_commands_sent_total"
+COMMAND_TIMEOUTS = "command_timeouts_total"
+WEBSOCKET_RECONNECTS = "websocket_reconnects_total"
+MARKET_SLOTS = "market_slots_total"
+
+METRIC_DESCRIPTIONS = {
+    MESSAGES_RECEIVED: "Messages received from the exchange, per event or command type.",
+    DECODED_BYTES: "Bytes of the JSON messages that were decoded.",
+    BATCHES_SENT: "Batches of commands sent by the aggregators.",
+    BATCH_COMMANDS_SENT: "Commands sent in batches by the aggregators.",
+    COMMAND_TIMEOUTS: "Commands that did not receive their response in time.",
+    WEBSOCKET_RECONNECTS: "Reconnections of websockets after a dropped connection.",
+    MARKET_SLOTS: "Market slots that started, counted once for all clients of the process.",
+}
+
+# Market slots that were counted recently, a market event is received once per client
+_RECENT_MARKET_SLOTS = 16
+
+_LabelsKey = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: _LabelsKey) -> str:
+    if not labels:
+        return ""
+    escaped_labels = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped_labels) + "}"
+
+
+class MetricsRegistry:
+    """Metrics that are shared by all clients of the process."""
+
+    def __init__(self, latency_tracker: Optional[LatencyTracker] = None):
+        self.latency_tracker = latency_tracker
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, _LabelsKey], float]] = []
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self._executors = weakref.WeakSet()
+        self._recent_market_slots: Dict[str, None] = {}
+        self._lock = threading.Lock()
+        self.register_gauge("executor_queue_depth", self._get_executor_queue_depth,
+                            "Callbacks that wait for a worker of the callback executors.")
+        if latency_tracker is not None:
+            self.register_gauge("pending_transactions",
+                                lambda: latency_tracker.pending_transactions,
+                                "Commands that wait for their response.")
+
+    def _get_shard(self) -> Dict[Tuple[str, _LabelsKey], float]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Increment the counter with the given labels."""
+        shard = self._get_shard()
+        key = (name, tuple(sorted(labels.items())))
+        shard[key] = shard.get(key, 0) + amount
+
+    def count_market_slot(self, market_slot: Optional[str]) -> None:
+        """Increment the market slot counter, unless a client already counted the slot."""
+        if market_slot is None:
+            return
+        with self._lock:
+            if market_slot in self._recent_market_slots:
+                return
+            self._recent_market_slots[market_slot] = None
+            if len(self._recent_market_slots) > _RECENT_MARKET_SLOTS:
+                del self._recent_market_slots[next(iter(self._recent_market_slots))]
+        self.inc(MARKET_SLOTS)
+
+    def get_counters(self) -> Dict[Tuple[str, _LabelsKey], float]:
+        """Return the values of all counters, summed over the threads."""
+        with self._lock:
+            shards = list(self._shards)
+        counters = {}
+        for shard in shards:
+            # Copy the shard, its thread might add keys while it is iterated
+            for key, value in shard.copy().items():
+                counters[key] = counters.get(key, 0) + value
+        return counters
+
+    def get_counter(self, name: str, **labels) -> float:
+        """Return the value of the counter with the given labels."""
+        return self.get_counters().get((name, tuple(sorted(labels.items()))), 0)
+
+    def register_gauge(self, name: str, function: Callable[[], float],
+                       description: str = "") -> None:
+        """Export the return value of function, which is called whenever metrics are scraped."""
+        self._gauges[name] = (description, function)
+
+    def track_executor(self, executor: ThreadPoolExecutor) -> None:
+        """Add the pending callbacks of the executor to the executor_queue_depth gauge."""
+        self._executors.add(executor)
+
+    def _get_executor_queue_depth(self) -> int:
+        return sum(executor._work_queue.qsize()  # pylint: disable=protected-access
+                   for executor in list(self._executors)
+                   if isinstance(executor, ThreadPoolExecutor))
+
+    def _render_counters(self) -> List[str]:
+        lines = []
+        counters_by_name: Dict[str, List[Tuple[_LabelsKey, float]]] = {}
+        for (name, labels), value in sorted(self.get_counters().items()):
+            counters_by_name.setdefault(name, []).append((labels, value))
+        for name, values in counters_by_name.items():
+            lines.append(f"# HELP {METRICS_PREFIX}{name} {METRIC_DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {METRICS_PREFIX}{name} counter")
+            lines.extend(f"{METRICS_PREFIX}{name}{_format_labels(labels)} {value}"
+                         for labels, value in values)
+        return lines
+
+    def _render_gauges(self) -> List[str]:
+        lines = []
+        for name, (description, function) in sorted(self._gauges.items()):
+            try:
+                value = function()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Gauge %s could not be evaluated.", name)
+                continue
+            lines.append(f"# HELP {METRICS_PREFIX}{name} {description or name}")
+            lines.append(f"# TYPE {METRICS_PREFIX}{name} gauge")
+            lines.append(f"{METRICS_PREFIX}{name} {value}")
+        return lines
+
+    def _render_latencies(self) -> List[str]:
+        if self.latency_tracker is None:
+            return []
+        name = f"{METRICS_PREFIX}latency_seconds"
+        lines = [f"# HELP {name} Latency of the stages of the message hot path.",
+                 f"# TYPE {name} summary"]
+        for stage, summary in self.latency_tracker.snapshot().items():
+            for quantile, value in (("0.5", summary.p50), ("0.9", summary.p90),
+                                    ("0.99", summary.p99)):
+                lines.append(
+                    f"{name}{_format_labels((('stage', stage), ('quantile', quantile)))} "
+                    f"{value}")
+            stage_labels = _format_labels((("stage", stage),))
+            lines.append(f"{name}_sum{stage_labels} {summary.mean * summary.count}")
+            lines.append(f"{name}_count{stage_labels} {summary.count}")
+        return lines
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        return "\n".join(
+            self._render_counters() + self._render_gauges() + self._render_latencies()) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve the metrics on /metrics."""
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug("Metrics endpoint: " + format, *args)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP server that exports the registry on /metrics, in a daemon thread."""
+
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = METRICS_DEFAULT_HOST):
+        super().__init__((host, port), _MetricsRequestHandler)
+        self.registry = registry
+        self._thread = threading.Thread(target=self.serve_forever, name="metrics-server",
+                                        daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        """Return the port that the server listens on (useful if it was started on port 0)."""
+        return self.server_address[1]
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+
+_metrics_registry: Optional[MetricsRegistry] = None
+_metrics_server: Optional[MetricsServer] = None
+_metrics_registry_lock = threading.Lock()
+
+
+def _start_metrics_server(registry: MetricsRegistry, port: int, host: str) -> MetricsServer:
+    global _metrics_server  # pylint: disable=global-statement
+    with _metrics_registry_lock:
+        if _metrics_server is None:
+            _metrics_server = MetricsServer(registry, port, host)
+            logging.info("Metrics are exported on http://%s:%s/metrics", host,
+                         _metrics_server.port)
+        return _metrics_server
+
+
+def start_metrics_server(port: int, host: str = METRICS_DEFAULT_HOST) -> MetricsServer:
+    """Export the metrics of the process on http://host:port/metrics.
+
+    Only one server is started per process, later calls return the running server.
+    """
+    return _start_metrics_server(get_metrics_registry(), port, host)
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Return the registry that is shared by all clients of the process.
+
+    If the API_CLIENT_METRICS_PORT environment variable is set, the metrics are exported
+    on that port.
+    """
+    global _metrics_registry  # pylint: disable=global-statement
+    with _metrics_registry_lock:
+        if _metrics_registry is None:
+            _metrics_registry = MetricsRegistry(get_latency_tracker())
+        registry = _metrics_registry
+    metrics_port = os.environ.get("API_CLIENT_METRICS_PORT")
+    if metrics_port and _metrics_server is None:
+        _start_metrics_server(registry, int(metrics_port), METRICS_DEFAULT_HOST)
+    return registry
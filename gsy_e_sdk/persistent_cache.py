@@ -0,0 +1,114 @@
+"""Persistent cache that lets restarted clients skip requests whose results rarely change."""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from gsy_e_sdk.constants import PERSISTENT_CACHE_FILE_NAME
+
+# Bump whenever the layout of the cached values changes, entries of older layouts are ignored
+CACHE_FORMAT_VERSION = 1
+
+
+def compute_cache_version(value: Any) -> str:
+    """Return a hash of the JSON representation of the value."""
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+class PersistentCache:
+    """Key-value store backed by a sqlite database in cache_dir.
+
+    Entries are grouped in namespaces (e.g. scenario_index, aggregator_devices) and carry a
+    version string, so that readers can discard entries that do not match what they expect.
+    """
+
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.file_path = os.path.join(cache_dir, PERSISTENT_CACHE_FILE_NAME)
+        self._lock = Lock()
+        self._connection = sqlite3.connect(self.file_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "namespace TEXT, key TEXT, format_version INTEGER, version TEXT, value TEXT, "
+                "updated_at REAL, PRIMARY KEY (namespace, key))")
+
+    def get(self, namespace: str, key: str, version: Optional[str] = None,
+            max_age: Optional[float] = None) -> Optional[Any]:
+        """Return the cached value.
+
+        None is returned if the entry is missing, does not match the version or was written
+        more than max_age seconds ago.
+        """
+        entry = self.get_entry(namespace, key)
+        if entry is None or (version is not None and entry["version"] != version):
+            return None
+        if max_age is not None and entry["updated_at"] < time.time() - max_age:
+            return None
+        return entry["value"]
+
+    def get_entry(self, namespace: str, key: str) -> Optional[Dict]:
+        """Return the cached value together with its version and update time."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT format_version, version, value, updated_at FROM entries "
+                "WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+        if row is None or row[0] != CACHE_FORMAT_VERSION:
+            return None
+        try:
+            return {"version": row[1], "value": json.loads(row[2]), "updated_at": row[3]}
+        except ValueError:
+            logging.warning("Discarding corrupted cache entry %s/%s.", namespace, key)
+            self.delete(namespace, key)
+            return None
+
+    def set(self, namespace: str, key: str, value: Any, version: Optional[str] = None) -> None:
+        """Store the value, the version defaults to the hash of the value."""
+        version = version or compute_cache_version(value)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, CACHE_FORMAT_VERSION, version, json.dumps(value), time.time()))
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove the entry from the cache."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        with self._lock:
+            self._connection.close()
+
+
+_persistent_caches: Dict[str, PersistentCache] = {}
+_persistent_caches_lock = Lock()
+
+
+def get_persistent_cache(cache_dir: Optional[str] = None) -> Optional[PersistentCache]:
+    """Return the cache of the directory, None if caching is not enabled.
+
+    The directory defaults to the API_CLIENT_CACHE_DIR environment variable.
+    """
+    cache_dir = cache_dir or os.environ.get("API_CLIENT_CACHE_DIR")
+    if not cache_dir:
+        return None
+    cache_dir = os.path.abspath(cache_dir)
+    with _persistent_caches_lock:
+        if cache_dir not in _persistent_caches:
+            try:
+                _persistent_caches[cache_dir] = PersistentCache(cache_dir)
+            except (OSError, sqlite3.Error) as ex:
+                logging.warning("Persistent cache in %s could not be opened: %s", cache_dir, ex)
+                return None
+        return _persistent_caches[cache_dir]
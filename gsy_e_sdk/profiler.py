@@ -0,0 +1,150 @@
+"""Sample the stacks of a running client script and attribute them to its callbacks.
+
+A background thread takes the Python stacks of all threads every interval seconds. A sample
+is attributed to the callback that is running in the thread (on_market_slot, on_tick, ...,
+submitted through the LatencyTracker) or to the dispatching of received messages and batch
+commands; the samples of idle or unrelated threads are dropped, unless all threads are
+profiled. The samples are written in the folded stacks format ("frame;frame;frame count"),
+which is read by flamegraph.pl, speedscope and inferno.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from tabulate import tabulate
+
+from gsy_e_sdk.constants import PROFILER_MAX_STACK_DEPTH, PROFILER_SAMPLE_INTERVAL_SECS
+from gsy_e_sdk.metrics import MARKET_SLOTS, MetricsRegistry, get_metrics_registry
+
+_CALLBACK_FUNCTION = "_execute_callback"
+# Functions of the clients that handle received messages, or send and wait for batch commands
+DISPATCH_FUNCTIONS = frozenset({
+    "_events_callback_dict", "_batch_response", "_aggregator_response_callback",
+    "_on_event_or_response", "received_message", "send_batch_commands",
+    "execute_batch_commands"})
+
+
+def _format_frame(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Count the attributed stacks of all threads, sampled in a background thread."""
+
+    def __init__(self, interval: float = PROFILER_SAMPLE_INTERVAL_SECS,
+                 all_threads: bool = False, max_depth: int = PROFILER_MAX_STACK_DEPTH):
+        self.interval = interval
+        self.all_threads = all_threads
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _attribute_stack(self, frame, thread_name: str) -> Optional[Tuple[str, ...]]:
+        """Return the stack (outermost first) below its callback or dispatch frame."""
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+        for index, outer_frame in enumerate(frames):
+            function_name = outer_frame.f_code.co_name
+            if function_name == _CALLBACK_FUNCTION:
+                root = f"callback:{outer_frame.f_locals.get('function_name')}"
+                inner_frames = frames[index + 1:]
+                break
+            if function_name in DISPATCH_FUNCTIONS:
+                root = f"dispatch:{function_name}"
+                inner_frames = frames[index + 1:]
+                break
+        else:
+            if not self.all_threads:
+                return None
+            root = f"thread:{thread_name}"
+            inner_frames = frames
+        # Deep stacks are cut below the root, the innermost frames are where the time is spent
+        return (root, *(_format_frame(inner_frame)
+                        for inner_frame in inner_frames[-self.max_depth:]))
+
+    def sample(self) -> None:
+        """Take one sample of the stacks of all other threads."""
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own_thread_id = threading.get_ident()
+        # pylint: disable-next=protected-access
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread_id:
+                continue
+            stack = self._attribute_stack(frame, thread_names.get(thread_id, str(thread_id)))
+            if stack is not None:
+                self.samples[stack] += 1
+        self.sample_count += 1
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        """Start sampling in a daemon thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_root_samples(self) -> Dict[str, int]:
+        """Return the number of samples per callback / dispatch function."""
+        root_samples = Counter()
+        for stack, count in self.samples.items():
+            root_samples[stack[0]] += count
+        return dict(root_samples.most_common())
+
+    def write_folded_stacks(self, file_path: str) -> None:
+        """Write the samples in the folded stacks format of flamegraph.pl."""
+        with open(file_path, "w", encoding="utf-8") as folded_file:
+            for stack, count in sorted(self.samples.items()):
+                folded_file.write(f"{';'.join(stack)} {count}\n")
+
+
+def format_profile_report(profiler: SamplingProfiler, top_frames: int = 10) -> str:
+    """Return the samples per callback and the frames that were sampled most as tables."""
+    total_samples = sum(profiler.samples.values()) or 1
+    roots = tabulate(
+        [[root, count, f"{count * 100 / total_samples:.1f}%",
+          round(count * profiler.interval, 3)]
+         for root, count in profiler.get_root_samples().items()],
+        headers=["Callback / dispatch", "Samples", "Share", "Est. time (s)"], tablefmt="github")
+    self_samples = Counter()
+    for stack, count in profiler.samples.items():
+        self_samples[(stack[0], stack[-1])] += count
+    frames = tabulate(
+        [[root, frame, count, f"{count * 100 / total_samples:.1f}%"]
+         for (root, frame), count in self_samples.most_common(top_frames)],
+        headers=["Callback / dispatch", "Innermost frame", "Samples", "Share"],
+        tablefmt="github")
+    return f"{roots}\n\n{frames}"
+
+
+def get_market_slot_count(metrics: Optional[MetricsRegistry] = None) -> int:
+    """Return the number of market slots that the clients of the process received."""
+    return int((metrics or get_metrics_registry()).get_counter(MARKET_SLOTS))
+
+
+def wait_for_market_slots(script_thread: threading.Thread, slot_count: int,
+                          poll_interval: float = 0.1) -> int:
+    """Block until slot_count market slots have passed or the script has finished.
+
+    A slot has passed once the market event of the next one is received.
+    """
+    initial_count = get_market_slot_count()
+    while script_thread.is_alive() and get_market_slot_count() - initial_count <= slot_count:
+        script_thread.join(poll_interval)
+    return min(get_market_slot_count() - initial_count, slot_count)
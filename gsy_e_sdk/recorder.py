@@ -0,0 +1,229 @@
+"""Record the raw messages that the clients receive and send to a compact replay log.
+
+The log is an append-only sequence of frames. Every frame consists of a fixed size header
+(payload size, monotonic timestamp, direction, channel size), the channel name and the payload,
+which is zlib-compressed if it is large enough to benefit from it. Every recording session
+starts with a session frame that maps the monotonic timestamps to the wall clock.
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+from gsy_e_sdk.constants import (
+    RECORDER_COMPRESSION_LEVEL, RECORDER_COMPRESSION_MIN_SIZE, RECORDER_MAX_QUEUE_SIZE)
+
+INBOUND = 0
+OUTBOUND = 1
+SESSION = 2
+_COMPRESSED_FLAG = 0x80
+
+FILE_MAGIC = b"GSYREC1\n"
+FRAME_HEADER = struct.Struct("<IdBH")
+
+
+class RecordedMessage(NamedTuple):
+    """Message read from a recording."""
+    timestamp: float
+    wall_time: float
+    direction: int
+    channel: str
+    payload: bytes
+
+    @property
+    def data(self):
+        """Return the JSON-decoded payload."""
+        return json.loads(self.payload)
+
+
+class RecorderStats(NamedTuple):
+    """Counters of a MessageRecorder."""
+    recorded: int
+    dropped: int
+    bytes_written: int
+
+
+def _to_bytes(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return json.dumps(value).encode("utf-8")
+
+
+class MessageRecorder:
+    """Write the recorded messages to file_path in a background thread.
+
+    record() only enqueues the message, so the caller never waits for the disk: decoded messages
+    are serialized by the writer thread too. If the writer can not keep up and max_queue_size
+    messages are pending, new messages are dropped (and counted) instead of blocking the caller.
+    """
+
+    def __init__(self, file_path: str, max_queue_size: int = RECORDER_MAX_QUEUE_SIZE,
+                 compression_level: int = RECORDER_COMPRESSION_LEVEL):
+        self.file_path = file_path
+        self.compression_level = compression_level
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._counters = {"recorded": 0, "dropped": 0, "bytes_written": 0}
+        self._lock = threading.Lock()
+        self._is_closed = False
+        # pylint: disable-next=consider-using-with
+        self._file = open(file_path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(FILE_MAGIC)
+        self._write_frame(SESSION, "", json.dumps(
+            {"wall_time": time.time(), "monotonic": time.monotonic()}).encode("utf-8"),
+            time.monotonic())
+        self._writer_thread = threading.Thread(
+            target=self._write_messages, name="message-recorder", daemon=True)
+        self._writer_thread.start()
+
+    @property
+    def stats(self) -> RecorderStats:
+        """Return the counters of the recorder."""
+        with self._lock:
+            return RecorderStats(**self._counters)
+
+    def record(self, direction: int, channel, payload) -> None:
+        """Enqueue the payload (bytes, str or JSON-serializable) that was sent or received.
+
+        JSON-serializable payloads must not be changed after they were recorded.
+        """
+        if self._is_closed:
+            return
+        if isinstance(channel, bytes):
+            channel = channel.decode("utf-8")
+        try:
+            self._queue.put_nowait((time.monotonic(), direction, channel, payload))
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+                dropped = self._counters["dropped"]
+            if dropped == 1:
+                logging.warning("Message recorder %s can not keep up, dropping messages.",
+                                self.file_path)
+
+    def _write_frame(self, direction: int, channel: str, payload: bytes,
+                     timestamp: float) -> int:
+        if len(payload) >= RECORDER_COMPRESSION_MIN_SIZE:
+            payload = zlib.compress(payload, self.compression_level)
+            direction |= _COMPRESSED_FLAG
+        channel = channel.encode("utf-8")
+        frame = FRAME_HEADER.pack(len(payload), timestamp, direction, len(channel))
+        self._file.write(frame + channel + payload)
+        return len(frame) + len(channel) + len(payload)
+
+    def _write_messages(self) -> None:
+        is_running = True
+        while is_running:
+            messages = [self._queue.get()]
+            # Write everything that is pending at once, then flush the file once
+            while True:
+                try:
+                    messages.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            bytes_written = recorded = dropped = 0
+            for message in messages:
+                if message is None:
+                    is_running = False
+                    continue
+                timestamp, direction, channel, payload = message
+                try:
+                    payload = _to_bytes(payload)
+                except (TypeError, ValueError, RuntimeError):
+                    logging.exception("Message recorder %s can not serialize a message.",
+                                      self.file_path)
+                    dropped += 1
+                    continue
+                bytes_written += self._write_frame(direction, channel, payload, timestamp)
+                recorded += 1
+            self._file.flush()
+            with self._lock:
+                self._counters["recorded"] += recorded
+                self._counters["dropped"] += dropped
+                self._counters["bytes_written"] += bytes_written
+
+    def close(self) -> None:
+        """Write the pending messages and close the file."""
+        if self._is_closed:
+            return
+        self._is_closed = True
+        self._queue.put(None)
+        self._writer_thread.join()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def iter_recording(file_path: str) -> Iterator[RecordedMessage]:
+    """Yield the messages of the recording in the order they were recorded.
+
+    A truncated last frame (e.g. after a crash of the recording process) is ignored.
+    """
+    with open(file_path, "rb") as recording:
+        if recording.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{file_path} is not a message recording.")
+        wall_time_offset = 0.0
+        while True:
+            header = recording.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            payload_size, timestamp, direction, channel_size = FRAME_HEADER.unpack(header)
+            channel = recording.read(channel_size)
+            payload = recording.read(payload_size)
+            if len(channel) < channel_size or len(payload) < payload_size:
+                return
+            if direction & _COMPRESSED_FLAG:
+                payload = zlib.decompress(payload)
+                direction &= ~_COMPRESSED_FLAG
+            if direction == SESSION:
+                session = json.loads(payload)
+                wall_time_offset = session["wall_time"] - session["monotonic"]
+                continue
+            yield RecordedMessage(timestamp, timestamp + wall_time_offset, direction,
+                                  channel.decode("utf-8"), payload)
+
+
+def recorded_callback(recorder: Optional[MessageRecorder], callback: Callable) -> Callable:
+    """Wrap the redis pubsub callback, so that the received messages are recorded."""
+    if recorder is None:
+        return callback
+
+    @functools.wraps(callback)
+    def _record_and_handle(message: Dict):
+        recorder.record(INBOUND, message["channel"], message["data"])
+        return callback(message)
+    return _record_and_handle
+
+
+_message_recorders: Dict[str, MessageRecorder] = {}
+_message_recorders_lock = threading.Lock()
+
+
+def get_message_recorder(file_path: Optional[str] = None) -> Optional[MessageRecorder]:
+    """Return the recorder that is shared by all clients of the process that record to file_path.
+
+    Defaults to the API_CLIENT_RECORDING_FILE environment variable, return None (recording
+    disabled) if neither is set.
+    """
+    file_path = file_path or os.environ.get("API_CLIENT_RECORDING_FILE")
+    if not file_path:
+        return None
+    file_path = os.path.abspath(file_path)
+    with _message_recorders_lock:
+        if file_path not in _message_recorders:
+            _message_recorders[file_path] = MessageRecorder(file_path)
+            atexit.register(_message_recorders[file_path].close)
+        return _message_recorders[file_path]
@@ -2,24 +2,35 @@ import json
 import logging
 import uuid
 from concurrent.futures.thread import ThreadPoolExecutor
-from copy import copy
 from threading import Lock
+from time import monotonic
 from typing import Optional, Dict, List
 
 from gsy_framework.client_connections.utils import (
     log_market_progression, get_slot_completion_percentage_int_from_message)
 from gsy_framework.redis_channels import AggregatorChannels
-from gsy_framework.utils import wait_until_timeout_blocking, execute_function_util
+from gsy_framework.utils import wait_until_timeout_blocking
 from redis import Redis
 
 from gsy_e_sdk.commands import ClientCommandBuffer
 from gsy_e_sdk.constants import (
     MAX_WORKER_THREADS, MIN_SLOT_COMPLETION_TICK_TRIGGER_PERCENTAGE, LOCAL_REDIS_URL)
 from gsy_e_sdk.grid_fee_calculation import GridFeeCalculation
+from gsy_e_sdk.latency import (
+    DECODE, EVENT_TO_RESPONSE, PUBLISH, SERIALIZE, LatencyTracker, get_latency_tracker)
+from gsy_e_sdk.log_policy import MessageLogView, SlotLogSummary, is_log_level_enabled
+from gsy_e_sdk.metrics import (
+    BATCH_COMMANDS_SENT, BATCHES_SENT, COMMAND_TIMEOUTS, DECODED_BYTES, MESSAGES_RECEIVED,
+    MetricsRegistry, get_metrics_registry)
+from gsy_e_sdk.recorder import (
+    OUTBOUND, MessageRecorder, get_message_recorder, recorded_callback)
+from gsy_e_sdk.tracing import (
+    PUBLISH_SPAN, RESPONSE_SPAN, SERIALIZE_SPAN, WAIT_SPAN, Tracer,
+    get_batch_commands_trace_attributes, get_tracer)
 from gsy_e_sdk.utils import (
     get_uuid_from_area_name_in_tree_dict, buffer_grid_tree_info,
     create_area_name_uuid_mapping_from_tree_info,
-    get_name_from_area_name_uuid_mapping, log_trade_info,
+    get_name_from_area_name_uuid_mapping,
     log_bid_offer_confirmation, log_deleted_bid_offer_confirmation)
 
 
@@ -30,13 +41,17 @@ class RedisAggregatorAPIException(Exception):
 class RedisAggregator:
     """Handle aggregator connection via redis to local running simulation."""
 
-    # pylint: disable = too-many-instance-attributes
+    # pylint: disable = too-many-instance-attributes, too-many-arguments
     def __init__(self, aggregator_name, accept_all_devices=True,
-                 redis_url=LOCAL_REDIS_URL):
+                 redis_url=LOCAL_REDIS_URL, recorder: Optional[MessageRecorder] = None,
+                 redis_db: Optional[Redis] = None,
+                 latency_tracker: Optional[LatencyTracker] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 tracer: Optional[Tracer] = None):
 
         self.is_finished = False
         self.grid_fee_calculation = GridFeeCalculation()
-        self.redis_db = Redis.from_url(redis_url)
+        self.redis_db = redis_db or Redis.from_url(redis_url)
         self.pubsub = self.redis_db.pubsub()
         self.aggregator_name = aggregator_name
         self.aggregator_uuid: Optional[str] = None
@@ -45,10 +60,17 @@ class RedisAggregator:
         self._transaction_id_response_buffer = {}
         self.device_uuid_list = []
         self._client_command_buffer = ClientCommandBuffer()
+        self.recorder = recorder or get_message_recorder()
+        self.latency_tracker = latency_tracker or get_latency_tracker()
+        self.metrics = metrics or get_metrics_registry()
+        self.tracer = tracer or get_tracer()
+        self._last_event_received_at: Optional[float] = None
+        self._log_summary = SlotLogSummary(aggregator_name)
 
         self._connect_and_subscribe()
 
         self.executor = ThreadPoolExecutor(max_workers=MAX_WORKER_THREADS)
+        self.metrics.track_executor(self.executor)
         self.lock = Lock()
         self.latest_grid_tree = {}
         self.latest_grid_tree_flat = {}
@@ -64,7 +86,7 @@ class RedisAggregator:
 
     def _subscribe_to_aggregator_response_and_start_redis_thread(self) -> None:
         channel_dict = {AggregatorChannels().response: self._aggregator_response_callback}
-        self.pubsub.psubscribe(**channel_dict)
+        self._psubscribe(channel_dict)
         self.pubsub.run_in_thread(daemon=True)
 
     def _connect_to_simulation(self, is_blocking: bool = True) -> None:
@@ -76,40 +98,91 @@ class RedisAggregator:
         channel_dict = {
             self.channel_names.events: self._events_callback_dict,
             self.channel_names.batch_commands_response: self._batch_response}
-        self.pubsub.psubscribe(**channel_dict)
+        self._psubscribe(channel_dict)
+
+    def _psubscribe(self, channel_dict: Dict) -> None:
+        self.pubsub.psubscribe(**{channel: recorded_callback(self.recorder, callback)
+                                  for channel, callback in channel_dict.items()})
+
+    def _publish(self, channel: str, data: Dict) -> None:
+        transaction_id = data.get("transaction_id")
+        with self.latency_tracker.measure(SERIALIZE), \
+                self.tracer.span(transaction_id, SERIALIZE_SPAN):
+            payload = json.dumps(data)
+        if self.recorder is not None:
+            self.recorder.record(OUTBOUND, channel, payload)
+        self.latency_tracker.start_transaction(transaction_id)
+        with self.latency_tracker.measure(PUBLISH), \
+                self.tracer.span(transaction_id, PUBLISH_SPAN, channel=channel):
+            self.redis_db.publish(channel, payload)
+
+    def _wait_for_response(self, transaction_id: str, timeout_message: str) -> None:
+        """Block until the response of the transaction is received."""
+        try:
+            with self.tracer.span(transaction_id, WAIT_SPAN):
+                wait_until_timeout_blocking(
+                    lambda: self._is_transaction_response_received(transaction_id)
+                )
+        except AssertionError as ex:
+            self.metrics.inc(COMMAND_TIMEOUTS)
+            self.tracer.end_transaction(transaction_id, error="timeout")
+            raise RedisAggregatorAPIException(timeout_message) from ex
+
+    def _decode(self, message: Dict) -> Dict:
+        self.metrics.inc(DECODED_BYTES, len(message["data"]))
+        with self.latency_tracker.measure(DECODE):
+            return json.loads(message["data"])
+
+    def _submit_callback(self, function, function_name: str) -> None:
+        self.latency_tracker.submit(self.executor, function, function_name)
 
     # pylint: disable = logging-too-many-args
     def _batch_response(self, message: Dict) -> None:
         logging.debug("AGGREGATORS_BATCH_RESPONSE:: %s", message)
-        data = json.loads(message["data"])
+        data = self._decode(message)
         if self.aggregator_uuid != data["aggregator_uuid"]:
             return
-        with self.lock:
-            self._transaction_id_buffer.pop(
-                self._transaction_id_buffer.index(data["transaction_id"]))
-            self._transaction_id_response_buffer[data["transaction_id"]] = data
-
-        for asset_uuid, responses in data["responses"].items():
-            for command_response in responses:
-                log_bid_offer_confirmation(command_response)
-                log_deleted_bid_offer_confirmation(
-                    command_response,
-                    asset_name=get_name_from_area_name_uuid_mapping(
-                        self.area_name_uuid_mapping, asset_uuid))
-        self.on_event_or_response(data)
+        self.metrics.inc(MESSAGES_RECEIVED, type="batch_commands")
+        self.latency_tracker.finish_transaction(data["transaction_id"])
+        self.latency_tracker.record_since(EVENT_TO_RESPONSE, self._last_event_received_at)
+        with self.tracer.span(data["transaction_id"], RESPONSE_SPAN):
+            with self.lock:
+                self._transaction_id_buffer.pop(
+                    self._transaction_id_buffer.index(data["transaction_id"]))
+                self._transaction_id_response_buffer[data["transaction_id"]] = data
+
+            for asset_uuid, responses in data["responses"].items():
+                self._log_summary.add_command_responses(responses)
+                for command_response in responses:
+                    log_bid_offer_confirmation(command_response)
+                    log_deleted_bid_offer_confirmation(
+                        command_response,
+                        asset_name=get_name_from_area_name_uuid_mapping(
+                            self.area_name_uuid_mapping, asset_uuid))
+            self.on_event_or_response(data)
+        self.tracer.end_transaction(data["transaction_id"])
 
     def _aggregator_response_callback(self, message: Dict) -> None:
-        data = json.loads(message["data"])
+        data = self._decode(message)
+        self.metrics.inc(MESSAGES_RECEIVED, type="aggregator")
         if data["transaction_id"] in self._transaction_id_buffer:
+            self.latency_tracker.finish_transaction(data["transaction_id"])
             self._transaction_id_buffer.remove(data["transaction_id"])
+            self.tracer.end_transaction(data["transaction_id"])
         if data["status"] == "SELECTED":
             self._selected_by_device(data)
         if data["status"] == "UNSELECTED":
             self._unselected_by_device(data)
 
     def _events_callback_dict(self, message: Dict) -> None:
-        payload = json.loads(message["data"])
+        self._last_event_received_at = monotonic()
+        self._handle_event(self._decode(message))
+
+    def _handle_event(self, payload: Dict) -> None:
+        """Dispatch a decoded event to its handler."""
+        self.metrics.inc(MESSAGES_RECEIVED, type=payload.get("event"))
         if payload.get("event") == "market":
+            self.metrics.count_market_slot(payload.get("market_slot"))
             self._on_market_cycle(payload)
         elif payload.get("event") == "tick":
             self._on_tick(payload)
@@ -131,16 +204,13 @@ class RedisAggregator:
         # IMPORTANT: Order matters in the following two steps because redis could be faster
         # than the appending of the transaction_id to the buffer:
         self._transaction_id_buffer.append(transaction_id)
-        self.redis_db.publish(AggregatorChannels().commands, json.dumps(data))
+        self.tracer.start_transaction(transaction_id, "create_aggregator",
+                                      aggregator=self.aggregator_name)
+        self._publish(AggregatorChannels().commands, data)
 
         if is_blocking:
-            try:
-                wait_until_timeout_blocking(
-                    lambda: self._is_transaction_response_received(transaction_id)
-                )
-                return transaction_id
-            except AssertionError as ex:
-                raise RedisAggregatorAPIException("API registration process timed out.") from ex
+            self._wait_for_response(transaction_id, "API registration process timed out.")
+            return transaction_id
         return None
 
     def delete_aggregator(self, is_blocking: bool = True) -> Optional[str]:
@@ -153,16 +223,13 @@ class RedisAggregator:
                 "type": "DELETE",
                 "transaction_id": transaction_id}
         self._transaction_id_buffer.append(transaction_id)
-        self.redis_db.publish("aggregator", json.dumps(data))
+        self.tracer.start_transaction(transaction_id, "delete_aggregator",
+                                      aggregator=self.aggregator_name)
+        self._publish("aggregator", data)
 
         if is_blocking:
-            try:
-                wait_until_timeout_blocking(
-                    lambda: self._is_transaction_response_received(transaction_id)
-                )
-                return transaction_id
-            except AssertionError as ex:
-                raise RedisAggregatorAPIException("API has timed out.") from ex
+            self._wait_for_response(transaction_id, "API has timed out.")
+            return transaction_id
         return None
 
     def _selected_by_device(self, message: Dict) -> None:
@@ -205,6 +272,14 @@ class RedisAggregator:
             return None
         batch_command_dict = self._client_command_buffer.execute_batch()
         self._client_command_buffer.clear()
+        return self.send_batch_commands(batch_command_dict, is_blocking)
+
+    def send_batch_commands(self, batch_command_dict: Dict,
+                            is_blocking: bool = True) -> Optional[str]:
+        """Send the batch commands ({asset_uuid: [command, ...]}) bypassing the commands buffer.
+
+        Can be called concurrently from multiple threads.
+        """
         self._all_uuids_in_selected_device_uuid_list(batch_command_dict.keys())
         transaction_id = str(uuid.uuid4())
         batched_command = {"type": "BATCHED", "transaction_id": transaction_id,
@@ -213,26 +288,26 @@ class RedisAggregator:
         # IMPORTANT: Order matters in the following two steps because redis could be faster
         # than the appending of the transaction_id to the buffer:
         self._transaction_id_buffer.append(transaction_id)
-        self.redis_db.publish(self.channel_names.batch_commands, json.dumps(batched_command))
+        self.tracer.start_transaction(
+            transaction_id, "batch_commands",
+            **get_batch_commands_trace_attributes(self.aggregator_uuid, batch_command_dict))
+        self._publish(self.channel_names.batch_commands, batched_command)
+        self.metrics.inc(BATCHES_SENT)
+        self.metrics.inc(BATCH_COMMANDS_SENT,
+                         sum(len(commands) for commands in batch_command_dict.values()))
 
         if is_blocking:
-            try:
-                wait_until_timeout_blocking(
-                    lambda: self._is_transaction_response_received(transaction_id)
-                )
-                return self._transaction_id_response_buffer.get(transaction_id, None)
-            except AssertionError as ex:
-                raise RedisAggregatorAPIException("Sending batch commands timed out.") from ex
+            self._wait_for_response(transaction_id, "Sending batch commands timed out.")
+            return self._transaction_id_response_buffer.get(transaction_id, None)
         return None
 
     def _on_event_or_response(self, message: Dict) -> None:
-        log_msg = copy(message)
-        log_msg.pop("grid_tree", None)
-        logging.debug("A new message was received. Message information: %s", log_msg)
-        log_market_progression(message)
-        self.executor.submit(execute_function_util,
-                             function=lambda: self.on_event_or_response(message),
-                             function_name="on_event_or_response")
+        logging.debug("A new message was received. Message information: %s",
+                      MessageLogView(message))
+        if is_log_level_enabled(logging.INFO):
+            log_market_progression(message)
+        self._submit_callback(lambda: self.on_event_or_response(message),
+                              "on_event_or_response")
 
     def calculate_grid_fee(self, start_market_or_device_name: str,
                            target_market_or_device_name: Optional[str] = None,
@@ -251,10 +326,8 @@ class RedisAggregator:
         self.area_name_uuid_mapping = \
             create_area_name_uuid_mapping_from_tree_info(self.latest_grid_tree_flat)
         self.grid_fee_calculation.handle_grid_stats(self.latest_grid_tree)
-        self.executor.submit(
-            execute_function_util,
-            function=lambda: self.on_market_slot(message),
-            function_name="on_market_slot")
+        self._log_summary.flush()
+        self._submit_callback(lambda: self.on_market_slot(message), "on_market_slot")
 
     @buffer_grid_tree_info
     def _on_tick(self, message: Dict) -> None:
@@ -262,19 +335,17 @@ class RedisAggregator:
         if slot_completion_int is not None and slot_completion_int < \
                 MIN_SLOT_COMPLETION_TICK_TRIGGER_PERCENTAGE:
             return
-        self.executor.submit(execute_function_util, function=lambda: self.on_tick(message),
-                             function_name="on_tick")
+        self._submit_callback(lambda: self.on_tick(message), "on_tick")
 
     @buffer_grid_tree_info
     def _on_trade(self, message: Dict) -> None:
         for individual_trade in message["trade_list"]:
-            log_trade_info(individual_trade)
-        self.executor.submit(execute_function_util, function=lambda: self.on_trade(message),
-                             function_name="on_trade")
+            self._log_summary.add_trade(individual_trade)
+        self._submit_callback(lambda: self.on_trade(message), "on_trade")
 
     def _on_finish(self, message: Dict) -> None:
-        self.executor.submit(execute_function_util, function=lambda: self.on_finish(message),
-                             function_name="on_finish")
+        self._log_summary.flush()
+        self._submit_callback(lambda: self.on_finish(message), "on_finish")
         self.is_finished = True
 
     def on_market_cycle(self, market_info):
@@ -2,14 +2,21 @@ import json
 import logging
 import uuid
 from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Dict, Optional
 
 from gsy_framework.redis_channels import ExternalStrategyChannels, AggregatorChannels
-from gsy_framework.utils import (
-    execute_function_util, wait_until_timeout_blocking, key_in_dict_and_not_none)
+from gsy_framework.utils import wait_until_timeout_blocking, key_in_dict_and_not_none
 from redis import Redis
 
 from gsy_e_sdk import APIClientInterface
 from gsy_e_sdk.constants import MAX_WORKER_THREADS, LOCAL_REDIS_URL
+from gsy_e_sdk.latency import DECODE, PUBLISH, SERIALIZE, LatencyTracker, get_latency_tracker
+from gsy_e_sdk.metrics import (
+    COMMAND_TIMEOUTS, DECODED_BYTES, MESSAGES_RECEIVED, MetricsRegistry, get_metrics_registry)
+from gsy_e_sdk.recorder import (
+    OUTBOUND, MessageRecorder, get_message_recorder, recorded_callback)
+from gsy_e_sdk.tracing import (
+    PUBLISH_SPAN, RESPONSE_SPAN, SERIALIZE_SPAN, WAIT_SPAN, Tracer, get_tracer)
 
 
 class RedisAPIException(Exception):
@@ -20,12 +27,17 @@ class RedisClientBase(APIClientInterface):
     # pylint: disable=too-many-instance-attributes
     """Base class for redis client"""
 
+    # pylint: disable-next=too-many-arguments
     def __init__(self, area_id, autoregister=True, redis_url=LOCAL_REDIS_URL,
-                 pubsub_thread=None):
+                 pubsub_thread=None, recorder: Optional[MessageRecorder] = None,
+                 redis_db: Optional[Redis] = None,
+                 latency_tracker: Optional[LatencyTracker] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 tracer: Optional[Tracer] = None):
         super().__init__(area_id, autoregister, redis_url)
         self.area_uuid = None
         self.channel_names = ExternalStrategyChannels(False, "", asset_name=area_id)
-        self.redis_db = Redis.from_url(redis_url)
+        self.redis_db = redis_db or Redis.from_url(redis_url)
         self.pubsub = self.redis_db.pubsub() if pubsub_thread is None else pubsub_thread
         self.area_id = area_id
         self.device_uuid = None
@@ -33,8 +45,13 @@ class RedisClientBase(APIClientInterface):
         self._blocking_command_responses = {}
         self._transaction_id_buffer = []
         self._subscribed_aggregator_response_cb = None
+        self.recorder = recorder or get_message_recorder()
+        self.latency_tracker = latency_tracker or get_latency_tracker()
+        self.metrics = metrics or get_metrics_registry()
+        self.tracer = tracer or get_tracer()
         self._subscribe_to_response_channels(pubsub_thread)
         self.executor = ThreadPoolExecutor(max_workers=MAX_WORKER_THREADS)
+        self.metrics.track_executor(self.executor)
 
         if autoregister:
             self.register(is_blocking=True)
@@ -47,21 +64,56 @@ class RedisClientBase(APIClientInterface):
 
         b_aggregator_response = AggregatorChannels().response.encode("utf-8")
         if b_aggregator_response in self.pubsub.patterns:
-            self._subscribed_aggregator_response_cb = self.pubsub.patterns[b_aggregator_response]
+            # Call the unwrapped callback, the message is recorded by this client already
+            previous_callback = self.pubsub.patterns[b_aggregator_response]
+            self._subscribed_aggregator_response_cb = getattr(
+                previous_callback, "__wrapped__", previous_callback)
         channel_subs[AggregatorChannels().response] = self._aggregator_response_callback
 
-        self.pubsub.psubscribe(**channel_subs)
+        self.pubsub.psubscribe(**{channel: recorded_callback(self.recorder, callback)
+                                  for channel, callback in channel_subs.items()})
         if pubsub_thread is None:
             self.pubsub.run_in_thread(daemon=True)
 
     def _aggregator_response_callback(self, message):
         if self._subscribed_aggregator_response_cb is not None:
             self._subscribed_aggregator_response_cb(message)
-        data = json.loads(message["data"])
+        data = self._decode(message)
         if not self._is_transaction_response_received(data["transaction_id"]):
-            self._transaction_id_buffer.pop(
-                self._transaction_id_buffer.index(data["transaction_id"])
-            )
+            self.latency_tracker.finish_transaction(data["transaction_id"])
+            with self.tracer.span(data["transaction_id"], RESPONSE_SPAN):
+                self._transaction_id_buffer.pop(
+                    self._transaction_id_buffer.index(data["transaction_id"])
+                )
+            self.tracer.end_transaction(data["transaction_id"])
+
+    def _publish(self, channel: str, data: Dict) -> None:
+        transaction_id = data.get("transaction_id")
+        with self.latency_tracker.measure(SERIALIZE), \
+                self.tracer.span(transaction_id, SERIALIZE_SPAN):
+            payload = json.dumps(data)
+        if self.recorder is not None:
+            self.recorder.record(OUTBOUND, channel, payload)
+        self.latency_tracker.start_transaction(transaction_id)
+        with self.latency_tracker.measure(PUBLISH), \
+                self.tracer.span(transaction_id, PUBLISH_SPAN, channel=channel):
+            self.redis_db.publish(channel, payload)
+
+    def _wait_for_response(self, transaction_id: str, condition, timeout_message: str,
+                           **kwargs) -> None:
+        """Block until condition() is true, raise RedisAPIException if it times out."""
+        try:
+            with self.tracer.span(transaction_id, WAIT_SPAN):
+                wait_until_timeout_blocking(condition, **kwargs)
+        except AssertionError as ex:
+            self.metrics.inc(COMMAND_TIMEOUTS)
+            self.tracer.end_transaction(transaction_id, error="timeout")
+            raise RedisAPIException(timeout_message) from ex
+
+    def _decode(self, message: Dict) -> Dict:
+        self.metrics.inc(DECODED_BYTES, len(message["data"]))
+        with self.latency_tracker.measure(DECODE):
+            return json.loads(message["data"])
 
     def _check_buffer_message_matching_command_and_id(self, message):
         if key_in_dict_and_not_none(message, "transaction_id"):
@@ -85,16 +137,15 @@ class RedisClientBase(APIClientInterface):
             raise RedisAPIException("API is already registered to the market.")
         data = {"name": self.area_id, "transaction_id": str(uuid.uuid4())}
         self._blocking_command_responses["register"] = data
-        self.redis_db.publish(self.channel_names.register, json.dumps(data))
+        self.tracer.start_transaction(data["transaction_id"], "register", asset=self.area_id)
+        self._publish(self.channel_names.register, data)
 
         if is_blocking:
-            try:
-                wait_until_timeout_blocking(lambda: self.is_active, timeout=120)
-            except AssertionError as ex:
-                raise RedisAPIException(
-                    "API registration process timed out. Server will continue processing your "
-                    "request on the background and will notify you as soon as the registration "
-                    "has been completed.") from ex
+            self._wait_for_response(
+                data["transaction_id"], lambda: self.is_active,
+                "API registration process timed out. Server will continue processing your "
+                "request on the background and will notify you as soon as the registration "
+                "has been completed.", timeout=120)
 
     def unregister(self, is_blocking=True):
         logging.info("Trying to unregister from %s", self.area_id)
@@ -104,44 +155,51 @@ class RedisClientBase(APIClientInterface):
 
         data = {"name": self.area_id, "transaction_id": str(uuid.uuid4())}
         self._blocking_command_responses["unregister"] = data
-        self.redis_db.publish(self.channel_names.unregister, json.dumps(data))
+        self.tracer.start_transaction(data["transaction_id"], "unregister", asset=self.area_id)
+        self._publish(self.channel_names.unregister, data)
 
         if is_blocking:
-            try:
-                wait_until_timeout_blocking(lambda: not self.is_active, timeout=120)
-            except AssertionError as ex:
-                raise RedisAPIException(
-                    "API unregister process timed out. Server will continue processing your "
-                    "request on the background and will notify you as soon as the unregistration "
-                    "has been completed.") from ex
+            self._wait_for_response(
+                data["transaction_id"], lambda: not self.is_active,
+                "API unregister process timed out. Server will continue processing your "
+                "request on the background and will notify you as soon as the unregistration "
+                "has been completed.", timeout=120)
 
     def _on_register(self, msg):
-        message = json.loads(msg["data"])
+        message = self._decode(msg)
         self._check_buffer_message_matching_command_and_id(message)
-        self.area_uuid = message["device_uuid"]
+        self.latency_tracker.finish_transaction(message["transaction_id"])
+        with self.tracer.span(message["transaction_id"], RESPONSE_SPAN):
+            self.area_uuid = message["device_uuid"]
 
-        logging.info("%s was registered", self.area_id)
-        self.is_active = True
+            logging.info("%s was registered", self.area_id)
+            self.is_active = True
 
-        def executor_function():
-            self.on_register(message)
+            def executor_function():
+                self.on_register(message)
 
-        self.executor.submit(executor_function)
+            self.executor.submit(executor_function)
+        self.tracer.end_transaction(message["transaction_id"])
 
     def _on_unregister(self, msg):
-        message = json.loads(msg["data"])
+        message = self._decode(msg)
         self._check_buffer_message_matching_command_and_id(message)
+        self.latency_tracker.finish_transaction(message["transaction_id"])
         if message.get("response") != "success":
+            self.tracer.end_transaction(message["transaction_id"], error=message.get("response"))
             raise RedisAPIException(
                 f"Failed to unregister from market {self.area_id}. Deactivating connection.")
 
         self.is_active = False
+        self.tracer.end_transaction(message["transaction_id"])
 
     def _on_event_or_response(self, msg):
-        message = json.loads(msg["data"])
-        self.executor.submit(execute_function_util,
-                             function=lambda: self.on_event_or_response(message),
-                             function_name="on_event_or_response")
+        message = self._decode(msg)
+        self.metrics.inc(MESSAGES_RECEIVED, type=message.get("event") or message.get("command"))
+        if message.get("event") == "market":
+            self.metrics.count_market_slot(message.get("market_slot"))
+        self.latency_tracker.submit(self.executor, lambda: self.on_event_or_response(message),
+                                    "on_event_or_response")
 
     def select_aggregator(self, aggregator_uuid, is_blocking=True):
         """Send select aggregator command to gsy-e."""
@@ -156,17 +214,16 @@ class RedisClientBase(APIClientInterface):
                 "type": "SELECT",
                 "transaction_id": transaction_id}
         self._transaction_id_buffer.append(transaction_id)
-        self.redis_db.publish(AggregatorChannels().commands, json.dumps(data))
+        self.tracer.start_transaction(transaction_id, "select_aggregator", asset=self.area_id,
+                                      aggregator=aggregator_uuid)
+        self._publish(AggregatorChannels().commands, data)
 
         if is_blocking:
-            try:
-                wait_until_timeout_blocking(
-                    lambda: self._is_transaction_response_received(transaction_id)
-                )
-                logging.info("%s has selected AGGREGATOR: %s", self.area_id, aggregator_uuid)
-                return transaction_id
-            except AssertionError as ex:
-                raise RedisAPIException("API has timed out.") from ex
+            self._wait_for_response(
+                transaction_id, lambda: self._is_transaction_response_received(transaction_id),
+                "API has timed out.")
+            logging.info("%s has selected AGGREGATOR: %s", self.area_id, aggregator_uuid)
+            return transaction_id
         return None
 
     def unselect_aggregator(self, aggregator_uuid):
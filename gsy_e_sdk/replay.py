@@ -0,0 +1,372 @@
+"""Replay recorded exchange traffic into aggregator strategies, without a running exchange.
+
+The recorded market, tick, trade and selection events are fed into an instance of the
+aggregator class, as fast as possible or at a chosen speedup. Commands that the strategy sends
+are answered immediately: batch commands with the batch responses of the recording (in the
+order they were recorded) or with generated ones once those are used up. All callbacks are
+executed synchronously and timed.
+"""
+import gzip
+import json
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import requests
+from gsy_framework.redis_channels import AggregatorChannels
+from tabulate import tabulate
+
+from gsy_e_sdk.authentication import get_jwt_token_manager
+from gsy_e_sdk.recorder import FILE_MAGIC, INBOUND, OUTBOUND, RecordedMessage, iter_recording
+from gsy_e_sdk.redis_aggregator import RedisAggregator
+
+REPLAY_SIMULATION_ID = "replay"
+REPLAY_DOMAIN_NAME = "http://replay"
+REPLAY_WEBSOCKETS_DOMAIN_NAME = "ws://replay"
+
+
+class CallbackTiming(NamedTuple):
+    """Execution times of one callback (including the callbacks that it triggered)."""
+    count: int
+    total_secs: float
+    max_secs: float
+
+    @property
+    def mean_secs(self) -> float:
+        """Return the mean execution time."""
+        return self.total_secs / self.count if self.count else 0.0
+
+
+class ReplayReport(NamedTuple):
+    """Summary of a replay run."""
+    messages: int
+    recorded_duration_secs: float
+    elapsed_secs: float
+    sent_batch_commands: int
+    recorded_batch_commands: int
+    stubbed_responses: int
+    callback_timings: Dict[str, CallbackTiming]
+
+    @property
+    def speedup(self) -> float:
+        """Return how much faster than recorded the messages were replayed."""
+        return self.recorded_duration_secs / self.elapsed_secs if self.elapsed_secs else 0.0
+
+
+def format_replay_report(report: ReplayReport) -> str:
+    """Return the report as human readable tables."""
+    summary = tabulate([
+        ["Messages", report.messages],
+        ["Recorded duration (s)", round(report.recorded_duration_secs, 3)],
+        ["Replay duration (s)", round(report.elapsed_secs, 3)],
+        ["Speedup", round(report.speedup, 1)],
+        ["Sent batch commands (recorded)",
+         f"{report.sent_batch_commands} ({report.recorded_batch_commands})"],
+        ["Generated batch responses", report.stubbed_responses]], tablefmt="github")
+    timings = tabulate(
+        [[name, timing.count, round(timing.total_secs * 1000, 3),
+          round(timing.mean_secs * 1000, 3), round(timing.max_secs * 1000, 3)]
+         for name, timing in sorted(report.callback_timings.items())],
+        headers=["Callback", "Calls", "Total (ms)", "Mean (ms)", "Max (ms)"], tablefmt="github")
+    return f"{summary}\n\n{timings}"
+
+
+def iter_replay_messages(file_path: str) -> Iterator[RecordedMessage]:
+    """Yield the messages of a recording (see gsy_e_sdk.recorder) or of a JSON lines file.
+
+    Every line of a JSON lines file is a {"timestamp": seconds, "data": message} object, with
+    optional "channel" and "direction" ("in" or "out", defaults to "in") members.
+    """
+    with open(file_path, "rb") as replay_file:
+        is_recording = replay_file.read(len(FILE_MAGIC)) == FILE_MAGIC
+    if is_recording:
+        yield from iter_recording(file_path)
+        return
+    with open(file_path, "r", encoding="utf-8") as replay_file:
+        for line in replay_file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            yield RecordedMessage(
+                float(entry["timestamp"]), float(entry["timestamp"]),
+                OUTBOUND if entry.get("direction") == "out" else INBOUND,
+                entry.get("channel", ""), json.dumps(entry["data"]).encode("utf-8"))
+
+
+class TimingExecutor(Executor):
+    """Executor that runs the submitted callbacks immediately and records their durations."""
+
+    def __init__(self):
+        self.timings: Dict[str, CallbackTiming] = {}
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        function_name = kwargs.get("function_name") or getattr(fn, "__name__", repr(fn))
+        future = Future()
+        start_time = time.perf_counter()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as ex:  # pylint: disable=broad-except
+            future.set_exception(ex)
+        duration = time.perf_counter() - start_time
+        timing = self.timings.get(function_name, CallbackTiming(0, 0.0, 0.0))
+        self.timings[function_name] = CallbackTiming(
+            timing.count + 1, timing.total_secs + duration, max(timing.max_secs, duration))
+        return future
+
+
+def _generate_command_response(asset_uuid: str, command: Dict) -> Dict:
+    command_name = command.get("type")
+    response = {"command": command_name, "status": "ready", "asset_uuid": asset_uuid}
+    if command_name in ("bid", "offer"):
+        trader_key = "buyer" if command_name == "bid" else "seller"
+        response[command_name] = json.dumps({
+            "id": str(uuid.uuid4()), "energy": command.get("energy"),
+            "price": command.get("price"), trader_key: asset_uuid})
+    return response
+
+
+class SynchronousPubSub:
+    """Stand-in for the redis PubSub object, the callbacks are called by the engine."""
+
+    def __init__(self):
+        self.patterns: Dict[bytes, Callable] = {}
+
+    def psubscribe(self, **channels) -> None:
+        """Register the callbacks of the channels."""
+        for channel, callback in channels.items():
+            self.patterns[channel.encode("utf-8")] = callback
+
+    def run_in_thread(self, **_kwargs) -> None:
+        """Do nothing, the messages are delivered by the engine."""
+
+    def deliver(self, channel: str, data: Dict) -> None:
+        """Call the callback of the channel with the message."""
+        callback = self.patterns.get(channel.encode("utf-8"))
+        if callback is not None:
+            callback({"type": "pmessage", "pattern": channel.encode("utf-8"),
+                      "channel": channel.encode("utf-8"),
+                      "data": json.dumps(data).encode("utf-8")})
+
+
+class SynchronousRedis:
+    """Stand-in for the redis connection of a RedisAggregator, without threads."""
+
+    def __init__(self, on_publish: Callable[[str, Dict], None]):
+        self.on_publish = on_publish
+        self._pubsub = SynchronousPubSub()
+
+    def pubsub(self) -> SynchronousPubSub:
+        """Return the pubsub object that is shared by all subscriptions."""
+        return self._pubsub
+
+    def publish(self, channel: str, payload: str) -> int:
+        """Pass the published message to the engine."""
+        self.on_publish(channel, json.loads(payload))
+        return 1
+
+
+class _ReplayResponse(requests.Response):
+    def __init__(self, url: str, body):
+        super().__init__()
+        self.status_code = 200
+        self.url = url
+        self._content = json.dumps(body).encode("utf-8")
+
+
+class _ReplayHTTPSession(requests.Session):
+    """HTTP session that answers the requests of a REST Aggregator locally."""
+
+    def __init__(self, aggregator_uuid: str, on_batch_commands: Callable[[Dict], None]):
+        super().__init__()
+        self.aggregator_uuid = aggregator_uuid
+        self.on_batch_commands = on_batch_commands
+
+    # pylint: disable-next=arguments-differ
+    def request(self, method, url, data=None, headers=None, **_kwargs):
+        if isinstance(data, bytes) and (headers or {}).get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        payload = json.loads(data) if data else {}
+        if url.endswith("api-token-auth/"):
+            return _ReplayResponse(url, {"access": "replay-token"})
+        if url.endswith("list-aggregators/"):
+            return _ReplayResponse(url, [])
+        if url.endswith("create-aggregator/"):
+            return _ReplayResponse(url, {"uuid": self.aggregator_uuid,
+                                         "name": payload.get("name")})
+        if url.endswith("batch-commands/"):
+            self.on_batch_commands(payload)
+        return _ReplayResponse(url, {})
+
+
+class _ReplayWebsocketManager:
+    """Stand-in for the websocket manager, the messages are delivered by the replay engine."""
+
+    def __init__(self, callback_executor: Executor):
+        self.callback_executor = callback_executor
+        self.dispatcher = None
+
+    def add_connection(self, _websocket_uri: str, _domain_name: str, message_dispatcher):
+        """Keep the dispatcher of the aggregator."""
+        self.dispatcher = message_dispatcher
+
+
+@contextmanager
+def _placeholder_credentials():
+    """Set the credentials that the REST clients require while they are created offline.
+
+    The authentication request is answered by _ReplayHTTPSession, the variables are removed
+    again so that later clients of the process do not pick them up.
+    """
+    missing_names = [name for name in ("API_CLIENT_USERNAME", "API_CLIENT_PASSWORD")
+                     if name not in os.environ]
+    os.environ.update({name: "replay" for name in missing_names})
+    try:
+        yield
+    finally:
+        for name in missing_names:
+            os.environ.pop(name, None)
+
+
+class ReplayEngine:
+    """Replay a recording into a RedisAggregator or (REST) Aggregator subclass."""
+
+    def __init__(self, recording_file: str, aggregator_class,
+                 aggregator_name: str = "replay-aggregator",
+                 aggregator_kwargs: Optional[Dict] = None):
+        self.recording_file = recording_file
+        self.aggregator_class = aggregator_class
+        self.aggregator_name = aggregator_name
+        self.aggregator_kwargs = aggregator_kwargs or {}
+        self.executor = TimingExecutor()
+        self.aggregator = None
+        self._recorded_responses = deque()
+        self._recorded_device_uuids: List[str] = []
+        self._recorded_batch_commands = 0
+        self._sent_batch_commands = 0
+        self._stubbed_responses = 0
+        self._redis_db: Optional[SynchronousRedis] = None
+        self._websocket_manager: Optional[_ReplayWebsocketManager] = None
+
+    @property
+    def _is_redis(self) -> bool:
+        return issubclass(self.aggregator_class, RedisAggregator)
+
+    @staticmethod
+    def _is_batch_response(data: Dict) -> bool:
+        return data.get("command") == "batch_commands" or (
+            "responses" in data and "event" not in data)
+
+    def _scan_recording(self) -> None:
+        device_uuids = {}
+        for message in iter_replay_messages(self.recording_file):
+            data = message.data
+            if message.direction == OUTBOUND and "batch_commands" in data:
+                self._recorded_batch_commands += 1
+                device_uuids.update(dict.fromkeys(data["batch_commands"]))
+            elif message.direction == INBOUND and self._is_batch_response(data):
+                self._recorded_responses.append(data)
+                device_uuids.update(dict.fromkeys(data.get("responses", {})))
+            elif data.get("event") == "selected_by_device" or data.get("status") == "SELECTED":
+                device_uuids[data["device_uuid"]] = None
+        self._recorded_device_uuids = list(device_uuids)
+
+    def _create_batch_response(self, batch_command: Dict) -> Dict:
+        if self._recorded_responses:
+            response = dict(self._recorded_responses.popleft())
+        else:
+            self._stubbed_responses += 1
+            response = {"command": "batch_commands", "status": "ready", "responses": {
+                asset_uuid: [_generate_command_response(asset_uuid, command)
+                             for command in commands]
+                for asset_uuid, commands in batch_command["batch_commands"].items()}}
+        response.update({"transaction_id": batch_command["transaction_id"],
+                         "aggregator_uuid": self.aggregator.aggregator_uuid})
+        return response
+
+    @staticmethod
+    def _is_replayed(data: Dict) -> bool:
+        # Events and selections, but not the responses to the recorded commands
+        return "event" in data or data.get("status") in ("SELECTED", "UNSELECTED")
+
+    def _on_redis_publish(self, channel: str, data: Dict) -> None:
+        pubsub = self._redis_db.pubsub()
+        if data.get("type") == "BATCHED":
+            self._sent_batch_commands += 1
+            pubsub.deliver(self.aggregator.channel_names.batch_commands_response,
+                           self._create_batch_response(data))
+        elif channel == AggregatorChannels().commands:
+            pubsub.deliver(AggregatorChannels().response, {
+                "transaction_id": data["transaction_id"], "status": "ready"})
+
+    def _on_rest_batch_commands(self, data: Dict) -> None:
+        self._sent_batch_commands += 1
+        self._websocket_manager.dispatcher.received_message(self._create_batch_response(data))
+
+    def _create_aggregator(self):
+        if self._is_redis:
+            self._redis_db = SynchronousRedis(self._on_redis_publish)
+            aggregator = self.aggregator_class(
+                self.aggregator_name, redis_db=self._redis_db, **self.aggregator_kwargs)
+            aggregator.executor = self.executor
+        else:
+            self._websocket_manager = _ReplayWebsocketManager(self.executor)
+            with _placeholder_credentials():
+                aggregator = self.aggregator_class(
+                    self.aggregator_name, simulation_id=REPLAY_SIMULATION_ID,
+                    domain_name=REPLAY_DOMAIN_NAME,
+                    websockets_domain_name=REPLAY_WEBSOCKETS_DOMAIN_NAME,
+                    http_session=_ReplayHTTPSession(
+                        str(uuid.uuid4()), self._on_rest_batch_commands),
+                    websocket_manager=self._websocket_manager, **self.aggregator_kwargs)
+        for device_uuid in self._recorded_device_uuids:
+            if device_uuid not in aggregator.device_uuid_list:
+                aggregator.device_uuid_list.append(device_uuid)
+        return aggregator
+
+    def _deliver(self, data: Dict) -> None:
+        if not self._is_redis:
+            self._websocket_manager.dispatcher.received_message(data)
+        elif "event" in data:
+            self._redis_db.pubsub().deliver(self.aggregator.channel_names.events, data)
+        else:
+            self._redis_db.pubsub().deliver(AggregatorChannels().response, data)
+
+    def run(self, speedup: Optional[float] = None) -> ReplayReport:
+        """Replay the recording as fast as possible, or speedup times faster than recorded."""
+        self._scan_recording()
+        self.aggregator = self._create_aggregator()
+        first_timestamp = last_timestamp = None
+        message_count = 0
+        start_time = time.perf_counter()
+        try:
+            for message in iter_replay_messages(self.recording_file):
+                if message.direction != INBOUND:
+                    continue
+                data = message.data
+                if not self._is_replayed(data):
+                    continue
+                if first_timestamp is None:
+                    first_timestamp = message.timestamp
+                last_timestamp = message.timestamp
+                if speedup:
+                    delay = ((message.timestamp - first_timestamp) / speedup
+                             - (time.perf_counter() - start_time))
+                    if delay > 0:
+                        time.sleep(delay)
+                self._deliver(data)
+                message_count += 1
+        finally:
+            if not self._is_redis:
+                get_jwt_token_manager().invalidate(REPLAY_DOMAIN_NAME)
+        return ReplayReport(
+            messages=message_count,
+            recorded_duration_secs=(last_timestamp - first_timestamp) if message_count else 0.0,
+            elapsed_secs=time.perf_counter() - start_time,
+            sent_batch_commands=self._sent_batch_commands,
+            recorded_batch_commands=self._recorded_batch_commands,
+            stubbed_responses=self._stubbed_responses,
+            callback_timings=dict(self.executor.timings))
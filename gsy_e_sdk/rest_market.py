@@ -1,30 +1,34 @@
 from concurrent.futures.thread import ThreadPoolExecutor
 
-from gsy_framework.client_connections.utils import RestCommunicationMixin, blocking_post_request
-from gsy_framework.client_connections.websocket_connection import WebsocketThread
-
+from gsy_e_sdk.async_rest import AsyncRestTransport, get_async_rest_transport
+from gsy_e_sdk.authentication import JWTAuthenticationMixin, get_jwt_token_manager
 from gsy_e_sdk.constants import MAX_WORKER_THREADS
+from gsy_e_sdk.http_session import HTTPSessionMixin, blocking_post_request, get_http_session
 from gsy_e_sdk.utils import domain_name_from_env, websocket_domain_name_from_env, \
     simulation_id_from_env
-from gsy_e_sdk.utils import (retrieve_jwt_key_from_server,
-                             logging_decorator, get_aggregator_prefix)
+from gsy_e_sdk.utils import logging_decorator, get_aggregator_prefix
 from gsy_e_sdk.websocket_device import DeviceWebsocketMessageReceiver
+from gsy_e_sdk.websocket_manager import WebsocketThread
 
 
-class RestMarketClient(RestCommunicationMixin):
+class RestMarketClient(JWTAuthenticationMixin, HTTPSessionMixin):
 
-    def __init__(self, area_id, simulation_id=None, domain_name=None, websockets_domain_name=None):
+    def __init__(self, area_id, simulation_id=None, domain_name=None, websockets_domain_name=None,
+                 rest_transport=None, http_session=None, websocket_manager=None):
         self.area_id = area_id
+        self.websocket_manager = websocket_manager
         self.simulation_id = simulation_id if simulation_id else simulation_id_from_env()
         self.domain_name = domain_name if domain_name else domain_name_from_env()
         self.websockets_domain_name = websockets_domain_name \
             if websockets_domain_name else websocket_domain_name_from_env()
-        self.jwt_token = retrieve_jwt_key_from_server(self.domain_name)
-        self._create_jwt_refresh_timer(self.domain_name)
+        self.http_session = http_session or get_http_session()
+        self.jwt_domain_name = self.domain_name
+        get_jwt_token_manager().get_token(self.jwt_domain_name, session=self.http_session)
 
         self.start_websocket_connection()
         self.aggregator_prefix = get_aggregator_prefix(self.domain_name, self.simulation_id)
         self.active_aggregator = None
+        self.rest_transport = rest_transport or get_async_rest_transport(http_session)
 
     @property
     def endpoint_prefix(self):
@@ -33,6 +37,11 @@ class RestMarketClient(RestCommunicationMixin):
     def start_websocket_connection(self):
         self.dispatcher = DeviceWebsocketMessageReceiver(self)
         websocket_uri = f"{self.websockets_domain_name}/{self.simulation_id}/{self.area_id}/"
+        if self.websocket_manager is not None:
+            self.websocket_connection = self.websocket_manager.add_connection(
+                websocket_uri, self.domain_name, self.dispatcher)
+            self.callback_thread = self.websocket_manager.callback_executor
+            return
         self.websocket_thread = WebsocketThread(websocket_uri, self.domain_name,
                                                 self.dispatcher)
         self.websocket_thread.start()
@@ -42,16 +51,25 @@ class RestMarketClient(RestCommunicationMixin):
     def select_aggregator(self, aggregator_uuid):
         response = blocking_post_request(f'{self.aggregator_prefix}select-aggregator/',
                                          {"aggregator_uuid": aggregator_uuid,
-                                          "device_uuid": self.area_id}, self.jwt_token)
+                                          "device_uuid": self.area_id}, self.jwt_token,
+                                         session=self.http_session)
         self.active_aggregator = response["aggregator_uuid"] if response else None
 
     @logging_decorator('unselect-aggregator')
     def unselect_aggregator(self, aggregator_uuid):
         response = blocking_post_request(f'{self.aggregator_prefix}unselect-aggregator/',
                                          {"aggregator_uuid": aggregator_uuid,
-                                          "device_uuid": self.area_id}, self.jwt_token)
+                                          "device_uuid": self.area_id}, self.jwt_token,
+                                         session=self.http_session)
         self.active_aggregator = None
 
+    async def async_select_aggregator(self, aggregator_uuid):
+        """Connect the market with its aggregator without blocking the running event loop."""
+        response = await self.rest_transport.blocking_post(
+            f'{self.aggregator_prefix}select-aggregator/',
+            {"aggregator_uuid": aggregator_uuid, "device_uuid": self.area_id}, self.jwt_token)
+        self.active_aggregator = response["aggregator_uuid"] if response else None
+
     @logging_decorator('grid_fees')
     def grid_fees(self, fee_cents_per_kWh):
         transaction_id, get_sent = self._post_request(f"{self.endpoint_prefix}/grid-fee", {"fee_const": fee_cents_per_kWh})
@@ -0,0 +1,195 @@
+"""Index of the areas of a scenario, fetched and parsed once per simulation."""
+import json
+import time
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from gsy_e_sdk.constants import PERSISTENT_CACHE_MAX_AGE_SECS, SCENARIO_INDEX_TTL_SECS
+from gsy_e_sdk.persistent_cache import (
+    PersistentCache, compute_cache_version, get_persistent_cache)
+from gsy_e_sdk.utils import AreaNotFoundException, execute_graphql_request
+
+PERSISTENT_CACHE_NAMESPACE = "scenario_index"
+
+SCENARIO_QUERY = '''query { readConfiguration(uuid: "%s")
+                { scenarioData { latest { serialized } } } }'''
+
+
+class ScenarioIndex:
+    """Lookup tables of the areas of a serialized scenario.
+
+    Names are resolved to the first matching area in depth-first order, like the recursive
+    lookup of get_area_uuid_from_area_name.
+    """
+
+    def __init__(self, configuration_id: str, serialized_scenario: Optional[dict] = None,
+                 areas: Optional[List[Tuple[str, str, Optional[str]]]] = None):
+        self.configuration_id = configuration_id
+        # (name, uuid, type) of every area in depth-first order, used to persist the index
+        self.areas: List[Tuple[str, str, Optional[str]]] = []
+        self.name_to_uuid: Dict[str, str] = {}
+        self.uuid_to_name: Dict[str, str] = {}
+        self.uuid_to_type: Dict[str, str] = {}
+        self.uuids_by_type: Dict[str, List[str]] = defaultdict(list)
+        self.from_persistent_cache = False
+        if serialized_scenario is not None:
+            self._index_scenario(serialized_scenario)
+        for area in areas or []:
+            self._add_area(*area)
+
+    def _index_scenario(self, area: dict) -> None:
+        # Iterative walk, deep scenarios should not hit the recursion limit
+        stack = [area]
+        while stack:
+            area = stack.pop()
+            if "name" in area and "uuid" in area:
+                self._add_area(area["name"], area["uuid"], area.get("type"))
+            stack.extend(reversed(area.get("children") or []))
+
+    def _add_area(self, name: str, area_uuid: str, area_type: Optional[str]) -> None:
+        self.areas.append((name, area_uuid, area_type))
+        self.name_to_uuid.setdefault(name, area_uuid)
+        self.uuid_to_name[area_uuid] = name
+        if area_type:
+            self.uuid_to_type[area_uuid] = area_type
+            self.uuids_by_type[area_type].append(area_uuid)
+
+    def resolve(self, area_name: str) -> str:
+        """Return the uuid of the area with the provided name."""
+        try:
+            return self.name_to_uuid[area_name]
+        except KeyError:
+            raise AreaNotFoundException(
+                f"Area with name {area_name} is not part of the "
+                f"collaboration with UUID {self.configuration_id}") from None
+
+    def resolve_many(self, area_names: Iterable[str]) -> Dict[str, str]:
+        """Return a mapping from each of the provided area names to its uuid."""
+        area_names = list(area_names)
+        missing_names = [name for name in area_names if name not in self.name_to_uuid]
+        if missing_names:
+            raise AreaNotFoundException(
+                f"Areas with names {missing_names} are not part of the "
+                f"collaboration with UUID {self.configuration_id}")
+        return {name: self.name_to_uuid[name] for name in area_names}
+
+    def get_names_by_type(self, area_type: str) -> List[str]:
+        """Return the names of all areas of the provided type (e.g. PV, LoadHours)."""
+        return [self.uuid_to_name[area_uuid]
+                for area_uuid in self.uuids_by_type.get(area_type, [])]
+
+
+def fetch_serialized_scenario(configuration_id: str, domain_name: str,
+                              session: Optional[requests.Session] = None) -> dict:
+    """Fire a request to get the serialized scenario of the collaboration."""
+    data = execute_graphql_request(
+        domain_name=domain_name, query=SCENARIO_QUERY % configuration_id, session=session)
+    try:
+        return json.loads(
+            data["data"]["readConfiguration"]["scenarioData"]["latest"]["serialized"])
+    except (KeyError, TypeError) as ex:
+        raise AreaNotFoundException(
+            f"Scenario of the collaboration with UUID {configuration_id} could not be "
+            f"retrieved: {(data or {}).get('errors')}") from ex
+
+
+_scenario_indexes: Dict[Tuple[str, str], Tuple[ScenarioIndex, float]] = {}
+_scenario_index_locks: Dict[Tuple[str, str], Lock] = {}
+_scenario_indexes_lock = Lock()
+
+
+def _load_persisted_index(cache: PersistentCache, configuration_id: str,
+                          domain_name: str) -> Optional[ScenarioIndex]:
+    # The scenario can be edited while no client runs, so persisted indexes expire
+    areas = cache.get(PERSISTENT_CACHE_NAMESPACE, f"{domain_name}/{configuration_id}",
+                      max_age=PERSISTENT_CACHE_MAX_AGE_SECS)
+    if areas is None:
+        return None
+    index = ScenarioIndex(configuration_id, areas=[tuple(area) for area in areas])
+    index.from_persistent_cache = True
+    return index
+
+
+def _persist_index(cache: PersistentCache, index: ScenarioIndex, domain_name: str) -> None:
+    key = f"{domain_name}/{index.configuration_id}"
+    version = compute_cache_version(index.areas)
+    # Only write if the scenario changed or the entry expires, so that concurrent restarts do
+    # not contend for the db
+    if cache.get(PERSISTENT_CACHE_NAMESPACE, key, version=version,
+                 max_age=PERSISTENT_CACHE_MAX_AGE_SECS / 2) is None:
+        cache.set(PERSISTENT_CACHE_NAMESPACE, key, index.areas, version=version)
+
+
+def _get_cached_index(key: Tuple[str, str]) -> Optional[ScenarioIndex]:
+    with _scenario_indexes_lock:
+        cached = _scenario_indexes.get(key)
+    return cached[0] if cached is not None and cached[1] > time.time() else None
+
+
+# pylint: disable-next=too-many-arguments
+def get_scenario_index(configuration_id: str, domain_name: str,
+                       session: Optional[requests.Session] = None,
+                       ttl: float = SCENARIO_INDEX_TTL_SECS,
+                       cache_dir: Optional[str] = None, refresh: bool = False) -> ScenarioIndex:
+    """Return the index of the scenario, fetching the scenario only if it is not cached.
+
+    Indexes are memoized in-process for ttl seconds. If cache_dir (or the API_CLIENT_CACHE_DIR
+    environment variable) is set, the index is also persisted, so that a restarted process can
+    skip the request. Persisted indexes are trusted for PERSISTENT_CACHE_MAX_AGE_SECS, or
+    until a name can not be resolved, see resolve_area_uuids. Pass refresh=True to always
+    fetch the scenario from the server.
+    """
+    persistent_cache = get_persistent_cache(cache_dir)
+    key = (domain_name, configuration_id)
+    index = None if refresh else _get_cached_index(key)
+    if index is not None:
+        return index
+    with _scenario_indexes_lock:
+        scenario_lock = _scenario_index_locks.setdefault(key, Lock())
+    # Only one fetch per scenario, lookups of other scenarios are not blocked by it
+    with scenario_lock:
+        if not refresh:
+            # Another thread may have fetched the scenario while this one waited for the lock
+            index = _get_cached_index(key)
+            if index is not None:
+                return index
+            with _scenario_indexes_lock:
+                was_indexed = key in _scenario_indexes
+            if not was_indexed and persistent_cache is not None:
+                index = _load_persisted_index(persistent_cache, configuration_id, domain_name)
+        if index is None:
+            index = ScenarioIndex(
+                configuration_id,
+                fetch_serialized_scenario(configuration_id, domain_name, session))
+            if persistent_cache is not None:
+                _persist_index(persistent_cache, index, domain_name)
+
+        with _scenario_indexes_lock:
+            _scenario_indexes[key] = (index, time.time() + ttl)
+        return index
+
+
+def resolve_area_uuids(configuration_id: str, domain_name: str, area_names: Iterable[str],
+                       session: Optional[requests.Session] = None) -> Dict[str, str]:
+    """Return a mapping from each of the provided area names to its uuid.
+
+    If an index that was loaded from the persistent cache misses a name, the scenario might
+    have been edited since, so it is fetched again before giving up.
+    """
+    index = get_scenario_index(configuration_id, domain_name, session=session)
+    try:
+        return index.resolve_many(area_names)
+    except AreaNotFoundException:
+        if not index.from_persistent_cache:
+            raise
+    return get_scenario_index(
+        configuration_id, domain_name, session=session, refresh=True).resolve_many(area_names)
+
+
+def clear_scenario_index_cache() -> None:
+    """Drop all in-process scenario indexes, e.g. after the scenario was edited."""
+    with _scenario_indexes_lock:
+        _scenario_indexes.clear()
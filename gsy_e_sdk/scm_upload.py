@@ -0,0 +1,143 @@
+"""Upload large SCM member and global data payloads in compressed, retried chunks."""
+import json
+import logging
+import time
+import uuid
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+from gsy_e_sdk.constants import (
+    SCM_UPLOAD_GZIP_MIN_SIZE, SCM_UPLOAD_MAX_CHUNK_BYTES, SCM_UPLOAD_MAX_CONCURRENCY,
+    SCM_UPLOAD_MAX_RETRIES, SCM_UPLOAD_RETRY_BACKOFF_SECS)
+from gsy_e_sdk.http_session import check_response, send_request
+
+
+class SCMChunkResult(NamedTuple):
+    """Outcome of the upload of one chunk of members."""
+    transaction_id: str
+    member_uuids: List[str]
+    payload_size: int
+    attempts: int
+    success: bool
+
+
+class SCMUploadReport(NamedTuple):
+    """Summary of an SCM upload."""
+    chunks: List[SCMChunkResult]
+    elapsed_secs: float
+
+    @property
+    def success(self) -> bool:
+        """Return whether all chunks were uploaded."""
+        return all(chunk.success for chunk in self.chunks)
+
+    @property
+    def failed_chunks(self) -> List[SCMChunkResult]:
+        """Return the chunks that could not be uploaded."""
+        return [chunk for chunk in self.chunks if not chunk.success]
+
+    @property
+    def members_per_sec(self) -> float:
+        """Return the number of uploaded members per second."""
+        members = sum(len(chunk.member_uuids) for chunk in self.chunks if chunk.success)
+        return members / self.elapsed_secs if self.elapsed_secs else 0.0
+
+    @property
+    def bytes_per_sec(self) -> float:
+        """Return the uploaded (uncompressed) payload bytes per second."""
+        payload_size = sum(chunk.payload_size for chunk in self.chunks if chunk.success)
+        return payload_size / self.elapsed_secs if self.elapsed_secs else 0.0
+
+
+def chunk_members(members: Dict[str, Dict], max_chunk_bytes: int = SCM_UPLOAD_MAX_CHUNK_BYTES
+                  ) -> List[Dict[str, Dict]]:
+    """Split the {member_uuid: member_data} dict into chunks of bounded JSON size.
+
+    Members are never split, a member that is larger than max_chunk_bytes gets its own chunk.
+    """
+    chunks = []
+    chunk, chunk_size = {}, 0
+    for member_uuid, member_data in members.items():
+        member_size = len(json.dumps({member_uuid: member_data}))
+        if chunk and chunk_size + member_size > max_chunk_bytes:
+            chunks.append(chunk)
+            chunk, chunk_size = {}, 0
+        chunk[member_uuid] = member_data
+        chunk_size += member_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class SCMUploader:
+    """Send SCM data of the RestAssetClient's simulation in chunks over its pooled session.
+
+    Every chunk keeps its transaction_id across retries, so that the exchange can recognize
+    repeated deliveries of the same chunk.
+    """
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, client, max_chunk_bytes: int = SCM_UPLOAD_MAX_CHUNK_BYTES,
+                 max_concurrency: int = SCM_UPLOAD_MAX_CONCURRENCY,
+                 max_retries: int = SCM_UPLOAD_MAX_RETRIES,
+                 gzip_min_size: Optional[int] = SCM_UPLOAD_GZIP_MIN_SIZE):
+        self.client = client
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.gzip_min_size = gzip_min_size
+
+    def upload_timeseries_and_member_data(self, scm_timeseries_members: Dict,
+                                          members_key: Optional[str] = None) -> SCMUploadReport:
+        """Upload the data of the members in chunks.
+
+        The members are the top-level entries of the payload, or the entries of
+        payload[members_key]. In the latter case the remaining keys are sent with every chunk.
+        """
+        if members_key is None:
+            payloads = chunk_members(scm_timeseries_members, self.max_chunk_bytes)
+        else:
+            common_data = {key: value for key, value in scm_timeseries_members.items()
+                           if key != members_key}
+            payloads = [{**common_data, members_key: chunk} for chunk in chunk_members(
+                scm_timeseries_members[members_key], self.max_chunk_bytes)]
+        return self._upload(
+            f"{self.client.endpoint_prefix}/set-scm-timeseries-and-member-data/", payloads,
+            [list(payload[members_key] if members_key else payload) for payload in payloads])
+
+    def upload_global_data(self, scm_global_data: Dict) -> SCMUploadReport:
+        """Upload the global data of the community (compressed and retried, not chunked)."""
+        return self._upload(f"{self.client.simulation_endpoint_prefix}/set-scm-global-data/",
+                            [scm_global_data], [[]])
+
+    def _upload(self, endpoint: str, payloads: List[Dict],
+                member_uuids: List[List[str]]) -> SCMUploadReport:
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            chunks = list(executor.map(
+                lambda args: self._send_chunk(endpoint, *args), zip(payloads, member_uuids)))
+        report = SCMUploadReport(chunks, time.monotonic() - start_time)
+        logging.info("Uploaded %s/%s SCM chunks in %.2f s (%.0f members/s, %.0f bytes/s).",
+                     len(chunks) - len(report.failed_chunks), len(chunks),
+                     report.elapsed_secs, report.members_per_sec, report.bytes_per_sec)
+        return report
+
+    def _send_chunk(self, endpoint: str, payload: Dict,
+                    member_uuids: List[str]) -> SCMChunkResult:
+        transaction_id = str(uuid.uuid4())
+        data = {**payload, "transaction_id": transaction_id}
+        payload_size = len(json.dumps(data))
+        for attempt in range(1, self.max_retries + 2):
+            response = send_request("POST", endpoint, data, self.client.jwt_token,
+                                    session=self.client.http_session,
+                                    gzip_min_size=self.gzip_min_size)
+            if check_response(response):
+                return SCMChunkResult(transaction_id, member_uuids, payload_size, attempt, True)
+            # Only connection errors and server errors can succeed when repeated
+            if response is not None and response.status_code < 500:
+                break
+            if attempt <= self.max_retries:
+                time.sleep(SCM_UPLOAD_RETRY_BACKOFF_SECS * 2 ** (attempt - 1))
+        logging.error("Uploading SCM chunk %s failed after %s attempts.",
+                      transaction_id, attempt)
+        return SCMChunkResult(transaction_id, member_uuids, payload_size, attempt, False)
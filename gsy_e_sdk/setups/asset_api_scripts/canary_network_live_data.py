@@ -8,7 +8,8 @@ from pendulum import from_format
 from gsy_framework.constants_limits import DATE_TIME_FORMAT
 from gsy_e_sdk.aggregator import Aggregator
 from gsy_e_sdk.clients.rest_asset_client import RestAssetClient
-from gsy_e_sdk.utils import get_area_uuid_from_area_name_and_collaboration_id, get_assets_name
+from gsy_e_sdk.scenario_index import resolve_area_uuids
+from gsy_e_sdk.utils import get_assets_name
 
 ORACLE_NAME = "oracle"
 
@@ -89,11 +90,9 @@ if CONNECT_TO_ALL_ASSETS:
 
 def register_asset_list(asset_names: List, asset_params: Dict, asset_uuid_map: Dict) -> Dict:
     """Register the provided list of assets with the aggregator."""
-    for asset_name in asset_names:
+    asset_name_uuid_map = resolve_area_uuids(simulation_id, domain_name, asset_names)
+    for asset_name, uuid in asset_name_uuid_map.items():
         print("Registered asset:", asset_name)
-        uuid = get_area_uuid_from_area_name_and_collaboration_id(
-            simulation_id, asset_name, domain_name
-        )
         asset_params["asset_uuid"] = uuid
         asset_uuid_map[uuid] = asset_name
         globals()[f"{asset_name}"] = RestAssetClient(**asset_params)
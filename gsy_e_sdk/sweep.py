@@ -0,0 +1,135 @@
+"""Sweep the parameters of aggregator strategies with backtests on a process pool.
+
+Every combination of the parameter grid is backtested (see gsy_e_sdk.backtest) in a worker
+process. The grid tree and the profiles are passed to every worker once, when it starts (and
+are shared copy-on-write where the workers are forked), not with every run. A parameter is set
+- on the BacktestEngine if it is one of its arguments (clearing_model, ticks_per_slot, ...),
+- as attribute of the strategy's module if the module defines it (e.g. LOOK_BACK_INDEX),
+- otherwise as keyword argument of the strategy class.
+The KPIs of every run are collected in a result table.
+"""
+import csv
+import importlib
+import inspect
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from tabulate import tabulate
+
+from gsy_e_sdk.backtest import BacktestEngine, BacktestResult
+from gsy_e_sdk.ingestion import TimeSeries
+
+SWEEP_KPIS = ("net_cost", "traded_energy_kWh", "market_maker_kWh", "feed_in_kWh",
+              "grid_fee_revenue", "trades", "rejected_commands", "elapsed_secs")
+_ENGINE_PARAMETERS = frozenset(inspect.signature(BacktestEngine).parameters) - {
+    "aggregator_class", "grid_tree", "profiles", "aggregator_kwargs"}
+
+# Inputs of the backtests of a worker process, set by _initialize_worker
+_worker_inputs: Dict = {}
+
+
+class SweepResult(NamedTuple):
+    """KPIs of the backtest of one parameter combination, or the error that it raised."""
+    parameters: Dict
+    kpis: Dict[str, float]
+    error: Optional[str] = None
+
+
+def iter_parameter_grid(parameter_grid: Dict[str, Iterable]) -> Iterator[Dict]:
+    """Yield all combinations of the parameter values, the last parameter varying fastest."""
+    names = list(parameter_grid)
+    for values in itertools.product(*(list(parameter_grid[name]) for name in names)):
+        yield dict(zip(names, values))
+
+
+def get_kpis(result: BacktestResult) -> Dict[str, float]:
+    """Return the KPIs of a backtest."""
+    return {kpi: getattr(result, kpi) for kpi in SWEEP_KPIS}
+
+
+def _initialize_worker(strategy_class, grid_tree: Dict, profiles: TimeSeries,
+                       engine_kwargs: Dict) -> None:
+    _worker_inputs.update({"strategy_class": strategy_class, "grid_tree": grid_tree,
+                           "profiles": profiles, "engine_kwargs": engine_kwargs})
+
+
+def _run_backtest(parameters: Dict) -> SweepResult:
+    strategy_class = _worker_inputs["strategy_class"]
+    module = importlib.import_module(strategy_class.__module__)
+    engine_kwargs = dict(_worker_inputs["engine_kwargs"])
+    strategy_kwargs = dict(engine_kwargs.pop("aggregator_kwargs", None) or {})
+    module_attributes = {}
+    for name, value in parameters.items():
+        if name in _ENGINE_PARAMETERS:
+            engine_kwargs[name] = value
+        elif hasattr(module, name):
+            module_attributes[name] = value
+        else:
+            strategy_kwargs[name] = value
+    # The workers run many backtests, so the module attributes are restored after each one
+    original_attributes = {name: getattr(module, name) for name in module_attributes}
+    try:
+        for name, value in module_attributes.items():
+            setattr(module, name, value)
+        result = BacktestEngine(
+            strategy_class, _worker_inputs["grid_tree"], _worker_inputs["profiles"],
+            aggregator_kwargs=strategy_kwargs, **engine_kwargs).run()
+        return SweepResult(parameters, get_kpis(result))
+    except Exception as ex:  # pylint: disable=broad-except
+        return SweepResult(parameters, {}, f"{type(ex).__name__}: {ex}")
+    finally:
+        for name, value in original_attributes.items():
+            setattr(module, name, value)
+
+
+# pylint: disable-next=too-many-arguments
+def run_sweep(strategy_class, grid_tree: Dict, profiles: TimeSeries,
+              parameter_grid: Dict[str, Iterable], max_workers: Optional[int] = None,
+              **engine_kwargs) -> List[SweepResult]:
+    """Backtest the strategy with every combination of the parameter grid.
+
+    The runs are distributed over max_workers processes (the number of CPUs by default), or
+    run in the calling process if max_workers is 1. engine_kwargs are passed to every
+    BacktestEngine. The results are returned in the order of iter_parameter_grid.
+    """
+    parameter_combinations = list(iter_parameter_grid(parameter_grid))
+    initargs = (strategy_class, grid_tree, profiles, engine_kwargs)
+    if max_workers == 1:
+        _initialize_worker(*initargs)
+        try:
+            return [_run_backtest(parameters) for parameters in parameter_combinations]
+        finally:
+            _worker_inputs.clear()
+    max_workers = min(max_workers or os.cpu_count() or 1, len(parameter_combinations) or 1)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialize_worker,
+                             initargs=initargs) as executor:
+        return list(executor.map(_run_backtest, parameter_combinations))
+
+
+def format_sweep_report(results: List[SweepResult], sort_by: str = "net_cost",
+                        descending: bool = False, top: Optional[int] = None) -> str:
+    """Return the (top) results as a table sorted by a KPI, the failed runs last."""
+    parameter_names = list(dict.fromkeys(
+        name for result in results for name in result.parameters))
+    results = sorted(results, key=lambda result: (
+        result.error is not None,
+        -result.kpis.get(sort_by, 0) if descending else result.kpis.get(sort_by, 0)))[:top]
+    return tabulate(
+        [[*(result.parameters.get(name) for name in parameter_names),
+          *(round(result.kpis[kpi], 3) if kpi in result.kpis else None for kpi in SWEEP_KPIS),
+          result.error or ""]
+         for result in results],
+        headers=[*parameter_names, *SWEEP_KPIS, "error"], tablefmt="github")
+
+
+def write_sweep_results(results: List[SweepResult], file_path: str) -> None:
+    """Write the parameters, KPIs and errors of the runs as CSV, one row per run."""
+    parameter_names = list(dict.fromkeys(
+        name for result in results for name in result.parameters))
+    with open(file_path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=[*parameter_names, *SWEEP_KPIS, "error"])
+        writer.writeheader()
+        for result in results:
+            writer.writerow({**result.parameters, **result.kpis, "error": result.error or ""})
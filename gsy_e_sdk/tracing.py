@@ -0,0 +1,295 @@
+"""Trace the transactions (commands) of the clients from sending until their response is handled.
+
+Every sampled transaction gets a root span, with child spans for serializing, publishing
+(or POSTing) the command, waiting for and handling its response. A trace is exported once
+the transaction has ended and all its child spans are closed, as one JSON line per trace:
+either in the OTLP/JSON format (one ResourceSpans object per line, which can be forwarded to
+any OpenTelemetry collector), or as a plain list of spans.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from gsy_e_sdk.constants import TRACING_MAX_ACTIVE_TRANSACTIONS, TRACING_MAX_QUEUE_SIZE
+
+SERIALIZE_SPAN = "serialize"
+PUBLISH_SPAN = "publish"
+POST_SPAN = "post"
+WAIT_SPAN = "wait"
+RESPONSE_SPAN = "response"
+
+OTLP_FORMAT = "otlp"
+SPANS_FORMAT = "spans"
+
+_STATUS_CODE_OK = 1
+_STATUS_CODE_ERROR = 2
+
+
+class Span(NamedTuple):
+    """Finished span of a transaction, the times are in nanoseconds since the epoch."""
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    name: str
+    start_time: int
+    end_time: int
+    attributes: Dict
+    error: Optional[str] = None
+
+    @property
+    def duration_secs(self) -> float:
+        """Return the duration of the span in seconds."""
+        return (self.end_time - self.start_time) / 1e9
+
+
+def _create_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def _to_otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_otlp_span(span: Span) -> Dict:
+    otlp_span = {
+        "traceId": span.trace_id, "spanId": span.span_id, "name": span.name,
+        "kind": 3,  # SPAN_KIND_CLIENT
+        "startTimeUnixNano": str(span.start_time), "endTimeUnixNano": str(span.end_time),
+        "attributes": [{"key": key, "value": _to_otlp_value(value)}
+                       for key, value in span.attributes.items()],
+        "status": ({"code": _STATUS_CODE_ERROR, "message": span.error} if span.error
+                   else {"code": _STATUS_CODE_OK})}
+    if span.parent_span_id:
+        otlp_span["parentSpanId"] = span.parent_span_id
+    return otlp_span
+
+
+def format_otlp_trace(spans: List[Span], service_name: str = "gsy-e-sdk") -> Dict:
+    """Return the spans as an OTLP/JSON ResourceSpans object."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name",
+                                     "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "gsy_e_sdk"},
+                        "spans": [_to_otlp_span(span) for span in spans]}]}]}
+
+
+def get_batch_commands_trace_attributes(aggregator_uuid: Optional[str],
+                                        batch_command_dict: Dict) -> Dict:
+    """Return the root span attributes of a batch of commands ({asset_uuid: [command, ...]})."""
+    attributes = {
+        "aggregator": aggregator_uuid,
+        "asset_count": len(batch_command_dict),
+        "command_count": sum(len(commands) for commands in batch_command_dict.values()),
+        "command_types": ",".join(sorted({
+            str(command.get("type")) for commands in batch_command_dict.values()
+            for command in commands if isinstance(command, dict)}))}
+    if len(batch_command_dict) == 1:
+        attributes["asset_uuid"] = next(iter(batch_command_dict))
+    return attributes
+
+
+class JsonLinesSpanExporter:
+    """Append the traces to file_path as JSON lines, written in a background thread.
+
+    Like the MessageRecorder, traces are dropped instead of blocking the caller if the
+    writer can not keep up.
+    """
+
+    def __init__(self, file_path: str, trace_format: str = OTLP_FORMAT,
+                 max_queue_size: int = TRACING_MAX_QUEUE_SIZE):
+        if trace_format not in (OTLP_FORMAT, SPANS_FORMAT):
+            raise ValueError(f"Unknown trace format {trace_format}.")
+        self.file_path = file_path
+        self.trace_format = trace_format
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._is_closed = False
+        # pylint: disable-next=consider-using-with
+        self._file = open(file_path, "a", encoding="utf-8")
+        self._writer_thread = threading.Thread(
+            target=self._write_traces, name="span-exporter", daemon=True)
+        self._writer_thread.start()
+
+    def export(self, spans: List[Span]) -> None:
+        """Enqueue the spans of one trace."""
+        if self._is_closed:
+            return
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1:
+                logging.warning("Span exporter %s can not keep up, dropping traces.",
+                                self.file_path)
+
+    def _format(self, spans: List[Span]) -> str:
+        if self.trace_format == OTLP_FORMAT:
+            return json.dumps(format_otlp_trace(spans))
+        return json.dumps([{**span._asdict(), "duration_secs": span.duration_secs}
+                           for span in spans])
+
+    def _write_traces(self) -> None:
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                return
+            self._file.write(self._format(spans) + "\n")
+            if self._queue.empty():
+                self._file.flush()
+
+    def close(self) -> None:
+        """Write the pending traces and close the file."""
+        if self._is_closed:
+            return
+        self._is_closed = True
+        self._queue.put(None)
+        self._writer_thread.join()
+        self._file.close()
+
+
+class _Trace:
+
+    def __init__(self, name: str, attributes: Dict):
+        self.trace_id = _create_id(128)
+        self.root_span_id = _create_id(64)
+        self.name = name
+        self.attributes = attributes
+        self.start_time = time.time_ns()
+        self.spans: List[Span] = []
+        self.open_spans = 0
+        self.end_time: Optional[int] = None
+        self.error: Optional[str] = None
+
+
+class Tracer:
+    """Trace a sample_rate share of the transactions and hand them to the exporter.
+
+    Calls for transactions that are not sampled (or unknown) do nothing, so the clients can
+    call the tracer unconditionally. Transactions that never end are forgotten once
+    max_active_transactions are active.
+    """
+
+    def __init__(self, exporter: Optional[JsonLinesSpanExporter] = None,
+                 sample_rate: float = 1.0,
+                 max_active_transactions: int = TRACING_MAX_ACTIVE_TRANSACTIONS):
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+        self.max_active_transactions = max_active_transactions
+        self._traces: "OrderedDict[str, _Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start_transaction(self, transaction_id: Optional[str], name: str,
+                          **attributes) -> bool:
+        """Start the trace of the transaction if it is sampled, return whether it is."""
+        if (transaction_id is None or not self.sample_rate or
+                random.random() >= self.sample_rate):
+            return False
+        trace = _Trace(name, {"transaction_id": transaction_id, **attributes})
+        with self._lock:
+            self._traces[transaction_id] = trace
+            while len(self._traces) > self.max_active_transactions:
+                self._traces.popitem(last=False)
+        return True
+
+    def is_traced(self, transaction_id: Optional[str]) -> bool:
+        """Return whether the transaction is sampled and has not ended yet."""
+        return transaction_id in self._traces
+
+    @contextmanager
+    def _record_span(self, trace: _Trace, name: str, attributes: Dict) -> Iterator[None]:
+        start_time = time.time_ns()
+        error = None
+        try:
+            yield
+        except BaseException as ex:
+            error = f"{type(ex).__name__}: {ex}"
+            raise
+        finally:
+            span = Span(trace.trace_id, _create_id(64), trace.root_span_id, name, start_time,
+                        time.time_ns(), attributes, error)
+            with self._lock:
+                trace.spans.append(span)
+                trace.open_spans -= 1
+                spans = self._pop_finished_trace(trace)
+            if spans:
+                self.exporter.export(spans)
+
+    def span(self, transaction_id: Optional[str], name: str, **attributes):
+        """Return a context manager that records a child span of the transaction."""
+        if transaction_id is None or transaction_id not in self._traces:
+            return nullcontext()
+        with self._lock:
+            trace = self._traces.get(transaction_id)
+            if trace is None:
+                return nullcontext()
+            trace.open_spans += 1
+        return self._record_span(trace, name, attributes)
+
+    def set_attributes(self, transaction_id: Optional[str], **attributes) -> None:
+        """Add attributes to the root span of the transaction."""
+        trace = self._traces.get(transaction_id) if transaction_id is not None else None
+        if trace is not None:
+            trace.attributes.update(attributes)
+
+    def end_transaction(self, transaction_id: Optional[str],
+                        error: Optional[str] = None) -> None:
+        """End the root span, the trace is exported as soon as its child spans are closed."""
+        with self._lock:
+            trace = self._traces.get(transaction_id) if transaction_id is not None else None
+            if trace is None or trace.end_time is not None:
+                return
+            trace.end_time = time.time_ns()
+            trace.error = error
+            spans = self._pop_finished_trace(trace)
+        if spans:
+            self.exporter.export(spans)
+
+    def _pop_finished_trace(self, trace: _Trace) -> Optional[List[Span]]:
+        if trace.end_time is None or trace.open_spans > 0:
+            return None
+        transaction_id = trace.attributes["transaction_id"]
+        if self._traces.get(transaction_id) is trace:
+            del self._traces[transaction_id]
+        end_time = max([trace.end_time] + [span.end_time for span in trace.spans])
+        return [Span(trace.trace_id, trace.root_span_id, None, trace.name, trace.start_time,
+                     end_time, trace.attributes, trace.error), *trace.spans]
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the tracer that is shared by all clients of the process.
+
+    Tracing is enabled by the API_CLIENT_TRACE_FILE environment variable. The share of traced
+    transactions is set by API_CLIENT_TRACE_SAMPLE_RATE (default 1), the format of the file
+    by API_CLIENT_TRACE_FORMAT ("otlp", the default, or "spans").
+    """
+    global _tracer  # pylint: disable=global-statement
+    with _tracer_lock:
+        if _tracer is None:
+            file_path = os.environ.get("API_CLIENT_TRACE_FILE")
+            exporter = None
+            if file_path:
+                exporter = JsonLinesSpanExporter(
+                    os.path.abspath(file_path),
+                    os.environ.get("API_CLIENT_TRACE_FORMAT", OTLP_FORMAT))
+                atexit.register(exporter.close)
+            _tracer = Tracer(
+                exporter, float(os.environ.get("API_CLIENT_TRACE_SAMPLE_RATE", 1.0)))
+        return _tracer
@@ -1,10 +1,22 @@
+"""Client classes of the transport that was chosen by the CLI (REST, or Redis for local runs).
+
+The client types are resolved on first access, so that only the modules (and dependencies) of
+the chosen transport are imported.
+"""
+import importlib
 import os
-from gsy_e_sdk.clients.rest_asset_client import RestAssetClient
-from gsy_e_sdk.clients.redis_asset_client import RedisAssetClient
-from gsy_e_sdk.aggregator import Aggregator
-from gsy_e_sdk.redis_aggregator import RedisAggregator
-from gsy_e_sdk.rest_market import RestMarketClient
-from gsy_e_sdk.redis_market import RedisMarketClient
+
+# {attribute: (REST client class, Redis client class)}
+_CLIENT_TYPES = {
+    "device_client_type": ("gsy_e_sdk.clients.rest_asset_client:RestAssetClient",
+                           "gsy_e_sdk.clients.redis_asset_client:RedisAssetClient"),
+    "aggregator_client_type": ("gsy_e_sdk.aggregator:Aggregator",
+                               "gsy_e_sdk.redis_aggregator:RedisAggregator"),
+    "market_client_type": ("gsy_e_sdk.rest_market:RestMarketClient",
+                           "gsy_e_sdk.redis_market:RedisMarketClient"),
+}
+
+__all__ = list(_CLIENT_TYPES)
 
 
 def _select_client_type(rest_type, redis_type):
@@ -14,7 +26,18 @@ def _select_client_type(rest_type, redis_type):
     return rest_type
 
 
-# pylint: disable=invalid-name
-device_client_type = _select_client_type(RestAssetClient, RedisAssetClient)
-aggregator_client_type = _select_client_type(Aggregator, RedisAggregator)
-market_client_type = _select_client_type(RestMarketClient, RedisMarketClient)
+def _import_class(class_path: str):
+    module_name, class_name = class_path.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def __getattr__(name: str):
+    if name not in _CLIENT_TYPES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    client_type = _import_class(_select_client_type(*_CLIENT_TYPES[name]))
+    globals()[name] = client_type
+    return client_type
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,4 +1,3 @@
-import ast
 import json
 import logging
 import os
@@ -9,12 +8,15 @@ from tabulate import tabulate
 import requests
 from gsy_framework.api_simulation_config.validators import validate_api_simulation_config
 from gsy_framework.utils import get_area_name_uuid_mapping
-from sgqlc.endpoint.http import HTTPEndpoint
 
-from gsy_e_sdk import __version__
+# pylint: disable-next=unused-import
+from gsy_e_sdk.authentication import (
+    get_jwt_token_manager, retrieve_jwt_key_from_server, validate_client_up_to_date)
 from gsy_e_sdk.constants import (
     DEFAULT_DOMAIN_NAME, DEFAULT_WEBSOCKET_DOMAIN,
     CUSTOMER_WEBSOCKET_DOMAIN_NAME, API_CLIENT_SIMULATION_ID)
+from gsy_e_sdk.http_session import get_http_session
+from gsy_e_sdk.log_policy import is_log_level_enabled
 
 CONSUMER_WEBSOCKET_DOMAIN_NAME_FROM_ENV = os.environ.get("CUSTOMER_WEBSOCKET_DOMAIN_NAME",
                                                          CUSTOMER_WEBSOCKET_DOMAIN_NAME)
@@ -39,42 +41,57 @@ class AreaNotFoundException(Exception):
     """Exception denoting that an area was not found in a simulation."""
 
 
+# pylint: disable=too-many-arguments
 def execute_graphql_request(domain_name: str, query: str,
-                            headers=None, url=None, authenticate=True):
+                            headers=None, url=None, authenticate=True,
+                            session: Optional[requests.Session] = None):
     """
     Fire a graphql request to the desired url and returns the response
     """
+    session = session or get_http_session()
     jwt_key = None
     if authenticate:
-        jwt_key = retrieve_jwt_key_from_server(domain_name)
+        jwt_key = get_jwt_token_manager().get_token(domain_name, session=session)
         if jwt_key is None:
             logging.error("authentication failed")
             return None
     url = f"{domain_name}/graphql/" if url is None else url
     headers = {"Authorization": f"JWT {jwt_key}",
                "Content-Type": "application/json"} if headers is None else headers
-    endpoint = HTTPEndpoint(url, headers)
-    data = endpoint(query=query)
+    try:
+        resp = session.post(url, data=json.dumps({"query": query}), headers=headers)
+    except requests.exceptions.RequestException as ex:
+        logging.error("GraphQL request to %s failed: %s", url, ex)
+        return _graphql_error_response(str(ex))
+    if not 200 <= resp.status_code < 300:
+        logging.error("GraphQL request failed with status code %s. Response body: %s",
+                      resp.status_code, resp.text)
+        return _graphql_error_response(f"HTTP Error {resp.status_code}: {resp.reason}")
+    try:
+        data = resp.json()
+    except ValueError:
+        logging.error("GraphQL request returned an invalid body: %s", resp.text)
+        return _graphql_error_response("Response body is not valid JSON")
+    if not isinstance(data, dict) or not {"data", "errors"} & set(data):
+        logging.error("GraphQL request returned an invalid body: %s", resp.text)
+        return _graphql_error_response("Response body is not a GraphQL response")
     return data
 
 
-def retrieve_jwt_key_from_server(domain_name: str) -> Optional[str]:
-    """
-    Get the jwt token from the server based on credentials set in the
-    environment variables.
-    """
-    resp = requests.post(
-        f"{domain_name}/api-token-auth/",
-        data=json.dumps({"username": os.environ["API_CLIENT_USERNAME"],
-                         "password": os.environ["API_CLIENT_PASSWORD"]}),
-        headers={"Content-Type": "application/json"})
-    if resp.status_code != 200:
-        logging.error("Request for token authentication failed with status "
-                      "code %s. Response body: %s", resp.status_code, resp.text)
-        return None
+def _graphql_error_response(message: str) -> Dict:
+    """Return a GraphQL response that reports the error, as sgqlc's HTTPEndpoint does."""
+    return {"data": None, "errors": [{"message": message}]}
+
 
-    validate_client_up_to_date(resp)
-    return json.loads(resp.text)["access"]
+def _log_graphql_errors(data: Optional[Dict]) -> bool:
+    """Log the errors of the GraphQL response, return whether the request failed."""
+    if data is None:
+        return True
+    if data.get("errors"):
+        logging.error("GraphQL request failed: %s",
+                      "; ".join(str(error.get("message")) for error in data["errors"]))
+        return True
+    return data.get("data") is None
 
 
 def get_aggregator_prefix(domain_name: str,
@@ -106,26 +123,19 @@ def get_area_uuid_from_area_name(serialized_scenario: dict,
 
 
 def get_area_uuid_from_area_name_and_collaboration_id(
-        collab_id, area_name, domain_name) -> str:
+        collab_id, area_name, domain_name, session: Optional[requests.Session] = None) -> str:
     """
-    Fire a request to get the scenario representation of the collaboration and
-    search for the uuid of the area that name matches area_name.
+    Search for the uuid of the area that name matches area_name in the scenario of the
+    collaboration. The scenario is fetched once and cached, see ScenarioIndex.
     """
-    query = '''query { readConfiguration(uuid: "''' + collab_id + '''")
-                { scenarioData { latest { serialized } } } }'''
-    data = execute_graphql_request(domain_name=domain_name, query=query)
-    area_uuid = get_area_uuid_from_area_name(
-        json.loads(data["data"]["readConfiguration"]["scenarioData"]["latest"]["serialized"]),
-        area_name
-    )
-    if not area_uuid:
-        raise AreaNotFoundException(f"Area with name {area_name} is not part of the "
-                                    f"collaboration with UUID {collab_id}")
-    return area_uuid
+    # pylint: disable-next=import-outside-toplevel
+    from gsy_e_sdk.scenario_index import resolve_area_uuids
+    return resolve_area_uuids(collab_id, domain_name, [area_name], session=session)[area_name]
 
 
 def get_area_uuid_and_name_mapping_from_simulation_id(
-        collab_id: str, domain_name: str = None) -> dict:
+        collab_id: str, domain_name: str = None,
+        session: Optional[requests.Session] = None) -> dict:
     """
     Fire a request to get the scenario representation of the collaboration and
     map for the uuid of the areas to their names.
@@ -133,16 +143,18 @@ def get_area_uuid_and_name_mapping_from_simulation_id(
     query = '''query { readConfiguration(uuid: "''' + collab_id + '''")
                 { scenarioData { latest { serialized } } } }'''
 
-    data = execute_graphql_request(domain_name=domain_name or domain_name_from_env(), query=query)
-    if data.get("errors"):
-        return ast.literal_eval(data["errors"][0]["message"])
+    data = execute_graphql_request(domain_name=domain_name or domain_name_from_env(), query=query,
+                                   session=session)
+    if _log_graphql_errors(data):
+        return {}
     area_name_uuid_map = get_area_name_uuid_mapping(
         json.loads(data["data"]["readConfiguration"]["scenarioData"]["latest"]["serialized"])
     )
     return area_name_uuid_map
 
 
-def get_aggregators_list(domain_name: Optional[str] = None) -> list:
+def get_aggregators_list(domain_name: Optional[str] = None,
+                         session: Optional[requests.Session] = None) -> list:
     """
     Return a list of aggregators for the logged in user.
     """
@@ -150,9 +162,10 @@ def get_aggregators_list(domain_name: Optional[str] = None) -> list:
         domain_name = os.environ.get("API_CLIENT_DOMAIN_NAME")
     query = "query { aggregatorsList { configUuid name  devicesList { deviceUuid } } }"
 
-    data = execute_graphql_request(domain_name=domain_name, query=query)
-    return (ast.literal_eval(data["errors"][0]["message"]) if
-            data.get("errors") else data["data"]["aggregatorsList"])
+    data = execute_graphql_request(domain_name=domain_name, query=query, session=session)
+    if _log_graphql_errors(data):
+        return []
+    return data["data"]["aggregatorsList"]
 
 
 def logging_decorator(command_name: str):
@@ -178,7 +191,8 @@ def is_scm_canary_network(config):
 
 
 def list_running_canary_networks_and_devices_with_live_data(
-        domain_name: str, is_scm: bool = False) -> dict:
+        domain_name: str, is_scm: bool = False,
+        session: Optional[requests.Session] = None) -> dict:
     """Return all canary networks with their forecastStreamAreaMapping setting."""
 
     query_name = "listScmCommunities" if is_scm else "listCanaryNetworks"
@@ -199,9 +213,11 @@ def list_running_canary_networks_and_devices_with_live_data(
       }
     }
     '''
-    data = execute_graphql_request(domain_name=domain_name, query=query)
+    data = execute_graphql_request(domain_name=domain_name, query=query, session=session)
 
     logging.debug("Received Canary Network data: %s", data)
+    if _log_graphql_errors(data):
+        return {}
 
     if is_scm:
         accepted_cn = lambda cn: is_scm_canary_network(cn)  # NOQA: E731
@@ -219,7 +235,9 @@ def list_running_canary_networks_and_devices_with_live_data(
 
 
 def log_bid_offer_confirmation(message: dict) -> None:
-    """Log the details of orders placed in the markets."""
+    """Log the details of orders placed in the markets (at DEBUG, they are summarized per slot)."""
+    if not is_log_level_enabled(logging.DEBUG):
+        return
     try:
         if message.get("status") == "ready" and message.get("command") in ["bid", "offer"]:
             event = "bid" if "bid" in message.get("command") else "offer"
@@ -230,8 +248,8 @@ def log_bid_offer_confirmation(message: dict) -> None:
             rate = price / energy
             trader = data_dict.get("seller" if event == "offer" else "buyer")
             action = "OFFERED" if event == "offer" else "BID"
-            logging.info("[%s] %s %s %s kWh at %s cts/kWh",
-                         market_type, trader, action, round(energy, 3), rate)
+            logging.debug("[%s] %s %s %s kWh at %s cts/kWh",
+                          market_type, trader, action, round(energy, 3), rate)
     # pylint: disable = broad-except
     except Exception:
         logging.exception("Logging bid/offer info failed.")
@@ -240,7 +258,9 @@ def log_bid_offer_confirmation(message: dict) -> None:
 def log_deleted_bid_offer_confirmation(
         message: dict, command_type: Optional[str] = None,
         bid_offer_id: Optional[str] = None, asset_name: Optional[str] = None) -> None:
-    """Log the details of orders deleted from the markets."""
+    """Log the details of orders deleted from the markets (at DEBUG, they are summarized)."""
+    if not is_log_level_enabled(logging.DEBUG):
+        return
     try:
         if message.get("status") == "ready" and message.get("command") in ["bid_delete",
                                                                            "offer_delete"]:
@@ -248,10 +268,10 @@ def log_deleted_bid_offer_confirmation(
                 # For the aggregator response, command type is not explicitly provided
                 command_type = "bid" if "bid" in message.get("command") else "offer"
             if bid_offer_id is None:
-                logging.info(
+                logging.debug(
                     "<-- All %ss of %s are successfully deleted-->", command_type, asset_name)
             else:
-                logging.info(
+                logging.debug(
                     "<-- %s %s is successfully deleted-->", command_type, bid_offer_id)
     # pylint: disable = broad-except
     except Exception:
@@ -340,18 +360,6 @@ def get_sim_id_and_domain_names():
     return simulation_id_from_env(), domain_name_from_env(), websocket_domain_name_from_env()
 
 
-def validate_client_up_to_date(response):
-    """Check whether the client is connected to the supporting version of the server."""
-    remote_version = response.headers.get("API-VERSION")
-    if not remote_version:
-        return
-
-    if __version__ < remote_version:
-        logging.warning(
-            "Your version of the client %s is outdated, kindly upgrade to "
-            "version %s to make use of our latest features", __version__, remote_version)
-
-
 def get_name_from_area_name_uuid_mapping(area_name_uuid_mapping, asset_uuid):
     """Get the area name from the name: [uuids] mapping."""
     for area_name, area_uuids in area_name_uuid_mapping.items():
@@ -1,14 +1,239 @@
+import asyncio
 import logging
 import traceback
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from threading import Condition
+from time import monotonic
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
 
 from gsy_framework.client_connections.websocket_connection import WebsocketMessageReceiver
-from gsy_framework.utils import wait_until_timeout_blocking
+
+from gsy_e_sdk.constants import (
+    COMMAND_RESPONSE_BUFFER_MAX_SIZE, COMMAND_RESPONSE_BUFFER_TTL_SECS,
+    WEBSOCKET_REPLAY_BUFFER_SIZE, WEBSOCKET_SEQUENCE_NUMBER_KEY)
+from gsy_e_sdk.latency import EVENT_TO_RESPONSE, LatencyTracker
+from gsy_e_sdk.metrics import COMMAND_TIMEOUTS, MESSAGES_RECEIVED, MetricsRegistry
+from gsy_e_sdk.recorder import INBOUND, MessageRecorder
+from gsy_e_sdk.tracing import RESPONSE_SPAN, WAIT_SPAN, Tracer
+
+
+class CommandResponseTimeoutError(TimeoutError, AssertionError):
+    """Exception denoting that a command did not receive its response in time.
+
+    It is also an AssertionError, which was raised by the former polling implementation.
+    """
+
+
+class CommandConnectionLostError(ConnectionError):
+    """Exception denoting that the connection dropped while waiting for a command response.
+
+    The response might have been lost, the command can be retried once reconnected.
+    """
+
+
+def _set_future_result(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _set_future_exception(future: asyncio.Future, exception: Exception) -> None:
+    if not future.done():
+        future.set_exception(exception)
+
+
+class CommandResponseBuffer:
+    """Command responses indexed by (command, transaction_id).
+
+    Waiters are woken up as soon as their response arrives. Responses that nobody waits for
+    (e.g. commands sent with do_not_wait=True) are dropped after ttl seconds, or when the
+    buffer grows beyond max_size.
+    """
+
+    def __init__(self, ttl: float = COMMAND_RESPONSE_BUFFER_TTL_SECS,
+                 max_size: int = COMMAND_RESPONSE_BUFFER_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._responses: "OrderedDict[Hashable, Tuple[Dict, float]]" = OrderedDict()
+        self._async_waiters: Dict[Hashable, List[Tuple[asyncio.AbstractEventLoop,
+                                                       asyncio.Future]]] = {}
+        self._condition = Condition()
+        self._connection_loss_count = 0
+
+    @staticmethod
+    def _get_key(command_name: str, transaction_id: Optional[str]) -> Hashable:
+        return command_name, transaction_id
+
+    def append(self, message: Dict) -> None:
+        """Store the response and notify the clients that wait for it."""
+        key = self._get_key(message["command"], message.get("transaction_id"))
+        with self._condition:
+            self._responses.pop(key, None)
+            self._responses[key] = (message, monotonic())
+            self._evict_orphaned_responses()
+            for loop, future in self._async_waiters.pop(key, []):
+                loop.call_soon_threadsafe(_set_future_result, future)
+            self._condition.notify_all()
+
+    def _evict_orphaned_responses(self) -> None:
+        expiry_time = monotonic() - self.ttl
+        while self._responses:
+            key, (_, arrival_time) = next(iter(self._responses.items()))
+            if arrival_time > expiry_time and len(self._responses) <= self.max_size:
+                break
+            logging.debug("Dropping response of command %s that nobody waited for.", key)
+            del self._responses[key]
+
+    def __contains__(self, key: Tuple[str, Optional[str]]) -> bool:
+        with self._condition:
+            return key in self._responses
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def __iter__(self) -> Iterator[Dict]:
+        with self._condition:
+            return iter([message for message, _ in self._responses.values()])
+
+    def pop(self, command_name: str, transaction_id: Optional[str]) -> Optional[Dict]:
+        """Remove the response from the buffer and return it, None if it has not arrived."""
+        with self._condition:
+            response = self._responses.pop(self._get_key(command_name, transaction_id), None)
+        return response[0] if response else None
+
+    def fail_pending(self) -> None:
+        """Wake up all waiters with a CommandConnectionLostError."""
+        with self._condition:
+            self._connection_loss_count += 1
+            for waiters in self._async_waiters.values():
+                for loop, future in waiters:
+                    loop.call_soon_threadsafe(
+                        _set_future_exception, future, CommandConnectionLostError(
+                            "The connection was lost while waiting for the response."))
+            self._async_waiters.clear()
+            self._condition.notify_all()
+
+    def wait(self, command_name: str, transaction_id: Optional[str], timeout: float) -> Dict:
+        """Block until the response arrives, then remove it from the buffer and return it."""
+        key = self._get_key(command_name, transaction_id)
+        with self._condition:
+            connection_loss_count = self._connection_loss_count
+            if not self._condition.wait_for(
+                    lambda: (key in self._responses or
+                             self._connection_loss_count != connection_loss_count),
+                    timeout=timeout):
+                raise CommandResponseTimeoutError(
+                    f"Command {command_name} ({transaction_id}) has not received a response "
+                    f"after {timeout} seconds.")
+            if key not in self._responses:
+                raise CommandConnectionLostError(
+                    f"The connection was lost while command {command_name} ({transaction_id}) "
+                    f"was waiting for its response.")
+            return self._responses.pop(key)[0]
+
+    async def async_wait(self, command_name: str, transaction_id: Optional[str],
+                         timeout: float) -> Dict:
+        """Wait for the response without blocking the running event loop."""
+        key = self._get_key(command_name, transaction_id)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._condition:
+            if key in self._responses:
+                return self._responses.pop(key)[0]
+            self._async_waiters.setdefault(key, []).append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._condition:
+                waiters = self._async_waiters.get(key, [])
+                if (loop, future) in waiters:
+                    waiters.remove((loop, future))
+                    if not waiters:
+                        del self._async_waiters[key]
+            raise CommandResponseTimeoutError(
+                f"Command {command_name} ({transaction_id}) has not received a response "
+                f"after {timeout} seconds.") from None
+        response = self.pop(command_name, transaction_id)
+        if response is None:
+            # Another waiter of the same command and transaction consumed the response
+            raise CommandResponseTimeoutError(
+                f"Response of command {command_name} ({transaction_id}) was already consumed.")
+        return response
 
 
 class DeviceWebsocketMessageReceiver(WebsocketMessageReceiver):
     def __init__(self, rest_client):
         self.client = rest_client
-        self.command_response_buffer = []
+        self.command_response_buffer = CommandResponseBuffer()
+        self.recorder: Optional[MessageRecorder] = getattr(rest_client, "recorder", None)
+        self.latency_tracker: Optional[LatencyTracker] = getattr(
+            rest_client, "latency_tracker", None)
+        self.metrics: Optional[MetricsRegistry] = getattr(rest_client, "metrics", None)
+        self.tracer: Optional[Tracer] = getattr(rest_client, "tracer", None)
+        self._last_event_received_at: Optional[float] = None
+        self.last_sequence_number: Optional[int] = None
+        # Sequence numbers of the most recent messages, used to drop messages that are
+        # delivered again after a reconnection
+        self._recent_sequence_numbers = deque(maxlen=WEBSOCKET_REPLAY_BUFFER_SIZE)
+        self.sequence_gaps = deque(maxlen=WEBSOCKET_REPLAY_BUFFER_SIZE)
+        self._is_new_session = False
+
+    def _is_in_sequence_gap(self, sequence_number: int) -> bool:
+        return any(first <= sequence_number <= last for first, last in self.sequence_gaps)
+
+    def _reset_sequence_tracking(self) -> None:
+        self.last_sequence_number = None
+        self._recent_sequence_numbers.clear()
+        self.sequence_gaps.clear()
+
+    def _is_new_message(self, message: Dict) -> bool:
+        """Track the sequence number of the message, return False if it was already received.
+
+        Messages without sequence number are always new. The tracking starts over when the
+        sequence of the server goes backwards, e.g. after a restart of the server: either a
+        new session does not resume after the last received message, or a message is older
+        than the last one without being a repetition or a late message of a gap.
+        """
+        sequence_number = message.get(WEBSOCKET_SEQUENCE_NUMBER_KEY)
+        if sequence_number is None:
+            return True
+        is_first_of_session = self._is_new_session
+        self._is_new_session = False
+        # Sequence numbers increase, only a message that is not newer can be a repetition
+        if (self.last_sequence_number is not None and
+                sequence_number <= self.last_sequence_number):
+            if is_first_of_session or not (
+                    sequence_number in self._recent_sequence_numbers or
+                    self._is_in_sequence_gap(sequence_number)):
+                logging.warning("The message sequence of %s restarted at %s.",
+                                getattr(self.client, "asset_uuid", self.client),
+                                sequence_number)
+                self._reset_sequence_tracking()
+            elif sequence_number in self._recent_sequence_numbers:
+                logging.debug("Dropping message %s that was already received.",
+                              sequence_number)
+                return False
+        if self.last_sequence_number is not None:
+            if sequence_number > self.last_sequence_number + 1:
+                logging.warning("Messages %s to %s of %s were lost.",
+                                self.last_sequence_number + 1, sequence_number - 1,
+                                getattr(self.client, "asset_uuid", self.client))
+                self.sequence_gaps.append((self.last_sequence_number + 1, sequence_number - 1))
+        self._recent_sequence_numbers.append(sequence_number)
+        self.last_sequence_number = max(sequence_number, self.last_sequence_number or 0)
+        return True
+
+    def get_resume_headers(self) -> Dict[str, str]:
+        """Return the headers that ask the server to resume after the last received message."""
+        if self.last_sequence_number is None:
+            return {}
+        return {"Last-Sequence-Number": str(self.last_sequence_number)}
+
+    def on_connection_lost(self) -> None:
+        """Fail the pending commands fast, their responses might be lost."""
+        # The server resumes after the last received message, unless it started a new sequence
+        self._is_new_session = True
+        self.command_response_buffer.fail_pending()
 
     def _handle_event_message(self, message):
         if message["event"] == "market":
@@ -22,30 +247,79 @@ class DeviceWebsocketMessageReceiver(WebsocketMessageReceiver):
         else:
             logging.error(f"Received message with unknown event type: {message}")
 
-    def received_message(self, message):
+    @property
+    def recording_channel(self) -> str:
+        """Return the channel name of the received messages in the recording."""
+        return (f"aggregator/{self.client.aggregator_uuid}"
+                if getattr(self.client, "aggregator_uuid", None)
+                else f"asset/{getattr(self.client, 'asset_uuid', None)}")
+
+    def _track_latency(self, message: Dict) -> None:
+        if "event" in message:
+            self._last_event_received_at = monotonic()
+        elif "command" in message:
+            self.latency_tracker.finish_transaction(message.get("transaction_id"))
+            if message["command"] == "batch_commands":
+                self.latency_tracker.record_since(
+                    EVENT_TO_RESPONSE, self._last_event_received_at)
+
+    def received_message(self, message, raw_message: Optional[str] = None):
+        if self.recorder is not None:
+            self.recorder.record(INBOUND, self.recording_channel,
+                                 message if raw_message is None else raw_message)
         try:
-            if "event" in message:
-                self._handle_event_message(message)
-            elif "command" in message:
-                self.command_response_buffer.append(message)
+            if not self._is_new_message(message):
+                return
+            if self.latency_tracker is not None:
+                self._track_latency(message)
+            if self.metrics is not None:
+                self.metrics.inc(MESSAGES_RECEIVED,
+                                 type=message.get("event") or message.get("command"))
+                if message.get("event") == "market":
+                    self.metrics.count_market_slot(message.get("market_slot"))
+            with self._trace_span(message, RESPONSE_SPAN):
+                if "event" in message:
+                    self._handle_event_message(message)
+                elif "command" in message:
+                    self.command_response_buffer.append(message)
 
-            if "event" in message or "command" in message:
-                self.client._on_event_or_response(message)
+                if "event" in message or "command" in message:
+                    self.client._on_event_or_response(message)
+            if self.tracer is not None and "command" in message:
+                self.tracer.end_transaction(message.get("transaction_id"))
         except Exception as e:
             logging.error(f"Error while processing incoming message {message}. Exception {e}.\n"
                           f"{traceback.format_exc()}")
 
+    def _trace_span(self, message: Dict, name: str):
+        if self.tracer is None or "command" not in message:
+            return nullcontext()
+        return self.tracer.span(message.get("transaction_id"), name)
+
+    def _count_timeout(self, transaction_id: Optional[str]) -> None:
+        if self.metrics is not None:
+            self.metrics.inc(COMMAND_TIMEOUTS)
+        if self.tracer is not None:
+            self.tracer.end_transaction(transaction_id, error="timeout")
+
     def wait_for_command_response(self, command_name, transaction_id, timeout=120):
-        def check_if_command_response_received():
-            return any("command" in c and c["command"] == command_name and
-                       "transaction_id" in c and c["transaction_id"] == transaction_id
-                       for c in self.command_response_buffer)
+        logging.debug(f"Command {command_name} waiting for response...")
+        try:
+            with self._trace_span({"command": command_name, "transaction_id": transaction_id},
+                                  WAIT_SPAN):
+                return self.command_response_buffer.wait(command_name, transaction_id, timeout)
+        except CommandResponseTimeoutError:
+            self._count_timeout(transaction_id)
+            raise
 
+    async def async_wait_for_command_response(self, command_name, transaction_id, timeout=120):
+        """Wait for the command response without blocking the running event loop."""
         logging.debug(f"Command {command_name} waiting for response...")
-        wait_until_timeout_blocking(check_if_command_response_received, timeout=timeout)
-        response = next(c
-                        for c in self.command_response_buffer
-                        if "command" in c and c["command"] == command_name and
-                        "transaction_id" in c and c["transaction_id"] == transaction_id)
-        self.command_response_buffer.remove(response)
-        return response
+        try:
+            with self._trace_span({"command": command_name, "transaction_id": transaction_id},
+                                  WAIT_SPAN):
+                return await self.command_response_buffer.async_wait(
+                    command_name, transaction_id, timeout)
+        except CommandResponseTimeoutError:
+            self._count_timeout(transaction_id)
+            raise
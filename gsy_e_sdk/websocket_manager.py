@@ -0,0 +1,208 @@
+"""Host the websocket sessions of many clients on a single event loop thread."""
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import websockets
+from gsy_framework.client_connections.websocket_connection import WebsocketMessageReceiver
+
+from gsy_e_sdk.authentication import get_jwt_token_manager
+from gsy_e_sdk.latency import DECODE
+from gsy_e_sdk.metrics import DECODED_BYTES, WEBSOCKET_RECONNECTS
+from gsy_e_sdk.constants import (
+    WEBSOCKET_MANAGER_CALLBACK_WORKERS, WEBSOCKET_MAX_CONNECTION_RETRIES,
+    WEBSOCKET_WAIT_BEFORE_RETRY_SECS)
+
+
+class ManagedWebsocketConnection:
+    """Websocket session of one client that runs on the event loop of the manager."""
+
+    def __init__(self, websocket_uri: str, domain_name: str,
+                 message_dispatcher: WebsocketMessageReceiver):
+        self.websocket_uri = websocket_uri
+        self.domain_name = domain_name
+        self.message_dispatcher = message_dispatcher
+        self.future: Optional[Future] = None
+        self.connected = False
+        self.connection_count = 0
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.errors = 0
+        self.last_message_time: Optional[float] = None
+
+    @property
+    def stats(self) -> Dict:
+        """Return the statistics of the connection."""
+        return {"connected": self.connected,
+                "connection_count": self.connection_count,
+                "messages_received": self.messages_received,
+                "bytes_received": self.bytes_received,
+                "errors": self.errors,
+                "last_message_time": self.last_message_time}
+
+    def close(self) -> None:
+        """Close the connection, it will not be reconnected."""
+        if self.future is not None:
+            self.future.cancel()
+
+    def _dispatch(self, message: str) -> None:
+        self.messages_received += 1
+        self.bytes_received += len(message)
+        self.last_message_time = time.time()
+        metrics = getattr(self.message_dispatcher, "metrics", None)
+        if metrics is not None:
+            metrics.inc(DECODED_BYTES, len(message))
+        try:
+            latency_tracker = getattr(self.message_dispatcher, "latency_tracker", None)
+            # The raw frame is passed along, so that it is recorded as it was received
+            if latency_tracker is None:
+                self.message_dispatcher.received_message(json.loads(message), raw_message=message)
+                return
+            with latency_tracker.measure(DECODE):
+                decoded_message = json.loads(message)
+            self.message_dispatcher.received_message(decoded_message, raw_message=message)
+        except Exception:  # pylint: disable=broad-except
+            self.errors += 1
+            logging.exception("Error while dispatching message of %s.", self.websocket_uri)
+
+    async def run(self) -> None:
+        """Receive messages until the connection is closed, reconnect on failures.
+
+        Clients that wait for command responses are failed fast whenever the connection drops.
+        """
+        retry_count = 0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                jwt_token = await loop.run_in_executor(
+                    None, get_jwt_token_manager().get_token, self.domain_name)
+                headers = {"Authorization": f"JWT {jwt_token}"}
+                if hasattr(self.message_dispatcher, "get_resume_headers"):
+                    # Resubscribe after the last received message when reconnecting
+                    headers.update(self.message_dispatcher.get_resume_headers())
+                async with websockets.connect(
+                        self.websocket_uri, extra_headers=headers) as websocket:
+                    self.connected = True
+                    self.connection_count += 1
+                    metrics = getattr(self.message_dispatcher, "metrics", None)
+                    if metrics is not None and self.connection_count > 1:
+                        metrics.inc(WEBSOCKET_RECONNECTS)
+                    retry_count = 0
+                    async for message in websocket:
+                        self._dispatch(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:  # pylint: disable=broad-except
+                self.errors += 1
+                logging.warning("Websocket connection %s failed: %s", self.websocket_uri, ex)
+            finally:
+                self.connected = False
+            if hasattr(self.message_dispatcher, "on_connection_lost"):
+                self.message_dispatcher.on_connection_lost()
+            if retry_count >= WEBSOCKET_MAX_CONNECTION_RETRIES:
+                logging.error("Giving up websocket connection %s after %s retries.",
+                              self.websocket_uri, retry_count)
+                return
+            retry_count += 1
+            await asyncio.sleep(WEBSOCKET_WAIT_BEFORE_RETRY_SECS)
+
+
+class WebsocketThread(threading.Thread):
+    """Run the websocket session of one client on its own event loop in its own thread.
+
+    It is used by the clients that are not hosted by a WebsocketConnectionManager, so that
+    they resume after reconnections and fail their pending commands fast as well.
+    """
+
+    def __init__(self, websocket_uri: str, domain_name: str,
+                 message_dispatcher: WebsocketMessageReceiver):
+        super().__init__(name=f"websocket-{websocket_uri}", daemon=True)
+        self.connection = ManagedWebsocketConnection(
+            websocket_uri, domain_name, message_dispatcher)
+
+    def run(self) -> None:
+        asyncio.run(self.connection.run())
+
+
+class WebsocketConnectionManager:
+    """Run the websocket sessions of all clients on one event loop in one thread.
+
+    Each session keeps its own dispatcher, so messages are routed to the client that opened
+    it. Client callbacks are run on one shared executor, instead of one executor per client.
+    """
+
+    def __init__(self, callback_workers: int = WEBSOCKET_MANAGER_CALLBACK_WORKERS):
+        self.callback_executor = ThreadPoolExecutor(max_workers=callback_workers)
+        self.connections: Dict[str, ManagedWebsocketConnection] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _get_event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="websocket-manager", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def add_connection(self, websocket_uri: str, domain_name: str,
+                       message_dispatcher: WebsocketMessageReceiver
+                       ) -> ManagedWebsocketConnection:
+        """Open a websocket session whose messages are passed to message_dispatcher."""
+        connection = ManagedWebsocketConnection(websocket_uri, domain_name, message_dispatcher)
+        previous_connection = self.connections.get(websocket_uri)
+        if previous_connection is not None:
+            previous_connection.close()
+        self.connections[websocket_uri] = connection
+        connection.future = asyncio.run_coroutine_threadsafe(
+            connection.run(), self._get_event_loop())
+        return connection
+
+    def remove_connection(self, websocket_uri: str) -> None:
+        """Close the websocket session of the uri."""
+        connection = self.connections.pop(websocket_uri, None)
+        if connection is not None:
+            connection.close()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Return the statistics of all websocket sessions, keyed by their uri."""
+        return {uri: connection.stats for uri, connection in self.connections.items()}
+
+    @staticmethod
+    async def _cancel_all_tasks() -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self) -> None:
+        """Close all websocket sessions and stop the event loop."""
+        self.connections.clear()
+        with self._lock:
+            if self._loop is not None:
+                asyncio.run_coroutine_threadsafe(self._cancel_all_tasks(), self._loop).result()
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+                self._loop = None
+        self.callback_executor.shutdown(wait=False)
+
+
+_websocket_manager: Optional[WebsocketConnectionManager] = None
+_websocket_manager_lock = threading.Lock()
+
+
+def get_websocket_manager() -> WebsocketConnectionManager:
+    """Return the websocket manager that is shared by all clients of the process."""
+    global _websocket_manager  # pylint: disable=global-statement
+    with _websocket_manager_lock:
+        if _websocket_manager is None:
+            _websocket_manager = WebsocketConnectionManager()
+        return _websocket_manager
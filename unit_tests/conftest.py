@@ -0,0 +1,18 @@
+"""Fixtures that are shared by the tests of the offline backtests and the parameter sweeps."""
+import pytest
+
+from gsy_e_sdk.emulator import create_synthetic_grid
+
+BACKTEST_TIME_SLOTS = ["2022-01-01T00:00", "2022-01-01T00:15"]
+
+
+@pytest.fixture(name="grid_tree")
+def fixture_grid_tree():
+    # Load 1, PV 2 and Storage 3 are in the same house, with a grid fee of 1 cent/kWh
+    return create_synthetic_grid(3)
+
+
+@pytest.fixture(name="profiles")
+def fixture_profiles():
+    return {"Load 1": {BACKTEST_TIME_SLOTS[0]: 1.0, BACKTEST_TIME_SLOTS[1]: 0.5},
+            "PV 2": {BACKTEST_TIME_SLOTS[0]: -0.6, BACKTEST_TIME_SLOTS[1]: -1.0}}
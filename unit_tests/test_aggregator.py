@@ -3,6 +3,7 @@ import uuid
 from unittest.mock import patch, PropertyMock, MagicMock
 import pytest
 
+from gsy_e_sdk.authentication import get_jwt_token_manager
 from gsy_e_sdk.constants import MAX_WORKER_THREADS
 
 from gsy_e_sdk.utils import get_aggregator_prefix, get_configuration_prefix
@@ -40,10 +41,11 @@ TEST_TRANSACTION_ID = str(uuid.uuid4())
 @pytest.fixture(autouse=True, name="mock_connections")
 def fixture_mock_connections(mocker):
     """Mock methods and functions which establish external connections."""
-    mocker.patch("gsy_e_sdk.clients.rest_asset_client.retrieve_jwt_key_from_server",
+    mocker.patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
                  return_value=TEST_JWT_KEY_FROM_SERVER)
     mocker.patch("gsy_framework.client_connections.utils"
                  ".RepeatingTimer")
+    get_jwt_token_manager().clear()
 
 
 @pytest.fixture(name="mock_grid_fee_calculation")
@@ -87,7 +89,7 @@ def fixture_mock_execute_batch_command_methods(mocker):
                  return_value=TEST_BATCH_COMMAND_DICT)
     mocker.patch("gsy_framework.client_connections.utils.uuid.uuid4",
                  return_value=TEST_TRANSACTION_ID)
-    mocker.patch("gsy_framework.client_connections.utils.post_request",
+    mocker.patch("gsy_e_sdk.http_session.post_request",
                  return_value=True)
 
 
@@ -295,16 +297,17 @@ class TestAggregator:
         endpoint = f"{aggregator.aggregator_prefix}batch-commands/"
         aggregator.device_uuid_list = TEST_BATCH_COMMAND_DICT.keys()
 
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=True) as mocked_func:
             aggregator.execute_batch_commands()
-            mocked_func.assert_called_with(endpoint, data, TEST_JWT_KEY_FROM_SERVER)
+            mocked_func.assert_called_with(endpoint, data, TEST_JWT_KEY_FROM_SERVER,
+                                           session=aggregator.http_session)
 
     @staticmethod
     @pytest.mark.usefixtures("mock_execute_batch_command_methods")
     def test_execute_batch_commands_post_request_not_posted_return_none(
             aggregator):
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=None):
             aggregator.device_uuid_list = TEST_BATCH_COMMAND_DICT.keys()
             assert aggregator.execute_batch_commands() is None
@@ -391,7 +394,8 @@ class TestAggregator:
         conf = f"{aggregator.configuration_prefix}registry"
         with patch("gsy_e_sdk.aggregator.blocking_get_request") as mocked_func:
             aggregator.get_configuration_registry()
-            mocked_func.assert_called_with(conf, {}, TEST_JWT_KEY_FROM_SERVER)
+            mocked_func.assert_called_with(conf, {}, TEST_JWT_KEY_FROM_SERVER,
+                                           session=aggregator.http_session)
 
     @staticmethod
     def test_delete_aggregator_calls_blocking_post_request(aggregator):
@@ -401,7 +405,8 @@ class TestAggregator:
             mocked_func.assert_called_with(
                 conf,
                 {"aggregator_uuid": aggregator.aggregator_uuid},
-                aggregator.jwt_token
+                aggregator.jwt_token,
+                session=aggregator.http_session
             )
 
     @staticmethod
@@ -423,3 +428,46 @@ class TestAggregator:
                    new_callable=PropertyMock,
                    return_value=buffer_length_mock):
             assert aggregator.commands_buffer_length == buffer_length_mock
+
+    @staticmethod
+    @pytest.mark.usefixtures("mock_outgoing_funcs_in_construction")
+    def test_selected_devices_are_restored_after_restart(tmp_path, mocker):
+        # The server can not be reached, so the persisted devices are used
+        mocker.patch("gsy_e_sdk.aggregator.get_aggregators_list", return_value=[])
+
+        def _create_aggregator():
+            return Aggregator(aggregator_name=TEST_AGGREGATOR_NAME,
+                              simulation_id=TEST_SIMULATION["uuid"],
+                              domain_name=TEST_SIMULATION["domain_name"],
+                              websockets_domain_name=TEST_SIMULATION["websockets_domain_name"],
+                              cache_dir=str(tmp_path))
+
+        aggregator = _create_aggregator()
+        aggregator._selected_by_device({"device_uuid": "device-1"})
+        aggregator._selected_by_device({"device_uuid": "device-2"})
+        aggregator._unselected_by_device({"device_uuid": "device-1"})
+        assert _create_aggregator().device_uuid_list == ["device-2"]
+
+    @staticmethod
+    @pytest.mark.usefixtures("mock_outgoing_funcs_in_construction")
+    def test_devices_listed_by_the_server_replace_the_restored_devices(tmp_path, mocker):
+        aggregators_list = mocker.patch("gsy_e_sdk.aggregator.get_aggregators_list",
+                                        return_value=[])
+
+        def _create_aggregator():
+            return Aggregator(aggregator_name=TEST_AGGREGATOR_NAME,
+                              simulation_id=TEST_SIMULATION["uuid"],
+                              domain_name=TEST_SIMULATION["domain_name"],
+                              websockets_domain_name=TEST_SIMULATION["websockets_domain_name"],
+                              cache_dir=str(tmp_path))
+
+        _create_aggregator()._selected_by_device({"device_uuid": "device-1"})
+        # device-1 unselected and device-2 selected the aggregator while it was down
+        aggregators_list.return_value = [
+            {"name": TEST_AGGREGATOR_NAME, "configUuid": "other-simulation",
+             "devicesList": [{"deviceUuid": "device-3"}]},
+            {"name": TEST_AGGREGATOR_NAME, "configUuid": TEST_SIMULATION["uuid"],
+             "devicesList": [{"deviceUuid": "device-2"}]}]
+        assert _create_aggregator().device_uuid_list == ["device-2"]
+        aggregators_list.return_value = []
+        assert _create_aggregator().device_uuid_list == ["device-2"]
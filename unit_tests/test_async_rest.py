@@ -0,0 +1,140 @@
+# pylint: disable=missing-function-docstring, protected-access
+import asyncio
+import json
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from gsy_e_sdk.async_rest import (
+    AsyncRestTransport, get_async_rest_transport, run_concurrently, set_energy_forecasts,
+    select_aggregator)
+from gsy_e_sdk.authentication import get_jwt_token_manager
+from gsy_e_sdk.clients.rest_asset_client import RestAssetClient
+
+TEST_ASSET_UUID = str(uuid.uuid4())
+TEST_SIMULATION_ID = str(uuid.uuid4())
+TEST_AGGREGATOR_UUID = str(uuid.uuid4())
+TEST_TRANSACTION_ID = str(uuid.uuid4())
+TEST_DOMAIN_NAME = "https://test.domain.com"
+TEST_JWT_TOKEN = "jwt-token"
+
+
+@pytest.fixture(name="transport")
+def fixture_transport():
+    transport = AsyncRestTransport(pool_size=4, max_requests_per_host=2)
+    transport.session = MagicMock()
+    yield transport
+    transport.close()
+
+
+@pytest.fixture(name="client")
+def fixture_rest_asset_client(mocker, transport):
+    mocker.patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                 return_value=TEST_JWT_TOKEN)
+    mocker.patch("gsy_framework.client_connections.utils.RepeatingTimer")
+    get_jwt_token_manager().clear()
+    mocker.patch("gsy_e_sdk.clients.rest_asset_client.WebsocketThread")
+    mocker.patch("gsy_e_sdk.clients.rest_asset_client.ThreadPoolExecutor")
+    return RestAssetClient(asset_uuid=TEST_ASSET_UUID, simulation_id=TEST_SIMULATION_ID,
+                           domain_name=TEST_DOMAIN_NAME, rest_transport=transport)
+
+
+class TestAsyncRestTransport:
+    """Test methods for the AsyncRestTransport class."""
+
+    @staticmethod
+    def test_post_sends_request_with_transaction_id(transport):
+        transport.session.request.return_value = MagicMock(status_code=200)
+        with patch("gsy_e_sdk.async_rest.uuid.uuid4", return_value=TEST_TRANSACTION_ID):
+            transaction_id, posted = asyncio.run(
+                transport.post(f"{TEST_DOMAIN_NAME}/endpoint", {"key": "value"}, TEST_JWT_TOKEN))
+
+        assert transaction_id == TEST_TRANSACTION_ID
+        assert posted is True
+        transport.session.request.assert_called_once_with(
+            "POST", f"{TEST_DOMAIN_NAME}/endpoint/",
+            data=json.dumps({"key": "value", "transaction_id": TEST_TRANSACTION_ID}).encode(),
+            headers={"Content-Type": "application/json",
+                     "Authorization": f"JWT {TEST_JWT_TOKEN}"})
+
+    @staticmethod
+    @pytest.mark.parametrize("status_code, expected_posted", [(200, True), (500, False)])
+    def test_post_reports_whether_request_succeeded(transport, status_code, expected_posted):
+        transport.session.request.return_value = MagicMock(status_code=status_code)
+        _, posted = asyncio.run(transport.post(TEST_DOMAIN_NAME, {}, TEST_JWT_TOKEN))
+        assert posted is expected_posted
+
+    @staticmethod
+    def test_blocking_post_returns_response_body(transport):
+        transport.session.request.return_value = MagicMock(
+            status_code=200, text=json.dumps({"aggregator_uuid": TEST_AGGREGATOR_UUID}))
+        response = asyncio.run(transport.blocking_post(TEST_DOMAIN_NAME, {}, TEST_JWT_TOKEN))
+        assert response == {"aggregator_uuid": TEST_AGGREGATOR_UUID}
+
+    @staticmethod
+    def test_host_semaphores_are_shared_per_host(transport):
+        semaphore = transport._get_host_semaphore("https://host-a.com/one")
+        assert transport._get_host_semaphore("https://host-a.com/two") is semaphore
+        assert transport._get_host_semaphore("https://host-b.com/one") is not semaphore
+
+
+def test_clients_of_the_same_session_share_one_transport(mocker):
+    mocker.patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                 return_value=TEST_JWT_TOKEN)
+    mocker.patch("gsy_e_sdk.clients.rest_asset_client.WebsocketThread")
+    mocker.patch("gsy_e_sdk.clients.rest_asset_client.ThreadPoolExecutor")
+    session, other_session = MagicMock(), MagicMock()
+    clients = [RestAssetClient(asset_uuid=str(uuid.uuid4()), simulation_id=TEST_SIMULATION_ID,
+                               domain_name=TEST_DOMAIN_NAME, http_session=http_session)
+               for http_session in [session, session, other_session]]
+    assert clients[0].rest_transport is clients[1].rest_transport
+    assert clients[0].rest_transport is get_async_rest_transport(session)
+    assert clients[0].rest_transport.session is session
+    assert clients[2].rest_transport is not clients[0].rest_transport
+    assert get_async_rest_transport() is not clients[0].rest_transport
+
+
+def test_run_concurrently_returns_results_and_exceptions_in_order():
+    async def _return(value):
+        await asyncio.sleep(0)
+        return value
+
+    async def _raise():
+        raise ValueError("failed")
+
+    results = run_concurrently([_return(1), _raise(), _return(3)])
+    assert results[0] == 1
+    assert isinstance(results[1], ValueError)
+    assert results[2] == 3
+
+
+def test_run_concurrently_works_inside_a_running_event_loop():
+    async def _return(value):
+        await asyncio.sleep(0)
+        return value
+
+    async def _strategy():
+        return run_concurrently([_return(1), _return(2)])
+
+    assert asyncio.run(_strategy()) == [1, 2]
+
+
+def test_set_energy_forecasts_waits_for_all_responses(client, transport):
+    transport.session.request.return_value = MagicMock(status_code=200)
+    client.dispatcher = MagicMock()
+
+    async def _wait_for_command_response(command_name, transaction_id):
+        return {"command": command_name, "transaction_id": transaction_id}
+
+    client.dispatcher.async_wait_for_command_response = _wait_for_command_response
+    results = set_energy_forecasts({client: {"2022-01-01T00:00": 1.2}})
+
+    assert results[0]["command"] == "set_energy_forecast"
+
+
+def test_select_aggregator_sets_active_aggregator(client, transport):
+    transport.session.request.return_value = MagicMock(
+        status_code=200, text=json.dumps({"aggregator_uuid": TEST_AGGREGATOR_UUID}))
+    select_aggregator([client], TEST_AGGREGATOR_UUID)
+    assert client.active_aggregator == TEST_AGGREGATOR_UUID
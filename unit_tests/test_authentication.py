@@ -0,0 +1,136 @@
+# pylint: disable=missing-function-docstring, protected-access
+import base64
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from gsy_e_sdk.authentication import JWTTokenManager, get_jwt_token_expiry
+
+TEST_DOMAIN_NAME = "https://test.domain.com"
+
+
+def _create_jwt_token(expiry):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": expiry}).encode()).decode()
+    return f"header.{payload.rstrip('=')}.signature"
+
+
+@pytest.fixture(name="token_manager")
+def fixture_token_manager():
+    token_manager = JWTTokenManager(refresh_margin=60)
+    yield token_manager
+    token_manager.clear()
+    # Wait for the cancelled refresh timers, so that they do not outlive the test
+    for thread in threading.enumerate():
+        if isinstance(thread, threading.Timer):
+            thread.join(1)
+
+
+class TestJWTTokenManager:
+    """Test the process-wide cache of JWT tokens."""
+
+    @staticmethod
+    def test_get_jwt_token_expiry_reads_exp_claim():
+        assert get_jwt_token_expiry(_create_jwt_token(1234)) == 1234
+
+    @staticmethod
+    def test_get_jwt_token_expiry_returns_none_for_opaque_tokens():
+        assert get_jwt_token_expiry("opaque-token") is None
+
+    @staticmethod
+    def test_get_token_authenticates_once_per_domain(token_manager):
+        with patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                   return_value="token") as mocked_func:
+            assert token_manager.get_token(TEST_DOMAIN_NAME) == "token"
+            assert token_manager.get_token(TEST_DOMAIN_NAME) == "token"
+            token_manager.get_token("https://other.domain.com")
+            assert mocked_func.call_count == 2
+
+    @staticmethod
+    def test_get_token_does_not_cache_failed_authentication(token_manager):
+        with patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                   side_effect=[None, "token"]):
+            assert token_manager.get_token(TEST_DOMAIN_NAME) is None
+            assert token_manager.get_token(TEST_DOMAIN_NAME) == "token"
+
+    @staticmethod
+    def test_token_is_refreshed_before_expiry(token_manager):
+        expiry = time.time() + 3600
+        with patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                   return_value=_create_jwt_token(expiry)):
+            token_manager.get_token(TEST_DOMAIN_NAME)
+        assert token_manager._tokens[TEST_DOMAIN_NAME].refresh_at == expiry - 60
+        assert token_manager._refresh_timer.is_alive()
+
+    @staticmethod
+    @pytest.mark.parametrize("lifetime, min_refresh_delay", [(40, 20), (-10, 30)])
+    def test_short_lived_tokens_are_not_refreshed_in_a_loop(
+            token_manager, lifetime, min_refresh_delay):
+        with patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                   return_value=_create_jwt_token(time.time() + lifetime)) as mocked_func:
+            start_time = time.time()
+            token_manager.get_token(TEST_DOMAIN_NAME)
+            time.sleep(0.1)
+        assert mocked_func.call_count == 1
+        assert (token_manager._tokens[TEST_DOMAIN_NAME].refresh_at >=
+                start_time + min_refresh_delay - 1)
+
+    @staticmethod
+    def test_refresh_replaces_expiring_tokens_only(token_manager):
+        with patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                   side_effect=["old", "fresh", "new"]):
+            token_manager.get_token(TEST_DOMAIN_NAME)
+            token_manager.get_token("https://other.domain.com")
+            token_manager._tokens[TEST_DOMAIN_NAME] = token_manager._tokens[
+                TEST_DOMAIN_NAME]._replace(refresh_at=0)
+            token_manager._refresh_expiring_tokens()
+        assert token_manager.get_token(TEST_DOMAIN_NAME) == "new"
+        assert token_manager.get_token("https://other.domain.com") == "fresh"
+
+    @staticmethod
+    def test_failed_refresh_keeps_current_token(token_manager):
+        with patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                   side_effect=["token", None]):
+            token_manager.get_token(TEST_DOMAIN_NAME)
+            token_manager._tokens[TEST_DOMAIN_NAME] = token_manager._tokens[
+                TEST_DOMAIN_NAME]._replace(refresh_at=0)
+            token_manager._refresh_expiring_tokens()
+        assert token_manager.get_token(TEST_DOMAIN_NAME) == "token"
+        assert token_manager._tokens[TEST_DOMAIN_NAME].refresh_at > time.time()
+
+    @staticmethod
+    def test_refresh_survives_connection_errors(token_manager):
+        with patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                   side_effect=["token", requests.exceptions.ConnectionError("reset")]):
+            token_manager.get_token(TEST_DOMAIN_NAME)
+            token_manager._tokens[TEST_DOMAIN_NAME] = token_manager._tokens[
+                TEST_DOMAIN_NAME]._replace(refresh_at=0)
+            token_manager._refresh_expiring_tokens()
+        assert token_manager.get_token(TEST_DOMAIN_NAME) == "token"
+        assert token_manager._tokens[TEST_DOMAIN_NAME].refresh_at > time.time()
+        assert token_manager._refresh_timer.is_alive()
+
+    @staticmethod
+    def test_slow_authentication_does_not_block_other_domains(token_manager):
+        slow_request_started, release_slow_request = threading.Event(), threading.Event()
+
+        def retrieve_jwt_key(domain_name, session=None):
+            if domain_name == TEST_DOMAIN_NAME:
+                slow_request_started.set()
+                release_slow_request.wait(5)
+            return domain_name
+
+        with patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server",
+                   side_effect=retrieve_jwt_key):
+            slow_thread = threading.Thread(target=token_manager.get_token,
+                                           args=(TEST_DOMAIN_NAME,))
+            slow_thread.start()
+            assert slow_request_started.wait(5)
+            assert token_manager.get_token("https://other.domain.com") == (
+                "https://other.domain.com")
+            release_slow_request.set()
+            slow_thread.join(5)
+        assert token_manager.get_token(TEST_DOMAIN_NAME) == TEST_DOMAIN_NAME
@@ -0,0 +1,185 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring
+import threading
+
+import pytest
+
+from gsy_e_sdk.backtest import (
+    BacktestEngine, create_synthetic_profiles, format_backtest_report, read_profiles)
+from gsy_e_sdk.redis_aggregator import RedisAggregator
+from gsy_e_sdk.utils import flatten_info_dict
+
+# Read when the strategy is created, so that parameter sweeps can change it per run
+OFFER_RATE = 15
+
+
+class OracleStrategy(RedisAggregator):
+
+    def __init__(self, *args, bid_rate=25, offer_rate=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bid_rate = bid_rate
+        self.offer_rate = OFFER_RATE if offer_rate is None else offer_rate
+        self.trades = []
+        self.responses = []
+        self.finished = False
+
+    def on_market_slot(self, market_info):
+        for area_uuid, area in self.latest_grid_tree_flat.items():
+            asset_info = area.get("asset_info") or {}
+            if "energy_requirement_kWh" in asset_info:
+                self.add_to_batch_commands.bid_energy_rate(
+                    area_uuid, asset_info["energy_requirement_kWh"], self.bid_rate)
+            if "available_energy_kWh" in asset_info:
+                self.add_to_batch_commands.offer_energy_rate(
+                    area_uuid, asset_info["available_energy_kWh"], self.offer_rate)
+        self.responses.append(self.execute_batch_commands())
+
+    def on_trade(self, trade_info):
+        self.trades.extend(trade_info["trade_list"])
+
+    def on_finish(self, finish_info):
+        self.finished = True
+
+
+def _iter_markets(grid_tree):
+    for area in grid_tree.values():
+        if "children" in area:
+            yield area
+            yield from _iter_markets(area["children"])
+
+
+def get_uuid(area_name, grid_tree):
+    return next(area_uuid for area_uuid, area in flatten_info_dict(grid_tree).items()
+                if area["area_name"] == area_name)
+
+
+class TestBacktestEngine:
+
+    @staticmethod
+    def test_strategy_trades_and_the_rest_is_settled_with_the_market_maker(grid_tree, profiles):
+        thread_count = threading.active_count()
+        engine = BacktestEngine(OracleStrategy, grid_tree, profiles, ticks_per_slot=4)
+        result = engine.run()
+        assert threading.active_count() == thread_count
+        assert engine.aggregator.finished
+        assert result.slots == 2
+        assert result.trades == 2
+        assert result.traded_energy_kWh == pytest.approx(1.1)
+        load, pv_asset = result.asset_results["Load 1"], result.asset_results["PV 2"]
+        assert load.bought_kWh == pytest.approx(1.1)
+        assert load.market_maker_kWh == pytest.approx(0.4)
+        # Pay as bid at 25 cents/kWh, plus 1 cent/kWh grid fee and the market maker at 30
+        assert load.cost == pytest.approx(1.1 * 25 + 1.1 * 1 + 0.4 * 30)
+        assert pv_asset.sold_kWh == pytest.approx(1.1)
+        assert pv_asset.feed_in_kWh == pytest.approx(0.5)
+        assert pv_asset.revenue == pytest.approx(1.1 * 25 + 0.5 * 11)
+        assert result.grid_fee_revenue == pytest.approx(1.1)
+        assert result.rejected_commands == 0
+        assert {trade["buyer"] for trade in engine.aggregator.trades} == {"Load 1"}
+        assert result.callback_timings["on_market_slot"].count == 2
+        assert "Load 1" in format_backtest_report(result)
+
+    @staticmethod
+    def test_pay_as_clear_trades_at_the_offer_rate(grid_tree, profiles):
+        result = BacktestEngine(OracleStrategy, grid_tree, profiles,
+                                clearing_model="pay_as_clear").run()
+        assert result.asset_results["PV 2"].revenue == pytest.approx(1.1 * 15 + 0.5 * 11)
+
+    @staticmethod
+    def test_runs_are_deterministic(grid_tree, profiles):
+        def run():
+            engine = BacktestEngine(OracleStrategy, grid_tree, profiles, seed=3)
+            return engine.run(), engine.aggregator.trades
+
+        (first_result, first_trades), (second_result, second_trades) = run(), run()
+        assert first_result.asset_results == second_result.asset_results
+        assert first_trades == second_trades
+
+    @staticmethod
+    def test_orders_above_the_energy_of_the_asset_are_rejected(grid_tree, profiles):
+        class OverbiddingStrategy(OracleStrategy):
+            def on_market_slot(self, market_info):
+                self.add_to_batch_commands.bid_energy_rate(
+                    self.get_uuid_from_area_name("Load 1"), 10, 25)
+                self.responses.append(self.execute_batch_commands())
+
+        engine = BacktestEngine(OverbiddingStrategy, grid_tree, profiles)
+        result = engine.run()
+        assert result.rejected_commands == 2
+        assert result.trades == 0
+        assert engine.aggregator.responses[0]["responses"][
+            engine.aggregator.get_uuid_from_area_name("Load 1")][0]["status"] == "error"
+
+    @staticmethod
+    def test_additional_orders_can_not_oversubscribe_the_asset(grid_tree, profiles):
+        class SplitBidStrategy(OracleStrategy):
+            def on_market_slot(self, market_info):
+                load_uuid = self.get_uuid_from_area_name("Load 1")
+                energy = self.latest_grid_tree_flat[load_uuid]["asset_info"][
+                    "energy_requirement_kWh"]
+                for _ in range(2):
+                    self.add_to_batch_commands.bid_energy_rate(
+                        load_uuid, energy * 0.75, 25, replace_existing=False)
+                self.responses.append(self.execute_batch_commands())
+
+        result = BacktestEngine(SplitBidStrategy, grid_tree, profiles).run()
+        assert result.rejected_commands == 2
+        assert result.asset_results["Load 1"].feed_in_kWh == 0
+
+    @staticmethod
+    def test_grid_fees_apply_from_the_next_market_slot(grid_tree, profiles):
+        class GridFeeStrategy(OracleStrategy):
+            def on_market_slot(self, market_info):
+                self.add_to_batch_commands.grid_fees(
+                    self.get_uuid_from_area_name("House 1"), 5)
+                super().on_market_slot(market_info)
+
+        result = BacktestEngine(GridFeeStrategy, grid_tree, profiles).run()
+        assert result.grid_fee_revenue == pytest.approx(0.6 * 1 + 0.5 * 5)
+        # The grid tree of the caller is not changed
+        assert {area["current_market_fee"] for area in _iter_markets(grid_tree)} == {1}
+
+    @staticmethod
+    def test_market_stats_report_the_last_market_slot(grid_tree, profiles):
+        class MarketStatsStrategy(OracleStrategy):
+            def on_market_slot(self, market_info):
+                for market_name in ("House 1", "Grid"):
+                    self.add_to_batch_commands.last_market_dso_stats(
+                        self.get_uuid_from_area_name(market_name))
+                self.responses.append(self.execute_batch_commands())
+                super().on_market_slot(market_info)
+
+        engine = BacktestEngine(MarketStatsStrategy, grid_tree, profiles)
+        engine.run()
+        market_stats = {
+            response[0]["name"]: response[0]["market_stats"]
+            for response in engine.aggregator.responses[2]["responses"].values()}
+        # Load 1 bought 0.6 kWh from PV 2 in the same house and 0.4 kWh from the market maker
+        assert market_stats["House 1"]["area_throughput"] == {
+            "import": pytest.approx(0.4), "export": 0}
+        assert market_stats["House 1"]["total_traded_energy_kWh"] == pytest.approx(0.6)
+        assert market_stats["Grid"]["area_throughput"] == {"import": 0, "export": 0}
+
+    @staticmethod
+    def test_synthetic_profiles_follow_the_sun(grid_tree):
+        profiles = create_synthetic_profiles(grid_tree, 96)
+        assert len(profiles) == 2
+        pv_profile, load_profile = (profiles[area_uuid] for area_uuid in (
+            get_uuid("PV 2", grid_tree), get_uuid("Load 1", grid_tree)))
+        assert pv_profile["2022-01-01T03:00"] == 0
+        assert pv_profile["2022-01-01T12:00"] < 0
+        assert all(energy > 0 for energy in load_profile.values())
+        assert create_synthetic_profiles(grid_tree, 96) == profiles
+
+    @staticmethod
+    def test_unknown_clearing_models_are_rejected(grid_tree, profiles):
+        with pytest.raises(ValueError):
+            BacktestEngine(OracleStrategy, grid_tree, profiles, clearing_model="auction")
+
+    @staticmethod
+    def test_profiles_are_read_per_market_slot(tmp_path):
+        csv_file = tmp_path / "profiles.csv"
+        csv_file.write_text("time,load\n2022-01-01T00:00,0.2\n2022-01-01T00:05,0.3\n"
+                            "2022-01-01T00:15,0.1\n")
+        assert read_profiles(str(csv_file), "time", {"load": "Load 1"}) == {
+            "Load 1": {"2022-01-01T00:00": pytest.approx(0.5),
+                       "2022-01-01T00:15": pytest.approx(0.1)}}
@@ -0,0 +1,43 @@
+# pylint: disable=missing-function-docstring
+import json
+
+from click.testing import CliRunner
+
+from gsy_e_sdk.bench import BenchResult, format_bench_report, run_benchmarks
+from gsy_e_sdk.cli import main
+from gsy_e_sdk.constants import BENCH_SCENARIOS
+
+
+class TestBench:
+
+    @staticmethod
+    def test_all_scenarios_run_on_every_grid():
+        results = run_benchmarks([30, 60], BENCH_SCENARIOS, iterations=3, depth=2)
+        assert [(result.scenario, result.area_count) for result in results] == [
+            (scenario, area_count) for area_count in (30, 60) for scenario in BENCH_SCENARIOS]
+        for result in results:
+            assert result.iterations == 3
+            assert 0 < result.p50_secs <= result.p99_secs <= result.max_secs
+            assert result.operations_per_sec > 0
+        assert "dispatch" in format_bench_report(results)
+
+    @staticmethod
+    def test_operations_per_sec_of_an_empty_result():
+        assert BenchResult("codec", 10, 0, 1, 0.0, 0.0, 0.0, 0.0).operations_per_sec == 0
+
+    @staticmethod
+    def test_bench_command_writes_the_json_report(tmp_path):
+        report_file = tmp_path / "bench.json"
+        result = CliRunner().invoke(main, [
+            "bench", "--area-counts", "30", "--depth", "2", "--iterations", "2",
+            "--scenario", "codec", "--scenario", "grid_fee", "--report-file", str(report_file)])
+        assert result.exit_code == 0, result.output
+        assert "grid_fee" in result.output
+        report = json.loads(report_file.read_text())
+        assert report["host"]["cpu_count"]
+        assert [result["scenario"] for result in report["results"]] == ["codec", "grid_fee"]
+
+    @staticmethod
+    def test_bench_command_rejects_invalid_area_counts():
+        result = CliRunner().invoke(main, ["bench", "--area-counts", "ten"])
+        assert result.exit_code != 0
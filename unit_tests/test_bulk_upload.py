@@ -0,0 +1,108 @@
+# pylint: disable=missing-function-docstring
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from gsy_e_sdk.bulk_upload import (
+    BulkTimeSeriesUploader, chunk_time_series, time_series_to_dict)
+from gsy_e_sdk.enums import Commands
+
+TEST_TIME_SLOTS = ["2022-01-01T00:00", "2022-01-01T00:15", "2022-01-01T00:30"]
+
+
+class FakeDataFrame:
+    """Minimal DataFrame-like object with one column per asset."""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def to_dict(self):
+        return self.columns
+
+
+def _time_series(asset_count, time_slot_count=96):
+    return {f"asset-{asset}": {f"2022-01-01T{slot // 4:02d}:{slot % 4 * 15:02d}": 1.5
+                               for slot in range(time_slot_count)}
+            for asset in range(asset_count)}
+
+
+class TestTimeSeriesConversion:
+    """Test the normalization of the supported time series inputs."""
+
+    @staticmethod
+    def test_array_input_is_mapped_to_assets_and_time_slots():
+        assert time_series_to_dict(
+            [[1, 2, None], [4, float("nan"), 6]], asset_uuids=["a", "b"],
+            time_slots=TEST_TIME_SLOTS) == {
+                "a": {TEST_TIME_SLOTS[0]: 1.0, TEST_TIME_SLOTS[1]: 2.0},
+                "b": {TEST_TIME_SLOTS[0]: 4.0, TEST_TIME_SLOTS[2]: 6.0}}
+
+    @staticmethod
+    def test_array_input_requires_assets_and_time_slots():
+        with pytest.raises(ValueError):
+            time_series_to_dict([[1, 2]])
+
+    @staticmethod
+    def test_dataframe_like_input_formats_time_slots():
+        data = FakeDataFrame({"a": {datetime(2022, 1, 1, 0, 15): 0.5}})
+        assert time_series_to_dict(data) == {"a": {"2022-01-01T00:15": 0.5}}
+
+
+class TestChunking:
+    """Test the splitting of time series into chunks of limited payload size."""
+
+    @staticmethod
+    def test_small_time_series_are_packed_into_one_chunk():
+        assert len(chunk_time_series(_time_series(3, 4))) == 1
+
+    @staticmethod
+    @pytest.mark.parametrize("max_chunk_bytes", [500, 2000, 10000])
+    def test_chunks_respect_payload_size_and_keep_all_values(max_chunk_bytes):
+        time_series = _time_series(10)
+        chunks = chunk_time_series(time_series, max_chunk_bytes)
+        assert all(len(json.dumps(chunk)) <= max_chunk_bytes for chunk in chunks)
+        merged = {}
+        for chunk in chunks:
+            for asset_uuid, series in chunk.items():
+                merged.setdefault(asset_uuid, {}).update(series)
+        assert merged == time_series
+
+
+class TestBulkTimeSeriesUploader:
+    """Test sending the chunks through an aggregator or REST clients."""
+
+    @staticmethod
+    def test_uploader_requires_exactly_one_transport():
+        with pytest.raises(ValueError):
+            BulkTimeSeriesUploader()
+
+    @staticmethod
+    def test_chunks_are_sent_as_batch_commands():
+        aggregator = MagicMock()
+        aggregator.send_batch_commands.side_effect = [{"responses": {}}, ValueError("failed")]
+        uploader = BulkTimeSeriesUploader(aggregator=aggregator, max_chunk_bytes=3000,
+                                          max_concurrency=1)
+        results = uploader.upload_energy_forecasts(_time_series(2))
+
+        assert [result.success for result in results] == [True, False]
+        assert isinstance(results[1].error, ValueError)
+        batch_command_dict = aggregator.send_batch_commands.call_args_list[0][0][0]
+        assert batch_command_dict["asset-0"][0]["type"] == "set_energy_forecast"
+        assert sum(result.time_slot_count for result in results) == 2 * 96
+
+    @staticmethod
+    def test_chunks_are_sent_through_rest_clients():
+        async def _set_energy_measurement(series):
+            return {"status": "ready", "count": len(series)}
+
+        clients = {asset_uuid: MagicMock(async_set_energy_measurement=_set_energy_measurement)
+                   for asset_uuid in ["asset-0", "asset-1"]}
+        uploader = BulkTimeSeriesUploader(clients=clients)
+        results = uploader.upload(Commands.MEASUREMENT, _time_series(2, 4))
+
+        assert len(results) == 1
+        assert results[0].success
+        assert results[0].asset_uuids == ["asset-0", "asset-1"]
+        assert results[0].response == [{"status": "ready", "count": 4}] * 2
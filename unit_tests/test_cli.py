@@ -0,0 +1,43 @@
+# pylint: disable=missing-function-docstring
+import os
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from gsy_e_sdk.cli import main
+
+
+def _get_imported_modules(code, modules, **environment):
+    """Run code in a fresh interpreter, return which of the modules it imported."""
+    output = subprocess.run(
+        [sys.executable, "-c",
+         f"import sys\n{code}\nprint(','.join(m for m in {modules!r} if m in sys.modules))"],
+        capture_output=True, text=True, check=True, env={**os.environ, **environment}).stdout
+    return [module for module in output.strip().split(",") if module]
+
+
+class TestLazyImports:
+
+    @staticmethod
+    def test_cli_does_not_import_the_clients():
+        assert _get_imported_modules(
+            "import gsy_e_sdk.cli",
+            ("gsy_e_sdk.utils", "gsy_e_sdk.replay", "gsy_e_sdk.redis_aggregator",
+             "gsy_e_sdk.clients.rest_asset_client", "gsy_framework.utils")) == []
+
+    @staticmethod
+    def test_client_types_only_import_the_chosen_transport():
+        modules = ("gsy_e_sdk.aggregator", "gsy_e_sdk.redis_aggregator")
+        assert _get_imported_modules(
+            "from gsy_e_sdk.types import aggregator_client_type", modules,
+            API_CLIENT_RUN_ON_REDIS="true") == ["gsy_e_sdk.redis_aggregator"]
+        assert _get_imported_modules(
+            "from gsy_e_sdk.types import aggregator_client_type", modules,
+            API_CLIENT_RUN_ON_REDIS="false") == ["gsy_e_sdk.aggregator"]
+
+    @staticmethod
+    def test_run_help_lists_the_setup_modules():
+        result = CliRunner().invoke(main, ["run", "--help"])
+        assert result.exit_code == 0
+        assert "test_create_aggregator" in result.output
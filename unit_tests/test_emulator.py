@@ -0,0 +1,152 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring
+import json
+from threading import Event
+from unittest.mock import MagicMock
+
+import pytest
+from gsy_framework.utils import wait_until_timeout_blocking
+
+from gsy_e_sdk.clients.redis_asset_client import RedisAssetClient
+from gsy_e_sdk.emulator import (
+    MARKET_MAKER_NAME, ExchangeEmulator, InProcessRedis, PayAsBidOrderBook,
+    create_synthetic_grid)
+from gsy_e_sdk.redis_aggregator import RedisAggregator
+
+
+class TradingAggregator(RedisAggregator):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trades = []
+        self.slot_orders_sent = Event()
+        self.finished = Event()
+
+    def on_market_slot(self, market_info):
+        for area_uuid, area in self.latest_grid_tree_flat.items():
+            if area_uuid not in self.device_uuid_list:
+                continue
+            asset_info = area["asset_info"]
+            if "energy_requirement_kWh" in asset_info:
+                self.add_to_batch_commands.bid_energy(
+                    area_uuid, asset_info["energy_requirement_kWh"], 30)
+            if "available_energy_kWh" in asset_info:
+                self.add_to_batch_commands.offer_energy(
+                    area_uuid, asset_info["available_energy_kWh"], 10)
+        self.execute_batch_commands()
+        self.slot_orders_sent.set()
+
+    def on_trade(self, trade_info):
+        self.trades.extend(trade_info["trade_list"])
+
+    def on_finish(self, finish_info):
+        self.finished.set()
+
+
+@pytest.fixture(name="redis_db")
+def fixture_redis_db():
+    return InProcessRedis()
+
+
+class TestInProcessRedis:
+
+    @staticmethod
+    def test_messages_are_delivered_to_matching_patterns(redis_db):
+        pubsub = redis_db.pubsub()
+        exact_handler, glob_handler = MagicMock(), MagicMock()
+        pubsub.psubscribe(**{"asset/events": exact_handler, "asset/*": glob_handler})
+        pubsub.run_in_thread(daemon=True)
+        assert redis_db.publish("asset/events", "{}") == 2
+        assert redis_db.publish("other/events", "{}") == 0
+        wait_until_timeout_blocking(lambda: glob_handler.call_count == 1, timeout=5)
+        pubsub.close()
+        exact_handler.assert_called_once_with({
+            "type": "pmessage", "pattern": b"asset/events", "channel": b"asset/events",
+            "data": b"{}"})
+        assert redis_db.publish("asset/events", "{}") == 0
+
+
+class TestSyntheticGrid:
+
+    @staticmethod
+    def test_grid_contains_the_requested_assets_and_the_market_maker():
+        grid_tree = create_synthetic_grid(100, assets_per_house=4, houses_per_street=5)
+        grid = next(iter(grid_tree.values()))
+        area_names = [area["area_name"] for area in grid["children"].values()]
+        assert MARKET_MAKER_NAME in area_names
+        assert len(area_names) == 1 + 5
+        emulator = ExchangeEmulator(redis_db=InProcessRedis(), grid_tree=grid_tree)
+        assert len(emulator.assets) == 100
+        assert create_synthetic_grid(100, 4, 5) == grid_tree
+
+
+class TestPayAsBidOrderBook:
+
+    @staticmethod
+    def test_highest_bids_are_matched_with_cheapest_offers_at_the_bid_price():
+        order_book = PayAsBidOrderBook()
+        order_book.add_order("bid", "Load 1", 2, 60)
+        order_book.add_order("bid", "Load 2", 1, 10)
+        order_book.add_order("offer", "PV 1", 1, 20)
+        order_book.add_order("offer", "PV 2", 3, 90)
+        trades = order_book.match("2022-01-01T00:00")
+        assert [(trade["buyer"], trade["seller"], trade["traded_energy"], trade["trade_price"])
+                for trade in trades] == [("Load 1", "PV 1", 1, 30), ("Load 1", "PV 2", 1, 30)]
+        assert [order["energy"] for order in order_book.offers.values()] == [2]
+        assert [order["buyer"] for order in order_book.bids.values()] == ["Load 2"]
+
+    @staticmethod
+    def test_orders_are_replaced_and_deleted_per_asset():
+        order_book = PayAsBidOrderBook()
+        order_book.add_order("bid", "Load 1", 1, 10)
+        bid = order_book.add_order("bid", "Load 1", 2, 10)
+        assert order_book.list_orders("bid", "Load 1") == [bid]
+        assert order_book.delete_orders("bid", "Load 1") == [bid["id"]]
+        assert not order_book.bids
+
+
+class TestExchangeEmulator:
+
+    @staticmethod
+    def test_aggregator_and_asset_clients_trade_on_the_emulator(redis_db):
+        emulator = ExchangeEmulator(redis_db=redis_db, asset_count=6, ticks_per_slot=4)
+        aggregator = TradingAggregator("aggregator", redis_db=redis_db)
+        clients = [RedisAssetClient(name, redis_db=redis_db, pubsub_thread=aggregator.pubsub)
+                   for name in ("Load 1", "PV 2", "Load 4", "PV 5")]
+        for client in clients:
+            client.select_aggregator(aggregator.aggregator_uuid)
+        assert sorted(aggregator.device_uuid_list) == sorted(
+            client.area_uuid for client in clients)
+
+        slot_trades = emulator.run_market_slot(tick_interval=0.01)
+        assert aggregator.slot_orders_sent.wait(5)
+        slot_trades += emulator.run_market_slot(tick_interval=0.1)
+        stats = emulator.run(0)
+        assert aggregator.finished.wait(5)
+        wait_until_timeout_blocking(lambda: len(aggregator.trades) == len(slot_trades), 5)
+        assert slot_trades
+        assert {trade["buyer"] for trade in slot_trades} <= {"Load 1", "Load 4"}
+        assert {trade["seller"] for trade in slot_trades} <= {"PV 2", "PV 5"}
+        assert stats.registered_assets == 4
+        assert stats.aggregators == 1
+        assert stats.batch_commands >= 1
+        emulator.stop()
+
+    @staticmethod
+    def test_unknown_assets_are_rejected(redis_db):
+        ExchangeEmulator(redis_db=redis_db, asset_count=3)
+        responses = []
+        pubsub = redis_db.pubsub()
+        pubsub.psubscribe(**{"Unknown/response/register_participant": responses.append})
+        pubsub.run_in_thread(daemon=True)
+        redis_db.publish("Unknown/register_participant",
+                         json.dumps({"name": "Unknown", "transaction_id": "1"}))
+        wait_until_timeout_blocking(lambda: responses, timeout=5)
+        assert json.loads(responses[0]["data"])["response"] == "error"
+
+    @staticmethod
+    def test_batch_commands_of_unselected_assets_fail(redis_db):
+        emulator = ExchangeEmulator(redis_db=redis_db, asset_count=3)
+        asset_uuid = emulator.asset_uuids_by_name["Load 1"]
+        assert emulator._execute_command(  # pylint: disable=protected-access
+            "aggregator", asset_uuid, {"type": "bid", "energy": 1, "price": 1}
+        )["status"] == "error"
@@ -0,0 +1,99 @@
+# pylint: disable=missing-function-docstring
+import gzip
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from gsy_e_sdk.http_session import (
+    blocking_post_request, create_http_session, encode_json_body, get_http_session,
+    post_request, set_http_session)
+from gsy_e_sdk.utils import execute_graphql_request, get_aggregators_list
+
+TEST_ENDPOINT = "https://test.domain.com/endpoint/"
+TEST_JWT_TOKEN = "jwt-token"
+
+
+@pytest.fixture(name="session")
+def fixture_session():
+    return MagicMock()
+
+
+class TestHTTPSession:
+    """Test the process-wide HTTP session and its request helpers."""
+
+    @staticmethod
+    def test_get_http_session_returns_process_wide_session():
+        set_http_session(None)
+        assert get_http_session() is get_http_session()
+
+    @staticmethod
+    def test_set_http_session_replaces_process_wide_session(session):
+        set_http_session(session)
+        try:
+            assert get_http_session() is session
+        finally:
+            set_http_session(None)
+
+    @staticmethod
+    def test_create_http_session_mounts_pooled_adapter_with_retries():
+        session = create_http_session(pool_size=7, max_retries=2)
+        adapter = session.get_adapter("https://test.domain.com")
+        assert adapter._pool_maxsize == 7  # pylint: disable=protected-access
+        assert adapter.max_retries.total == 2
+
+    @staticmethod
+    def test_encode_json_body_keeps_small_bodies_uncompressed():
+        body, headers = encode_json_body({"a": 1}, {}, gzip_min_size=1000)
+        assert body == b'{"a": 1}'
+        assert "Content-Encoding" not in headers
+
+    @staticmethod
+    def test_encode_json_body_compresses_large_bodies():
+        data = {"values": list(range(1000))}
+        body, headers = encode_json_body(data, {}, gzip_min_size=100)
+        assert headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(body)) == data
+
+    @staticmethod
+    @pytest.mark.parametrize("status_code, expected", [(200, True), (404, False)])
+    def test_post_request_uses_injected_session(session, status_code, expected):
+        session.request.return_value = MagicMock(status_code=status_code)
+        assert post_request(TEST_ENDPOINT, {}, TEST_JWT_TOKEN, session=session) is expected
+        session.request.assert_called_once()
+
+    @staticmethod
+    def test_blocking_post_request_returns_response_body(session):
+        session.request.return_value = MagicMock(status_code=200, text='{"uuid": "1"}')
+        assert blocking_post_request(
+            TEST_ENDPOINT, {}, TEST_JWT_TOKEN, session=session) == {"uuid": "1"}
+
+    @staticmethod
+    def test_execute_graphql_request_uses_session_and_shared_token(session):
+        session.post.return_value = MagicMock(
+            status_code=200, json=MagicMock(return_value={"data": {}}))
+        token_manager = MagicMock(get_token=MagicMock(return_value=TEST_JWT_TOKEN))
+        with patch("gsy_e_sdk.utils.get_jwt_token_manager", return_value=token_manager):
+            assert execute_graphql_request("https://test.domain.com", "query {}",
+                                           session=session) == {"data": {}}
+            token_manager.get_token.assert_called_with("https://test.domain.com",
+                                                       session=session)
+        session.post.assert_called_once()
+
+    @staticmethod
+    @pytest.mark.parametrize("post_kwargs", [
+        {"side_effect": requests.exceptions.ConnectionError("reset")},
+        {"return_value": MagicMock(status_code=502, reason="Bad Gateway",
+                                   text="<html>Bad Gateway</html>")},
+        {"return_value": MagicMock(status_code=200, json=MagicMock(
+            return_value={"detail": "Not found"}))},
+    ])
+    def test_failed_graphql_requests_return_errors(session, post_kwargs):
+        session.post.configure_mock(**post_kwargs)
+        with patch("gsy_e_sdk.utils.get_jwt_token_manager"):
+            data = execute_graphql_request("https://test.domain.com", "query {}",
+                                           session=session)
+            assert data["data"] is None
+            assert data["errors"][0]["message"]
+            assert get_aggregators_list("https://test.domain.com", session=session) == []
@@ -0,0 +1,111 @@
+# pylint: disable=missing-function-docstring
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from gsy_e_sdk.ingestion import (
+    align_to_market_slot, ingest_file, iter_batches_in_background, iter_csv_rows,
+    iter_time_series_batches, send_time_series_batches)
+
+TEST_CSV = """Time,PV,Load
+2022-01-01T00:00,0.5,1
+2022-01-01T00:05,0.5,
+2022-01-01T00:20,"1,5",2
+2022-01-01T00:35,1,3
+"""
+
+
+@pytest.fixture(name="csv_file")
+def fixture_csv_file(tmp_path):
+    file_path = tmp_path / "meter_data.csv"
+    file_path.write_text(TEST_CSV, encoding="utf-8")
+    return str(file_path)
+
+
+class TestIngestion:
+    """Test the streaming ingestion of time series files."""
+
+    @staticmethod
+    def test_iter_csv_rows_yields_dicts(csv_file):
+        rows = list(iter_csv_rows(csv_file))
+        assert len(rows) == 4
+        assert rows[0] == {"Time": "2022-01-01T00:00", "PV": "0.5", "Load": "1"}
+        assert rows[2]["PV"] == "1,5"
+
+    @staticmethod
+    def test_iter_csv_rows_of_empty_file(tmp_path):
+        (tmp_path / "empty.csv").write_bytes(b"")
+        assert not list(iter_csv_rows(str(tmp_path / "empty.csv")))
+
+    @staticmethod
+    @pytest.mark.parametrize("timestamp, expected", [
+        ("2022-01-01T00:00", "2022-01-01T00:00"),
+        ("2022-01-01 00:29:59", "2022-01-01T00:15"),
+        ("2022-01-01T00:30:00+00:00", "2022-01-01T00:30")])
+    def test_align_to_market_slot(timestamp, expected):
+        assert align_to_market_slot(timestamp) == expected
+
+    @staticmethod
+    def test_rows_are_summed_per_slot_and_batched(csv_file):
+        batches = list(iter_time_series_batches(
+            iter_csv_rows(csv_file), "Time", {"PV": "pv-uuid", "Load": "load-uuid"},
+            batch_slots=2, decimal_separator=","))
+        assert batches == [
+            {"pv-uuid": {"2022-01-01T00:00": 1.0, "2022-01-01T00:15": 1.5},
+             "load-uuid": {"2022-01-01T00:00": 1.0, "2022-01-01T00:15": 2.0}},
+            {"pv-uuid": {"2022-01-01T00:30": 1.0}, "load-uuid": {"2022-01-01T00:30": 3.0}}]
+
+    @staticmethod
+    def test_invalid_values_are_skipped(csv_file, caplog):
+        batches = list(iter_time_series_batches(
+            iter_csv_rows(csv_file), "Time", {"PV": "pv-uuid"}, batch_slots=1))
+        assert batches == [{"pv-uuid": {"2022-01-01T00:00": 1.0}}, {},
+                           {"pv-uuid": {"2022-01-01T00:30": 1.0}}]
+        assert "'1,5' of column PV in row 3" in caplog.text
+
+    @staticmethod
+    def test_background_reader_propagates_errors():
+        def _failing_batches():
+            yield {"asset": {}}
+            raise ValueError("corrupted file")
+
+        batches = iter_batches_in_background(_failing_batches())
+        assert next(batches) == {"asset": {}}
+        with pytest.raises(ValueError):
+            next(batches)
+
+    @staticmethod
+    def test_background_reader_stops_when_the_consumer_stops():
+        closed = threading.Event()
+
+        def _endless_batches():
+            try:
+                while True:
+                    yield {"asset": {}}
+            finally:
+                closed.set()
+
+        batches = iter_batches_in_background(_endless_batches(), max_pending_batches=1)
+        assert next(batches) == {"asset": {}}
+        batches.close()
+        assert closed.wait(5)
+
+    @staticmethod
+    def test_send_time_series_batches_rejects_unknown_commands():
+        with pytest.raises(ValueError):
+            send_time_series_batches([], {}, command="bid_energy")
+
+    @staticmethod
+    def test_ingest_file_sends_every_batch_to_the_clients(csv_file):
+        clients = {"pv-uuid": MagicMock(), "load-uuid": MagicMock()}
+        clients["load-uuid"].set_energy_measurement.side_effect = [None, ConnectionError]
+        stats = ingest_file(csv_file, clients, "Time", {"PV": "pv-uuid", "Load": "load-uuid"},
+                            command="set_energy_measurement", batch_slots=2,
+                            decimal_separator=",")
+
+        assert stats.batches == 2
+        assert stats.values == 6
+        assert stats.failed_requests == 1
+        clients["pv-uuid"].set_energy_measurement.assert_called_with(
+            {"2022-01-01T00:30": 1.0}, do_not_wait=False)
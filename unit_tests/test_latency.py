@@ -0,0 +1,78 @@
+# pylint: disable=missing-function-docstring, protected-access
+import random
+from concurrent.futures.thread import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from gsy_e_sdk.latency import (
+    CALLBACK_PREFIX, EVENT_TO_RESPONSE, QUEUE_WAIT, RESPONSE_RTT, LatencyHistogram,
+    LatencyTracker)
+from gsy_e_sdk.websocket_device import DeviceWebsocketMessageReceiver
+
+
+class TestLatencyHistogram:
+
+    @staticmethod
+    def test_percentiles_are_accurate_within_the_bucket_width():
+        histogram = LatencyHistogram()
+        rng = random.Random(0)
+        durations = sorted(rng.expovariate(100) for _ in range(10000))
+        for duration in durations:
+            histogram.record(duration)
+        summary = histogram.summary()
+        assert summary.count == 10000
+        assert summary.max == durations[-1]
+        assert summary.mean == pytest.approx(sum(durations) / 10000)
+        for percentile, value in ((50, summary.p50), (90, summary.p90), (99, summary.p99)):
+            assert value == pytest.approx(durations[percentile * 100 - 1], rel=0.05)
+
+    @staticmethod
+    def test_memory_does_not_grow_with_large_durations():
+        histogram = LatencyHistogram()
+        bucket_count = len(histogram._counts)
+        for duration in (0, 1e-7, 1.5, 3600, 1e9):
+            histogram.record(duration)
+        assert len(histogram._counts) == bucket_count
+        assert histogram.summary().max == 1e9
+        assert histogram.percentile(50) == pytest.approx(1.5, rel=0.05)
+        histogram.reset()
+        assert histogram.summary().count == 0
+
+
+class TestLatencyTracker:
+
+    @staticmethod
+    def test_round_trip_time_is_recorded_once_per_transaction():
+        tracker = LatencyTracker(max_pending_transactions=2)
+        for transaction_id in ("1", "2", "3"):
+            tracker.start_transaction(transaction_id)
+        assert tracker.pending_transactions == 2
+        assert tracker.finish_transaction("1") is None
+        assert tracker.finish_transaction("3") >= 0
+        assert tracker.finish_transaction("3") is None
+        assert tracker.snapshot()[RESPONSE_RTT].count == 1
+
+    @staticmethod
+    def test_submitted_callbacks_record_queue_wait_and_duration():
+        tracker = LatencyTracker()
+        callback = MagicMock()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            tracker.submit(executor, callback, "on_tick").result()
+        callback.assert_called_once()
+        snapshot = tracker.snapshot()
+        assert snapshot[QUEUE_WAIT].count == 1
+        assert snapshot[CALLBACK_PREFIX + "on_tick"].count == 1
+        assert "on_tick" in tracker.format_summary()
+
+    @staticmethod
+    def test_websocket_receiver_measures_batch_response_after_event():
+        tracker = LatencyTracker()
+        client = MagicMock(latency_tracker=tracker, recorder=None)
+        receiver = DeviceWebsocketMessageReceiver(client)
+        tracker.start_transaction("transaction")
+        receiver.received_message({"event": "tick"})
+        receiver.received_message({"command": "batch_commands", "transaction_id": "transaction"})
+        snapshot = tracker.snapshot()
+        assert snapshot[RESPONSE_RTT].count == 1
+        assert snapshot[EVENT_TO_RESPONSE].count == 1
@@ -0,0 +1,73 @@
+# pylint: disable=missing-function-docstring
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from gsy_e_sdk.live_data import LiveDataCoalescer
+
+
+@pytest.fixture(name="client")
+def fixture_client():
+    return MagicMock()
+
+
+class TestLiveDataCoalescer:
+    """Test buffering and flushing of live data readings."""
+
+    @staticmethod
+    def test_readings_are_merged_by_timestamp(client):
+        with LiveDataCoalescer(max_latency=60) as coalescer:
+            coalescer.add(client, {"2022-01-01T00:00": 1, "2022-01-01T00:01": 2})
+            coalescer.add(client, {"2022-01-01T00:01": 3})
+        client.set_live_generation.assert_called_once_with(
+            {"2022-01-01T00:00": 1, "2022-01-01T00:01": 3}, do_not_wait=True)
+        assert coalescer.stats.readings_merged == 1
+        assert coalescer.stats.readings_sent == 2
+
+    @staticmethod
+    def test_readings_can_be_summed_up(client):
+        with LiveDataCoalescer(max_latency=60, sum_readings=True) as coalescer:
+            coalescer.add(client, {"2022-01-01T00:00": 1})
+            coalescer.add(client, {"2022-01-01T00:00": 2})
+        client.set_live_generation.assert_called_once_with(
+            {"2022-01-01T00:00": 3}, do_not_wait=True)
+
+    @staticmethod
+    def test_buffer_is_flushed_when_full(client):
+        with LiveDataCoalescer(max_batch_size=3, max_latency=60) as coalescer:
+            for second in range(7):
+                coalescer.add(client, {f"2022-01-01T00:00:{second:02d}": second})
+            assert client.set_live_generation.call_count == 2
+            assert coalescer.stats.size_flushes == 2
+        assert coalescer.stats.readings_sent == 7
+
+    @staticmethod
+    def test_buffer_is_flushed_on_deadline(client):
+        coalescer = LiveDataCoalescer(max_latency=0.05)
+        coalescer.add(client, {"2022-01-01T00:00": 1})
+        time.sleep(0.3)
+        client.set_live_generation.assert_called_once()
+        assert coalescer.stats.deadline_flushes == 1
+        assert 0.05 <= coalescer.stats.max_flush_delay < 0.3
+        coalescer.close()
+
+    @staticmethod
+    def test_one_request_per_client_and_failures_are_counted():
+        clients = [MagicMock(), MagicMock(set_energy_measurement=MagicMock(
+            side_effect=ConnectionError))]
+        with LiveDataCoalescer(max_latency=60, command="set_energy_measurement",
+                               do_not_wait=False) as coalescer:
+            for client in clients:
+                coalescer.add(client, {"2022-01-01T00:00": 1})
+        clients[0].set_energy_measurement.assert_called_once_with(
+            {"2022-01-01T00:00": 1}, do_not_wait=False)
+        assert coalescer.stats.requests_sent == 2
+        assert coalescer.stats.failed_requests == 1
+
+    @staticmethod
+    def test_add_after_close_raises(client):
+        coalescer = LiveDataCoalescer()
+        coalescer.close()
+        with pytest.raises(RuntimeError):
+            coalescer.add(client, {"2022-01-01T00:00": 1})
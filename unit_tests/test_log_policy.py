@@ -0,0 +1,89 @@
+# pylint: disable=missing-function-docstring, protected-access
+import logging
+from logging.handlers import QueueHandler
+from unittest.mock import patch
+
+import pytest
+
+from gsy_e_sdk.commands import ClientCommandBuffer
+from gsy_e_sdk.log_policy import (
+    MessageLogView, SlotLogSummary, configure_async_logging, stop_async_logging)
+
+
+@pytest.fixture(name="root_logger")
+def fixture_root_logger():
+    root_logger = logging.getLogger()
+    level, handlers = root_logger.level, list(root_logger.handlers)
+    yield root_logger
+    root_logger.setLevel(level)
+    root_logger.handlers = handlers
+
+
+class TestSlotLogSummary:
+
+    @staticmethod
+    def test_trades_and_commands_are_summarized_once_per_slot(caplog):
+        summary = SlotLogSummary("aggregator")
+        summary.add_trade({"traded_energy": 1, "trade_price": 20, "buyer": "house"})
+        summary.add_trade({"traded_energy": 3, "trade_price": 40, "buyer": "anonymous"})
+        summary.add_command_responses([{"command": "offer", "status": "ready"},
+                                       {"command": "bid", "status": "ready"},
+                                       {"command": "bid", "status": "error"}])
+        with caplog.at_level(logging.INFO):
+            summary.flush()
+            summary.flush()
+        assert caplog.messages == [
+            "Market slot summary of aggregator: 2 trades, 4.0 kWh, avg rate 15.0 cents/kWh; "
+            "1 bid, 1 offer commands"]
+
+    @staticmethod
+    def test_individual_trades_are_limited_per_slot(caplog):
+        summary = SlotLogSummary(max_item_lines=2)
+        with caplog.at_level(logging.DEBUG):
+            for _ in range(5):
+                summary.add_trade({"traded_energy": 1, "trade_price": 20, "seller": "pv"})
+        assert len(caplog.messages) == 2
+        summary.flush()
+        with caplog.at_level(logging.DEBUG):
+            summary.add_trade({"traded_energy": 1, "trade_price": 20, "seller": "pv"})
+        assert summary.trade_count == 1
+
+
+class TestLogPolicy:
+
+    @staticmethod
+    def test_message_view_drops_the_grid_tree():
+        message = {"event": "tick", "grid_tree": {"area": {}}}
+        assert str(MessageLogView(message)) == "{'event': 'tick'}"
+        assert "grid_tree" in message
+
+    @staticmethod
+    def test_command_buffer_is_only_tabulated_when_debug_is_enabled(root_logger):
+        root_logger.setLevel(logging.INFO)
+        with patch("gsy_e_sdk.commands.tabulate") as tabulate_mock:
+            buffer = ClientCommandBuffer()
+            for _ in range(3):
+                buffer.offer_energy("asset", 1, 30)
+            buffer.execute_batch()
+            tabulate_mock.assert_not_called()
+            root_logger.setLevel(logging.DEBUG)
+            buffer.execute_batch()
+            tabulate_mock.assert_called_once()
+
+    @staticmethod
+    def test_async_logging_moves_the_handlers_to_a_listener(root_logger):
+        records = []
+
+        class ListHandler(logging.Handler):
+            def emit(self, record):
+                records.append(record.getMessage())
+
+        root_logger.handlers = [ListHandler()]
+        root_logger.setLevel(logging.INFO)
+        listener = configure_async_logging()
+        assert configure_async_logging() is listener
+        assert isinstance(root_logger.handlers[0], QueueHandler)
+        logging.info("message %s", 1)
+        stop_async_logging()
+        assert records == ["message 1"]
+        assert isinstance(root_logger.handlers[0], ListHandler)
@@ -0,0 +1,71 @@
+# pylint: disable=missing-function-docstring
+import threading
+import urllib.request
+from concurrent.futures.thread import ThreadPoolExecutor
+
+import pytest
+
+from gsy_e_sdk.latency import LatencyTracker
+from gsy_e_sdk.metrics import (
+    BATCHES_SENT, MESSAGES_RECEIVED, MetricsRegistry, MetricsServer)
+
+
+@pytest.fixture(name="registry")
+def fixture_registry():
+    return MetricsRegistry(LatencyTracker())
+
+
+class TestMetricsRegistry:
+
+    @staticmethod
+    def test_counters_of_all_threads_are_summed_up(registry):
+
+        def count_messages():
+            for _ in range(1000):
+                registry.inc(MESSAGES_RECEIVED, type="tick")
+
+        threads = [threading.Thread(target=count_messages) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        registry.inc(MESSAGES_RECEIVED, type="market")
+        assert registry.get_counter(MESSAGES_RECEIVED, type="tick") == 4000
+        assert registry.get_counter(MESSAGES_RECEIVED, type="market") == 1
+        assert registry.get_counter(BATCHES_SENT) == 0
+
+    @staticmethod
+    def test_metrics_are_rendered_in_prometheus_text_format(registry):
+        registry.inc(MESSAGES_RECEIVED, type='say "hi"')
+        registry.latency_tracker.record("callback.on_tick", 0.002)
+        registry.latency_tracker.start_transaction("transaction")
+        executor = ThreadPoolExecutor(max_workers=1)
+        registry.track_executor(executor)
+        started, blocker = threading.Event(), threading.Event()
+        executor.submit(lambda: started.set() or blocker.wait())
+        started.wait(5)
+        executor.submit(blocker.wait)
+        lines = registry.render().splitlines()
+        blocker.set()
+        executor.shutdown()
+        assert "# TYPE gsy_e_sdk_messages_received_total counter" in lines
+        assert 'gsy_e_sdk_messages_received_total{type="say \\"hi\\""} 1' in lines
+        assert "gsy_e_sdk_executor_queue_depth 1" in lines
+        assert "gsy_e_sdk_pending_transactions 1" in lines
+        assert 'gsy_e_sdk_latency_seconds_count{stage="callback.on_tick"} 1' in lines
+
+
+class TestMetricsServer:
+
+    @staticmethod
+    def test_metrics_are_served_on_the_metrics_path(registry):
+        registry.inc(BATCHES_SENT)
+        server = MetricsServer(registry, port=0)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+                body = response.read().decode("utf-8")
+            assert "gsy_e_sdk_batches_sent_total 1" in body
+            with pytest.raises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other")
+        finally:
+            server.stop()
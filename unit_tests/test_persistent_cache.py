@@ -0,0 +1,53 @@
+# pylint: disable=missing-function-docstring
+import pytest
+
+from gsy_e_sdk.persistent_cache import PersistentCache, compute_cache_version, get_persistent_cache
+
+
+@pytest.fixture(name="cache")
+def fixture_cache(tmp_path):
+    cache = PersistentCache(str(tmp_path))
+    yield cache
+    cache.close()
+
+
+class TestPersistentCache:
+    """Test the sqlite backed persistent cache."""
+
+    @staticmethod
+    def test_values_survive_reopening_the_cache(cache, tmp_path):
+        cache.set("namespace", "key", {"a": [1, 2]})
+        reopened_cache = PersistentCache(str(tmp_path))
+        assert reopened_cache.get("namespace", "key") == {"a": [1, 2]}
+        reopened_cache.close()
+
+    @staticmethod
+    def test_get_discards_entries_of_other_versions(cache):
+        cache.set("namespace", "key", ["value"], version="1")
+        assert cache.get("namespace", "key", version="1") == ["value"]
+        assert cache.get("namespace", "key", version="2") is None
+
+    @staticmethod
+    def test_version_defaults_to_hash_of_value(cache):
+        cache.set("namespace", "key", ["value"])
+        assert cache.get_entry("namespace", "key")["version"] == compute_cache_version(["value"])
+
+    @staticmethod
+    def test_get_discards_expired_entries(cache):
+        cache.set("namespace", "key", ["value"])
+        assert cache.get("namespace", "key", max_age=60) == ["value"]
+        assert cache.get("namespace", "key", max_age=-1) is None
+
+    @staticmethod
+    def test_namespaces_are_separated(cache):
+        cache.set("namespace", "key", 1)
+        assert cache.get("other_namespace", "key") is None
+        cache.delete("namespace", "key")
+        assert cache.get("namespace", "key") is None
+
+    @staticmethod
+    def test_get_persistent_cache_is_disabled_without_directory(monkeypatch, tmp_path):
+        monkeypatch.delenv("API_CLIENT_CACHE_DIR", raising=False)
+        assert get_persistent_cache() is None
+        monkeypatch.setenv("API_CLIENT_CACHE_DIR", str(tmp_path))
+        assert get_persistent_cache() is get_persistent_cache(str(tmp_path))
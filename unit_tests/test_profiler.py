@@ -0,0 +1,113 @@
+# pylint: disable=missing-function-docstring
+import threading
+import time
+import uuid
+from concurrent.futures.thread import ThreadPoolExecutor
+
+from gsy_e_sdk.latency import LatencyTracker
+from gsy_e_sdk.metrics import MetricsRegistry, get_metrics_registry
+from gsy_e_sdk.profiler import (
+    SamplingProfiler, format_profile_report, get_market_slot_count, wait_for_market_slots)
+
+
+def _busy_strategy(duration):
+    end_time = time.monotonic() + duration
+    while time.monotonic() < end_time:
+        pass
+
+
+def _events_callback_dict(duration):
+    _busy_strategy(duration)
+
+
+def _profile(function, *args, all_threads=False):
+    profiler = SamplingProfiler(interval=0.001, all_threads=all_threads)
+    profiler.start()
+    function(*args)
+    profiler.stop()
+    return profiler
+
+
+class TestSamplingProfiler:
+
+    @staticmethod
+    def test_samples_are_attributed_to_the_running_callback():
+        def run_callback():
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                LatencyTracker().submit(
+                    executor, lambda: _busy_strategy(0.2), "on_market_slot").result()
+
+        profiler = _profile(run_callback)
+        assert list(profiler.get_root_samples()) == ["callback:on_market_slot"]
+        assert any(stack[-1].startswith("_busy_strategy") for stack in profiler.samples)
+        assert "callback:on_market_slot" in format_profile_report(profiler)
+
+    @staticmethod
+    def test_samples_of_other_threads_are_only_kept_for_all_threads():
+        def run_threads():
+            idle_thread = threading.Thread(target=time.sleep, args=(0.2,), name="idle")
+            dispatch_thread = threading.Thread(target=_events_callback_dict, args=(0.2,))
+            idle_thread.start()
+            dispatch_thread.start()
+            idle_thread.join()
+            dispatch_thread.join()
+
+        roots = _profile(run_threads).get_root_samples()
+        assert "dispatch:_events_callback_dict" in roots
+        assert "thread:idle" not in roots
+        assert "thread:idle" in _profile(run_threads, all_threads=True).get_root_samples()
+
+    @staticmethod
+    def test_folded_stacks_are_written_per_line(tmp_path):
+        profiler = _profile(_events_callback_dict, 0.05)
+        file_path = tmp_path / "profile.folded"
+        profiler.write_folded_stacks(str(file_path))
+        for line in file_path.read_text().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert stack.split(";")[0] == "dispatch:_events_callback_dict"
+            assert int(count) > 0
+
+    @staticmethod
+    def test_deep_stacks_keep_the_innermost_frames():
+        def recurse(depth):
+            if depth:
+                recurse(depth - 1)
+            else:
+                _busy_strategy(0.1)
+
+        def _events_callback_dict():  # pylint: disable=invalid-name
+            recurse(10)
+
+        profiler = SamplingProfiler(interval=0.001, max_depth=3)
+        profiler.start()
+        _events_callback_dict()
+        profiler.stop()
+        assert profiler.samples
+        assert all(len(stack) <= 4 for stack in profiler.samples)
+        assert any(stack[-1].startswith("_busy_strategy") for stack in profiler.samples)
+
+    @staticmethod
+    def test_market_slots_are_counted_once_for_all_clients():
+        metrics = MetricsRegistry()
+        for market_slot in ["2022-01-01T00:00", "2022-01-01T00:00", "2022-01-01T00:15",
+                            "2022-01-01T00:00", None]:
+            metrics.count_market_slot(market_slot)
+        assert get_market_slot_count(metrics) == 2
+
+    @staticmethod
+    def test_waits_until_the_slots_have_passed():
+        def script():
+            # The second slot has passed with the market event of the third one
+            for _ in range(3):
+                time.sleep(0.05)
+                market_slot = str(uuid.uuid4())
+                # Every client of the script receives the market event
+                for _ in range(4):
+                    get_metrics_registry().count_market_slot(market_slot)
+            time.sleep(10)
+
+        script_thread = threading.Thread(target=script, daemon=True)
+        start_time = time.monotonic()
+        script_thread.start()
+        assert wait_for_market_slots(script_thread, 2, poll_interval=0.01) == 2
+        assert time.monotonic() - start_time < 5
@@ -0,0 +1,131 @@
+# pylint: disable=missing-function-docstring, protected-access
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from gsy_e_sdk.recorder import (
+    FILE_MAGIC, INBOUND, OUTBOUND, MessageRecorder, get_message_recorder, iter_recording,
+    recorded_callback)
+from gsy_e_sdk.redis_aggregator import RedisAggregator
+from gsy_e_sdk.websocket_device import DeviceWebsocketMessageReceiver
+
+
+@pytest.fixture(name="recording_file")
+def fixture_recording_file(tmp_path):
+    return str(tmp_path / "messages.rec")
+
+
+class TestMessageRecorder:
+    """Test the message recorder and the reader of its recordings."""
+
+    @staticmethod
+    def test_recorded_messages_are_read_back_in_order(recording_file):
+        large_payload = {"market_slot": "2022-01-01T00:00", "bids": [{"energy": 1}] * 100}
+        before = time.time()
+        with MessageRecorder(recording_file) as recorder:
+            recorder.record(INBOUND, b"aggregator/events", b'{"event": "tick"}')
+            recorder.record(OUTBOUND, "aggregator/batch_commands", large_payload)
+        messages = list(iter_recording(recording_file))
+        assert [(message.direction, message.channel) for message in messages] == [
+            (INBOUND, "aggregator/events"), (OUTBOUND, "aggregator/batch_commands")]
+        assert messages[0].data == {"event": "tick"}
+        assert messages[1].data == large_payload
+        assert messages[0].timestamp <= messages[1].timestamp
+        assert before - 1 < messages[0].wall_time < time.time() + 1
+        assert recorder.stats.recorded == 2
+
+    @staticmethod
+    def test_large_payloads_are_compressed(recording_file):
+        payload = json.dumps({"bids": [{"energy": 1, "price": 30}] * 1000})
+        with MessageRecorder(recording_file) as recorder:
+            recorder.record(INBOUND, "events", payload)
+        assert recorder.stats.bytes_written < len(payload) / 10
+
+    @staticmethod
+    def test_sessions_are_appended_to_the_same_file(recording_file):
+        for event in ("market", "tick"):
+            with MessageRecorder(recording_file) as recorder:
+                recorder.record(INBOUND, "events", {"event": event})
+        assert [message.data["event"] for message in iter_recording(recording_file)] == [
+            "market", "tick"]
+
+    @staticmethod
+    def test_truncated_last_frame_is_ignored(recording_file):
+        with MessageRecorder(recording_file) as recorder:
+            recorder.record(INBOUND, "events", {"event": "market"})
+            recorder.record(INBOUND, "events", {"event": "tick"})
+        with open(recording_file, "rb+") as recording:
+            recording.truncate(recording.seek(0, 2) - 3)
+        assert [message.data for message in iter_recording(recording_file)] == [
+            {"event": "market"}]
+
+    @staticmethod
+    def test_messages_are_dropped_instead_of_blocking_when_the_queue_is_full(recording_file):
+        recorder = MessageRecorder(recording_file, max_queue_size=1)
+        # Stop the writer, so that the queue is not consumed
+        recorder._queue.put(None)
+        recorder._writer_thread.join()
+        recorder.record(INBOUND, "events", "1")
+        recorder.record(INBOUND, "events", "2")
+        assert recorder.stats.dropped == 1
+
+    @staticmethod
+    def test_unserializable_payloads_are_dropped_by_the_writer(recording_file):
+        with MessageRecorder(recording_file) as recorder:
+            recorder.record(INBOUND, "events", {"event": object()})
+            recorder.record(INBOUND, "events", {"event": "tick"})
+        assert recorder.stats.dropped == 1
+        assert [message.data for message in iter_recording(recording_file)] == [
+            {"event": "tick"}]
+
+    @staticmethod
+    def test_invalid_files_are_rejected(recording_file):
+        with open(recording_file, "wb") as recording:
+            recording.write(b"not a recording")
+        with pytest.raises(ValueError):
+            list(iter_recording(recording_file))
+
+    @staticmethod
+    def test_recorder_is_shared_per_file_and_disabled_by_default(recording_file, monkeypatch):
+        monkeypatch.delenv("API_CLIENT_RECORDING_FILE", raising=False)
+        assert get_message_recorder() is None
+        recorder = get_message_recorder(recording_file)
+        assert get_message_recorder(recording_file) is recorder
+        recorder.close()
+        with open(recording_file, "rb") as recording:
+            assert recording.read(len(FILE_MAGIC)) == FILE_MAGIC
+
+
+class TestClientRecording:
+    """Test that the clients record their messages."""
+
+    @staticmethod
+    def test_recorded_callback_records_and_calls_the_callback():
+        recorder, callback = MagicMock(), MagicMock(return_value=1)
+        wrapped_callback = recorded_callback(recorder, callback)
+        assert wrapped_callback({"channel": b"events", "data": b"{}"}) == 1
+        recorder.record.assert_called_once_with(INBOUND, b"events", b"{}")
+        assert wrapped_callback.__wrapped__ is callback
+        assert recorded_callback(None, callback) is callback
+
+    @staticmethod
+    def test_redis_aggregator_records_published_commands(mocker):
+        mocker.patch("gsy_e_sdk.redis_aggregator.Redis")
+        mocker.patch("gsy_e_sdk.redis_aggregator.wait_until_timeout_blocking")
+        recorder = MagicMock()
+        aggregator = RedisAggregator("aggregator", recorder=recorder)
+        channel, payload = aggregator.redis_db.publish.call_args.args
+        recorder.record.assert_called_once_with(OUTBOUND, channel, payload)
+        assert json.loads(payload)["type"] == "CREATE"
+
+    @staticmethod
+    def test_websocket_receiver_records_raw_messages():
+        client = MagicMock(asset_uuid="asset-uuid", aggregator_uuid=None)
+        receiver = DeviceWebsocketMessageReceiver(client)
+        message = {"event": "tick", "sequence_number": 1}
+        receiver.received_message(message)
+        receiver.received_message(message)
+        assert client.recorder.record.call_count == 2
+        client.recorder.record.assert_called_with(INBOUND, "asset/asset-uuid", message)
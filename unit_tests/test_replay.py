@@ -0,0 +1,125 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from gsy_e_sdk.aggregator import Aggregator
+from gsy_e_sdk.authentication import get_jwt_token_manager
+from gsy_e_sdk.cli import main
+from gsy_e_sdk.recorder import INBOUND, OUTBOUND, MessageRecorder
+from gsy_e_sdk.redis_aggregator import RedisAggregator
+from gsy_e_sdk.replay import ReplayEngine, TimingExecutor, iter_replay_messages
+
+TEST_ASSET_UUID = "asset-uuid"
+
+
+class RedisBiddingAggregator(RedisAggregator):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ticks = []
+        self.batch_responses = []
+
+    def on_tick(self, tick_info):
+        self.ticks.append(tick_info["slot_completion"])
+        self.add_to_batch_commands.bid_energy(TEST_ASSET_UUID, 1, 30)
+        self.batch_responses.append(self.execute_batch_commands())
+
+
+class RestBiddingAggregator(Aggregator):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_responses = []
+
+    def on_tick(self, tick_info):
+        self.add_to_batch_commands.bid_energy(TEST_ASSET_UUID, 1, 30)
+        self.batch_responses.append(self.execute_batch_commands())
+
+
+def _write_jsonl(file_path, entries):
+    with open(file_path, "w", encoding="utf-8") as jsonl_file:
+        for entry in entries:
+            jsonl_file.write(json.dumps(entry) + "\n")
+
+
+@pytest.fixture(name="recording_file")
+def fixture_recording_file(tmp_path):
+    file_path = str(tmp_path / "traffic.jsonl")
+    _write_jsonl(file_path, [
+        {"timestamp": 0, "data": {"event": "selected_by_device",
+                                  "device_uuid": TEST_ASSET_UUID}},
+        {"timestamp": 1, "data": {"event": "tick", "slot_completion": "50%",
+                                  "grid_tree": {}}},
+        {"timestamp": 1.5, "direction": "out", "data": {
+            "batch_commands": {TEST_ASSET_UUID: [{"type": "bid"}]}}},
+        {"timestamp": 2, "data": {"command": "batch_commands", "transaction_id": "recorded",
+                                  "responses": {TEST_ASSET_UUID: [{"status": "error"}]}}},
+        {"timestamp": 3, "data": {"event": "tick", "slot_completion": "80%",
+                                  "grid_tree": {}}}])
+    yield file_path
+    get_jwt_token_manager().clear()
+
+
+class TestReplayEngine:
+
+    @staticmethod
+    def test_redis_aggregator_is_driven_by_the_recorded_events(recording_file):
+        engine = ReplayEngine(recording_file, RedisBiddingAggregator)
+        report = engine.run()
+        aggregator = engine.aggregator
+        assert aggregator.ticks == ["50%", "80%"]
+        assert report.messages == 3
+        assert (report.sent_batch_commands, report.recorded_batch_commands) == (2, 1)
+        # The first response is taken from the recording, the second one is generated
+        assert aggregator.batch_responses[0]["responses"] == {
+            TEST_ASSET_UUID: [{"status": "error"}]}
+        generated_response = aggregator.batch_responses[1]["responses"][TEST_ASSET_UUID][0]
+        assert (generated_response["command"], generated_response["status"]) == ("bid", "ready")
+        assert report.stubbed_responses == 1
+        assert report.callback_timings["on_tick"].count == 2
+        assert report.recorded_duration_secs == 3
+
+    @staticmethod
+    def test_rest_aggregator_is_driven_by_the_recorded_events(recording_file, monkeypatch):
+        monkeypatch.delenv("API_CLIENT_USERNAME", raising=False)
+        engine = ReplayEngine(recording_file, RestBiddingAggregator)
+        report = engine.run()
+        # The placeholder credentials do not leak into later clients of the process
+        assert "API_CLIENT_USERNAME" not in os.environ
+        batch_responses = engine.aggregator.batch_responses
+        assert len(batch_responses) == 2
+        assert "recorded" not in [response["transaction_id"] for response in batch_responses]
+        assert batch_responses[0]["responses"] == {TEST_ASSET_UUID: [{"status": "error"}]}
+        assert report.sent_batch_commands == 2
+        assert report.callback_timings["on_tick"].count == 2
+
+    @staticmethod
+    def test_recordings_of_the_message_recorder_are_replayed(tmp_path):
+        file_path = str(tmp_path / "traffic.rec")
+        with MessageRecorder(file_path) as recorder:
+            recorder.record(INBOUND, "events", {"event": "tick", "slot_completion": "50%"})
+            recorder.record(OUTBOUND, "batch", {"batch_commands": {}})
+        messages = list(iter_replay_messages(file_path))
+        assert [message.direction for message in messages] == [INBOUND, OUTBOUND]
+        assert messages[0].data["event"] == "tick"
+
+    @staticmethod
+    def test_timing_executor_runs_callbacks_immediately():
+        executor = TimingExecutor()
+        future = executor.submit(lambda function_name: 42, function_name="on_market_slot")
+        assert future.result() == 42
+        assert executor.timings["on_market_slot"].count == 1
+
+    @staticmethod
+    def test_replay_command_prints_and_writes_the_report(recording_file, tmp_path):
+        report_file = str(tmp_path / "report.json")
+        result = CliRunner().invoke(main, [
+            "replay", recording_file, "--aggregator",
+            "unit_tests.test_replay:RedisBiddingAggregator", "--report-file", report_file])
+        assert result.exit_code == 0, result.output
+        assert "on_tick" in result.output
+        with open(report_file, encoding="utf-8") as report_json:
+            assert json.load(report_json)["callback_timings"]["on_tick"]["count"] == 2
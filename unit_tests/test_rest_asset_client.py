@@ -4,6 +4,7 @@ import uuid
 from unittest.mock import patch, MagicMock
 
 import pytest
+from gsy_e_sdk.authentication import get_jwt_token_manager
 from gsy_e_sdk.constants import MAX_WORKER_THREADS
 
 from gsy_e_sdk.clients.rest_asset_client import RestAssetClient, REGISTER_COMMAND_TIMEOUT
@@ -25,8 +26,9 @@ TEST_COMMAND_RESPONSE = {"command": "register",
 @pytest.fixture(name="mock_connections", autouse=True)
 def fixture_mock_connections(mocker):
     # gsy_framework/client_connections/utils.py
-    mocker.patch("gsy_e_sdk.clients.rest_asset_client.retrieve_jwt_key_from_server")
+    mocker.patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server")
     mocker.patch("gsy_framework.client_connections.utils.RepeatingTimer")
+    get_jwt_token_manager().clear()
 
     mocker.patch("gsy_e_sdk.clients.rest_asset_client.WebsocketThread")
     mocker.patch("gsy_e_sdk.clients.rest_asset_client.ThreadPoolExecutor")
@@ -86,11 +88,11 @@ class TestRestAssetClient:
                              [(None, TEST_DOMAIN_NAME),
                               ("test_sim_api_name", "test_sim_api_name")])
     def test_constructor_jwt_token_setup(set_value, expected_call_val):
-        with patch("gsy_e_sdk.clients.rest_asset_client."
+        with patch("gsy_e_sdk.authentication."
                    "retrieve_jwt_key_from_server") as mocked_func:
-            RestAssetClient(asset_uuid=TEST_ASSET_UUID,
-                            sim_api_domain_name=set_value)
-            mocked_func.assert_called_with(expected_call_val)
+            client = RestAssetClient(asset_uuid=TEST_ASSET_UUID,
+                                     sim_api_domain_name=set_value)
+            mocked_func.assert_called_with(expected_call_val, session=client.http_session)
 
     @staticmethod
     @pytest.mark.usefixtures("mock_environment_use_functions")
@@ -140,14 +142,15 @@ class TestRestAssetClient:
         endpoint = f"{client.endpoint_prefix}/register/"
         data = {"transaction_id": TEST_TRANSACTION_ID}
 
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=None) as mocked_func:
             client.register()
-            mocked_func.assert_called_with(endpoint, data, client.jwt_token)
+            mocked_func.assert_called_with(endpoint, data, client.jwt_token,
+                                           session=client.http_session)
 
     @staticmethod
     def test_register_request_not_posted_return_none(client):
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=False):
             ret_val = client.register()
 
@@ -156,7 +159,7 @@ class TestRestAssetClient:
     @staticmethod
     @pytest.mark.usefixtures("mock_transaction_id")
     def test_register_request_posted_waits_for_command_response_and_return_expected(client):
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=True):
             client.dispatcher = MagicMock()
             client.dispatcher.wait_for_command_response.return_value = TEST_COMMAND_RESPONSE
@@ -170,15 +173,16 @@ class TestRestAssetClient:
     def test_unregister_request_post_call(client):
         endpoint = f"{client.endpoint_prefix}/unregister/"
         data = {"transaction_id": TEST_TRANSACTION_ID}
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=None) as mocked_func:
             client.unregister(is_blocking=False)
 
-            mocked_func.assert_called_with(endpoint, data, client.jwt_token)
+            mocked_func.assert_called_with(endpoint, data, client.jwt_token,
+                                           session=client.http_session)
 
     @staticmethod
     def test_unregister_request_not_posted_return_none(client):
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=False):
             ret_val = client.unregister(is_blocking=False)
 
@@ -187,7 +191,7 @@ class TestRestAssetClient:
     @staticmethod
     @pytest.mark.usefixtures("mock_transaction_id")
     def test_unregister_request_posted_waits_for_command_response_and_return_expected(client):
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=True):
             client.dispatcher = MagicMock()
             client.dispatcher.wait_for_command_response.return_value = TEST_COMMAND_RESPONSE
@@ -210,7 +214,7 @@ class TestRestAssetClient:
             client.select_aggregator(TEST_AGGREGATOR_UUID)
             expected_ret_val = post_response["aggregator_uuid"] if post_response else None
 
-            mocked_func.assert_called_with(endpoint, data, jwt_token)
+            mocked_func.assert_called_with(endpoint, data, jwt_token, session=client.http_session)
             assert client.active_aggregator is expected_ret_val
 
     @staticmethod
@@ -223,7 +227,7 @@ class TestRestAssetClient:
                    "blocking_post_request") as mocked_func:
             client.unselect_aggregator(TEST_AGGREGATOR_UUID)
 
-            mocked_func.assert_called_with(endpoint, data, jwt_token)
+            mocked_func.assert_called_with(endpoint, data, jwt_token, session=client.http_session)
             assert client.active_aggregator is None
 
     @staticmethod
@@ -234,18 +238,18 @@ class TestRestAssetClient:
                 "transaction_id": TEST_TRANSACTION_ID}
         jwt_token = client.jwt_token
 
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=True) as mocked_func:
             client.set_energy_forecast(energy_forecast_kWh={}, do_not_wait=True)
 
-            mocked_func.assert_called_with(endpoint, data, jwt_token)
+            mocked_func.assert_called_with(endpoint, data, jwt_token, session=client.http_session)
 
     @staticmethod
     @pytest.mark.usefixtures("mock_transaction_id")
     def test_set_energy_forecast_call_wait_for_command_response_and_return_response(client):
         client.dispatcher = MagicMock()
         client.dispatcher.wait_for_command_response.return_value = TEST_COMMAND_RESPONSE
-        with patch("gsy_framework.client_connections.utils.post_request", return_value=True):
+        with patch("gsy_e_sdk.http_session.post_request", return_value=True):
             ret_val = client.set_energy_forecast(energy_forecast_kWh={})
 
             client.dispatcher.wait_for_command_response.assert_called_with("set_energy_forecast",
@@ -255,7 +259,7 @@ class TestRestAssetClient:
     @staticmethod
     @pytest.mark.parametrize("posted, do_not_wait", [(True, True), (False, True), (False, False)])
     def test_set_energy_forecast_return_none(client, posted, do_not_wait):
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=posted):
             ret_val = client.set_energy_forecast(energy_forecast_kWh={},
                                                  do_not_wait=do_not_wait)
@@ -269,18 +273,18 @@ class TestRestAssetClient:
                 "transaction_id": TEST_TRANSACTION_ID}
         jwt_token = client.jwt_token
 
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=True) as mocked_func:
             client.set_energy_measurement(energy_measurement_kWh={}, do_not_wait=True)
 
-            mocked_func.assert_called_with(endpoint, data, jwt_token)
+            mocked_func.assert_called_with(endpoint, data, jwt_token, session=client.http_session)
 
     @staticmethod
     @pytest.mark.usefixtures("mock_transaction_id")
     def test_set_energy_measurement_call_wait_for_command_response_and_return_response(client):
         client.dispatcher = MagicMock()
         client.dispatcher.wait_for_command_response.return_value = TEST_COMMAND_RESPONSE
-        with patch("gsy_framework.client_connections.utils.post_request", return_value=True):
+        with patch("gsy_e_sdk.http_session.post_request", return_value=True):
             ret_val = client.set_energy_measurement(energy_measurement_kWh={})
 
             client.dispatcher.wait_for_command_response.assert_called_with(
@@ -290,7 +294,7 @@ class TestRestAssetClient:
     @staticmethod
     @pytest.mark.parametrize("posted, do_not_wait", [(True, True), (False, True), (False, False)])
     def test_set_energy_measurement_return_none(client, posted, do_not_wait):
-        with patch("gsy_framework.client_connections.utils.post_request",
+        with patch("gsy_e_sdk.http_session.post_request",
                    return_value=posted):
             ret_val = client.set_energy_measurement(energy_measurement_kWh={},
                                                     do_not_wait=do_not_wait)
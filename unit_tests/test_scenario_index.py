@@ -0,0 +1,138 @@
+# pylint: disable=missing-function-docstring
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from gsy_e_sdk.scenario_index import (
+    ScenarioIndex, clear_scenario_index_cache, get_scenario_index, resolve_area_uuids)
+from gsy_e_sdk.utils import (
+    AreaNotFoundException, get_area_uuid_from_area_name_and_collaboration_id)
+
+TEST_SIMULATION_ID = "test-simulation-id"
+TEST_DOMAIN_NAME = "https://test.domain.com"
+TEST_SCENARIO = {
+    "name": "Grid", "uuid": "grid-uuid", "type": "Area", "children": [
+        {"name": "House 1", "uuid": "house-1-uuid", "type": "Area", "children": [
+            {"name": "Load", "uuid": "load-1-uuid", "type": "LoadHours"},
+            {"name": "PV 1", "uuid": "pv-1-uuid", "type": "PV"}]},
+        {"name": "House 2", "uuid": "house-2-uuid", "type": "Area", "children": [
+            {"name": "Load", "uuid": "load-2-uuid", "type": "LoadHours"}]}]}
+
+
+def _graphql_response(scenario):
+    return {"data": {"readConfiguration": {"scenarioData": {"latest": {
+        "serialized": json.dumps(scenario)}}}}}
+
+
+@pytest.fixture(name="graphql_request")
+def fixture_graphql_request():
+    clear_scenario_index_cache()
+    with patch("gsy_e_sdk.scenario_index.execute_graphql_request",
+               return_value=_graphql_response(TEST_SCENARIO)) as mocked_request:
+        yield mocked_request
+    clear_scenario_index_cache()
+
+
+class TestScenarioIndex:
+    """Test the lookup tables and the caching of scenario indexes."""
+
+    @staticmethod
+    def test_index_resolves_names_to_first_area_in_depth_first_order():
+        index = ScenarioIndex(TEST_SIMULATION_ID, TEST_SCENARIO)
+        assert index.resolve("Load") == "load-1-uuid"
+        assert index.uuid_to_name["load-2-uuid"] == "Load"
+        assert index.uuid_to_type["pv-1-uuid"] == "PV"
+        assert index.get_names_by_type("Area") == ["Grid", "House 1", "House 2"]
+
+    @staticmethod
+    def test_resolve_many_reports_all_missing_names():
+        index = ScenarioIndex(TEST_SIMULATION_ID, TEST_SCENARIO)
+        assert index.resolve_many(["PV 1", "House 2"]) == {
+            "PV 1": "pv-1-uuid", "House 2": "house-2-uuid"}
+        with pytest.raises(AreaNotFoundException, match="PV 2.*PV 3"):
+            index.resolve_many(["PV 1", "PV 2", "PV 3"])
+
+    @staticmethod
+    def test_scenario_is_fetched_once_per_simulation(graphql_request):
+        for area_name in ["Load", "PV 1", "House 1"]:
+            get_area_uuid_from_area_name_and_collaboration_id(
+                TEST_SIMULATION_ID, area_name, TEST_DOMAIN_NAME)
+        get_scenario_index("other-simulation-id", TEST_DOMAIN_NAME)
+        assert graphql_request.call_count == 2
+
+    @staticmethod
+    def test_expired_index_is_fetched_again(graphql_request):
+        get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME, ttl=0)
+        get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME, ttl=0)
+        assert graphql_request.call_count == 2
+
+    @staticmethod
+    def test_persisted_index_is_used_after_restart(graphql_request, tmp_path):
+        get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME, cache_dir=str(tmp_path))
+        clear_scenario_index_cache()
+        index = get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME, cache_dir=str(tmp_path))
+        assert index.from_persistent_cache
+        assert index.resolve("Load") == "load-1-uuid"
+        assert index.get_names_by_type("PV") == ["PV 1"]
+        assert graphql_request.call_count == 1
+
+    @staticmethod
+    def test_expired_persisted_index_is_fetched_again(graphql_request, tmp_path, monkeypatch):
+        get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME, cache_dir=str(tmp_path))
+        clear_scenario_index_cache()
+        # A re-created area keeps its name but gets a new uuid
+        edited_scenario = json.loads(json.dumps(TEST_SCENARIO).replace("pv-1-uuid", "pv-uuid"))
+        graphql_request.return_value = _graphql_response(edited_scenario)
+        monkeypatch.setattr("gsy_e_sdk.scenario_index.PERSISTENT_CACHE_MAX_AGE_SECS", -1)
+        index = get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME, cache_dir=str(tmp_path))
+        assert not index.from_persistent_cache
+        assert index.resolve("PV 1") == "pv-uuid"
+        assert graphql_request.call_count == 2
+
+    @staticmethod
+    def test_stale_persisted_index_is_refreshed_on_missing_name(
+            graphql_request, tmp_path, monkeypatch):
+        monkeypatch.setenv("API_CLIENT_CACHE_DIR", str(tmp_path))
+        get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME)
+        clear_scenario_index_cache()
+        edited_scenario = {**TEST_SCENARIO, "children": TEST_SCENARIO["children"] + [
+            {"name": "PV 2", "uuid": "pv-2-uuid", "type": "PV"}]}
+        graphql_request.return_value = _graphql_response(edited_scenario)
+
+        assert resolve_area_uuids(TEST_SIMULATION_ID, TEST_DOMAIN_NAME, ["PV 2"]) == {
+            "PV 2": "pv-2-uuid"}
+        assert graphql_request.call_count == 2
+        clear_scenario_index_cache()
+        assert get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME).resolve("PV 2")
+
+    @staticmethod
+    def test_failed_request_raises_area_not_found(graphql_request):
+        graphql_request.return_value = {"data": None, "errors": [{"message": "failed"}]}
+        with pytest.raises(AreaNotFoundException):
+            get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME)
+
+    @staticmethod
+    def test_slow_fetch_does_not_block_other_scenarios(graphql_request):
+        get_scenario_index(TEST_SIMULATION_ID, TEST_DOMAIN_NAME)
+        fetch_started, release_fetch = threading.Event(), threading.Event()
+
+        def _slow_request(**kwargs):  # pylint: disable=unused-argument
+            fetch_started.set()
+            release_fetch.wait(timeout=5)
+            return _graphql_response(TEST_SCENARIO)
+
+        graphql_request.side_effect = _slow_request
+        slow_thread = threading.Thread(
+            target=get_scenario_index, args=("other-simulation-id", TEST_DOMAIN_NAME))
+        slow_thread.start()
+        try:
+            assert fetch_started.wait(timeout=5)
+            assert get_scenario_index(
+                TEST_SIMULATION_ID, TEST_DOMAIN_NAME).resolve("PV 1") == "pv-1-uuid"
+            assert slow_thread.is_alive()
+        finally:
+            release_fetch.set()
+            slow_thread.join()
+        assert graphql_request.call_count == 2
@@ -0,0 +1,103 @@
+# pylint: disable=missing-function-docstring
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from gsy_e_sdk.scm_upload import SCMUploader, chunk_members
+
+
+def _members(member_count):
+    return {f"member-{member}": {"energy": [1.5] * 96, "name": f"home {member}"}
+            for member in range(member_count)}
+
+
+def _response(status_code):
+    response = MagicMock()
+    response.status_code = status_code
+    return response
+
+
+@pytest.fixture(name="client")
+def fixture_client():
+    client = MagicMock()
+    client.endpoint_prefix = "https://exchange/api/simulation/area"
+    client.simulation_endpoint_prefix = "https://exchange/api/simulation"
+    client.jwt_token = "token"
+    return client
+
+
+@pytest.fixture(name="send_request_mock")
+def fixture_send_request_mock(mocker):
+    mocker.patch("gsy_e_sdk.scm_upload.time.sleep")
+    return mocker.patch("gsy_e_sdk.scm_upload.send_request", return_value=_response(200))
+
+
+class TestSCMUploader:
+    """Test the chunked upload of SCM data."""
+
+    @staticmethod
+    def test_chunk_members_keeps_members_whole_and_bounds_the_chunk_size():
+        members = _members(50)
+        chunks = chunk_members(members, max_chunk_bytes=2000)
+        assert len(chunks) > 1
+        assert {uuid: data for chunk in chunks for uuid, data in chunk.items()} == members
+        assert all(len(json.dumps(chunk)) <= 2000 for chunk in chunks if len(chunk) > 1)
+
+    @staticmethod
+    def test_members_are_uploaded_in_chunks_over_the_client_session(client, send_request_mock):
+        report = SCMUploader(client, max_chunk_bytes=2000).upload_timeseries_and_member_data(
+            _members(50))
+        assert report.success
+        assert len(report.chunks) == send_request_mock.call_count > 1
+        assert sum(len(chunk.member_uuids) for chunk in report.chunks) == 50
+        method, endpoint, data, jwt_token = send_request_mock.call_args.args
+        assert (method, jwt_token) == ("POST", "token")
+        assert endpoint.endswith("/area/set-scm-timeseries-and-member-data/")
+        assert send_request_mock.call_args.kwargs["session"] is client.http_session
+        assert "transaction_id" in data
+
+    @staticmethod
+    def test_common_data_is_sent_with_every_chunk(client, send_request_mock):
+        SCMUploader(client, max_chunk_bytes=2000).upload_timeseries_and_member_data(
+            {"members": _members(20), "market_slot": "2022-01-01T00:00"}, members_key="members")
+        sent_members = {}
+        for call in send_request_mock.call_args_list:
+            assert call.args[2]["market_slot"] == "2022-01-01T00:00"
+            sent_members.update(call.args[2]["members"])
+        assert sent_members == _members(20)
+
+    @staticmethod
+    def test_failed_chunks_are_retried_with_the_same_transaction_id(client, send_request_mock):
+        send_request_mock.side_effect = [None, _response(500), _response(200)]
+        report = SCMUploader(client).upload_timeseries_and_member_data(_members(2))
+        assert report.success
+        assert report.chunks[0].attempts == 3
+        transaction_ids = {call.args[2]["transaction_id"]
+                           for call in send_request_mock.call_args_list}
+        assert transaction_ids == {report.chunks[0].transaction_id}
+
+    @staticmethod
+    def test_chunks_are_reported_as_failed_after_the_last_retry(client, send_request_mock):
+        send_request_mock.return_value = _response(503)
+        report = SCMUploader(client, max_retries=2).upload_timeseries_and_member_data(
+            _members(2))
+        assert not report.success
+        assert send_request_mock.call_count == 3
+        assert report.failed_chunks == report.chunks
+        assert report.members_per_sec == 0
+
+    @staticmethod
+    def test_rejected_chunks_are_not_retried(client, send_request_mock):
+        send_request_mock.return_value = _response(400)
+        report = SCMUploader(client).upload_timeseries_and_member_data(_members(2))
+        assert not report.success
+        assert send_request_mock.call_count == 1
+        assert report.chunks[0].attempts == 1
+
+    @staticmethod
+    def test_global_data_is_uploaded_to_the_simulation_endpoint(client, send_request_mock):
+        report = SCMUploader(client).upload_global_data({"grid_fee": 1})
+        assert report.success
+        assert send_request_mock.call_args.args[1] == (
+            "https://exchange/api/simulation/set-scm-global-data/")
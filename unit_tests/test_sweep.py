@@ -0,0 +1,57 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring
+import csv
+
+import pytest
+
+from gsy_e_sdk.backtest import BacktestEngine
+from gsy_e_sdk.sweep import (
+    SWEEP_KPIS, format_sweep_report, iter_parameter_grid, run_sweep, write_sweep_results)
+from unit_tests import test_backtest
+from unit_tests.test_backtest import OracleStrategy
+
+
+class TestSweep:
+
+    @staticmethod
+    def test_parameter_grid_contains_all_combinations():
+        assert list(iter_parameter_grid({"a": [1, 2], "b": "xy"})) == [
+            {"a": 1, "b": "x"}, {"a": 1, "b": "y"}, {"a": 2, "b": "x"}, {"a": 2, "b": "y"}]
+
+    @staticmethod
+    def test_runs_in_worker_processes_match_the_backtest(grid_tree, profiles):
+        results = run_sweep(OracleStrategy, grid_tree, profiles, {
+            "bid_rate": [20, 30], "clearing_model": ["pay_as_bid", "pay_as_clear"]},
+            max_workers=2, ticks_per_slot=4)
+        assert [result.parameters for result in results] == list(iter_parameter_grid({
+            "bid_rate": [20, 30], "clearing_model": ["pay_as_bid", "pay_as_clear"]}))
+        assert all(result.error is None for result in results)
+        expected = BacktestEngine(OracleStrategy, grid_tree, profiles, ticks_per_slot=4,
+                                  clearing_model="pay_as_clear",
+                                  aggregator_kwargs={"bid_rate": 30}).run()
+        assert results[3].kpis["net_cost"] == expected.net_cost
+        assert results[3].kpis["grid_fee_revenue"] == expected.grid_fee_revenue
+
+    @staticmethod
+    def test_module_attributes_are_set_per_run(grid_tree, profiles):
+        results = run_sweep(OracleStrategy, grid_tree, profiles, {"OFFER_RATE": [10, 40]},
+                            max_workers=1)
+        assert test_backtest.OFFER_RATE == 15
+        # The offers at 40 cents/kWh are above the bids, so no energy is traded
+        assert results[0].kpis["traded_energy_kWh"] == pytest.approx(1.1)
+        assert results[1].kpis["traded_energy_kWh"] == 0
+
+    @staticmethod
+    def test_errors_are_collected_per_run(grid_tree, profiles, tmp_path):
+        results = run_sweep(OracleStrategy, grid_tree, profiles,
+                            {"bid_rate": [25], "unknown_parameter": [1]}, max_workers=1)
+        assert results[0].error.startswith("TypeError")
+        results += run_sweep(OracleStrategy, grid_tree, profiles, {"bid_rate": [25]},
+                             max_workers=1)
+        report = format_sweep_report(results)
+        assert report.index("TypeError") > report.index("25")
+        file_path = tmp_path / "sweep.csv"
+        write_sweep_results(results, str(file_path))
+        with open(file_path, newline="", encoding="utf-8") as csv_file:
+            rows = list(csv.DictReader(csv_file))
+        assert list(rows[0]) == ["bid_rate", "unknown_parameter", *SWEEP_KPIS, "error"]
+        assert rows[1]["error"] == ""
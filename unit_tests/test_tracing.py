@@ -0,0 +1,133 @@
+# pylint: disable=missing-function-docstring, protected-access
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from gsy_e_sdk.tracing import (
+    SPANS_FORMAT, WAIT_SPAN, JsonLinesSpanExporter, Tracer,
+    get_batch_commands_trace_attributes)
+from gsy_e_sdk.websocket_device import DeviceWebsocketMessageReceiver
+
+
+@pytest.fixture(name="exporter")
+def fixture_exporter():
+    return MagicMock(spec=JsonLinesSpanExporter)
+
+
+class TestTracer:
+
+    @staticmethod
+    def test_transactions_are_not_traced_without_exporter():
+        tracer = Tracer()
+        assert tracer.start_transaction("1", "batch_commands") is False
+        with tracer.span("1", WAIT_SPAN):
+            pass
+        tracer.end_transaction("1")
+        assert not tracer._traces
+
+    @staticmethod
+    def test_sample_rate_limits_the_traced_transactions(exporter):
+        tracer = Tracer(exporter, sample_rate=0)
+        assert tracer.start_transaction("1", "batch_commands") is False
+        tracer = Tracer(exporter, sample_rate=1)
+        assert tracer.start_transaction("1", "batch_commands") is True
+        assert tracer.is_traced("1")
+
+    @staticmethod
+    def test_trace_is_exported_once_its_child_spans_are_closed(exporter):
+        tracer = Tracer(exporter)
+        tracer.start_transaction("1", "batch_commands", command_count=2)
+        with tracer.span("1", WAIT_SPAN):
+            tracer.end_transaction("1")
+            exporter.export.assert_not_called()
+        exporter.export.assert_called_once()
+        root_span, wait_span = exporter.export.call_args[0][0]
+        assert root_span.name == "batch_commands"
+        assert root_span.parent_span_id is None
+        assert root_span.attributes == {"transaction_id": "1", "command_count": 2}
+        assert root_span.end_time >= wait_span.end_time
+        assert wait_span.parent_span_id == root_span.span_id
+        assert wait_span.trace_id == root_span.trace_id
+        assert not tracer.is_traced("1")
+
+    @staticmethod
+    def test_span_records_the_raised_exception(exporter):
+        tracer = Tracer(exporter)
+        tracer.start_transaction("1", "register")
+        with pytest.raises(ValueError):
+            with tracer.span("1", WAIT_SPAN):
+                raise ValueError("lost")
+        tracer.end_transaction("1", error="timeout")
+        root_span, wait_span = exporter.export.call_args[0][0]
+        assert root_span.error == "timeout"
+        assert wait_span.error == "ValueError: lost"
+
+    @staticmethod
+    def test_transactions_that_never_end_are_forgotten(exporter):
+        tracer = Tracer(exporter, max_active_transactions=2)
+        for transaction_id in ("1", "2", "3"):
+            tracer.start_transaction(transaction_id, "batch_commands")
+        assert not tracer.is_traced("1")
+        assert tracer.is_traced("3")
+
+    @staticmethod
+    def test_batch_commands_attributes():
+        attributes = get_batch_commands_trace_attributes(
+            "aggregator", {"asset": [{"type": "offer"}, {"type": "bid"}, {"type": "offer"}]})
+        assert attributes == {"aggregator": "aggregator", "asset_count": 1, "command_count": 3,
+                              "command_types": "bid,offer", "asset_uuid": "asset"}
+
+
+class TestJsonLinesSpanExporter:
+
+    @staticmethod
+    def test_traces_are_written_in_the_otlp_format(tmp_path):
+        file_path = tmp_path / "traces.jsonl"
+        exporter = JsonLinesSpanExporter(str(file_path))
+        tracer = Tracer(exporter)
+        tracer.start_transaction("1", "batch_commands", asset_count=3)
+        with tracer.span("1", WAIT_SPAN):
+            pass
+        tracer.end_transaction("1")
+        exporter.close()
+        (line,) = file_path.read_text().splitlines()
+        spans = json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert [span["name"] for span in spans] == ["batch_commands", WAIT_SPAN]
+        assert {"key": "asset_count", "value": {"intValue": "3"}} in spans[0]["attributes"]
+        assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+        assert int(spans[0]["endTimeUnixNano"]) >= int(spans[0]["startTimeUnixNano"])
+
+    @staticmethod
+    def test_traces_are_written_as_spans(tmp_path):
+        file_path = tmp_path / "traces.jsonl"
+        exporter = JsonLinesSpanExporter(str(file_path), SPANS_FORMAT)
+        tracer = Tracer(exporter)
+        tracer.start_transaction("1", "register")
+        tracer.end_transaction("1")
+        exporter.close()
+        (span,) = json.loads(file_path.read_text())
+        assert span["name"] == "register"
+        assert span["duration_secs"] >= 0
+
+
+class TestWebsocketTracing:
+
+    @staticmethod
+    def test_command_response_ends_the_transaction(exporter):
+        tracer = Tracer(exporter)
+        client = MagicMock(latency_tracker=None, recorder=None, metrics=None, tracer=tracer)
+        receiver = DeviceWebsocketMessageReceiver(client)
+        tracer.start_transaction("transaction", "batch-commands")
+        waiter = threading.Thread(target=receiver.wait_for_command_response,
+                                  args=("batch_commands", "transaction", 5))
+        waiter.start()
+        while tracer._traces["transaction"].open_spans == 0:
+            time.sleep(0.001)
+        receiver.received_message({"command": "batch_commands", "transaction_id": "transaction"})
+        waiter.join()
+        root_span, *child_spans = exporter.export.call_args[0][0]
+        assert root_span.name == "batch-commands"
+        assert sorted(span.name for span in child_spans) == ["response", "wait"]
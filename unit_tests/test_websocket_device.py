@@ -0,0 +1,163 @@
+# pylint: disable=missing-function-docstring, protected-access
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from gsy_e_sdk.recorder import INBOUND
+from gsy_e_sdk.websocket_device import (
+    CommandConnectionLostError, CommandResponseBuffer, CommandResponseTimeoutError,
+    DeviceWebsocketMessageReceiver)
+
+
+def _response(command="set_energy_forecast", transaction_id="transaction-1"):
+    return {"command": command, "transaction_id": transaction_id, "status": "ready"}
+
+
+@pytest.fixture(name="receiver")
+def fixture_receiver():
+    return DeviceWebsocketMessageReceiver(MagicMock())
+
+
+class TestCommandResponseBuffer:
+    """Test the indexed buffer of command responses."""
+
+    @staticmethod
+    def test_wait_returns_and_removes_response_that_already_arrived(receiver):
+        receiver.received_message(_response())
+        assert receiver.wait_for_command_response(
+            "set_energy_forecast", "transaction-1") == _response()
+        assert len(receiver.command_response_buffer) == 0
+
+    @staticmethod
+    def test_wait_is_woken_up_when_response_arrives(receiver):
+        threading.Timer(0.05, receiver.received_message, args=(_response(),)).start()
+        assert receiver.wait_for_command_response(
+            "set_energy_forecast", "transaction-1", timeout=5) == _response()
+
+    @staticmethod
+    def test_wait_ignores_responses_of_other_transactions(receiver):
+        receiver.received_message(_response(transaction_id="transaction-2"))
+        with pytest.raises(CommandResponseTimeoutError):
+            receiver.wait_for_command_response("set_energy_forecast", "transaction-1",
+                                               timeout=0.01)
+        assert ("set_energy_forecast", "transaction-2") in receiver.command_response_buffer
+
+    @staticmethod
+    def test_timeout_is_still_an_assertion_error(receiver):
+        with pytest.raises(AssertionError):
+            receiver.wait_for_command_response("register", "transaction-1", timeout=0.01)
+
+    @staticmethod
+    def test_orphaned_responses_are_dropped_after_ttl():
+        buffer = CommandResponseBuffer(ttl=0.01)
+        buffer.append(_response(transaction_id="transaction-1"))
+        time.sleep(0.02)
+        buffer.append(_response(transaction_id="transaction-2"))
+        assert [message["transaction_id"] for message in buffer] == ["transaction-2"]
+
+    @staticmethod
+    def test_oldest_responses_are_dropped_beyond_max_size():
+        buffer = CommandResponseBuffer(max_size=2)
+        for transaction_id in ["transaction-1", "transaction-2", "transaction-3"]:
+            buffer.append(_response(transaction_id=transaction_id))
+        assert [message["transaction_id"] for message in buffer] == [
+            "transaction-2", "transaction-3"]
+
+    @staticmethod
+    def test_async_wait_is_woken_up_from_another_thread(receiver):
+        async def _wait():
+            threading.Timer(0.05, receiver.received_message, args=(_response(),)).start()
+            return await receiver.async_wait_for_command_response(
+                "set_energy_forecast", "transaction-1", timeout=5)
+
+        assert asyncio.run(_wait()) == _response()
+
+    @staticmethod
+    def test_async_wait_raises_on_timeout(receiver):
+        with pytest.raises(CommandResponseTimeoutError):
+            asyncio.run(receiver.async_wait_for_command_response(
+                "set_energy_forecast", "transaction-1", timeout=0.01))
+        assert not receiver.command_response_buffer._async_waiters
+
+
+class TestSequenceTracking:
+    """Test the detection of lost and repeated messages."""
+
+    @staticmethod
+    def test_repeated_messages_are_dropped(receiver):
+        message = {"event": "tick", "sequence_number": 1}
+        receiver.received_message(message)
+        receiver.received_message(message)
+        receiver.client._on_tick.assert_called_once_with(message)
+
+    @staticmethod
+    def test_late_messages_are_handled_once(receiver):
+        for sequence_number in [1, 3, 2, 2, 3]:
+            receiver.received_message({"event": "tick", "sequence_number": sequence_number})
+        assert receiver.client._on_tick.call_count == 3
+
+    @staticmethod
+    def test_gaps_in_sequence_numbers_are_recorded(receiver):
+        for sequence_number in [1, 2, 5]:
+            receiver.received_message({"event": "tick", "sequence_number": sequence_number})
+        assert list(receiver.sequence_gaps) == [(3, 4)]
+        assert receiver.get_resume_headers() == {"Last-Sequence-Number": "5"}
+
+    @staticmethod
+    def test_sequence_that_goes_backwards_restarts_the_tracking(receiver):
+        for sequence_number in [5, 6, 7, 1, 2]:
+            receiver.received_message({"event": "tick", "sequence_number": sequence_number})
+        assert receiver.client._on_tick.call_count == 5
+        assert not receiver.sequence_gaps
+        assert receiver.get_resume_headers() == {"Last-Sequence-Number": "2"}
+
+    @staticmethod
+    def test_new_session_that_does_not_resume_restarts_the_tracking(receiver):
+        for sequence_number in [1, 2, 3]:
+            receiver.received_message({"event": "tick", "sequence_number": sequence_number})
+        receiver.on_connection_lost()
+        for sequence_number in [1, 2]:
+            receiver.received_message({"event": "tick", "sequence_number": sequence_number})
+        assert receiver.client._on_tick.call_count == 5
+        assert receiver.get_resume_headers() == {"Last-Sequence-Number": "2"}
+
+    @staticmethod
+    def test_new_session_that_resumes_keeps_dropping_repetitions(receiver):
+        for sequence_number in [1, 2]:
+            receiver.received_message({"event": "tick", "sequence_number": sequence_number})
+        receiver.on_connection_lost()
+        for sequence_number in [3, 2]:
+            receiver.received_message({"event": "tick", "sequence_number": sequence_number})
+        assert receiver.client._on_tick.call_count == 3
+
+    @staticmethod
+    def test_messages_without_sequence_number_are_always_handled(receiver):
+        receiver.received_message({"event": "tick"})
+        receiver.received_message({"event": "tick"})
+        assert receiver.client._on_tick.call_count == 2
+        assert receiver.get_resume_headers() == {}
+
+    @staticmethod
+    def test_raw_frames_are_recorded_as_received(receiver):
+        receiver.received_message({"event": "tick"}, raw_message='{"event":"tick"}')
+        receiver.recorder.record.assert_called_once_with(
+            INBOUND, receiver.recording_channel, '{"event":"tick"}')
+
+    @staticmethod
+    def test_connection_loss_fails_pending_waits_fast(receiver):
+        threading.Timer(0.05, receiver.on_connection_lost).start()
+        with pytest.raises(CommandConnectionLostError):
+            receiver.wait_for_command_response("register", "transaction-1", timeout=5)
+
+    @staticmethod
+    def test_connection_loss_fails_pending_async_waits_fast(receiver):
+        async def _wait():
+            threading.Timer(0.05, receiver.on_connection_lost).start()
+            return await receiver.async_wait_for_command_response(
+                "register", "transaction-1", timeout=5)
+
+        with pytest.raises(CommandConnectionLostError):
+            asyncio.run(_wait())
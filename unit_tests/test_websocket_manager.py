@@ -0,0 +1,164 @@
+# pylint: disable=missing-function-docstring
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from gsy_e_sdk.clients.rest_asset_client import RestAssetClient
+from gsy_e_sdk.websocket_device import DeviceWebsocketMessageReceiver
+from gsy_e_sdk.websocket_manager import WebsocketConnectionManager, WebsocketThread
+
+TEST_DOMAIN_NAME = "https://test.domain.com"
+
+
+class FakeWebsocket:
+    """Websocket that yields the configured messages and then stays open."""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __aiter__(self):
+        return self._receive()
+
+    async def _receive(self):
+        for message in self.messages:
+            yield json.dumps(message)
+        await asyncio.Event().wait()
+
+
+class ClosingWebsocket(FakeWebsocket):
+    """Websocket that is closed by the server after yielding its messages."""
+
+    async def _receive(self):
+        for message in self.messages:
+            yield json.dumps(message)
+
+
+def _wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+@pytest.fixture(name="manager")
+def fixture_manager(mocker):
+    mocker.patch("gsy_e_sdk.websocket_manager.get_jwt_token_manager")
+    messages = {
+        "wss://test/asset-1/": [{"event": "tick", "asset": "asset-1"}],
+        "wss://test/asset-2/": [{"event": "tick", "asset": "asset-2"},
+                                {"event": "tick", "asset": "asset-2"}],
+    }
+    mocker.patch("gsy_e_sdk.websocket_manager.websockets.connect",
+                 side_effect=lambda uri, **kwargs: FakeWebsocket(messages[uri]))
+    manager = WebsocketConnectionManager(callback_workers=2)
+    yield manager
+    manager.close()
+
+
+class TestWebsocketConnectionManager:
+    """Test hosting multiple websocket sessions on one event loop."""
+
+    @staticmethod
+    def test_messages_are_routed_to_the_dispatcher_of_their_connection(manager):
+        dispatchers = {uri: MagicMock() for uri in ["wss://test/asset-1/", "wss://test/asset-2/"]}
+        for uri, dispatcher in dispatchers.items():
+            manager.add_connection(uri, TEST_DOMAIN_NAME, dispatcher)
+
+        _wait_until(lambda: dispatchers["wss://test/asset-2/"].received_message.call_count == 2)
+        dispatchers["wss://test/asset-1/"].received_message.assert_called_once_with(
+            {"event": "tick", "asset": "asset-1"},
+            raw_message=json.dumps({"event": "tick", "asset": "asset-1"}))
+
+    @staticmethod
+    def test_all_connections_share_one_thread(manager):
+        threads_before = threading.active_count()
+        manager.add_connection("wss://test/asset-1/", TEST_DOMAIN_NAME, MagicMock())
+        manager.add_connection("wss://test/asset-2/", TEST_DOMAIN_NAME, MagicMock())
+        assert threading.active_count() - threads_before <= 2
+
+    @staticmethod
+    def test_get_stats_reports_per_connection_counters(manager):
+        manager.add_connection("wss://test/asset-2/", TEST_DOMAIN_NAME, MagicMock())
+        _wait_until(lambda: manager.get_stats()["wss://test/asset-2/"]["messages_received"] == 2)
+        stats = manager.get_stats()["wss://test/asset-2/"]
+        assert stats["connected"] is True
+        assert stats["connection_count"] == 1
+        assert stats["errors"] == 0
+
+    @staticmethod
+    def test_dispatcher_errors_do_not_close_the_connection(manager):
+        dispatcher = MagicMock(received_message=MagicMock(side_effect=ValueError))
+        manager.add_connection("wss://test/asset-2/", TEST_DOMAIN_NAME, dispatcher)
+        _wait_until(lambda: manager.get_stats()["wss://test/asset-2/"]["errors"] == 2)
+        assert manager.get_stats()["wss://test/asset-2/"]["connected"] is True
+
+
+def test_rest_asset_client_uses_shared_manager_and_executor(mocker):
+    mocker.patch("gsy_e_sdk.authentication.retrieve_jwt_key_from_server", return_value="token")
+    manager = MagicMock()
+    with patch("gsy_e_sdk.clients.rest_asset_client.WebsocketThread") as websocket_thread:
+        client = RestAssetClient("asset-uuid", simulation_id="simulation-id",
+                                 domain_name=TEST_DOMAIN_NAME,
+                                 websockets_domain_name="wss://test",
+                                 websocket_manager=manager)
+    websocket_thread.assert_not_called()
+    manager.add_connection.assert_called_once_with(
+        "wss://test/simulation-id/asset-uuid/", TEST_DOMAIN_NAME, client.dispatcher)
+    assert client.callback_thread is manager.callback_executor
+
+
+def test_reconnection_resumes_and_fails_pending_commands(mocker):
+    mocker.patch("gsy_e_sdk.websocket_manager.get_jwt_token_manager")
+    mocker.patch("gsy_e_sdk.websocket_manager.WEBSOCKET_WAIT_BEFORE_RETRY_SECS", 0)
+    connect_headers = []
+
+    def _connect(uri, extra_headers):  # pylint: disable=unused-argument
+        connect_headers.append(extra_headers)
+        if len(connect_headers) == 1:
+            return ClosingWebsocket([{"event": "tick", "sequence_number": 7}])
+        return FakeWebsocket([])
+
+    mocker.patch("gsy_e_sdk.websocket_manager.websockets.connect", side_effect=_connect)
+    receiver = DeviceWebsocketMessageReceiver(MagicMock())
+    receiver.on_connection_lost = MagicMock(wraps=receiver.on_connection_lost)
+    manager = WebsocketConnectionManager(callback_workers=1)
+    try:
+        manager.add_connection("wss://test/asset-1/", TEST_DOMAIN_NAME, receiver)
+        _wait_until(lambda: len(connect_headers) == 2)
+        assert connect_headers[1]["Last-Sequence-Number"] == "7"
+        receiver.on_connection_lost.assert_called_once()
+    finally:
+        manager.close()
+
+
+def test_websocket_thread_resumes_and_fails_pending_commands(mocker):
+    mocker.patch("gsy_e_sdk.websocket_manager.get_jwt_token_manager")
+    mocker.patch("gsy_e_sdk.websocket_manager.WEBSOCKET_WAIT_BEFORE_RETRY_SECS", 0)
+    mocker.patch("gsy_e_sdk.websocket_manager.WEBSOCKET_MAX_CONNECTION_RETRIES", 1)
+    connect_headers = []
+
+    def _connect(uri, extra_headers):  # pylint: disable=unused-argument
+        connect_headers.append(extra_headers)
+        if len(connect_headers) > 1:
+            raise ConnectionError
+        return ClosingWebsocket([{"event": "tick", "sequence_number": 7}])
+
+    mocker.patch("gsy_e_sdk.websocket_manager.websockets.connect", side_effect=_connect)
+    receiver = DeviceWebsocketMessageReceiver(MagicMock())
+    receiver.on_connection_lost = MagicMock(wraps=receiver.on_connection_lost)
+    websocket_thread = WebsocketThread("wss://test/asset-1/", TEST_DOMAIN_NAME, receiver)
+    websocket_thread.start()
+    websocket_thread.join(timeout=2)
+    assert not websocket_thread.is_alive()
+    assert connect_headers[1]["Last-Sequence-Number"] == "7"
+    assert receiver.on_connection_lost.call_count == 2